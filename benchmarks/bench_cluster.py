@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_cluster.py
+----------------
+Generador de carga multiproceso contra el servidor en uno o varios procesos
+(server/cluster.py, SO_REUSEPORT).
+
+Cada proceso generador abre `--pairs` parejas de usuarios, les abre un chat y
+hace ida y vuelta CHAT a -> b -> a desde un hilo por pareja durante
+`--duration` segundos. Con varios procesos servidor el kernel reparte las
+conexiones, así que parte de las parejas queda en workers distintos y sus
+mensajes cruzan el socket Unix entre workers.
+
+Se informa de mensajes enrutados por segundo y latencia de ida y vuelta
+(p50 / p99). "1" es el servidor de un solo proceso sin registro compartido.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_cluster
+    python -m benchmarks.bench_cluster --processes 1,4 --generators 8 --pairs 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from .common import connect, login, send_tlv, recv_tlv, raise_fd_limit, percentile
+
+
+def serve(processes: int, mode: str) -> None:
+    """Proceso hijo: servidor (o cluster) sin observers de salida; imprime el puerto."""
+    raise_fd_limit()
+    if processes == 1:
+        from server.facade import SERVER_MODES
+        from server.events import ServerStarted
+        server = SERVER_MODES[mode]("127.0.0.1", 0)
+
+        def announce(event):
+            if isinstance(event, ServerStarted):
+                print(event.port, flush=True)
+
+        server.subscribe(announce)
+        server.start()
+        return
+    from server.cluster import run_cluster
+    run_cluster(processes, "127.0.0.1", 0, log_filename=None, mode=mode,
+                announce=lambda port: print(port, flush=True))
+
+
+def open_chat(a, b, name_a: str, name_b: str) -> None:
+    send_tlv(a, 1, f"REQ_CHAT:{name_b}".encode("utf-8"))
+    recv_tlv(b)                                   # REQ_CHAT_FROM
+    send_tlv(b, 1, f"ACCEPT_CHAT:{name_a}".encode("utf-8"))
+    recv_tlv(a)                                   # CHAT_ACCEPTED
+    recv_tlv(b)                                   # CHAT_ACCEPTED
+
+
+def generate(args) -> tuple:
+    """Proceso generador: devuelve (mensajes enrutados, latencias en ms)."""
+    port, gen, pairs, duration = args
+    raise_fd_limit()
+    sockets = []
+    for i in range(pairs):
+        name_a, name_b = f"g{gen}p{i}a", f"g{gen}p{i}b"
+        a, b = connect(port), connect(port)
+        login(a, name_a)
+        login(b, name_b)
+        open_chat(a, b, name_a, name_b)
+        sockets.append((a, b, name_a, name_b))
+
+    counts = [0] * pairs
+    latencies = [[] for _ in range(pairs)]
+    deadline = time.perf_counter() + duration
+
+    def ping_pong(i: int) -> None:
+        a, b, name_a, name_b = sockets[i]
+        to_b = f"CHAT:{name_b}:ping".encode("utf-8")
+        to_a = f"CHAT:{name_a}:pong".encode("utf-8")
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            send_tlv(a, 0, to_b)
+            recv_tlv(b)
+            send_tlv(b, 0, to_a)
+            recv_tlv(a)
+            latencies[i].append((time.perf_counter() - start) * 1000.0)
+            counts[i] += 2
+
+    threads = [threading.Thread(target=ping_pong, args=(i,)) for i in range(pairs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for a, b, _, _ in sockets:
+        a.close()
+        b.close()
+    return sum(counts), [x for samples in latencies for x in samples]
+
+
+def measure(processes: int, mode: str, generators: int, pairs: int, duration: float) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_cluster", "--serve", str(processes), "--mode", mode],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(proc.stdout.readline())
+        time.sleep(1.0)  # los workers del cluster arrancan después de anunciar el puerto
+        with multiprocessing.Pool(generators) as pool:
+            results = pool.map(generate, [(port, g, pairs, duration) for g in range(generators)])
+        messages = sum(count for count, _ in results)
+        latencies = [x for _, samples in results for x in samples]
+        return {
+            "processes": processes,
+            "rate": messages / duration,
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--processes", default=f"1,{max(2, os.cpu_count() or 1)}",
+                        help="procesos servidor a comparar, separados por comas")
+    parser.add_argument("--mode", default="threaded", choices=("threaded", "async"))
+    parser.add_argument("--generators", type=int, default=4, help="procesos generadores de carga")
+    parser.add_argument("--pairs", type=int, default=25, help="parejas de usuarios por generador")
+    parser.add_argument("--duration", type=float, default=5.0, help="segundos de carga por medición")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.mode)
+        return
+
+    print(f"{args.generators} generadores x {args.pairs} parejas, {args.duration:g} s, "
+          f"{os.cpu_count()} CPU")
+    print(f"{'procesos':<10}{'msgs/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for processes in (int(p) for p in args.processes.split(",")):
+        r = measure(processes, args.mode, args.generators, args.pairs, args.duration)
+        print(f"{r['processes']:<10}{r['rate']:>12.0f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONUNBUFFERED", "1")
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_compression.py
+--------------------
+Compresión por trama (common/compression.py) sobre distintos tipos de datos:
+ratio, CPU por fragmento de 64 KiB, decisión de omitir y tiempo estimado de
+transferencia por un enlace limitado (bytes en el cable / ancho de banda +
+CPU de compresión y descompresión).
+
+Los datos se envían por FrameCodec.encode/decode como fragmentos Tipo 3, igual
+que el cliente en modo streaming.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --link-mbit 100 --size 16
+"""
+
+import argparse
+import io
+import os
+import random
+import time
+import zipfile
+
+from common.compression import FrameCodec
+from client.transfer import CHUNK_DATA, CHUNK_SIZE, chunk_prefix
+
+
+def sample_log(size: int) -> bytes:
+    rng = random.Random(1)
+    levels = ("INFO", "INFO", "INFO", "WARNING", "ERROR")
+    out = io.StringIO()
+    i = 0
+    while out.tell() < size:
+        out.write(f"2026-10-17 12:{i % 60:02d}:{rng.randrange(60):02d} {rng.choice(levels)} "
+                  f"server.core: cliente user{rng.randrange(500)} desde 10.0.{rng.randrange(255)}."
+                  f"{rng.randrange(255)} ({rng.randrange(200)} ms)\n")
+        i += 1
+    return out.getvalue().encode("utf-8")[:size]
+
+
+def sample_csv(size: int) -> bytes:
+    rng = random.Random(2)
+    out = io.StringIO()
+    out.write("id,fecha,usuario,importe,estado\n")
+    i = 0
+    while out.tell() < size:
+        out.write(f"{i},2026-10-{rng.randrange(1, 29):02d},user{rng.randrange(1000)},"
+                  f"{rng.uniform(0, 1000):.2f},{rng.choice(('ok', 'pendiente', 'error'))}\n")
+        i += 1
+    return out.getvalue().encode("utf-8")[:size]
+
+
+def sample_source(size: int) -> bytes:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    chunks = []
+    for folder in ("server", "client", "common"):
+        for name in sorted(os.listdir(os.path.join(root, folder))):
+            if name.endswith(".py"):
+                with open(os.path.join(root, folder, name), "rb") as f:
+                    chunks.append(f.read())
+    data = b"".join(chunks)
+    return (data * (size // len(data) + 1))[:size]
+
+
+def sample_zip(size: int) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("log.txt", sample_log(size * 4))
+    data = buf.getvalue()
+    return (data * (size // len(data) + 1))[:size]
+
+
+SAMPLES = {
+    "log":      sample_log,
+    "csv":      sample_csv,
+    "código":   sample_source,
+    "zip":      sample_zip,
+    "aleatorio": os.urandom,
+}
+
+
+def measure(data: bytes, codecs) -> dict:
+    codec = FrameCodec()
+    receiver = FrameCodec()
+    wire = 0
+    start = time.perf_counter()
+    frames = []
+    for offset in range(0, len(data), CHUNK_SIZE):
+        payload = (chunk_prefix("bob", 1, CHUNK_DATA), data[offset:offset + CHUNK_SIZE])
+        msg_type, parts = codec.encode(3, payload, codecs)
+        body = b"".join(bytes(p) for p in parts) if isinstance(parts, tuple) else parts
+        frames.append((msg_type, body))
+        wire += len(body)
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for msg_type, body in frames:
+        receiver.decode(msg_type, body, codecs)
+    decode_s = time.perf_counter() - start
+    stats = codec.stats()
+    return {"wire": wire, "encode_s": encode_s, "decode_s": decode_s,
+            "compressed": stats["frames"], "skipped": stats["skipped"], "frames": len(frames)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=8, help="MB por tipo de datos")
+    parser.add_argument("--link-mbit", type=float, default=10.0, help="ancho de banda del enlace simulado")
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    bandwidth = args.link_mbit * 1e6 / 8
+    print(f"enlace {args.link_mbit:g} Mbit/s, {args.size} MB por muestra, fragmentos de {CHUNK_SIZE // 1024} KiB")
+    print(f"{'datos':<11}{'códec':<7}{'ratio':>7}{'comp.':>8}{'omit.':>7}"
+          f"{'cod MB/s':>10}{'dec MB/s':>10}{'µs/frag':>9}{'enlace s':>10}")
+    for name, make in SAMPLES.items():
+        data = make(size)
+        for label, codecs in (("ninguno", ()), ("zlib", ("zlib",)), ("lzma", ("zlib", "lzma"))):
+            r = measure(data, codecs)
+            mb = len(data) / (1024 * 1024)
+            link = r["wire"] / bandwidth + (r["encode_s"] + r["decode_s"] if codecs else 0.0)
+            print(f"{name:<11}{label:<7}{len(data) / r['wire']:>7.2f}{r['compressed']:>8}{r['skipped']:>7}"
+                  f"{mb / r['encode_s']:>10.0f}{mb / r['decode_s']:>10.0f}"
+                  f"{r['encode_s'] / r['frames'] * 1e6:>9.0f}{link:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_engines.py
+----------------
+Compara el motor con hilos (ChatServer) y el motor asyncio (AsyncChatServer):
+memoria residente, número de hilos y latencia de mensajes con 1k, 5k y 10k
+conexiones abiertas.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_engines
+    python -m benchmarks.bench_engines --connections 1000 --modes async
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from .common import (
+    connect, login, send_tlv, recv_tlv, rss_kb, thread_count,
+    raise_fd_limit, percentile,
+)
+
+
+def serve(mode: str) -> None:
+    """Proceso hijo: arranca el servidor sin observers de salida e imprime el puerto."""
+    from server.facade import SERVER_MODES
+    from server.events import ServerStarted
+
+    raise_fd_limit()
+    server = SERVER_MODES[mode]("127.0.0.1", 0)
+
+    def announce(event):
+        if isinstance(event, ServerStarted):
+            print(event.port, flush=True)
+
+    server.subscribe(announce)
+    server.start()
+
+
+def measure(mode: str, connections: int, messages: int) -> dict:
+    """Abre `connections` clientes contra un servidor nuevo y mide memoria y latencia."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_engines", "--serve", mode],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(proc.stdout.readline())
+        base_rss = rss_kb(proc.pid)
+
+        idle = []
+        for i in range(connections):
+            sock = connect(port)
+            send_tlv(sock, 1, f"SET_NAME:idle{i}".encode("utf-8"))
+            idle.append(sock)
+        for sock in idle:  # vaciar NAME_OK para confirmar el registro
+            recv_tlv(sock)
+
+        a, b = connect(port), connect(port)
+        login(a, "bench_a")
+        login(b, "bench_b")
+        send_tlv(a, 1, b"REQ_CHAT:bench_b")
+        recv_tlv(b)                                   # REQ_CHAT_FROM
+        send_tlv(b, 1, b"ACCEPT_CHAT:bench_a")
+        recv_tlv(a)                                   # CHAT_ACCEPTED
+        recv_tlv(b)                                   # CHAT_ACCEPTED
+
+        latencies = []
+        for i in range(messages):
+            start = time.perf_counter()
+            send_tlv(a, 0, f"CHAT:bench_b:{i}".encode("utf-8"))
+            recv_tlv(b)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        result = {
+            "mode": mode,
+            "connections": connections,
+            "rss_base_mb": (base_rss or 0) / 1024.0,
+            "rss_mb": (rss_kb(proc.pid) or 0) / 1024.0,
+            "threads": thread_count(proc.pid),
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+        }
+        for sock in idle + [a, b]:
+            sock.close()
+        return result
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--modes", default="threaded,async")
+    parser.add_argument("--connections", default="1000,5000,10000")
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    limit = raise_fd_limit()
+    print(f"{'modo':<10}{'conexiones':>12}{'RSS base':>11}{'RSS':>10}{'hilos':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for n in (int(c) for c in args.connections.split(",")):
+        if 0 < limit < n + 64:
+            print(f"(omitido {n}: límite de descriptores {limit})")
+            continue
+        for mode in args.modes.split(","):
+            r = measure(mode, n, args.messages)
+            print(f"{r['mode']:<10}{r['connections']:>12}{r['rss_base_mb']:>9.1f}MB{r['rss_mb']:>8.1f}MB"
+                  f"{r['threads'] or 0:>8}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONUNBUFFERED", "1")
+    main()
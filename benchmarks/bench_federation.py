@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_federation.py
+-------------------
+Latencia y throughput de chat y archivos entre usuarios del mismo nodo y de
+nodos distintos de una federación (server/federation.py).
+
+Arranca `--nodes` servidores federados en procesos hijos (localhost) y mide,
+para una pareja con ambos usuarios en el nodo 0 y otra con un usuario en el
+nodo 0 y otro en el nodo 1:
+
+    ida y vuelta   CHAT a -> b -> a, uno cada vez (p50 / p99 en ms)
+    ráfaga         N mensajes CHAT seguidos de a hacia b (msgs/s)
+    volumen        fragmentos Tipo 3 de 64 KiB de a hacia b (MB/s)
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_federation
+    python -m benchmarks.bench_federation --mode async --pings 5000
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from .common import connect, login, send_tlv, recv_tlv, percentile
+from .bench_socket_profiles import count_reads
+
+CHUNK = 64 * 1024
+
+
+def serve(node: str, peers: str, mode: str) -> None:
+    """Proceso hijo: nodo federado sin observers de salida; imprime el puerto de clientes."""
+    from server.facade import SERVER_MODES
+    from server.events import ServerStarted
+    from server.federation import FederationRouter
+    from server.outbox import OutboxConfig
+
+    outbox = OutboxConfig(max_frames=1 << 20, max_bytes=512 * 1024 * 1024)
+    router = FederationRouter(node, [p for p in peers.split(",") if p])
+    server = SERVER_MODES[mode]("127.0.0.1", 0, outbox=outbox, router=router)
+
+    def announce(event):
+        if isinstance(event, ServerStarted):
+            print(event.port, flush=True)
+
+    server.subscribe(announce)
+    server.start()
+
+
+def free_port() -> int:
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def measure_pair(port_a: int, port_b: int, tag: str, pings: int, burst: int, volume_mb: int) -> dict:
+    name_a, name_b = f"{tag}_a", f"{tag}_b"
+    a, b = connect(port_a), connect(port_b)
+    login(a, name_a)
+    login(b, name_b)
+    send_tlv(a, 1, f"REQ_CHAT:{name_b}".encode("utf-8"))
+    recv_tlv(b)                                   # REQ_CHAT_FROM
+    send_tlv(b, 1, f"ACCEPT_CHAT:{name_a}".encode("utf-8"))
+    recv_tlv(a)                                   # CHAT_ACCEPTED
+    recv_tlv(b)                                   # CHAT_ACCEPTED
+
+    latencies = []
+    to_b = f"CHAT:{name_b}:ping".encode("utf-8")
+    to_a = f"CHAT:{name_a}:pong".encode("utf-8")
+    for _ in range(pings):
+        start = time.perf_counter()
+        send_tlv(a, 0, to_b)
+        recv_tlv(b)
+        send_tlv(b, 0, to_a)
+        recv_tlv(a)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    message = to_b + b"x" * 32
+    delivered = 5 + len(f"FROM:{name_a}:ping".encode("utf-8")) + 32
+    reader = threading.Thread(target=count_reads, args=(b, burst * delivered))
+    start = time.perf_counter()
+    reader.start()
+    for _ in range(burst):
+        send_tlv(a, 0, message)
+    reader.join()
+    burst_elapsed = time.perf_counter() - start
+
+    chunks = volume_mb * 1024 * 1024 // CHUNK
+    dst = name_b.encode("utf-8")
+    payload = bytes([len(dst)]) + dst + (1).to_bytes(4, "big") + bytes([1]) + bytes(CHUNK)
+    relayed = 5 + 1 + len(name_a.encode("utf-8")) + 5 + CHUNK
+    reader = threading.Thread(target=count_reads, args=(b, chunks * relayed))
+    start = time.perf_counter()
+    reader.start()
+    for _ in range(chunks):
+        send_tlv(a, 3, payload)
+    reader.join()
+    volume_elapsed = time.perf_counter() - start
+
+    a.close()
+    b.close()
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "burst_rate": burst / burst_elapsed,
+        "volume_mbs": chunks * CHUNK / volume_elapsed / (1024 * 1024),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--peers", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--mode", default="threaded", choices=("threaded", "async"))
+    parser.add_argument("--pings", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=20000)
+    parser.add_argument("--volume", type=int, default=128, help="MB a transferir en la prueba de volumen")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.peers, args.mode)
+        return
+
+    nodes = [f"127.0.0.1:{free_port()}" for _ in range(max(2, args.nodes))]
+    procs = []
+    try:
+        ports = []
+        for node in nodes:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_federation", "--serve", node,
+                 "--peers", ",".join(nodes), "--mode", args.mode],
+                stdout=subprocess.PIPE, text=True,
+            )
+            procs.append(proc)
+            ports.append(int(proc.stdout.readline()))
+        time.sleep(2.0)  # enlaces entre nodos (se reintentan cada segundo)
+
+        print(f"{len(nodes)} nodos, motor {args.mode}")
+        print(f"{'pareja':<12}{'p50 ms':>10}{'p99 ms':>10}{'ráfaga msg/s':>15}{'volumen MB/s':>15}")
+        for label, port_b in (("mismo nodo", ports[0]), ("entre nodos", ports[1])):
+            r = measure_pair(ports[0], port_b, label.replace(" ", "_"), args.pings, args.burst, args.volume)
+            print(f"{label:<12}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['burst_rate']:>15.0f}"
+                  f"{r['volume_mbs']:>15.1f}")
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONUNBUFFERED", "1")
+    main()
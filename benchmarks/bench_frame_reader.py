@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_frame_reader.py
+---------------------
+Throughput de recepción de tramas TLV: lectura anterior (`data += packet`)
+frente a FrameReader (recv_into sobre buffers preasignados), con tramas de
+1 KB, 1 MB y 100 MB sobre un socketpair local.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_frame_reader
+    python -m benchmarks.bench_frame_reader --sizes 1024,1048576
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+from common.framing import FrameReader
+
+
+def legacy_recv_all(sock: socket.socket, n: int):
+    """Implementación previa de ClientSession/MessageReceiver.recv_all."""
+    data = b""
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+        if not packet:
+            return None
+        data += packet
+    return data
+
+
+def legacy_read_frame(sock: socket.socket):
+    header = legacy_recv_all(sock, 5)
+    msg_type, length = struct.unpack("!BI", header)
+    return msg_type, legacy_recv_all(sock, length)
+
+
+def run(size: int, frames: int, variant: str) -> float:
+    """Devuelve MB/s recibidos para `frames` tramas de `size` bytes."""
+    rx, tx = socket.socketpair()
+    payload = bytes(size)
+    header = struct.pack("!BI", 2, size)
+
+    def writer():
+        for _ in range(frames):
+            tx.sendall(header)
+            tx.sendall(payload)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    if variant == "anterior":
+        for _ in range(frames):
+            legacy_read_frame(rx)
+    else:
+        reader = FrameReader(rx)
+        reuse = variant == "reuse"
+        for _ in range(frames):
+            reader.read_frame(reuse=reuse)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    rx.close()
+    tx.close()
+    return size * frames / elapsed / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1024,1048576,104857600")
+    parser.add_argument("--bytes", type=int, default=256 * 1024 * 1024,
+                        help="volumen aproximado a transferir por medición")
+    args = parser.parse_args()
+
+    print(f"{'tamaño':>12}{'tramas':>8}{'anterior':>14}{'FrameReader':>14}{'(propio buf)':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        frames = max(2, min(20000, args.bytes // size))
+        results = [run(size, frames, v) for v in ("anterior", "reuse", "owned")]
+        print(f"{size:>12}{frames:>8}" + "".join(f"{r:>10.1f}MB/s" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_journal.py
+----------------
+Escritura y lectura del diario binario de eventos (server/journal.py):
+
+    escritura    eventos/s a través de JournalObserver (encolar + hilo escritor)
+    replay       eventos/s decodificados con Journal.replay() de todo el diario
+    resumen      eventos/s contados por tipo sin decodificar (Journal.summary)
+    intervalo    ms para leer una ventana de --window segundos en mitad del
+                 diario (búsqueda en el índice + lectura desde esa posición)
+
+Los eventos son una mezcla de conexiones, chats, transferencias y salas con
+instantes repartidos a lo largo de --span segundos (24 h por defecto), como
+un día de actividad.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_journal
+    python -m benchmarks.bench_journal --events 5000000 --window 60
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from server.events import (
+    ChatEstablished, ClientDisconnected, ClientHandshakeStarted, ClientJoined,
+    FileTransferRouted, RoomMessagePosted,
+)
+from server.journal import Journal, JournalObserver
+
+
+def sample_events(count: int):
+    kinds = (
+        lambda i: ClientHandshakeStarted(("10.0.0.1", 40000 + i % 20000), f"Temp_{i % 9000 + 1000}"),
+        lambda i: ClientJoined(f"user{i % 5000}", ("10.0.0.1", 40000 + i % 20000)),
+        lambda i: ChatEstablished(f"user{i % 5000}", f"user{(i + 1) % 5000}"),
+        lambda i: FileTransferRouted(f"user{i % 5000}", f"user{(i + 7) % 5000}"),
+        lambda i: RoomMessagePosted(f"sala{i % 50}", f"user{i % 5000}", i % 300),
+        lambda i: ClientDisconnected(f"user{i % 5000}", ("10.0.0.1", 40000 + i % 20000)),
+    )
+    return [kinds[i % len(kinds)](i) for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--span", type=float, default=86400.0, help="segundos cubiertos por el diario")
+    parser.add_argument("--window", type=float, default=60.0, help="segundos del intervalo consultado")
+    args = parser.parse_args()
+
+    events = sample_events(args.events)
+    directory = tempfile.mkdtemp(prefix="journal-")
+    path = os.path.join(directory, "events.journal")
+    base = time.time() - args.span
+    step = args.span / args.events
+
+    journal = JournalObserver(path)
+    start = time.perf_counter()
+    queue_put = journal._queue.put
+    for i, event in enumerate(events):
+        queue_put((base + i * step, event))  # instantes sintéticos repartidos en --span
+    journal.stop()
+    write = args.events / (time.perf_counter() - start)
+    size = os.path.getsize(path)
+
+    with Journal(path) as reader:
+        start = time.perf_counter()
+        replayed = sum(1 for _ in reader.replay())
+        replay = replayed / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        counted = sum(reader.summary().values())
+        summary = counted / (time.perf_counter() - start)
+
+        middle = base + args.span / 2
+        start = time.perf_counter()
+        window = sum(1 for _ in reader.replay(middle, middle + args.window))
+        window_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{args.events} eventos, {size / 1e6:.1f} MB ({size / args.events:.1f} B/evento)")
+    print(f"{'escritura':<12}{write:>14.0f} eventos/s")
+    print(f"{'replay':<12}{replay:>14.0f} eventos/s")
+    print(f"{'resumen':<12}{summary:>14.0f} eventos/s")
+    print(f"{'intervalo':<12}{window_ms:>14.2f} ms ({window} eventos en {args.window:g} s)")
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_protocol.py
+-----------------
+Coste de codificar, decodificar y despachar comandos de control: despacho
+anterior (cadena de startswith sobre texto) frente a los comandos v1 con
+tabla de despacho y frente a los comandos binarios v2 (Tipo 4).
+
+El despacho se mide con ProtocolHandlers.dispatch sobre un servidor ficticio
+cuyos manejadores no hacen nada, para aislar el coste del protocolo.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_protocol
+    python -m benchmarks.bench_protocol --iterations 500000
+"""
+
+import argparse
+import time
+
+from common.protocol import (
+    PROTOCOL_V1, PROTOCOL_V2, decode_binary, frame_command, split_args,
+)
+from server.handlers import ProtocolHandlers
+
+# Mezcla representativa del tráfico de control (nombre, campos)
+SAMPLE = [
+    ("CHAT", "bob", "hola, ¿qué tal? todo bien por aquí"),
+    ("CHAT", "bob", "mensaje con : dos puntos"),
+    ("REQ_CHAT", "carla"),
+    ("ACCEPT_CHAT", "ana"),
+    ("REQ_SEND_FILES", "bob", "3", "STREAM"),
+    ("GET_USERS",),
+    ("STOP_CHAT", "bob"),
+]
+
+
+def _noop(self, session, *args) -> None:
+    pass
+
+
+# Servidor con los manejadores de ChatServer reducidos a no-ops
+DummyServer = type("DummyServer", (), {
+    method: _noop for method, *_ in ProtocolHandlers.COMMANDS.values()
+} | {"handle_chat_message": _noop, "handle_set_name": _noop})
+
+
+def legacy_dispatch(server, session, msg_type: int, payload: bytes) -> None:
+    """Despacho previo: decodificar todo el payload y probar prefijos en orden."""
+    message = payload.decode("utf-8")
+    if msg_type in (0, 1):
+        if message.startswith("SET_NAME:"): server.handle_set_name(session, message.split(":", 1)[1])
+        elif message == "GET_USERS": server.send_user_list(session)
+        elif message.startswith("REQ_CHAT:"): server.handle_req_chat(session, message.split(":", 1)[1])
+        elif message.startswith("ACCEPT_CHAT:"): server.handle_accept_chat(session, message.split(":", 1)[1])
+        elif message.startswith("DENY_CHAT:"): server.handle_deny_chat(session, message.split(":", 1)[1])
+        elif message.startswith("STOP_CHAT:"): server.handle_stop_chat(session, message.split(":", 1)[1])
+        elif message.startswith("REQ_SEND_FILES:"): server.handle_req_send_files(session, message.split(":", 1)[1])
+        elif message.startswith("ACCEPT_SEND_FILES:"): server.handle_accept_send_files(session, message.split(":", 1)[1])
+        elif message.startswith("DENY_SEND_FILES:"): server.handle_deny_send_files(session, message.split(":", 1)[1])
+        elif message.startswith("FILES_RECEIVED:"): server.handle_files_received(session, message.split(":", 1)[1])
+        elif message.startswith("CHAT:"): server.handle_chat_message(session, message)
+
+
+def timed(fn, iterations: int) -> float:
+    """Microsegundos por operación."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def measure(iterations: int):
+    server = DummyServer()
+    rounds = max(1, iterations // len(SAMPLE))
+    frames = {v: [frame_command(v, *cmd) for cmd in SAMPLE] for v in (PROTOCOL_V1, PROTOCOL_V2)}
+    results = {}
+
+    for version in (PROTOCOL_V1, PROTOCOL_V2):
+        def encode(version=version):
+            for cmd in SAMPLE:
+                frame_command(version, *cmd)
+        results[("codificar", version)] = timed(encode, rounds) / len(SAMPLE)
+
+    def decode_v1():
+        for _, payload in frames[PROTOCOL_V1]:
+            name, _, rest = str(payload, "utf-8").partition(":")
+            split_args(rest, ProtocolHandlers.COMMANDS[name][1])
+
+    def decode_v2():
+        for _, payload in frames[PROTOCOL_V2]:
+            decode_binary(payload)
+
+    results[("decodificar", PROTOCOL_V1)] = timed(decode_v1, rounds) / len(SAMPLE)
+    results[("decodificar", PROTOCOL_V2)] = timed(decode_v2, rounds) / len(SAMPLE)
+
+    def dispatch_legacy():
+        for msg_type, payload in frames[PROTOCOL_V1]:
+            legacy_dispatch(server, None, msg_type, payload)
+
+    results[("despachar", "anterior")] = timed(dispatch_legacy, rounds) / len(SAMPLE)
+    for version in (PROTOCOL_V1, PROTOCOL_V2):
+        def dispatch(version=version):
+            for msg_type, payload in frames[version]:
+                ProtocolHandlers.dispatch(server, None, msg_type, payload)
+        results[("despachar", version)] = timed(dispatch, rounds) / len(SAMPLE)
+
+    sizes = {v: sum(5 + len(p) for _, p in frames[v]) / len(SAMPLE) for v in frames}
+    return results, sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000,
+                        help="comandos procesados por medición")
+    args = parser.parse_args()
+
+    results, sizes = measure(args.iterations)
+    print(f"{'operación':<14}{'anterior':>12}{'v1 texto':>12}{'v2 binario':>12}   (µs/comando)")
+    for op in ("codificar", "decodificar", "despachar"):
+        legacy = results.get((op, "anterior"))
+        cells = [f"{legacy:>12.3f}" if legacy is not None else f"{'-':>12}"]
+        cells += [f"{results[(op, v)]:>12.3f}" for v in (PROTOCOL_V1, PROTOCOL_V2)]
+        print(f"{op:<14}" + "".join(cells))
+    print(f"{'bytes/trama':<14}{'':>12}{sizes[PROTOCOL_V1]:>12.1f}{sizes[PROTOCOL_V2]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
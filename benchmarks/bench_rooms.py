@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_rooms.py
+--------------
+Throughput de reparto de mensajes de sala (server/rooms.py) con 10, 1k y 10k
+miembros:
+
+    por destinatario   send_command por miembro: cada uno codifica (y
+                       comprime, si negoció un códec) su propia trama
+    codificar una vez  rooms.deliver: una trama compartida por todos
+    fan-out            FanOut: la misma trama, repartida en tramos entre hilos
+
+Los miembros son sesiones sin socket cuyos métodos de envío son los de
+ClientSession y cuya cola de salida es una OutboundQueue real; se mide hasta
+dejar la trama encolada, que es el trabajo del hilo que publica. Se informa
+de entregas por segundo.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_rooms
+    python -m benchmarks.bench_rooms --sizes 10,1000,10000 --text 2048 --codecs zlib
+"""
+
+import argparse
+import time
+
+from common.compression import FrameCodec
+from server.outbox import OutboundQueue, OutboxConfig
+from server.rooms import FANOUT_WORKERS, EncodedMessage, FanOut, deliver
+from server.session import ClientSession
+
+OUTBOX = OutboxConfig(max_frames=1 << 20, max_bytes=1 << 34)
+
+
+class BenchSession:
+    """Miembro sin socket: envíos de ClientSession sobre una cola que nadie vacía."""
+
+    send = ClientSession.send
+    send_command = ClientSession.send_command
+    send_frame = ClientSession.send_frame
+    _metrics = None
+
+    def __init__(self, name: str, codecs: tuple, frame_codec: FrameCodec) -> None:
+        self.name = name
+        self.protocol = 1
+        self.codecs = codecs
+        self._frame_codec = frame_codec
+        self._outbox = OutboundQueue(OUTBOX)
+
+
+def measure(size: int, deliveries: int, text: str, codecs: tuple, workers: int) -> dict:
+    frame_codec = FrameCodec()
+    members = tuple(BenchSession(f"u{i}", codecs, frame_codec) for i in range(size))
+    posts = max(1, deliveries // size)
+    fanout = FanOut(workers)
+
+    def per_recipient():
+        for session in members:
+            session.send_command("ROOM_FROM", "sala", "ana", text)
+
+    def encode_once():
+        deliver(members, EncodedMessage(frame_codec, "ROOM_FROM", "sala", "ana", text))
+
+    def parallel():
+        fanout.deliver(members, EncodedMessage(frame_codec, "ROOM_FROM", "sala", "ana", text))
+
+    results = {}
+    for label, post in (("per_recipient", per_recipient), ("encode_once", encode_once),
+                        ("fanout", parallel)):
+        for session in members:
+            session._outbox = OutboundQueue(OUTBOX)
+        start = time.perf_counter()
+        for _ in range(posts):
+            post()
+        results[label] = posts * size / (time.perf_counter() - start)
+    fanout.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000", help="miembros por sala, separados por comas")
+    parser.add_argument("--deliveries", type=int, default=200000, help="entregas por medición")
+    parser.add_argument("--text", type=int, default=64, help="bytes de texto por mensaje")
+    parser.add_argument("--codecs", default="", help="códecs negociados por los miembros (p. ej. zlib)")
+    parser.add_argument("--workers", type=int, default=FANOUT_WORKERS, help="hilos de FanOut")
+    args = parser.parse_args()
+
+    text = ("hola sala, " * (args.text // 11 + 1))[:args.text]
+    codecs = tuple(c for c in args.codecs.split(",") if c)
+    print(f"texto {args.text} B, códecs {','.join(codecs) or 'ninguno'}, {args.workers} hilos de fan-out")
+    print(f"{'miembros':<10}{'por destinatario/s':>20}{'una vez/s':>14}{'fan-out/s':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        r = measure(size, args.deliveries, text, codecs, args.workers)
+        print(f"{size:<10}{r['per_recipient']:>20.0f}{r['encode_once']:>14.0f}{r['fanout']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_socket_profiles.py
+------------------------
+Latencia y throughput de cada perfil de socket (common/sockopts.py), aplicado
+tanto al servidor como a los clientes:
+
+    ida y vuelta   CHAT a -> b -> a, uno cada vez (p50 / p99 en ms)
+    ráfaga         N mensajes CHAT pequeños seguidos de a hacia b (msgs/s) y
+                   escrituras del servidor por mensaje (agrupación)
+    volumen        fragmentos Tipo 3 de 64 KiB de a hacia b (MB/s)
+
+Cada perfil arranca su propio servidor en un proceso hijo.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_socket_profiles
+    python -m benchmarks.bench_socket_profiles --profiles default,system --mode async
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from common.sockopts import SOCKET_PROFILES, get_profile
+from .common import send_tlv, recv_tlv, login, percentile
+
+CHUNK = 64 * 1024
+
+
+def serve(profile: str, mode: str) -> None:
+    """Proceso hijo: servidor con el perfil indicado; imprime el puerto."""
+    from server.facade import SERVER_MODES
+    from server.events import ServerStarted
+    from server.outbox import OutboxConfig
+
+    # Colas de salida holgadas: se mide el camino de escritura, no la política
+    # de desbordamiento (sin agrupar, la ráfaga supera las 1024 tramas por defecto).
+    outbox = OutboxConfig(max_frames=1 << 20, max_bytes=512 * 1024 * 1024)
+    server = SERVER_MODES[mode]("127.0.0.1", 0, outbox=outbox, profile=get_profile(profile))
+
+    def announce(event):
+        if isinstance(event, ServerStarted):
+            print(event.port, flush=True)
+
+    server.subscribe(announce)
+    server.start()
+
+
+def connect(port: int, profile: str) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    get_profile(profile).apply(sock)
+    sock.connect(("127.0.0.1", port))
+    return sock
+
+
+def open_chat(a: socket.socket, b: socket.socket) -> None:
+    send_tlv(a, 1, b"REQ_CHAT:bench_b")
+    recv_tlv(b)                                   # REQ_CHAT_FROM
+    send_tlv(b, 1, b"ACCEPT_CHAT:bench_a")
+    recv_tlv(a)                                   # CHAT_ACCEPTED
+    recv_tlv(b)                                   # CHAT_ACCEPTED
+
+
+def count_reads(sock: socket.socket, total: int) -> int:
+    """Lee `total` bytes y devuelve cuántos recv hicieron falta."""
+    buf = bytearray(1024 * 1024)
+    got = reads = 0
+    while got < total:
+        n = sock.recv_into(buf, min(len(buf), total - got))
+        if not n:
+            break
+        got += n
+        reads += 1
+    return reads
+
+
+def measure(profile: str, mode: str, pings: int, burst: int, volume_mb: int) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_socket_profiles", "--serve", profile, "--mode", mode],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(proc.stdout.readline())
+        a, b = connect(port, profile), connect(port, profile)
+        login(a, "bench_a")
+        login(b, "bench_b")
+        open_chat(a, b)
+
+        # Ida y vuelta
+        latencies = []
+        for i in range(pings):
+            start = time.perf_counter()
+            send_tlv(a, 0, f"CHAT:bench_b:{i}".encode("utf-8"))
+            recv_tlv(b)
+            send_tlv(b, 0, f"CHAT:bench_a:{i}".encode("utf-8"))
+            recv_tlv(a)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        # Ráfaga de mensajes pequeños
+        message = b"CHAT:bench_b:" + b"x" * 32
+        delivered = 5 + len(b"FROM:bench_a:") + 32
+        result = {}
+
+        def drain_burst():
+            result["reads"] = count_reads(b, burst * delivered)
+
+        reader = threading.Thread(target=drain_burst)
+        start = time.perf_counter()
+        reader.start()
+        for _ in range(burst):
+            send_tlv(a, 0, message)
+        reader.join()
+        burst_elapsed = time.perf_counter() - start
+
+        # Volumen: fragmentos Tipo 3 (DST_LEN + DST + TID + KIND + CUERPO)
+        chunks = volume_mb * 1024 * 1024 // CHUNK
+        prefix = bytes([len(b"bench_b")]) + b"bench_b" + (1).to_bytes(4, "big") + bytes([1])
+        payload = prefix + bytes(CHUNK)
+        relayed = 5 + 1 + len(b"bench_a") + 5 + CHUNK
+
+        def drain_volume():
+            count_reads(b, chunks * relayed)
+
+        reader = threading.Thread(target=drain_volume)
+        start = time.perf_counter()
+        reader.start()
+        for _ in range(chunks):
+            send_tlv(a, 3, payload)
+        reader.join()
+        volume_elapsed = time.perf_counter() - start
+
+        a.close()
+        b.close()
+        return {
+            "profile": profile,
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+            "burst_rate": burst / burst_elapsed,
+            "reads_per_msg": result["reads"] / burst,
+            "volume_mbs": chunks * CHUNK / volume_elapsed / (1024 * 1024),
+        }
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--profiles", default=",".join(SOCKET_PROFILES))
+    parser.add_argument("--mode", default="threaded", choices=("threaded", "async"))
+    parser.add_argument("--pings", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=20000)
+    parser.add_argument("--volume", type=int, default=256, help="MB a transferir en la prueba de volumen")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.mode)
+        return
+
+    print(f"{'perfil':<12}{'p50 ms':>10}{'p99 ms':>10}{'ráfaga msg/s':>15}{'recv/msg':>10}{'volumen MB/s':>15}")
+    for profile in args.profiles.split(","):
+        r = measure(profile, args.mode, args.pings, args.burst, args.volume)
+        print(f"{r['profile']:<12}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['burst_rate']:>15.0f}"
+              f"{r['reads_per_msg']:>10.3f}{r['volume_mbs']:>15.1f}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONUNBUFFERED", "1")
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_spool.py
+--------------
+Memoria del servidor con varias subidas grandes (Tipo 2) a la vez: archivos
+recibidos en memoria vs. volcados a un archivo temporal (FrameLimits.spool)
+y reenviados al destinatario con sendfile.
+
+Cada pareja abre un chat y el emisor envía `--files` archivos de
+`--size` bytes; el receptor los lee en bloques y comprueba su tamaño. Se
+informa del pico de memoria residente del servidor (VmHWM), el tiempo total
+y el volumen reenviado.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_spool
+    python -m benchmarks.bench_spool --pairs 8 --size 67108864 --modes async
+"""
+
+import argparse
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from .common import connect, login, send_tlv, recv_tlv, recv_exact, peak_rss_kb, rss_kb
+
+BLOCK = 256 * 1024
+
+
+def serve(mode: str, spool: int) -> None:
+    """Proceso hijo: servidor sin observers con el umbral de volcado dado; imprime el puerto."""
+    from common.framing import FrameLimits
+    from server.facade import SERVER_MODES
+    from server.events import ServerStarted
+
+    limits = FrameLimits(file=4 * 1024 ** 3, spool=spool)
+    server = SERVER_MODES[mode]("127.0.0.1", 0, limits=limits)
+
+    def announce(event):
+        if isinstance(event, ServerStarted):
+            print(event.port, flush=True)
+
+    server.subscribe(announce)
+    server.start()
+
+
+def send_files(sock: socket.socket, target: str, size: int, files: int) -> None:
+    """Envía `files` tramas Tipo 2 de `size` bytes de datos, por bloques."""
+    dst = target.encode("utf-8")
+    name = b"bench.bin"
+    block = os.urandom(BLOCK)
+    for _ in range(files):
+        head = bytes([len(dst)]) + dst + bytes([len(name)]) + name
+        sock.sendall(struct.pack("!BI", 2, len(head) + size) + head)
+        remaining = size
+        while remaining:
+            n = min(remaining, BLOCK)
+            sock.sendall(block[:n])
+            remaining -= n
+
+
+def receive_files(sock: socket.socket, size: int, files: int, errors: list) -> None:
+    """Lee `files` tramas Tipo 2 en bloques, sin acumularlas, y comprueba su tamaño."""
+    received = 0
+    while received < files:
+        msg_type, length = struct.unpack("!BI", recv_exact(sock, 5))
+        if msg_type != 2:
+            recv_exact(sock, length)  # p. ej. ERROR
+            continue
+        head = recv_exact(sock, 1)
+        recv_exact(sock, head[0])                    # emisor
+        name_len = recv_exact(sock, 1)[0]
+        recv_exact(sock, name_len)                   # nombre del archivo
+        remaining = length - 2 - head[0] - name_len
+        if remaining != size:
+            errors.append(f"tamaño {remaining} != {size}")
+        while remaining:
+            chunk = sock.recv(min(remaining, BLOCK))
+            if not chunk:
+                errors.append("conexión cerrada")
+                return
+            remaining -= len(chunk)
+        received += 1
+
+
+def measure(mode: str, spool: int, pairs: int, size: int, files: int) -> dict:
+    """Lanza un servidor nuevo y `pairs` parejas subiendo archivos a la vez."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_spool", "--serve", mode, "--spool", str(spool)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(proc.stdout.readline())
+        base_rss = rss_kb(proc.pid)
+        sockets = []
+        for i in range(pairs):
+            a, b = connect(port), connect(port)
+            login(a, f"up{i}")
+            login(b, f"down{i}")
+            send_tlv(a, 1, f"REQ_CHAT:down{i}".encode("utf-8"))
+            recv_tlv(b)                               # REQ_CHAT_FROM
+            send_tlv(b, 1, f"ACCEPT_CHAT:up{i}".encode("utf-8"))
+            recv_tlv(a)                               # CHAT_ACCEPTED
+            recv_tlv(b)                               # CHAT_ACCEPTED
+            sockets.append((a, b))
+
+        errors: list = []
+        threads = []
+        for i, (a, b) in enumerate(sockets):
+            threads.append(threading.Thread(target=send_files, args=(a, f"down{i}", size, files)))
+            threads.append(threading.Thread(target=receive_files, args=(b, size, files, errors)))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        result = {
+            "mode": mode,
+            "spool": spool,
+            "rss_base_mb": (base_rss or 0) / 1024.0,
+            "peak_mb": (peak_rss_kb(proc.pid) or 0) / 1024.0,
+            "seconds": elapsed,
+            "mb_s": pairs * files * size / elapsed / (1024 * 1024),
+            "errors": len(errors),
+        }
+        for a, b in sockets:
+            a.close()
+            b.close()
+        return result
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--spool", type=int, default=8 * 1024 * 1024, help=argparse.SUPPRESS)
+    parser.add_argument("--modes", default="threaded,async")
+    parser.add_argument("--pairs", type=int, default=8)
+    parser.add_argument("--size", type=int, default=32 * 1024 * 1024)
+    parser.add_argument("--files", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.spool)
+        return
+
+    print(f"{args.pairs} parejas, {args.files} archivos de {args.size / 1024 / 1024:.0f} MB cada una")
+    print(f"{'modo':<10}{'recepción':>12}{'RSS base':>11}{'pico RSS':>11}{'segundos':>10}{'MB/s':>9}{'errores':>9}")
+    # Umbral mayor que el archivo: todo en memoria; 8 MiB: a disco
+    for mode in args.modes.split(","):
+        for label, spool in (("memoria", args.size * 2), ("disco", 8 * 1024 * 1024)):
+            r = measure(mode, spool, args.pairs, args.size, args.files)
+            print(f"{mode:<10}{label:>12}{r['rss_base_mb']:>9.1f}MB{r['peak_mb']:>9.1f}MB"
+                  f"{r['seconds']:>10.2f}{r['mb_s']:>9.1f}{r['errors']:>9}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONUNBUFFERED", "1")
+    main()
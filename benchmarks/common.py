@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+common.py
+---------
+Utilidades compartidas por los benchmarks: tramas TLV mínimas sobre sockets
+crudos, lectura de memoria de procesos y estadística básica.
+"""
+
+import socket
+import struct
+from typing import List, Optional, Tuple
+
+
+def send_tlv(sock: socket.socket, msg_type: int, data: bytes) -> None:
+    """Envía una trama TLV (!BI) por un socket bloqueante."""
+    sock.sendall(struct.pack("!BI", msg_type, len(data)) + data)
+
+
+def recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    """Recibe exactamente n bytes o None si el socket se cierra."""
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        r = sock.recv_into(view[got:])
+        if not r:
+            return None
+        got += r
+    return bytes(buf)
+
+
+def recv_tlv(sock: socket.socket) -> Optional[Tuple[int, bytes]]:
+    """Recibe una trama TLV completa."""
+    header = recv_exact(sock, 5)
+    if header is None:
+        return None
+    msg_type, length = struct.unpack("!BI", header)
+    payload = recv_exact(sock, length)
+    if payload is None:
+        return None
+    return msg_type, payload
+
+
+def connect(port: int, host: str = "127.0.0.1") -> socket.socket:
+    """Abre una conexión TCP bloqueante con el servidor de pruebas."""
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def login(sock: socket.socket, name: str) -> None:
+    """Registra un nombre y espera NAME_OK."""
+    send_tlv(sock, 1, f"SET_NAME:{name}".encode("utf-8"))
+    while True:
+        _, payload = recv_tlv(sock)
+        if payload == b"NAME_OK":
+            return
+        if payload == b"NAME_TAKEN":
+            raise RuntimeError(f"Nombre ocupado: {name}")
+
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Memoria residente (KiB) de un proceso. Solo Linux (/proc)."""
+    return _proc_status_field(pid, "VmRSS")
+
+
+def peak_rss_kb(pid: int) -> Optional[int]:
+    """Pico de memoria residente (KiB) de un proceso desde su arranque. Solo Linux (/proc)."""
+    return _proc_status_field(pid, "VmHWM")
+
+
+def thread_count(pid: int) -> Optional[int]:
+    """Número de hilos de un proceso. Solo Linux (/proc)."""
+    return _proc_status_field(pid, "Threads")
+
+
+def _proc_status_field(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def raise_fd_limit() -> int:
+    """Sube el límite de descriptores abiertos al máximo permitido."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return -1
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentil por rango más cercano (samples no necesita estar ordenada)."""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
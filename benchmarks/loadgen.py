@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+loadgen.py
+----------
+Generador de carga: miles de clientes sintéticos que hablan el protocolo TLV
+(v1) contra un servidor, con escenarios configurables:
+
+    login     tormenta de conexiones: todos conectan y registran su nombre a
+              la vez (latencia = connect -> NAME_OK)
+    pingpong  parejas con chat abierto en ida y vuelta CHAT a -> b -> a
+              (latencia = ida y vuelta)
+    fanout    una sala con todos los clientes; un emisor publica y espera a
+              que lleguen todas las copias (latencia = publicación -> entrega)
+    files     parejas enviándose archivos de tamaños variados, alternando
+              trama Tipo 2 completa y fragmentos Tipo 3 (latencia = primer
+              byte enviado -> archivo recibido)
+
+Se informa de mensajes por segundo (logins, mensajes enrutados, entregas o
+archivos según el escenario), bytes por segundo enviados y recibidos por los
+clientes y latencia p50 / p95 / p99.
+
+Los clientes son corrutinas de asyncio en un solo hilo. Por defecto el
+servidor (ChatServer o AsyncChatServer, sin observers) arranca en este mismo
+proceso en un puerto efímero; con --target se ataca a un servidor externo.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.loadgen
+    python -m benchmarks.loadgen --scenario pingpong --clients 2000 --duration 10
+    python -m benchmarks.loadgen --scenario files --clients 20 --file-sizes 4096,1048576
+    python -m benchmarks.loadgen --scenario login --target 127.0.0.1:5000
+"""
+
+import argparse
+import asyncio
+import itertools
+import struct
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .common import percentile, raise_fd_limit
+
+HEADER = struct.Struct("!BI")
+CHUNK = 64 * 1024
+SCENARIOS = ("login", "pingpong", "fanout", "files")
+_runs = itertools.count(1)
+
+
+class Stats:
+    """Contadores y latencias de un escenario."""
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.errors = 0
+        self.latencies: List[float] = []  # segundos
+        self.elapsed = 0.0
+
+    def report(self) -> Dict[str, float]:
+        ms = [x * 1000.0 for x in self.latencies]
+        elapsed = self.elapsed or float("nan")
+        return {
+            "messages": self.messages,
+            "msgs_s": self.messages / elapsed,
+            "out_mb_s": self.bytes_out / elapsed / (1024 * 1024),
+            "in_mb_s": self.bytes_in / elapsed / (1024 * 1024),
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "errors": self.errors,
+        }
+
+
+class SyntheticClient:
+    """Cliente TLV mínimo sobre streams de asyncio; las tramas recibidas van a `inbox`."""
+
+    def __init__(self, name: str, stats: Stats) -> None:
+        self.name = name
+        self._stats = stats
+        self.inbox: "asyncio.Queue[Tuple[int, bytes]]" = asyncio.Queue()
+        # Si está fijado, recibe las tramas en vez de la cola (escenarios de alto volumen)
+        self.on_frame: Optional[Callable[[int, bytes], None]] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self, host: str, port: int) -> None:
+        self._reader, self._writer = await asyncio.open_connection(host, port, limit=1 << 22)
+        self._task = asyncio.ensure_future(self._read_loop())
+
+    async def login(self) -> None:
+        self.send(1, f"SET_NAME:{self.name}".encode("utf-8"))
+        while True:
+            _, payload = await self.inbox.get()
+            if payload == b"NAME_OK":
+                return
+            if payload == b"NAME_TAKEN":
+                raise RuntimeError(f"Nombre ocupado: {self.name}")
+
+    async def expect(self, prefix: bytes) -> bytes:
+        """Espera la siguiente trama cuyo payload empiece por `prefix`."""
+        while True:
+            _, payload = await self.inbox.get()
+            if payload.startswith(prefix):
+                return payload
+            if payload.startswith(b"ERROR:"):
+                self._stats.errors += 1
+
+    def send(self, msg_type: int, *parts: bytes) -> None:
+        size = sum(len(p) for p in parts)
+        self._writer.writelines((HEADER.pack(msg_type, size),) + parts)
+        self._stats.bytes_out += 5 + size
+
+    async def drain(self) -> None:
+        await self._writer.drain()
+
+    async def _read_loop(self) -> None:
+        reader = self._reader
+        try:
+            while True:
+                msg_type, length = HEADER.unpack(await reader.readexactly(5))
+                payload = await reader.readexactly(length) if length else b""
+                self._stats.bytes_in += 5 + length
+                if self.on_frame is not None:
+                    self.on_frame(msg_type, payload)
+                else:
+                    self.inbox.put_nowait((msg_type, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self._task is not None:
+            self._task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Preparación
+# ---------------------------------------------------------------------------
+
+async def _gather_limited(factories: List[Callable[[], Awaitable]], limit: int) -> list:
+    """Ejecuta las corrutinas con como mucho `limit` a la vez."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(factory):
+        async with semaphore:
+            return await factory()
+
+    return await asyncio.gather(*(run(f) for f in factories))
+
+
+async def connect_clients(host: str, port: int, count: int, stats: Stats, tag: str,
+                          concurrency: int) -> List[SyntheticClient]:
+    """Conecta y registra `count` clientes (sin medir)."""
+    clients = [SyntheticClient(f"{tag}{i}", stats) for i in range(count)]
+
+    async def setup(client: SyntheticClient):
+        await client.open(host, port)
+        await client.login()
+
+    await _gather_limited([lambda c=c: setup(c) for c in clients], concurrency)
+    return clients
+
+
+async def open_chat(a: SyntheticClient, b: SyntheticClient) -> None:
+    a.send(1, f"REQ_CHAT:{b.name}".encode("utf-8"))
+    await b.expect(b"REQ_CHAT_FROM:")
+    b.send(1, f"ACCEPT_CHAT:{a.name}".encode("utf-8"))
+    await a.expect(b"CHAT_ACCEPTED:")
+    await b.expect(b"CHAT_ACCEPTED:")
+
+
+async def close_all(clients: List[SyntheticClient]) -> None:
+    await asyncio.gather(*(c.close() for c in clients))
+
+
+# ---------------------------------------------------------------------------
+# Escenarios
+# ---------------------------------------------------------------------------
+
+async def scenario_login(host: str, port: int, args, stats: Stats) -> None:
+    tag = f"l{next(_runs)}_"
+    clients = [SyntheticClient(f"{tag}{i}", stats) for i in range(args.clients)]
+
+    async def storm(client: SyntheticClient):
+        start = time.perf_counter()
+        await client.open(host, port)
+        await client.login()
+        stats.latencies.append(time.perf_counter() - start)
+        stats.messages += 1
+
+    start = time.perf_counter()
+    await _gather_limited([lambda c=c: storm(c) for c in clients], args.concurrency)
+    stats.elapsed = time.perf_counter() - start
+    await close_all(clients)
+
+
+async def scenario_pingpong(host: str, port: int, args, stats: Stats) -> None:
+    pairs = max(1, args.clients // 2)
+    clients = await connect_clients(host, port, pairs * 2, stats, f"p{next(_runs)}_", args.concurrency)
+    couples = list(zip(clients[0::2], clients[1::2]))
+    await _gather_limited([lambda a=a, b=b: open_chat(a, b) for a, b in couples], args.concurrency)
+    stats.bytes_out = stats.bytes_in = 0
+
+    async def ping_pong(a: SyntheticClient, b: SyntheticClient, deadline: float):
+        to_b = f"CHAT:{b.name}:ping".encode("utf-8")
+        to_a = f"CHAT:{a.name}:pong".encode("utf-8")
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            a.send(0, to_b)
+            await b.expect(b"FROM:")
+            b.send(0, to_a)
+            await a.expect(b"FROM:")
+            stats.latencies.append(time.perf_counter() - start)
+            stats.messages += 2
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ping_pong(a, b, start + args.duration) for a, b in couples))
+    stats.elapsed = time.perf_counter() - start
+    await close_all(clients)
+
+
+async def scenario_fanout(host: str, port: int, args, stats: Stats) -> None:
+    run = next(_runs)
+    clients = await connect_clients(host, port, max(2, args.clients), stats, f"f{run}_", args.concurrency)
+    publisher, members = clients[0], clients[1:]
+    room = f"sala{run}".encode("utf-8")
+    publisher.send(1, b"ROOM_CREATE:" + room)
+    await publisher.expect(b"ROOM_CREATED:")
+
+    async def join(client: SyntheticClient):
+        client.send(1, b"ROOM_JOIN:" + room)
+        await client.expect(b"ROOM_JOINED:")
+
+    await _gather_limited([lambda c=c: join(c) for c in members], args.concurrency)
+    stats.bytes_out = stats.bytes_in = 0
+
+    pending = [0]
+    posted = [0.0]
+    done = asyncio.Event()
+
+    def delivered(msg_type: int, payload: bytes) -> None:
+        if payload.startswith(b"ROOM_FROM:"):
+            stats.latencies.append(time.perf_counter() - posted[0])
+            stats.messages += 1
+            pending[0] -= 1
+            if pending[0] == 0:
+                done.set()
+
+    for client in members:
+        client.on_frame = delivered
+    post = b"ROOM_POST:" + room + b":" + b"x" * args.size
+    start = time.perf_counter()
+    deadline = start + args.duration
+    while time.perf_counter() < deadline:
+        pending[0] = len(members)
+        done.clear()
+        posted[0] = time.perf_counter()
+        publisher.send(0, post)
+        await done.wait()
+    stats.elapsed = time.perf_counter() - start
+    await close_all(clients)
+
+
+async def scenario_files(host: str, port: int, args, stats: Stats) -> None:
+    pairs = max(1, args.clients // 2)
+    clients = await connect_clients(host, port, pairs * 2, stats, f"t{next(_runs)}_", args.concurrency)
+    couples = list(zip(clients[0::2], clients[1::2]))
+    await _gather_limited([lambda a=a, b=b: open_chat(a, b) for a, b in couples], args.concurrency)
+    stats.bytes_out = stats.bytes_in = 0
+    sizes = [int(s) for s in args.file_sizes.split(",")]
+    body = bytes(max(sizes))
+
+    async def transfer(a: SyntheticClient, b: SyntheticClient, deadline: float):
+        received = asyncio.Event()
+
+        def on_frame(msg_type: int, payload: bytes) -> None:
+            # Tipo 2: archivo completo; Tipo 3: solo cuenta el fragmento END
+            if msg_type == 2 or (msg_type == 3 and payload[1 + payload[0] + 4] == 2):
+                received.set()
+
+        b.on_frame = on_frame
+        dst = b.name.encode("utf-8")
+        route = bytes([len(dst)]) + dst
+        for n in itertools.count():
+            if time.perf_counter() >= deadline:
+                return
+            size = sizes[n % len(sizes)]
+            received.clear()
+            start = time.perf_counter()
+            if n // len(sizes) % 2 == 0:
+                a.send(2, route, b"bench.bin\x00", body[:size])
+            else:
+                a.send(3, route, struct.pack("!IB", n, 0), b"\x09bench.bin", struct.pack("!Q", size))
+                for offset in range(0, size, CHUNK):
+                    a.send(3, route, struct.pack("!IB", n, 1), body[offset:offset + CHUNK])
+                    await a.drain()
+                a.send(3, route, struct.pack("!IB", n, 2))
+            await a.drain()
+            await received.wait()
+            stats.latencies.append(time.perf_counter() - start)
+            stats.messages += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(transfer(a, b, start + args.duration) for a, b in couples))
+    stats.elapsed = time.perf_counter() - start
+    await close_all(clients)
+
+
+RUNNERS: Dict[str, Callable] = {
+    "login": scenario_login,
+    "pingpong": scenario_pingpong,
+    "fanout": scenario_fanout,
+    "files": scenario_files,
+}
+
+
+# ---------------------------------------------------------------------------
+# Servidor en proceso
+# ---------------------------------------------------------------------------
+
+def start_server(mode: str) -> int:
+    """Arranca un servidor sin observers en un hilo daemon. Devuelve su puerto."""
+    from server.facade import SERVER_MODES
+    from server.events import ServerStarted
+    from server.outbox import OutboxConfig
+
+    outbox = OutboxConfig(max_frames=1 << 20, max_bytes=512 * 1024 * 1024)
+    server = SERVER_MODES[mode]("127.0.0.1", 0, outbox=outbox)
+    started = threading.Event()
+    port = []
+
+    def announce(event):
+        if isinstance(event, ServerStarted):
+            port.append(event.port)
+            started.set()
+
+    server.subscribe(announce)
+    threading.Thread(target=server.start, daemon=True).start()
+    if not started.wait(10):
+        raise RuntimeError("El servidor no arrancó")
+    return port[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="all", choices=SCENARIOS + ("all",))
+    parser.add_argument("--clients", type=int, default=None,
+                        help="clientes por escenario (por defecto login 2000, pingpong 200, "
+                             "fanout 1000, files 20)")
+    parser.add_argument("--duration", type=float, default=5.0, help="segundos de carga (salvo login)")
+    parser.add_argument("--concurrency", type=int, default=256, help="conexiones en preparación a la vez")
+    parser.add_argument("--size", type=int, default=64, help="bytes de texto por publicación (fanout)")
+    parser.add_argument("--file-sizes", default="4096,262144,4194304", help="tamaños de archivo (files)")
+    parser.add_argument("--mode", default="threaded", choices=("threaded", "async"),
+                        help="motor del servidor en proceso")
+    parser.add_argument("--target", help="host:puerto de un servidor ya en marcha")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        port = int(port)
+    else:
+        host, port = "127.0.0.1", start_server(args.mode)
+    defaults = {"login": 2000, "pingpong": 200, "fanout": 1000, "files": 20}
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+
+    print(f"servidor {args.target or f'en proceso ({args.mode})'}, {args.duration:g} s por escenario")
+    print(f"{'escenario':<10}{'clientes':>9}{'msgs':>9}{'msgs/s':>11}{'MB/s out':>10}{'MB/s in':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errores':>9}")
+    for scenario in scenarios:
+        clients = args.clients or defaults[scenario]
+        stats = Stats()
+        scenario_args = argparse.Namespace(**{**vars(args), "clients": clients})
+        asyncio.run(RUNNERS[scenario](host, port, scenario_args, stats))
+        r = stats.report()
+        print(f"{scenario:<10}{clients:>9}{r['messages']:>9}{r['msgs_s']:>11.0f}{r['out_mb_s']:>10.1f}"
+              f"{r['in_mb_s']:>10.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['errors']:>9}")
+
+
+if __name__ == "__main__":
+    main()
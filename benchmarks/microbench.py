@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+microbench.py
+-------------
+Microbenchmarks de las piezas por las que pasa cada mensaje del servidor:
+
+    tlv.*        cabecera !BI (pack / unpack_from), frame_parts y
+                 FrameReader.read_frame sobre un socketpair (64 B y 1 KiB)
+    dispatch.*   ProtocolHandlers.dispatch por comando, en v1 y v2, sobre un
+                 servidor cuyos manejadores no hacen nada
+    emit.*       Observable.emit con 0, 1 y 5 observers vacíos, con 5 suscritos a
+                 otros tipos (filtrados) y con un observer asíncrono
+    observer.*   ServerObserver.__call__ + _broadcast por tipo de evento
+                 (solo el lado productor: las colas no tienen workers) y un
+                 tipo muestreado 1 de cada 100 (logcontrol.py)
+    buffer.*     RequestBuffer: coste por petición en ráfaga y latencia de
+                 encolado -> procesado de una petición aislada (p50 / p99)
+    metrics.*    server.metrics: inc, observe y frame_out por operación
+
+Cada caso se repite --repeats veces y se toma el mejor tiempo por operación
+(µs). Los resultados se escriben en JSON (--json) y se pueden comparar con
+una línea base guardada (--save-baseline / --baseline): los casos más lentos
+que la línea base en más de --threshold se marcan como regresión y el
+proceso termina con código 1.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.microbench --baseline benchmarks/baseline.json --json resultados.json
+    python -m benchmarks.microbench --filter dispatch
+"""
+
+import argparse
+import json
+import platform
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from common.framing import HEADER, FrameReader, frame_parts
+from common.protocol import PROTOCOL_V1, PROTOCOL_V2, frame_command
+from server.buffer import RequestBuffer
+from server.events import ChatEstablished, ClientJoined, FileTransferRouted, RoomMessagePosted
+from server.handlers import ProtocolHandlers
+from server.logcontrol import LogControl
+from server.logger import ServerObserver
+from server.metrics import Metrics as MetricsRegistry
+from server.observable import Observable
+from .bench_protocol import SAMPLE, DummyServer
+from .common import percentile
+
+Metrics = Dict[str, float]
+
+
+def timed(fn: Callable[[int], float], n: int, repeats: int) -> Metrics:
+    """fn(n) devuelve los segundos de n operaciones; µs por operación (mejor y mediana)."""
+    samples = [fn(n) / n * 1e6 for _ in range(repeats)]
+    return {"us_per_op": min(samples), "us_median": statistics.median(samples)}
+
+
+def loop(op: Callable[[], object]) -> Callable[[int], float]:
+    def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            op()
+        return time.perf_counter() - start
+    return run
+
+
+# ---------------------------------------------------------------------------
+# Casos
+# ---------------------------------------------------------------------------
+
+def bench_tlv(n: int, repeats: int) -> Dict[str, Metrics]:
+    header = HEADER.pack(1, 64)
+    payload = bytes(64)
+    results = {
+        "tlv.header_pack": timed(loop(lambda: HEADER.pack(1, 64)), n, repeats),
+        "tlv.header_unpack": timed(loop(lambda: HEADER.unpack_from(header)), n, repeats),
+        "tlv.frame_parts": timed(loop(lambda: frame_parts(0, payload)), n, repeats),
+    }
+    for size, label in ((64, "64b"), (1024, "1k")):
+        results[f"tlv.read_frame_{label}"] = timed(_read_frames(size), max(1, n // 10), repeats)
+    return results
+
+
+def _read_frames(size: int) -> Callable[[int], float]:
+    """Lectura de n tramas ya escritas por otro hilo, como en el hilo lector del servidor."""
+    def run(n: int) -> float:
+        rx, tx = socket.socketpair()
+        blob = (HEADER.pack(1, size) + bytes(size)) * 256
+        batches = (n + 255) // 256
+        writer = threading.Thread(target=lambda: [tx.sendall(blob) for _ in range(batches)], daemon=True)
+        reader = FrameReader(rx)
+        writer.start()
+        start = time.perf_counter()
+        for _ in range(batches * 256):
+            reader.read_frame(reuse=False)
+        elapsed = time.perf_counter() - start
+        writer.join()
+        rx.close()
+        tx.close()
+        return elapsed * n / (batches * 256)
+    return run
+
+
+def bench_dispatch(n: int, repeats: int) -> Dict[str, Metrics]:
+    server = DummyServer()
+    results = {}
+    for version, label in ((PROTOCOL_V1, "v1"), (PROTOCOL_V2, "v2")):
+        seen = set()
+        for command in SAMPLE:
+            if command[0] in seen:
+                continue
+            seen.add(command[0])
+            msg_type, payload = frame_command(version, *command)
+            results[f"dispatch.{label}.{command[0]}"] = timed(
+                loop(lambda t=msg_type, p=payload: ProtocolHandlers.dispatch(server, None, t, p)),
+                n, repeats)
+    return results
+
+
+def bench_emit(n: int, repeats: int) -> Dict[str, Metrics]:
+    event = ClientJoined("ana", ("127.0.0.1", 5000))
+    results = {}
+    for count in (0, 1, 5):
+        source = Observable()
+        for _ in range(count):
+            source.subscribe(lambda event: None)
+        results[f"emit.{count}"] = timed(loop(lambda s=source: s.emit(event)), n, repeats)
+    source = Observable()
+    for _ in range(5):
+        source.subscribe(lambda event: None, (ChatEstablished,))
+    results["emit.filtered"] = timed(loop(lambda: source.emit(event)), n, repeats)
+    source = Observable()
+    source.subscribe(lambda event: None, delivery="async", queue_size=n)
+    results["emit.async"] = timed(loop(lambda: source.emit(event)), n, repeats)
+    return results
+
+
+def bench_observer(n: int, repeats: int) -> Dict[str, Metrics]:
+    # Solo el lado productor: colas sin workers que las vacíen (se vacían entre repeticiones)
+    observer = ServerObserver.__new__(ServerObserver)
+    observer._console_queue = queue.Queue()
+    observer._file_queue = queue.Queue()
+    observer.control = LogControl()
+    observer._sinks = threading.local()
+    observer.dropped = {"console": 0, "file": 0}
+    events = {
+        "ClientJoined": ClientJoined("ana", ("127.0.0.1", 5000)),
+        "ChatEstablished": ChatEstablished("ana", "bob"),
+        "FileTransferRouted": FileTransferRouted("ana", "bob"),
+        "RoomMessagePosted": RoomMessagePosted("general", "ana", 10),
+    }
+    results = {}
+    for name, event in events.items():
+        def run(count: int, event=event) -> float:
+            elapsed = loop(lambda: observer(event))(count)
+            observer._console_queue = queue.Queue()
+            observer._file_queue = queue.Queue()
+            return elapsed
+        results[f"observer.{name}"] = timed(run, n, repeats)
+    # Tipo muestreado (1 de cada 100): coste de los eventos suprimidos
+    observer.control.apply("FileTransferRouted sample=100")
+    routed = events["FileTransferRouted"]
+    results["observer.sampled"] = timed(loop(lambda: observer(routed)), n, repeats)
+    return results
+
+
+def bench_buffer(n: int, repeats: int) -> Dict[str, Metrics]:
+    results = {}
+    done = threading.Event()
+    remaining = [0]
+    latencies: List[float] = []
+
+    def burst(_session, _msg_type, _payload) -> None:
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            done.set()
+
+    buffer = RequestBuffer(burst, lambda event: None, workers=1)
+
+    def run_burst(count: int) -> float:
+        remaining[0] = count
+        done.clear()
+        start = time.perf_counter()
+        for _ in range(count):
+            buffer.add_request(None, 1, b"")
+        done.wait()
+        return time.perf_counter() - start
+
+    results["buffer.burst"] = timed(run_burst, n, repeats)
+    buffer.stop()
+
+    def single(_session, _msg_type, enqueued) -> None:
+        latencies.append((time.perf_counter() - enqueued) * 1e6)
+        done.set()
+
+    buffer = RequestBuffer(single, lambda event: None, workers=1)
+    for _ in range(max(1, n // 20)):
+        done.clear()
+        buffer.add_request(None, 1, time.perf_counter())
+        done.wait()
+    buffer.stop()
+    median = percentile(latencies, 50)
+    results["buffer.latency"] = {"us_per_op": median, "us_median": median,
+                                 "us_p99": percentile(latencies, 99)}
+    return results
+
+
+def bench_metrics(n: int, repeats: int) -> Dict[str, Metrics]:
+    registry = MetricsRegistry()
+    frame = frame_parts(1, bytes(64))
+    return {
+        "metrics.inc": timed(loop(lambda: registry.inc("chat_connections_total")), n, repeats),
+        "metrics.observe": timed(
+            loop(lambda: registry.observe("chat_dispatch_seconds", 0.0003, ("CHAT",))), n, repeats),
+        "metrics.frame_out": timed(loop(lambda: registry.frame_out(frame)), n, repeats),
+    }
+
+
+SUITES: List[Tuple[str, Callable[[int, int], Dict[str, Metrics]]]] = [
+    ("tlv", bench_tlv),
+    ("dispatch", bench_dispatch),
+    ("emit", bench_emit),
+    ("observer", bench_observer),
+    ("buffer", bench_buffer),
+    ("metrics", bench_metrics),
+]
+
+
+# ---------------------------------------------------------------------------
+# Línea base
+# ---------------------------------------------------------------------------
+
+def compare(results: Dict[str, Metrics], baseline: Dict[str, Metrics], threshold: float) -> List[str]:
+    """Imprime la comparación y devuelve los casos con regresión."""
+    regressions = []
+    print(f"\n{'caso':<34}{'base µs':>10}{'actual µs':>11}{'cambio':>9}")
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if base is None:
+            print(f"{case:<34}{'-':>10}{metrics['us_per_op']:>11.3f}{'nuevo':>9}")
+            continue
+        change = metrics["us_per_op"] / base["us_per_op"] - 1.0
+        mark = ""
+        if change > threshold:
+            mark = "  REGRESIÓN"
+            regressions.append(case)
+        elif change < -threshold:
+            mark = "  mejora"
+        print(f"{case:<34}{base['us_per_op']:>10.3f}{metrics['us_per_op']:>11.3f}{change:>+9.1%}{mark}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000, help="operaciones por repetición")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--filter", default="", help="solo los grupos cuyo nombre empiece así")
+    parser.add_argument("--json", help="escribe los resultados en este archivo JSON")
+    parser.add_argument("--save-baseline", help="guarda los resultados como línea base")
+    parser.add_argument("--baseline", help="línea base JSON con la que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="cambio relativo que cuenta como regresión")
+    args = parser.parse_args()
+
+    results: Dict[str, Metrics] = {}
+    for name, suite in SUITES:
+        if name.startswith(args.filter):
+            results.update(suite(args.iterations, args.repeats))
+
+    print(f"{'caso':<34}{'µs/op':>10}{'mediana':>10}{'p99':>10}")
+    for case, metrics in results.items():
+        p99 = f"{metrics['us_p99']:>10.3f}" if "us_p99" in metrics else ""
+        print(f"{case:<34}{metrics['us_per_op']:>10.3f}{metrics['us_median']:>10.3f}{p99}")
+
+    document = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,87 @@
-import queue
 import threading
 import sys
-from typing import Optional, Callable
+from collections import deque
+from typing import Deque, Dict, Optional, Callable, Tuple
+
+# Tipos de evento; los asigna quien lo genera (p. ej. la tabla de comandos del receptor)
+EVENT_CHAT     = "chat"      # texto de chat: acotado, nunca se descarta
+EVENT_CONTROL  = "control"   # diálogos, listas de usuarios, avisos, errores...: acotado, nunca se descarta
+EVENT_PROGRESS = "progress"  # progreso de subida: solo se muestra, el siguiente lo sustituye
+
+# Eventos de chat pendientes como máximo antes de frenar al receptor
+EVENT_BACKLOG = 10000
+# Eventos de control pendientes como máximo antes de frenar a quien los genera
+CONTROL_BACKLOG = 1000
+
 
 class EventBuffer:
-    """Buffer de eventos para manejar actualizaciones de GUI."""
+    """
+    Buffer de eventos para manejar actualizaciones de GUI.
+
+    Los eventos se entregan en orden y ninguno se descarta; cada uno llega
+    con su tipo:
+
+    - EVENT_PROGRESS se fusiona: si el último evento pendiente también es
+      progreso, el nuevo lo sustituye.
+    - EVENT_CHAT está acotado a `max_events` pendientes y EVENT_CONTROL a
+      `max_control`: si la GUI no da abasto, add_event() espera (y el
+      receptor deja de leer del socket, frenando al servidor) hasta que haya
+      sitio en su carril. Desde el propio hilo del buffer (callbacks) nunca
+      se espera.
+    """
 
-    def __init__(self, callback: Optional[Callable] = None):
-        self._queue = queue.Queue()
+    def __init__(self, callback: Optional[Callable] = None, max_events: int = EVENT_BACKLOG,
+                 max_control: int = CONTROL_BACKLOG):
+        self._events: Deque[Tuple[str, str]] = deque()  # (tipo, mensaje)
+        self._pending: Dict[str, int] = {EVENT_CHAT: 0, EVENT_CONTROL: 0}
+        self._limits = {EVENT_CHAT: max_events, EVENT_CONTROL: max_control}
+        self._cond = threading.Condition()
         self._callback = callback
         self._stop_event = threading.Event()
+        self.stalls = 0
+        self.coalesced = 0
         self._worker = threading.Thread(target=self._process_loop, daemon=True)
         self._worker.start()
 
-    def add_event(self, message: str):
-        """Agrega un evento al buffer."""
-        self._queue.put(message)
+    def add_event(self, message: str, kind: str = EVENT_CONTROL):
+        """Agrega un evento del tipo indicado al buffer."""
+        with self._cond:
+            if kind == EVENT_PROGRESS:
+                if self._events and self._events[-1][0] == EVENT_PROGRESS:
+                    self._events[-1] = (kind, message)
+                    self.coalesced += 1
+                    return
+            else:
+                limit = self._limits[kind]
+                if self._pending[kind] >= limit and threading.current_thread() is not self._worker:
+                    self.stalls += 1
+                    self._cond.wait_for(lambda: self._pending[kind] < limit
+                                        or self._stop_event.is_set())
+                self._pending[kind] += 1
+            self._events.append((kind, message))
+            self._cond.notify_all()
 
     def _process_loop(self):
         while not self._stop_event.is_set():
-            try:
-                message = self._queue.get(timeout=1.0)
-                if self._callback:
-                    try:
-                        self._callback(message)
-                    except Exception as e:
-                        import sys
-                        print(f"[EventBuffer ERROR] callback falló: {e}", file=sys.stderr, flush=True)
-                self._queue.task_done()
-            except queue.Empty:
-                continue
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._events or self._stop_event.is_set(), 1.0):
+                    continue
+                if not self._events:
+                    continue
+                kind, message = self._events.popleft()
+                if kind != EVENT_PROGRESS:
+                    self._pending[kind] -= 1
+                    self._cond.notify_all()
+            if self._callback:
+                try:
+                    self._callback(message)
+                except Exception as e:
+                    print(f"[EventBuffer ERROR] callback falló: {e}", file=sys.stderr, flush=True)
 
     def stop(self):
         """Detiene el buffer."""
         self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
         if self._worker.is_alive():
             self._worker.join(timeout=2.0)
@@ -3,31 +3,114 @@
 
 import socket
 import sys
-import struct
+import threading
 import pathlib
-from typing import Optional, Callable, List
+from collections import deque
+from typing import Optional, Callable, Deque, Dict, List, Sequence, Tuple
+from common.compression import FrameCodec
+from common.framing import FileRegion, Payload, frame_parts, send_buffers
+from common.protocol import PROTOCOL_V2, frame_command
+from common.sockopts import SocketProfile
 from .state import ChatState
-from .buffer import EventBuffer
+from .buffer import EVENT_CHAT, EventBuffer
 from .receiver import MessageReceiver
+from .transfer import RESUME_MODE, STREAM_MODE
+from .upload import FileUploader
+
+# Segundos de espera por créditos del servidor antes de enviar igualmente
+CREDIT_TIMEOUT = 5.0
 
 class ChatClient:
-    def __init__(self, event_callback: Optional[Callable] = None) -> None:
+    def __init__(self, event_callback: Optional[Callable] = None,
+                 profile: Optional[SocketProfile] = None,
+                 compression: Sequence[str] = ("zlib",)) -> None:
         self._sock: Optional[socket.socket] = None
+        self._profile = profile or SocketProfile()
+        # Códecs que se ofrecen al servidor; añadir "lzma" comprime los archivos
+        # con mejor ratio a costa de más CPU (enlaces lentos).
+        self._compression = tuple(compression)
+        self._frame_codec = FrameCodec()
         self._state = ChatState()
         self._buffer = EventBuffer(event_callback)
         self._receiver: Optional[MessageReceiver] = None
+        # Control de flujo por créditos (WINDOW/CREDIT): sin ventana concedida
+        # (servidores antiguos) no se limita nada
+        self._flow = threading.Condition()
+        self._credits: Optional[int] = None
+        self._uncredited = 0  # tramas enviadas desde WINDOW antes de recibir la ventana
+        self._window_requested = False
+        self.credit_stalls = 0
+        # Una trama entera por vez en el socket: la envían la GUI, el receptor y el
+        # FileUploader. Quien tiene el cerrojo envía también las tramas que los
+        # demás dejan en _outgoing, así nadie espera a que salga un archivo Tipo 2
+        self._send_lock = threading.Lock()
+        self._outgoing: Deque[Tuple[bytes, ...]] = deque()
+        self._uploader = FileUploader(self._write, self._buffer.add_event, self._state)
 
     def connect(self, host: str, port: int) -> None:
-        """Conecta al cliente al servidor."""
+        """
+        Conecta al cliente al servidor.
+
+        Se puede volver a llamar tras disconnect() (o tras perder la conexión):
+        el estado (presencia, parciales reanudables) se conserva.
+        """
+        self.disconnect()
+        self._state.reset_connection()
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._profile.apply(self._sock)  # antes de connect: los buffers fijan la ventana TCP
         self._sock.connect((host, port))
-        self._receiver = MessageReceiver(self._sock, self._state, self._buffer)
+        self._credits, self._uncredited, self._window_requested = None, 0, False
+        self._outgoing.clear()
+        self._receiver = MessageReceiver(self._sock, self._state, self._buffer,
+                                         self._send_cmd, self._frame_codec, self._grant_credit,
+                                         self._send)
         self._receiver.start()
+        # Proponemos los comandos binarios v2 y la compresión; hasta recibir
+        # HELLO_OK se sigue en texto y sin comprimir
+        hello = f"HELLO:{PROTOCOL_V2}"
+        if self._compression:
+            hello += ":" + ",".join(self._compression)
+        self._send(1, hello.encode("utf-8"))
+        # Pedimos ventana de créditos: desde WINDOW (incluido) cada trama gasta uno
+        self._window_requested = True
+        self._send_cmd("WINDOW")
+        # Presencia por suscripción: con la versión de una conexión anterior el
+        # servidor responde solo con los cambios
+        self._send_cmd("SUB_PRESENCE", self._state.presence_epoch, self._state.presence_version)
+
+    def compression_stats(self) -> Dict[str, float]:
+        """Ratio y tiempo de CPU por trama de la compresión en este cliente."""
+        return self._frame_codec.stats()
+
+    def flow_stats(self) -> Dict[str, Optional[int]]:
+        """Créditos disponibles, esperas por crédito, esperas de la GUI y progresos fusionados."""
+        return {
+            "credits":        self._credits,
+            "credit_stalls":  self.credit_stalls,
+            "event_stalls":   self._buffer.stalls,
+            "events_coalesced": self._buffer.coalesced,
+        }
+
+    def upload_progress(self) -> Dict[str, object]:
+        """Archivo que se está enviando, bytes enviados y totales, y archivos pendientes."""
+        return self._uploader.progress()
 
     def disconnect(self) -> None:
-        """Desconecta al cliente del servidor."""
-        if self._sock:
-            self._sock.close()
+        """Desconecta al cliente del servidor; connect() puede volver a conectarlo."""
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                # Sin shutdown, el recv del receptor retiene el socket y el servidor
+                # no ve el cierre (el nombre seguiría ocupado al reconectar)
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def close(self) -> None:
+        """Desconecta y detiene los hilos de subida y de eventos (el cliente ya no se reutiliza)."""
+        self.disconnect()
+        self._uploader.stop()
         self._buffer.stop()
 
     def set_name(self, name: str) -> bool:
@@ -36,7 +119,7 @@ class ChatClient:
         self._state.name = name
         self._state.name_confirmed.clear()
         self._state.name_error = None
-        self._send(1, f"SET_NAME:{name}".encode("utf-8"))
+        self._send_cmd("SET_NAME", name)
         return True
 
     def process_command(self, line: str) -> None:
@@ -64,9 +147,14 @@ class ChatClient:
             target = line.split(":", 1)[1] if ":" in line else self._state.current_target
             self._cmd_stop(target)
         elif line.startswith("chat:"): self._cmd_chat(line.split(":", 1)[1])
+        elif line.startswith("room:"): self._cmd_room(line.split(":", 1)[1]) # room:create|join|leave|post:<sala>[:<texto>]
         else: self._cmd_send(line)
 
-    def _cmd_list(self) -> None: self._send(1, b"GET_USERS") # Si se recibe el comando list
+    def _cmd_list(self) -> None: # Si se recibe el comando list
+        if self._state.presence_version: # La suscripción mantiene la lista al día
+            self._buffer.add_event(f"[USUARIOS CONECTADOS] {','.join(self._state.connected_users)}")
+        else:
+            self._send_cmd("GET_USERS")
 
     def _cmd_sessions(self) -> None: # Si se recibe el comando sessions
         sessions_str = ", ".join(self._state.open_sessions) if self._state.open_sessions else "Ninguno"
@@ -77,7 +165,7 @@ class ChatClient:
     def _cmd_accept(self) -> None: # Si se recibe el comando accept
         if self._state.pending_requests:
             requester = self._state.pending_requests.pop(0)
-            self._send(1, f"ACCEPT_CHAT:{requester}".encode("utf-8"))
+            self._send_cmd("ACCEPT_CHAT", requester)
             self._buffer.add_event(f"[INFO] Chat con {requester} aceptado.")
         elif self._state.pending_file_request:
             # Notificamos a la GUI que debe abrir el diálogo de carpeta
@@ -88,11 +176,11 @@ class ChatClient:
     def _cmd_deny(self) -> None:
         if self._state.pending_requests:
             requester = self._state.pending_requests.pop(0)
-            self._send(1, f"DENY_CHAT:{requester}".encode("utf-8"))
+            self._send_cmd("DENY_CHAT", requester)
             self._buffer.add_event(f"[INFO] Solicitud de {requester} rechazada.")
         elif self._state.pending_file_request:
             req = self._state.pending_file_request
-            self._send(1, f"DENY_SEND_FILES:{req['sender']}".encode("utf-8"))
+            self._send_cmd("DENY_SEND_FILES", req['sender'])
             self._buffer.add_event(f"[INFO] Transferencia de {req['sender']} rechazada.")
             self._state.pending_file_request = None
         else:
@@ -100,7 +188,7 @@ class ChatClient:
 
     def _cmd_stop(self, target: Optional[str]) -> None: # Si se recibe el comando stop
         if target and target in self._state.open_sessions:
-            self._send(1, f"STOP_CHAT:{target}".encode("utf-8"))
+            self._send_cmd("STOP_CHAT", target)
             self._state.open_sessions.discard(target)
             if self._state.current_target == target: self._state.current_target = None
             self._buffer.add_event(f"[INFO] Chat con {target} finalizado.")
@@ -115,7 +203,7 @@ class ChatClient:
             self._state.current_target = target
             self._buffer.add_event(f"[INFO] Cambiado a chat con {target}.")
         else:
-            self._send(1, f"REQ_CHAT:{target}".encode("utf-8"))
+            self._send_cmd("REQ_CHAT", target)
             self._buffer.add_event(f"[SISTEMA] Solicitud enviada a {target}. Esperando...")
             self._state.current_target = target
 
@@ -137,8 +225,9 @@ class ChatClient:
 
         self._state.file_queue = valid_paths
         target = self._state.current_target
-        # REQ_SEND_FILES:<Target>:<Count>
-        self._send(1, f"REQ_SEND_FILES:{target}:{len(valid_paths)}".encode("utf-8"))
+        # REQ_SEND_FILES:<Target>:<Count>:STREAM:RESUME (ofrecemos fragmentos reanudables)
+        self._state.stream_files = self._state.resume_files = False
+        self._send_cmd("REQ_SEND_FILES", target, str(len(valid_paths)), STREAM_MODE, RESUME_MODE)
         self._buffer.add_event(f"[SISTEMA] Solicitando enviar {len(valid_paths)} archivo(s) a {target}...")
 
     def set_save_path_and_accept(self, path: str) -> None:
@@ -146,43 +235,126 @@ class ChatClient:
         if self._state.pending_file_request:
             self._state.save_path = path
             sender = self._state.pending_file_request['sender']
-            self._send(1, f"ACCEPT_SEND_FILES:{sender}".encode("utf-8"))
+            # Aceptamos ofreciendo fragmentos reanudables; el servidor solo
+            # confirma al emisor los modos que él también ofreció.
+            self._send_cmd("ACCEPT_SEND_FILES", sender, STREAM_MODE, RESUME_MODE)
             self._buffer.add_event(f"[INFO] Carpeta de destino establecida. Esperando archivos de {sender}...")
 
-    def _send_next_file(self) -> None:
-        """Envía el siguiente archivo en la cola."""
-        if not self._state.file_queue or not self._state.current_target:
+    def start_upload(self) -> None:
+        """
+        Entrega la cola de archivos al FileUploader (el receptor aceptó).
+
+        Vuelve enseguida: los archivos se envían en el hilo de subida, uno
+        detrás de otro, sin ocupar el hilo de eventos de la GUI.
+        """
+        paths, self._state.file_queue = self._state.file_queue, []
+        if not paths or not self._state.current_target:
             self._buffer.add_event("[INFO] Envío de archivos completado.")
             return
+        self._uploader.submit(paths, self._state.current_target)
 
-        path_str = self._state.file_queue.pop(0)
-        path = pathlib.Path(path_str)
-        
-        try:
-            file_data = path.read_bytes()
-            filename = path.name.encode("utf-8")
-            dst = self._state.current_target.encode("utf-8")
-            # Mensaje tipo 2: DST_LEN (1) + DST + FILENAME_LEN (1) + FILENAME + DATA
-            full_payload = bytes([len(dst)]) + dst + bytes([len(filename)]) + filename + file_data
-            self._send(2, full_payload)
-            self._buffer.add_event(f"[YO] Enviando {path.name}...")
-        except Exception as e:
-            self._buffer.add_event(f"[ERROR] Error al enviar {path.name}: {e}")
-            self._send_next_file()
+    def _cmd_room(self, args: str) -> None: # Si se recibe el comando room
+        action, _, rest = args.partition(":")
+        if action == "post":
+            room, _, text = rest.partition(":")
+            if room in self._state.rooms and text:
+                self._send_cmd("ROOM_POST", room, text)
+                self._buffer.add_event(f"[SALA {room}] [YO] {text}", EVENT_CHAT)
+            else:
+                self._buffer.add_event(f"[!] No estás en la sala {room}.")
+        elif action in ("create", "join", "leave") and rest:
+            self._send_cmd(f"ROOM_{action.upper()}", rest)
+        else:
+            self._buffer.add_event("[!] Uso: room:create|join|leave:<sala> o room:post:<sala>:<texto>")
 
     def _cmd_send(self, text: str) -> None:
         """Envía un mensaje de texto."""
         if self._state.current_target: 
-            self._send(0, f"CHAT:{self._state.current_target}:{text}".encode("utf-8"))
-            self._buffer.add_event(f"[YO] {text}")
+            self._send_cmd("CHAT", self._state.current_target, text)
+            self._buffer.add_event(f"[YO] {text}", EVENT_CHAT)
         else: 
             self._buffer.add_event("[!] Selecciona un chat primero.")
 
-    def _send(self, msg_type: int, data: bytes) -> None:
-        """Envía un mensaje al servidor."""
-        if self._sock:
+    def _send_cmd(self, name: str, *fields: str) -> None:
+        """Envía un comando de control en la versión de protocolo negociada."""
+        self._send(*frame_command(self._state.protocol, name, *fields))
+
+    def _grant_credit(self, credits: int) -> None:
+        """CREDIT:<n> del servidor: la primera vez es la ventana, después lo ya despachado."""
+        with self._flow:
+            if self._credits is None:
+                self._credits = credits - self._uncredited
+            else:
+                self._credits += credits
+            self._flow.notify_all()
+
+    def _take_credit(self) -> None:
+        """Gasta un crédito; sin créditos espera a que el servidor despache (hasta CREDIT_TIMEOUT)."""
+        with self._flow:
+            if self._credits is None:
+                if self._window_requested:
+                    self._uncredited += 1
+                return
+            # El receptor nunca espera: es quien procesa los CREDIT
+            if self._credits <= 0 and threading.current_thread() is not self._receiver:
+                self.credit_stalls += 1
+                self._flow.wait_for(lambda: self._credits > 0, CREDIT_TIMEOUT)
+            self._credits -= 1
+
+    def _send(self, msg_type: int, data: Payload) -> None:
+        """
+        Envía un mensaje al servidor (cabecera y partes en una sola escritura).
+
+        No espera a otros hilos: si el socket está ocupado la trama queda en
+        _outgoing y la envía quien lo ocupa en cuanto termina su trama.
+        """
+        try:
+            frame = self._frame(msg_type, data)
+            if frame is None:
+                return
+            self._outgoing.append(frame)
+            self._flush()
+        except Exception as e:
+            self._buffer.add_event(f"[ERROR RED] Error al enviar: {e}")
+
+    def _write(self, msg_type: int, data: Payload) -> None:
+        """
+        Como _send, pero espera su turno y los errores de red se propagan
+        (FileUploader corta el archivo).
+
+        Las partes FileRegion salen con sendfile y sin comprimir.
+        """
+        frame = self._frame(msg_type, data)
+        if frame is None:
+            raise ConnectionError("No hay conexión con el servidor")
+        with self._send_lock:
+            self._drain()
+            send_buffers(self._sock, frame)
+            self._drain()
+        self._flush()
+
+    def _frame(self, msg_type: int, data: Payload) -> Optional[Tuple[bytes, ...]]:
+        """Toma crédito y devuelve la trama lista para enviar (comprimida si procede)."""
+        if not self._sock:
+            return None
+        self._take_credit()
+        regions = not isinstance(data, (bytes, bytearray, memoryview)) and any(
+            isinstance(part, FileRegion) for part in data)
+        if self._state.codecs and not regions:
+            msg_type, data = self._frame_codec.encode(msg_type, data, self._state.codecs)
+        return frame_parts(msg_type, data)
+
+    def _flush(self) -> None:
+        """Envía las tramas de _outgoing si nadie está enviando (si no, las envía ese hilo)."""
+        # Se vuelve a mirar tras soltar el cerrojo: otro hilo pudo encolar
+        # justo cuando el que lo tenía ya había vaciado la cola
+        while self._outgoing and self._send_lock.acquire(blocking=False):
             try:
-                header = struct.pack("!BI", msg_type, len(data))
-                self._sock.sendall(header + data)
-            except Exception as e:
-                self._buffer.add_event(f"[ERROR RED] Error al enviar: {e}")
+                self._drain()
+            finally:
+                self._send_lock.release()
+
+    def _drain(self) -> None:
+        """Envía las tramas de _outgoing; requiere el cerrojo de envío."""
+        while self._outgoing:
+            send_buffers(self._sock, self._outgoing.popleft())
@@ -3,7 +3,7 @@ let currentSuggestion = "";
 let suggestionMatches = [];
 let currentMatchIndex = 0;
 
-const baseCommands = ['list', 'sessions', 'stop', 'chat:', 'file', 'accept', 'deny', 'exit'];
+const baseCommands = ['list', 'sessions', 'stop', 'chat:', 'room:create:', 'room:join:', 'room:leave:', 'room:post:', 'file', 'accept', 'deny', 'exit'];
 
 function toggleHelp() {
     document.getElementById('help-modal').classList.toggle('hidden');
@@ -152,6 +152,34 @@ function addEvent(message) {
         connectedUsers = usersStr.split(",").filter(u => u !== "");
         return;
     }
+    if (message.startsWith("USERS_DELTA:")) {
+        // "+nombre" alta, "-nombre" baja
+        const changes = message.replace("USERS_DELTA:", "").split(",").filter(c => c !== "");
+        const users = new Set(connectedUsers);
+        for (const change of changes) {
+            if (change[0] === "+") users.add(change.slice(1));
+            else users.delete(change.slice(1));
+        }
+        connectedUsers = Array.from(users);
+        return;
+    }
+    if (message.startsWith("UPLOAD_PROGRESS:")) {
+        // "<enviados>:<total>:<nombre>": una línea por archivo que se va actualizando
+        const [sent, total, ...rest] = message.replace("UPLOAD_PROGRESS:", "").split(":");
+        const file = rest.join(":");
+        const pct = Number(total) ? Math.floor(100 * Number(sent) / Number(total)) : 100;
+        const log = document.getElementById('log');
+        let line = document.getElementById('upload-' + file);
+        if (!line) {
+            line = document.createElement('div');
+            line.id = 'upload-' + file;
+            line.className = 'msg info';
+            log.appendChild(line);
+        }
+        line.innerText = `[YO] Subiendo ${file}: ${pct}%`;
+        log.scrollTop = log.scrollHeight;
+        return;
+    }
 
     const log = document.getElementById('log');
     const div = document.createElement('div');
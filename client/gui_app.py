@@ -2,14 +2,16 @@ import webview
 import os
 import json
 import pathlib
+from typing import Optional
+from common.sockopts import SocketProfile
 from .core import ChatClient
 
 class Bridge:
     """Clase que actúa como puente entre la GUI y el cliente."""
 
-    def __init__(self):
+    def __init__(self, profile: Optional[SocketProfile] = None):
         self._window = None
-        self._client = ChatClient(event_callback=self._handle_server_event)
+        self._client = ChatClient(event_callback=self._handle_server_event, profile=profile)
 
     def set_window(self, window):
         """Establece la ventana webview."""
@@ -30,9 +32,8 @@ class Bridge:
             return
 
         if message == "START_FILE_TRANSFER": # Si se recibe un evento de solicitud de transferencia de archivos
-            # Iniciar el envío secuencial de la cola
-            while self._client._state.file_queue:
-                self._client._send_next_file()
+            # La cola se envía en el hilo de subida; este hilo sigue entregando eventos
+            self._client.start_upload()
             return
 
         if self._window:
@@ -70,10 +71,11 @@ class Bridge:
 
     def get_connected_users(self):
         """Obtiene los usuarios conectados."""
-        return self._client._state.connected_users
+        return list(self._client._state.connected_users)
 
     def close_window(self):
         """Cierra la ventana."""
+        self._client.close()
         if self._window:
             self._window.destroy()
 
@@ -94,10 +96,10 @@ class Bridge:
             return folder if folder else ""
         return ""
 
-def start_gui(host="127.0.0.1", port=5000):
-    """Inicia la GUI."""
+def start_gui(host="127.0.0.1", port=5000, profile: Optional[SocketProfile] = None):
+    """Inicia la GUI con el perfil de socket indicado (el mismo SOCKET_PROFILE que el servidor)."""
     try:
-        bridge = Bridge()
+        bridge = Bridge(profile)
         html_path = (pathlib.Path(__file__).parent / "gui" / "index.html").resolve()
         
         window = webview.create_window(
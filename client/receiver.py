@@ -4,63 +4,113 @@
 import threading
 import struct
 import pathlib
-from typing import Optional, Any
+from typing import Optional, Any, Callable
 from .state import ChatState
-from .buffer import EventBuffer
+from .buffer import EVENT_CHAT, EventBuffer
+from common.framing import FrameReader, split_field
+from common.compression import FrameCodec, parse_codecs
+from common.protocol import BINARY_COMMAND, CSV_COMMANDS, decode_binary, opcode_table, split_args
+from .transfer import (
+    CHUNK_START, CHUNK_DATA, CHUNK_END, CHUNK_START_RESUME, CHUNK_DATA_AT, CHUNK_NEED,
+    CHUNK_DONE, CHUNK_DIGEST_SIZE, DONE_CORRUPT, DONE_OK, DONE_REJECTED, MAX_VERIFY_FAILURES,
+    RESUME_MODE, STREAM_MODE, IncomingFile, ResumableFile, check_resume, encode_chunk, encode_ranges,
+)
 
 class MessageReceiver(threading.Thread):
     """Hilo daemon que escucha mensajes del servidor y los agrega al buffer de eventos."""
 
-    def __init__(self, sock, state: ChatState, buffer: EventBuffer) -> None:
+    def __init__(self, sock, state: ChatState, buffer: EventBuffer,
+                 send_cmd: Callable[..., None], frame_codec: FrameCodec,
+                 on_credit: Optional[Callable[[int], None]] = None,
+                 send: Optional[Callable[[int, Any], None]] = None) -> None:
         super().__init__(daemon=True)
         self._sock = sock
         self._state = state
         self._buffer = buffer
-
-    def recv_all(self, n: int) -> Optional[bytes]:
-        """Recibe todos los bytes de un paquete."""
-        data = b""
-        while len(data) < n:
-            packet = self._sock.recv(n - len(data))
-            if not packet: return None
-            data += packet
-        return data
+        self._send_cmd = send_cmd  # ChatClient._send_cmd: respeta la versión negociada
+        self._frame_codec = frame_codec
+        self._on_credit_granted = on_credit  # ChatClient._grant_credit
+        self._send = send  # ChatClient._send: respuestas NEED / DONE de las transferencias reanudables
+        # Los archivos reanudables se verifican en otro hilo, que también descuenta el lote
+        self._count_lock = threading.Lock()
 
     def run(self) -> None:
         """Bucle principal del hilo."""
+        # Cada trama se procesa antes de leer la siguiente, así que el buffer
+        # del lector se reutiliza entre tramas (sin asignaciones por recv).
+        reader = FrameReader(self._sock)
         while True:
             try:
-                header = self.recv_all(5)
-                if not header: break
-                msg_type, length = struct.unpack("!BI", header)
-                payload = self.recv_all(length)
-                if payload is None: break
-                
+                frame = reader.read_frame(reuse=True)
+                if frame is None: break
+                msg_type, payload = frame
+
                 self._dispatch(msg_type, payload)
             except Exception as e:
                 self._buffer.add_event(f"[ERROR RECEPTOR] {e}")
                 break
+        # Los archivos reanudables a medias conservan su progreso para la próxima vez
+        for incoming in list(self._state.incoming_files.values()):
+            incoming.close()
+        self._state.incoming_files.clear()
         self._buffer.add_event("[DESCONECTADO] Conexión perdida con el servidor.")
 
-    def _dispatch(self, msg_type: int, payload: bytes) -> None:
+    # Comando -> (manejador, separación de argumentos en v1; ver split_args)
+    COMMANDS = {
+        "HELLO_OK":               ("_on_hello_ok",                -1),
+        "NAME_OK":                ("_on_name_ok",                 None),
+        "NAME_TAKEN":             ("_on_name_taken",              None),
+        "LIST_USERS":             ("_on_list_users",              -1),
+        "PRESENCE_SNAPSHOT":      ("_on_presence_snapshot",       -1),
+        "PRESENCE_DELTA":         ("_on_presence_delta",          -1),
+        "REQ_CHAT_FROM":          ("_on_req_chat_from",           0),
+        "CHAT_ACCEPTED":          ("_on_chat_accepted",           0),
+        "CHAT_DENIED":            ("_on_chat_denied",             0),
+        "CHAT_STOPPED":           ("_on_chat_stopped",            0),
+        "FROM":                   ("_on_message_received",        1),
+        "ERROR":                  ("_on_error",                   0),
+        "REQ_SEND_FILES_FROM":    ("_on_req_send_files_from",     -1),
+        "ACCEPT_SEND_FILES_FROM": ("_on_accept_send_files_from",  -1),
+        "DENY_SEND_FILES_FROM":   ("_on_deny_send_files_from",    0),
+        "FILES_RECEIVED_FROM":    ("_on_files_received_from",     0),
+        "ROOM_CREATED":           ("_on_room_created",            0),
+        "ROOM_JOINED":            ("_on_room_joined",             0),
+        "ROOM_LEFT":              ("_on_room_left",               0),
+        "ROOM_FROM":              ("_on_room_message",            2),
+        "CREDIT":                 ("_on_credit",                  0),
+    }
+
+    # Opcode v2 -> manejador (los campos ya llegan separados)
+    BINARY_COMMANDS = opcode_table(COMMANDS)
+
+    def _dispatch(self, msg_type: int, payload: memoryview) -> None:
         """Distribuye los mensajes al método correspondiente."""
+        # Solo se aceptan los códecs confirmados en HELLO_OK, sin superar FrameLimits por tipo
+        msg_type, payload = self._frame_codec.decode(msg_type, payload, self._state.codecs)
         if msg_type in (0, 1):
-            message = payload.decode("utf-8")
-            if message == "NAME_OK": self._on_name_ok()
-            elif message == "NAME_TAKEN": self._on_name_taken()
-            elif message.startswith("LIST_USERS:"): self._on_list_users(message.split(":", 1)[1])
-            elif message.startswith("REQ_CHAT_FROM:"): self._on_req_chat_from(message.split(":", 1)[1])
-            elif message.startswith("CHAT_ACCEPTED:"): self._on_chat_accepted(message.split(":", 1)[1])
-            elif message.startswith("CHAT_DENIED:"): self._on_chat_denied(message.split(":", 1)[1])
-            elif message.startswith("CHAT_STOPPED:"): self._on_chat_stopped(message.split(":", 1)[1])
-            elif message.startswith("FROM:"): self._on_message_received(message)
-            elif message.startswith("ERROR:"): self._on_error(message.split(":", 1)[1])
-            elif message.startswith("REQ_SEND_FILES_FROM:"): self._on_req_send_files_from(message.split(":", 1)[1])
-            elif message.startswith("ACCEPT_SEND_FILES_FROM:"): self._on_accept_send_files_from(message.split(":", 1)[1])
-            elif message.startswith("DENY_SEND_FILES_FROM:"): self._on_deny_send_files_from(message.split(":", 1)[1])
-            elif message.startswith("FILES_RECEIVED_FROM:"): self._on_files_received_from(message.split(":", 1)[1])
+            name, _, rest = str(payload, "utf-8").partition(":")
+            entry = self.COMMANDS.get(name)
+            if entry:
+                method, maxsplit = entry
+                separator = "," if name in CSV_COMMANDS else ":"
+                getattr(self, method)(*split_args(rest, maxsplit, separator))
+        elif msg_type == BINARY_COMMAND:
+            opcode, fields = decode_binary(payload)
+            method = self.BINARY_COMMANDS.get(opcode)
+            if method:
+                getattr(self, method)(*fields)
         elif msg_type == 2:
             self._on_file_received(payload)
+        elif msg_type == 3:
+            self._on_file_chunk(payload)
+
+    def _on_hello_ok(self, version: str, codecs: str = "", *_: str) -> None:
+        self._state.protocol = int(version)
+        self._state.codecs = parse_codecs(codecs)
+
+    def _on_credit(self, credits: str) -> None:
+        if self._on_credit_granted is not None:
+            self._on_credit_granted(int(credits))
 
     def _on_name_ok(self) -> None:
         self._state.name_confirmed.set()
@@ -69,13 +119,31 @@ class MessageReceiver(threading.Thread):
         self._state.name_error = "El nombre ya está en uso."
         self._state.name_confirmed.set()
 
-    def _on_list_users(self, users: str) -> None:
-        user_list = [u for u in users.split(",") if u]
-        self._state.connected_users = user_list
+    def _on_list_users(self, *names: str) -> None:
+        user_list = [u for u in names if u]
+        users = ",".join(user_list)
+        self._state.connected_users = dict.fromkeys(user_list)
         # Notificamos al buffer
         self._buffer.add_event(f"USERS_UPDATE:{users}")
         self._buffer.add_event(f"[USUARIOS CONECTADOS] {users}")
 
+    def _on_presence_snapshot(self, epoch: str, version: str, *names: str) -> None:
+        self._state.presence_epoch, self._state.presence_version = epoch, version
+        self._state.connected_users = dict.fromkeys(u for u in names if u)
+        self._buffer.add_event(f"USERS_UPDATE:{','.join(self._state.connected_users)}")
+
+    def _on_presence_delta(self, epoch: str, version: str, *changes: str) -> None:
+        self._state.presence_epoch, self._state.presence_version = epoch, version
+        users = self._state.connected_users
+        for change in changes:
+            if change[:1] == "+":
+                users[change[1:]] = None
+            else:
+                users.pop(change[1:], None)
+        if changes:
+            # La GUI aplica el mismo delta sobre su lista
+            self._buffer.add_event(f"USERS_DELTA:{','.join(changes)}")
+
     def _on_req_chat_from(self, requester: str) -> None:
         self._state.pending_requests.append(requester)
         self._buffer.add_event(f"[SOLICITUD] {requester} quiere chatear contigo. Escribe 'accept' o 'deny' ({len(self._state.pending_requests)} pendientes).")
@@ -99,19 +167,34 @@ class MessageReceiver(threading.Thread):
             self._state.current_target = None
             self._buffer.add_event("[INFO] Has vuelto al menú principal. Selecciona otro chat con 'chat:<user>'.")
 
-    def _on_message_received(self, raw: str) -> None:
-        _, sender, content = raw.split(":", 2)
-        self._buffer.add_event(f"[{sender}] dice: {content}")
+    def _on_message_received(self, sender: str, content: str) -> None:
+        self._buffer.add_event(f"[{sender}] dice: {content}", EVENT_CHAT)
+
+    def _on_room_created(self, room: str) -> None:
+        self._state.rooms.add(room)
+        self._buffer.add_event(f"[SISTEMA] Sala {room} creada.")
+
+    def _on_room_joined(self, room: str) -> None:
+        self._state.rooms.add(room)
+        self._buffer.add_event(f"[SISTEMA] Has entrado en la sala {room}.")
+
+    def _on_room_left(self, room: str) -> None:
+        self._state.rooms.discard(room)
+        self._buffer.add_event(f"[SISTEMA] Has salido de la sala {room}.")
+
+    def _on_room_message(self, room: str, sender: str, content: str) -> None:
+        self._buffer.add_event(f"[SALA {room}] [{sender}] dice: {content}", EVENT_CHAT)
 
     def _on_error(self, description: str) -> None:
         self._buffer.add_event(f"[ERROR] {description}")
 
-    def _on_req_send_files_from(self, payload: str) -> None:
-        sender, count = payload.split(":")
+    def _on_req_send_files_from(self, sender: str, count: str) -> None:
         self._state.pending_file_request = {"sender": sender, "count": int(count)}
         self._buffer.add_event(f"[SOLICITUD] {sender} quiere enviarte {count} archivo(s). Escribe 'accept' o 'deny'.")
 
-    def _on_accept_send_files_from(self, target: str) -> None:
+    def _on_accept_send_files_from(self, target: str, *mode: str) -> None:
+        self._state.stream_files = STREAM_MODE in mode
+        self._state.resume_files = self._state.stream_files and RESUME_MODE in mode
         # El receptor aceptó, ahora el emisor (nosotros) debe empezar a mandar la cola
         self._buffer.add_event(f"[INFO] {target} ha aceptado la transferencia. Iniciando envío...")
         # Necesitamos una forma de que ChatClient empiece a mandar. 
@@ -127,45 +210,165 @@ class MessageReceiver(threading.Thread):
     def _on_files_received_from(self, target: str) -> None:
         self._buffer.add_event(f"[INFO] {target} ha recibido todos los archivos correctamente.")
 
-    def _on_file_received(self, payload: bytes) -> None:
+    def _on_file_received(self, payload: memoryview) -> None:
         """Maneja la recepción de archivos (Binario Genérico Tipo 2)."""
         try:
             # Formato esperado: sender_len(1)|sender|filename_len(1)|filename|data
-            s_len = payload[0]
-            sender = payload[1:1+s_len].decode("utf-8")
-            f_len = payload[1+s_len]
-            filename = payload[2+s_len:2+s_len+f_len].decode("utf-8")
-            file_data = payload[2+s_len+f_len:]
-            
-            # Ruta de guardado: usar save_path si existe, sino descargas por defecto
-            if self._state.save_path:
-                down_path = pathlib.Path(self._state.save_path)
-            else:
-                down_path = pathlib.Path.home() / "Downloads" / self._state.name
-            
-            down_path.mkdir(parents=True, exist_ok=True)
-            dest_file = down_path / filename
-            
-            # Evitar sobreescribir si ya existe (añadir número)
-            count = 1
-            original_stem = dest_file.stem
-            while dest_file.exists():
-                dest_file = dest_file.with_name(f"{original_stem}_{count}{dest_file.suffix}")
-                count += 1
+            sender, offset = split_field(payload)
+            sender = str(sender, "utf-8")
+            filename, offset = split_field(payload, offset)
+            filename = str(filename, "utf-8")
+            file_data = payload[offset:]
 
+            dest_file = self._destination(filename)
             with open(dest_file, "wb") as f:
                 f.write(file_data)
-            
-            self._buffer.add_event(f"[ARCHIVO] Recibido de {sender}: {filename} (Guardado en {dest_file})")
-            
+            self._on_file_saved(sender, filename, dest_file)
+        except Exception as e:
+            self._buffer.add_event(f"[ERROR ARCHIVO] {e}")
+
+    def _on_file_chunk(self, payload: memoryview) -> None:
+        """Maneja un fragmento de transferencia por streaming (Tipo 3)."""
+        try:
+            # Formato esperado: sender_len(1)|sender|transfer_id(!I)|kind(1)|cuerpo
+            sender, offset = split_field(payload)
+            sender = str(sender, "utf-8")
+            tid, kind = struct.unpack_from("!IB", payload, offset)
+            body = payload[offset+5:]
+            key = (sender, tid)
+
+            if kind == CHUNK_START:
+                filename, offset = split_field(body)
+                filename = str(filename, "utf-8")
+                (size,) = struct.unpack_from("!Q", body, offset)
+                dest_file = self._destination(filename)
+                self._state.incoming_files[key] = IncomingFile(sender, filename, size, open(dest_file, "wb"), dest_file)
+            elif kind == CHUNK_DATA:
+                self._state.incoming_files[key].write(body)
+            elif kind == CHUNK_DATA_AT:
+                (index,) = struct.unpack_from("!Q", body)
+                digest = body[8:8 + CHUNK_DIGEST_SIZE]
+                self._state.incoming_files[key].write_chunk(index, digest, body[8 + CHUNK_DIGEST_SIZE:])
+            elif kind == CHUNK_END:
+                incoming = self._state.incoming_files[key]
+                if isinstance(incoming, ResumableFile):
+                    self._end_resumable(key, incoming)
+                    return
+                del self._state.incoming_files[key]
+                incoming.close()
+                self._on_file_saved(sender, incoming.filename, incoming.path)
+            elif kind == CHUNK_START_RESUME:
+                filename, offset = split_field(body)
+                filename = str(filename, "utf-8")
+                size, = struct.unpack_from("!Q", body, offset)
+                digest = bytes(body[offset + 8:offset + 40])
+                (chunk_size,) = struct.unpack_from("!I", body, offset + 40)
+                try:
+                    check_resume(size, chunk_size)
+                except ValueError as e:
+                    self._reply_chunk(sender, tid, CHUNK_DONE, bytes([DONE_REJECTED]))
+                    self._buffer.add_event(f"[ERROR ARCHIVO] {filename} de {sender} rechazado: {e}")
+                    self._on_file_counted(sender)
+                    return
+                directory = self._directory()
+                self._close_stale(sender, filename, directory)
+                incoming = ResumableFile(sender, filename, size, digest, chunk_size, directory)
+                self._state.incoming_files[key] = incoming
+                if incoming.resumed:
+                    self._buffer.add_event(f"[ARCHIVO] Reanudando {filename} de {sender}: "
+                                           f"{incoming.received} de {incoming.chunks} fragmentos ya recibidos.")
+                self._reply_chunk(sender, tid, CHUNK_NEED, encode_ranges(incoming.missing()))
+            elif kind in (CHUNK_NEED, CHUNK_DONE):
+                # Respuesta del receptor a un envío reanudable nuestro (el emisor la espera)
+                replies = self._state.outgoing_files.get(key)
+                if replies is not None:
+                    replies.put((kind, bytes(body)))
+        except Exception as e:
+            self._buffer.add_event(f"[ERROR ARCHIVO] {e}")
+
+    def _close_stale(self, sender: str, filename: str, directory: pathlib.Path) -> None:
+        """Cierra (guardando el progreso) un envío anterior del mismo archivo que quedó a medias."""
+        for key, incoming in list(self._state.incoming_files.items()):
+            if (isinstance(incoming, ResumableFile) and incoming.sender == sender
+                    and incoming.filename == filename and incoming.path.parent == directory):
+                incoming.close()
+                del self._state.incoming_files[key]
+
+    def _reply_chunk(self, sender: str, tid: int, kind: int, body: bytes) -> None:
+        self._send(3, encode_chunk(sender, tid, kind, body))
+
+    def _end_resumable(self, key, incoming: ResumableFile) -> None:
+        """END de un envío reanudable: pide lo que falte o verifica y confirma con DONE."""
+        sender, tid = key
+        missing = incoming.missing()
+        if missing:
+            incoming.save()
+            self._reply_chunk(sender, tid, CHUNK_NEED, encode_ranges(missing))
+            return
+        # La verificación puede leer el archivo de disco: en otro hilo, para
+        # seguir recibiendo. El emisor espera DONE, así que no llega nada más de él.
+        del self._state.incoming_files[key]
+        threading.Thread(target=self._verify_resumable, args=(key, incoming), daemon=True).start()
+
+    def _verify_resumable(self, key, incoming: ResumableFile) -> None:
+        """Comprueba el SHA-256 completo y confirma con DONE o vuelve a pedir el archivo."""
+        sender, tid = key
+        try:
+            if incoming.verify():
+                dest_file = self._destination(incoming.filename)
+                incoming.finish(dest_file)
+                self._reply_chunk(sender, tid, CHUNK_DONE, bytes([DONE_OK]))
+                self._on_file_saved(sender, incoming.filename, dest_file)
+            elif incoming.failures < MAX_VERIFY_FAILURES:
+                # SHA-256 distinto: se vuelve a pedir el archivo entero
+                incoming.reset()
+                self._state.incoming_files[key] = incoming
+                self._reply_chunk(sender, tid, CHUNK_NEED, encode_ranges(incoming.missing()))
+            else:
+                incoming.discard()
+                self._reply_chunk(sender, tid, CHUNK_DONE, bytes([DONE_CORRUPT]))
+                self._buffer.add_event(f"[ERROR ARCHIVO] {incoming.filename} de {sender} no supera la verificación.")
+                self._on_file_counted(sender)
+        except Exception as e:
+            incoming.close()
+            self._buffer.add_event(f"[ERROR ARCHIVO] {e}")
+
+    def _directory(self) -> pathlib.Path:
+        """Carpeta de guardado: save_path si existe, si no descargas por defecto."""
+        if self._state.save_path:
+            down_path = pathlib.Path(self._state.save_path)
+        else:
+            down_path = pathlib.Path.home() / "Downloads" / self._state.name
+        down_path.mkdir(parents=True, exist_ok=True)
+        return down_path
+
+    def _destination(self, filename: str) -> pathlib.Path:
+        """Ruta libre donde guardar un archivo entrante."""
+        dest_file = self._directory() / pathlib.Path(filename).name
+
+        # Evitar sobreescribir si ya existe (añadir número)
+        count = 1
+        original_stem = dest_file.stem
+        while dest_file.exists():
+            dest_file = dest_file.with_name(f"{original_stem}_{count}{dest_file.suffix}")
+            count += 1
+        return dest_file
+
+    def _on_file_saved(self, sender: str, filename: str, dest_file: pathlib.Path) -> None:
+        """Registra un archivo completo y confirma el lote al terminar."""
+        self._buffer.add_event(f"[ARCHIVO] Recibido de {sender}: {filename} (Guardado en {dest_file})")
+        self._on_file_counted(sender)
+
+    def _on_file_counted(self, sender: str) -> None:
+        """Descuenta un archivo del lote (recibido o descartado) y lo confirma al terminar."""
+        with self._count_lock:
             # Si era parte de una solicitud pendiente, descontamos
-            if self._state.pending_file_request and self._state.pending_file_request['sender'] == sender:
-                self._state.pending_file_request['count'] -= 1
-                if self._state.pending_file_request['count'] <= 0:
+            request = self._state.pending_file_request
+            if request and request['sender'] == sender:
+                request['count'] -= 1
+                if request['count'] <= 0:
                     self._state.pending_file_request = None
                     self._state.save_path = None
                     self._buffer.add_event(f"[INFO] Transferencia de {sender} completada.")
                     # Notificamos al servidor para que avise al emisor
-                    self._sock.sendall(struct.pack("!BI", 1, len(f"FILES_RECEIVED:{sender}")) + f"FILES_RECEIVED:{sender}".encode("utf-8"))
-        except Exception as e:
-            self._buffer.add_event(f"[ERROR ARCHIVO] {e}")
+                    self._send_cmd("FILES_RECEIVED", sender)
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import threading
-from typing import Optional, Set, List
+from typing import Optional, Set, List, Dict, Tuple, Any
 
 class ChatState:
     """Estado compartido del cliente."""
@@ -12,11 +12,39 @@ class ChatState:
         self.pending_requests: List[str] = []
         self.open_sessions: Set[str] = set()
         self.current_target: Optional[str] = None
-        self.connected_users: List[str] = []
+        self.connected_users: Dict[str, None] = {}  # conjunto ordenado, se actualiza con los deltas
+        # Última presencia recibida; se conserva entre reconexiones para pedir solo el delta
+        self.presence_epoch: str = ""
+        self.presence_version: str = ""
+        self.rooms: Set[str] = set()  # salas en las que está el usuario
         self.name_confirmed = threading.Event()
         self.name_error: Optional[str] = None
+        self.protocol: int = 1  # versión de comandos confirmada por HELLO_OK
+        self.codecs: Tuple[str, ...] = ()  # códecs de compresión confirmados por HELLO_OK
         
         # Gestión de archivos
         self.file_queue: List[str] = []
         self.pending_file_request: Optional[dict] = None # {"sender": str, "count": int}
         self.save_path: Optional[str] = None
+        self.stream_files: bool = False  # el receptor aceptó el modo por fragmentos
+        self.resume_files: bool = False  # ... y el modo reanudable
+        self.incoming_files: Dict[Tuple[str, int], Any] = {}  # (emisor, transfer_id) -> IncomingFile / ResumableFile
+        # (receptor, transfer_id) -> cola de respuestas NEED/DONE de un envío reanudable
+        self.outgoing_files: Dict[Tuple[str, int], Any] = {}
+        self.last_transfer_id: int = 0
+
+    def reset_connection(self) -> None:
+        """
+        Olvida lo que solo vale para la conexión anterior (protocolo, chats,
+        salas, solicitudes) antes de reconectar. Se conservan el nombre, la
+        presencia (para pedir solo el delta) y los parciales reanudables.
+        """
+        self.pending_requests.clear()
+        self.open_sessions.clear()
+        self.current_target = None
+        self.rooms.clear()
+        self.protocol = 1
+        self.codecs = ()
+        self.file_queue.clear()
+        self.pending_file_request = None
+        self.stream_files = self.resume_files = False
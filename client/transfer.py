@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+transfer.py
+-----------
+Modo de transferencia por fragmentos (tramas Tipo 3).
+
+Un archivo viaja como una secuencia de tramas acotadas con un id de
+transferencia, de modo que ni el relay ni el receptor necesitan tenerlo
+completo en memoria:
+
+    DST_LEN (1) + DST + TRANSFER_ID (!I) + KIND (1) + CUERPO
+
+    KIND 0 (START): FILENAME_LEN (1) + FILENAME + SIZE (!Q)
+    KIND 1 (DATA):  bytes del archivo (como máximo CHUNK_SIZE)
+    KIND 2 (END):   vacío
+
+El servidor reemplaza DST por el nombre del emisor antes de reenviar.
+
+Modo reanudable (RESUME, negociado junto a STREAM): el archivo se divide en
+fragmentos numerados con su propio resumen y el receptor guarda el progreso
+junto al archivo parcial, así que tras un corte solo se piden los que faltan:
+
+    KIND 3 (START_RESUME): FILENAME_LEN (1) + FILENAME + SIZE (!Q) + SHA256 (32) + CHUNK_SIZE (!I)
+    KIND 4 (DATA_AT):      INDEX (!Q) + BLAKE2B (16) + bytes del fragmento
+    KIND 5 (NEED):         receptor -> emisor: COUNT (!I) + [FIRST (!Q) + END (!Q)]*
+    KIND 6 (DONE):         receptor -> emisor: STATUS (1), 0 = verificado,
+                           1 = SHA-256 distinto, 2 = rechazado (START_RESUME fuera de límites)
+
+El emisor envía START_RESUME y espera NEED con los rangos de fragmentos que
+faltan (todos si es nuevo), los envía como DATA_AT y cierra con END. Si aún
+falta alguno (p. ej. resumen erróneo) el receptor responde otro NEED; si no,
+comprueba el SHA-256 completo y responde DONE. El receptor rechaza con DONE
+un START_RESUME cuyo CHUNK_SIZE o número de fragmentos excede los límites
+(check_resume).
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+import struct
+from typing import BinaryIO, List, Optional, Tuple
+
+CHUNK_START = 0
+CHUNK_DATA  = 1
+CHUNK_END   = 2
+CHUNK_START_RESUME = 3
+CHUNK_DATA_AT      = 4
+CHUNK_NEED         = 5
+CHUNK_DONE         = 6
+
+CHUNK_SIZE = 64 * 1024
+
+# Marcas que emisor y receptor añaden al handshake REQ/ACCEPT_SEND_FILES
+STREAM_MODE = "STREAM"
+RESUME_MODE = "RESUME"
+
+CHUNK_DIGEST_SIZE = 16
+_INDEX = struct.Struct("!Q")
+_RANGE = struct.Struct("!QQ")
+# Rangos por NEED (el resto se pide en la siguiente ronda)
+MAX_NEED_RANGES = 4096
+# Fragmentos recibidos entre dos escrituras del archivo de progreso
+PROGRESS_EVERY = 64
+# Comprobaciones del SHA-256 completo fallidas antes de descartar el archivo
+MAX_VERIFY_FAILURES = 2
+# Estados de DONE
+DONE_OK       = 0
+DONE_CORRUPT  = 1
+DONE_REJECTED = 2
+# Límites de un START_RESUME recibido: el fragmento cabe en una trama Tipo 3
+# (FrameLimits.chunk) y el mapa de progreso ocupa un byte por fragmento
+MAX_RESUME_CHUNK_SIZE = 1024 * 1024 - 1024
+MAX_RESUME_CHUNKS = 1 << 24
+# Caracteres que no se copian del nombre del emisor al del archivo parcial
+_UNSAFE_NAME = re.compile(r"[^\w.-]")
+
+
+def chunk_prefix(dst: str, transfer_id: int, kind: int) -> bytes:
+    """Cabecera de fragmento (DST_LEN + DST + TRANSFER_ID + KIND), sin el cuerpo."""
+    dst_b = dst.encode("utf-8")
+    return bytes([len(dst_b)]) + dst_b + struct.pack("!IB", transfer_id, kind)
+
+
+def encode_chunk(dst: str, transfer_id: int, kind: int, body: bytes = b"") -> bytes:
+    """Construye el payload de una trama Tipo 3."""
+    return chunk_prefix(dst, transfer_id, kind) + body
+
+
+def encode_start(filename: str, size: int) -> bytes:
+    """Cuerpo de un fragmento START."""
+    name_b = filename.encode("utf-8")
+    return bytes([len(name_b)]) + name_b + struct.pack("!Q", size)
+
+
+class IncomingFile:
+    """Archivo en recepción: se escribe a disco fragmento a fragmento."""
+
+    def __init__(self, sender: str, filename: str, size: int, handle: BinaryIO, path) -> None:
+        self.sender = sender
+        self.filename = filename
+        self.size = size
+        self.received = 0
+        self.path = path
+        self._handle: Optional[BinaryIO] = handle
+
+    def write(self, data) -> None:
+        self._handle.write(data)
+        self.received += len(data)
+
+    def close(self) -> None:
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+
+
+def chunk_digest(data) -> bytes:
+    """Resumen de un fragmento (BLAKE2b de 16 bytes)."""
+    return hashlib.blake2b(data, digest_size=CHUNK_DIGEST_SIZE).digest()
+
+
+def file_digest(path, block: int = 1024 * 1024) -> bytes:
+    """SHA-256 de un archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while data := f.read(block):
+            digest.update(data)
+    return digest.digest()
+
+
+def encode_start_resume(filename: str, size: int, digest: bytes, chunk_size: int = CHUNK_SIZE) -> bytes:
+    """Cuerpo de un fragmento START_RESUME."""
+    return encode_start(filename, size) + digest + struct.pack("!I", chunk_size)
+
+
+def check_resume(size: int, chunk_size: int) -> None:
+    """Comprueba el tamaño y el de fragmento de un START_RESUME (ValueError si exceden los límites)."""
+    if not 0 < chunk_size <= MAX_RESUME_CHUNK_SIZE:
+        raise ValueError(f"Tamaño de fragmento no válido: {chunk_size}")
+    if -(-size // chunk_size) > MAX_RESUME_CHUNKS:
+        raise ValueError(f"Demasiados fragmentos: {size} bytes en fragmentos de {chunk_size}")
+
+
+def encode_ranges(ranges: List[Tuple[int, int]]) -> bytes:
+    """Cuerpo de NEED: rangos [first, end) de índices de fragmento."""
+    return struct.pack("!I", len(ranges)) + b"".join(_RANGE.pack(*r) for r in ranges)
+
+
+def decode_ranges(body) -> List[Tuple[int, int]]:
+    (count,) = struct.unpack_from("!I", body)
+    return [_RANGE.unpack_from(body, 4 + i * _RANGE.size) for i in range(count)]
+
+
+def safe_component(name: str) -> str:
+    """Reduce un nombre remoto a un único componente de ruta (sin separadores ni "..")."""
+    return _UNSAFE_NAME.sub("_", name).replace("..", "__") or "_"
+
+
+def encode_data_at(index: int, data) -> bytes:
+    """Cabecera de DATA_AT (índice + resumen); el fragmento va detrás."""
+    return _INDEX.pack(index) + chunk_digest(data)
+
+
+class ResumableFile:
+    """
+    Archivo reanudable en recepción.
+
+    Los datos se escriben en su posición en "<nombre>.<emisor>.part" (el
+    emisor pasado por safe_component: lo elige un usuario remoto) y el
+    progreso (fragmentos verificados, como rangos) en el archivo JSON de al
+    lado, cada PROGRESS_EVERY fragmentos y al cerrar. Un START_RESUME del
+    mismo emisor, nombre, tamaño y SHA-256 retoma ese progreso.
+
+    El SHA-256 se calcula mientras llegan los fragmentos en orden; verify()
+    solo lee de disco lo que no se pudo resumir así (p. ej. lo recibido antes
+    de reanudar).
+    """
+
+    def __init__(self, sender: str, filename: str, size: int, digest: bytes,
+                 chunk_size: int, directory: pathlib.Path) -> None:
+        self.sender = sender
+        self.filename = filename
+        self.size = size
+        self.digest = digest
+        self.chunk_size = chunk_size
+        self.chunks = -(-size // chunk_size)
+        self.path = directory / f"{pathlib.Path(filename).name}.{safe_component(sender)}.part"
+        self.progress_path = self.path.with_name(self.path.name + ".json")
+        self.failures = 0
+        self.corrupt = 0  # fragmentos con resumen erróneo
+        self._done = bytearray(self.chunks)
+        self._unsaved = 0
+        self._sha = hashlib.sha256()
+        self._hashed = 0  # fragmentos iniciales ya incluidos en _sha
+        self.resumed = self._load()
+        self._handle: Optional[BinaryIO] = open(self.path, "r+b" if self.resumed else "w+b")
+
+    @property
+    def received(self) -> int:
+        return sum(self._done)
+
+    def _load(self) -> bool:
+        """Recupera el progreso si el archivo parcial es de esta misma transferencia."""
+        try:
+            progress = json.loads(self.progress_path.read_text(encoding="utf-8"))
+            if (progress["sender"], progress["filename"], progress["size"],
+                    progress["sha256"], progress["chunk_size"]) != (
+                    self.sender, self.filename, self.size, self.digest.hex(), self.chunk_size):
+                return False
+            if not self.path.exists():
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        for first, end in progress["done"]:
+            self._done[first:end] = b"\x01" * (end - first)
+        return True
+
+    def missing(self, limit: int = MAX_NEED_RANGES) -> List[Tuple[int, int]]:
+        """Rangos [first, end) de fragmentos aún no recibidos (como mucho `limit`)."""
+        return _ranges(self._done, 0, limit)
+
+    def write_chunk(self, index: int, digest, data) -> bool:
+        """Escribe un fragmento si su resumen es correcto. False si no."""
+        if (index >= self.chunks or len(data) != min(self.chunk_size, self.size - index * self.chunk_size)
+                or chunk_digest(data) != bytes(digest)):
+            self.corrupt += 1
+            return False
+        self._handle.seek(index * self.chunk_size)
+        self._handle.write(data)
+        if index == self._hashed:
+            self._sha.update(data)
+            self._hashed += 1
+        if not self._done[index]:
+            self._done[index] = 1
+            self._unsaved += 1
+            if self._unsaved >= PROGRESS_EVERY:
+                self.save()
+        return True
+
+    def save(self) -> None:
+        """Guarda el progreso (reemplazo atómico); los datos se vuelcan antes."""
+        if self._handle is None:
+            return
+        self._handle.flush()
+        progress = {
+            "sender": self.sender, "filename": self.filename, "size": self.size,
+            "sha256": self.digest.hex(), "chunk_size": self.chunk_size,
+            "done": _ranges(self._done, 1),
+        }
+        tmp = self.progress_path.with_name(self.progress_path.name + ".tmp")
+        tmp.write_text(json.dumps(progress), encoding="utf-8")
+        os.replace(tmp, self.progress_path)
+        self._unsaved = 0
+
+    def verify(self, block: int = 1024 * 1024) -> bool:
+        """Comprueba el SHA-256 del archivo completo, leyendo solo lo aún no resumido."""
+        self._handle.flush()
+        self._handle.truncate(self.size)
+        digest = self._sha.copy()
+        with open(self.path, "rb") as f:
+            f.seek(self._hashed * self.chunk_size)
+            while data := f.read(block):
+                digest.update(data)
+        return digest.digest() == self.digest
+
+    def reset(self) -> None:
+        """Olvida todo lo recibido (tras fallar la verificación completa)."""
+        self.failures += 1
+        self._done = bytearray(self.chunks)
+        self._sha = hashlib.sha256()
+        self._hashed = 0
+        self.save()
+
+    def finish(self, dest_file: pathlib.Path) -> None:
+        """Mueve el archivo verificado a su destino y borra el progreso."""
+        self._handle.close()
+        self._handle = None
+        os.replace(self.path, dest_file)
+        self.progress_path.unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        self._handle.close()
+        self._handle = None
+        self.path.unlink(missing_ok=True)
+        self.progress_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Cierra conservando el progreso (conexión perdida)."""
+        if self._handle:
+            self.save()
+            self._handle.close()
+            self._handle = None
+
+
+def _ranges(flags: bytearray, value: int, limit: int = 0) -> List[Tuple[int, int]]:
+    """Rangos [first, end) de posiciones de `flags` iguales a `value`."""
+    ranges: List[Tuple[int, int]] = []
+    needle = bytes([value])
+    other = bytes([1 - value])
+    start = flags.find(needle)
+    while start != -1 and (not limit or len(ranges) < limit):
+        end = flags.find(other, start)
+        if end == -1:
+            end = len(flags)
+        ranges.append((start, end))
+        start = flags.find(needle, end)
+    return ranges
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+upload.py
+---------
+Envío de archivos en un hilo propio (FileUploader).
+
+Las subidas se encolan como lotes (rutas + destino + modos negociados) y un
+hilo dedicado las envía una detrás de otra, así ni la GUI ni el buffer de
+eventos esperan a que termine un archivo. Ningún archivo se lee entero:
+
+- Tipo 2 (una sola trama): la cabecera sale con sendmsg y el contenido con
+  socket.sendfile, directo del archivo al socket, por bloques de UPLOAD_BLOCK.
+- STREAM: cada fragmento de 64 KiB también va con sendfile; si se negoció
+  compresión se lee el fragmento para comprimirlo (memoria acotada igual).
+- RESUME: cada fragmento se lee para calcular su resumen (ver transfer.py).
+
+El progreso se publica como evento "UPLOAD_PROGRESS:<enviados>:<total>:<nombre>"
+(EVENT_PROGRESS: el EventBuffer fusiona los que la GUI aún no mostró) como mucho cada PROGRESS_INTERVAL segundos y al terminar cada archivo.
+"""
+
+import os
+import pathlib
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from common.framing import FileRegion, Payload
+from .buffer import EVENT_PROGRESS
+from .state import ChatState
+from .transfer import (
+    CHUNK_START, CHUNK_DATA, CHUNK_END, CHUNK_SIZE, CHUNK_START_RESUME, CHUNK_DATA_AT,
+    CHUNK_DONE, DONE_OK, DONE_REJECTED, chunk_prefix, decode_ranges, encode_chunk, encode_data_at, encode_start,
+    encode_start_resume, file_digest,
+)
+
+# Bytes por llamada a sendfile en las tramas Tipo 2 (entre dos avisos de progreso)
+UPLOAD_BLOCK = 4 * 1024 * 1024
+# Segundos mínimos entre dos eventos de progreso del mismo archivo
+PROGRESS_INTERVAL = 0.5
+# Segundos de espera por la respuesta del receptor (NEED / DONE) en un envío reanudable
+RESUME_TIMEOUT = 30.0
+
+
+class UploadRegion(FileRegion):
+    """FileRegion que se envía con sendfile por bloques y avisa de cada uno."""
+
+    __slots__ = ("_on_sent",)
+
+    def __init__(self, file, offset: int, length: int, on_sent: Callable[[int], None]) -> None:
+        super().__init__(file, offset, length)
+        self._on_sent = on_sent
+
+    def sendfile(self, sock) -> None:
+        for start in range(0, self.length, UPLOAD_BLOCK):
+            size = min(UPLOAD_BLOCK, self.length - start)
+            sock.sendfile(self.file, self.offset + start, size)
+            self._on_sent(size)
+
+
+class FileUploader:
+    """
+    Cola de subidas atendida por un hilo dedicado.
+
+    `send` es ChatClient._write: toma crédito y el cerrojo de envío del
+    cliente, así las tramas de la subida nunca se mezclan con las de otros
+    hilos (mensajes de la GUI, respuestas del receptor), y propaga los
+    errores de red para abandonar el archivo en curso. Las tramas que otros
+    hilos envían mientras tanto salen entre dos tramas de la subida (tras la
+    única trama de un Tipo 2), sin que esos hilos esperen.
+    """
+
+    def __init__(self, send: Callable[[int, Payload], None], add_event: Callable[..., None],
+                 state: ChatState) -> None:
+        self._send = send
+        self._add_event = add_event
+        self._state = state
+        self._jobs: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Any] = {"file": None, "sent": 0, "total": 0, "pending": 0}
+        self._last_report = 0.0
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, paths: List[str], target: str) -> None:
+        """Encola un lote con los modos que el receptor aceptó (se fijan ahora)."""
+        with self._lock:
+            self._progress["pending"] += len(paths)
+        self._jobs.put({"paths": list(paths), "target": target,
+                        "stream": self._state.stream_files, "resume": self._state.resume_files})
+
+    def progress(self) -> Dict[str, Any]:
+        """Archivo en curso, bytes enviados y totales, y archivos pendientes."""
+        with self._lock:
+            return dict(self._progress)
+
+    def stop(self) -> None:
+        self._jobs.put(None)
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            for path_str in job["paths"]:
+                path = pathlib.Path(path_str)
+                try:
+                    self._upload(path, job)
+                except Exception as e:
+                    self._add_event(f"[ERROR] Error al enviar {path.name}: {e}")
+                finally:
+                    with self._lock:
+                        self._progress["pending"] -= 1
+            self._add_event("[INFO] Envío de archivos completado.")
+
+    def _upload(self, path: pathlib.Path, job: Dict[str, Any]) -> None:
+        target = job["target"]
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._begin(path.name, size)
+            if job["resume"]:
+                self._send_resumable(path, FileRegion(f, 0, size), target)
+                return
+            self._add_event(f"[YO] Enviando {path.name}...")
+            if job["stream"]:
+                self._stream_file(path, FileRegion(f, 0, size), target)
+            else:
+                filename = path.name.encode("utf-8")
+                dst = target.encode("utf-8")
+                # Mensaje tipo 2: DST_LEN (1) + DST + FILENAME_LEN (1) + FILENAME + DATA
+                prefix = bytes([len(dst)]) + dst + bytes([len(filename)]) + filename
+                self._send(2, (prefix, UploadRegion(f, 0, size, self._sent)))
+        self._report(force=True)
+
+    def _stream_file(self, path: pathlib.Path, file: FileRegion, target: str) -> None:
+        """Envía un archivo como secuencia de tramas Tipo 3 de tamaño acotado."""
+        tid = self._next_transfer_id()
+        self._send(3, encode_chunk(target, tid, CHUNK_START, encode_start(path.name, len(file))))
+        # Con compresión el fragmento se lee (el códec necesita los bytes); sin ella, sendfile
+        read = bool(self._state.codecs)
+        for offset in range(0, len(file), CHUNK_SIZE):
+            length = min(CHUNK_SIZE, len(file) - offset)
+            body = file.read(offset, length) if read else file.region(offset, length)
+            self._send(3, (chunk_prefix(target, tid, CHUNK_DATA), body))
+            self._sent(length)
+        self._send(3, encode_chunk(target, tid, CHUNK_END))
+
+    def _send_resumable(self, path: pathlib.Path, file: FileRegion, target: str) -> None:
+        """
+        Envía un archivo en modo reanudable (ver transfer.py).
+
+        Tras START_RESUME el receptor responde con los fragmentos que le
+        faltan (todos si no tiene un parcial de este mismo archivo); se envían
+        solo esos y se repite tras cada END hasta que confirma con DONE.
+        """
+        tid = self._next_transfer_id()
+        size = len(file)
+        total = -(-size // CHUNK_SIZE)
+        replies: "queue.Queue" = queue.Queue()
+        self._state.outgoing_files[(target, tid)] = replies
+        try:
+            self._send(3, encode_chunk(target, tid, CHUNK_START_RESUME,
+                                       encode_start_resume(path.name, size, file_digest(path))))
+            first_round = True
+            while True:
+                try:
+                    kind, body = replies.get(timeout=RESUME_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError(f"{target} no responde") from None
+                if kind == CHUNK_DONE:
+                    if body[0] == DONE_REJECTED:
+                        raise ValueError(f"{target} rechazó el archivo (fuera de sus límites)")
+                    if body[0] != DONE_OK:
+                        raise ValueError(f"{target} descartó el archivo (SHA-256 distinto)")
+                    self._report(force=True)
+                    self._add_event(f"[YO] {path.name} enviado y verificado.")
+                    return
+                ranges = decode_ranges(body)
+                if first_round:
+                    pending = sum(end - first for first, end in ranges)
+                    if pending < total:
+                        self._add_event(f"[YO] Reanudando {path.name}: faltan {pending} de {total} fragmentos.")
+                        # El último fragmento puede ser corto: se descuenta su tamaño real
+                        missing = sum(min(end * CHUNK_SIZE, size) - first * CHUNK_SIZE for first, end in ranges)
+                        self._sent(max(0, size - missing))
+                    else:
+                        self._add_event(f"[YO] Enviando {path.name}...")
+                    first_round = False
+                for first, end in ranges:
+                    for index in range(first, end):
+                        data = file.read(index * CHUNK_SIZE, CHUNK_SIZE)
+                        self._send(3, (chunk_prefix(target, tid, CHUNK_DATA_AT),
+                                       encode_data_at(index, data), data))
+                        self._sent(len(data))
+                self._send(3, encode_chunk(target, tid, CHUNK_END))
+        finally:
+            self._state.outgoing_files.pop((target, tid), None)
+
+    def _next_transfer_id(self) -> int:
+        self._state.last_transfer_id += 1
+        return self._state.last_transfer_id
+
+    def _begin(self, name: str, size: int) -> None:
+        with self._lock:
+            self._progress.update(file=name, sent=0, total=size)
+        self._last_report = time.monotonic()
+
+    def _sent(self, size: int) -> None:
+        with self._lock:
+            self._progress["sent"] = min(self._progress["total"], self._progress["sent"] + size)
+        self._report()
+
+    def _report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        progress = self.progress()
+        self._add_event(f"UPLOAD_PROGRESS:{progress['sent']}:{progress['total']}:{progress['file']}", EVENT_PROGRESS)
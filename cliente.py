@@ -12,8 +12,13 @@ import sys
 import os
 import subprocess
 from client.gui_app import start_gui
+from common.sockopts import get_profile
 
 def main():
+    # Opciones TCP y agrupación de escrituras, como en servidor.py: "default",
+    # "latency", "throughput" o "system". El proceso hijo hereda la variable.
+    profile = get_profile(os.environ.get("SOCKET_PROFILE"))
+
     # Si ya se está ejecutando en el proceso hijo desvinculado
     if "--run-internal" in sys.argv:
         # Redirigir stderr a archivo para capturar errores del proceso silencioso
@@ -21,7 +26,7 @@ def main():
         sys.stderr = open(log_path, "a", encoding="utf-8", buffering=1)
         import traceback
         try:
-            start_gui()
+            start_gui(profile=profile)
         except Exception:
             traceback.print_exc()   # va al client_stderr.log
         return
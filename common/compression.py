@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+compression.py
+--------------
+Compresión por trama negociada al conectar.
+
+El cliente ofrece los códecs que admite en el saludo ("HELLO:2:zlib,lzma") y
+el servidor confirma los que también admite ("HELLO_OK:2:zlib"). Desde ahí
+cada extremo puede comprimir las tramas que envía; el códec usado se marca en
+los bits altos del byte de tipo:
+
+    0x80  zlib  (comandos y texto; también archivos si no hay lzma)
+    0x40  lzma  (archivos y fragmentos, tipos 2 y 3)
+    0x3F  máscara del tipo TLV real
+
+En las tramas enrutadas (tipos 2 y 3) el prefijo de enrutado no se comprime
+(DST, y en los fragmentos también TRANSFER_ID + KIND): el servidor lee el
+destino, cambia DST por el emisor y reenvía el cuerpo comprimido tal cual si
+el receptor negoció ese códec; si no, lo descomprime una vez para él.
+
+No se comprime (la trama viaja sin marca) cuando el payload es pequeño, cuando
+una muestra comprimida con zlib rápido apenas reduce (datos ya comprimidos:
+zip, jpeg, vídeo...) o cuando el resultado no compensa.
+
+Al recibir, una marca de un códec que no se negoció se rechaza
+(CodecNotNegotiated) y lo descomprimido nunca supera el límite de su tipo
+(FrameLimits): una trama pequeña no puede reservar más que una sin comprimir.
+"""
+
+import lzma
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .framing import SPOOL_BLOCK as BLOCK, FileRegion, FrameLimits
+
+FLAG_ZLIB  = 0x80
+FLAG_LZMA  = 0x40
+FLAGS_MASK = FLAG_ZLIB | FLAG_LZMA
+TYPE_MASK  = 0x3F
+
+CODEC_FLAGS: Dict[str, int] = {"zlib": FLAG_ZLIB, "lzma": FLAG_LZMA}
+FLAG_CODECS: Dict[int, str] = {flag: codec for codec, flag in CODEC_FLAGS.items()}
+CODECS = tuple(CODEC_FLAGS)
+
+# Tipos cuyo prefijo de enrutado viaja sin comprimir
+ROUTED_TYPES = (2, 3)
+# Tipos que el servidor comprime al enviar (los archivos los comprime el emisor)
+COMMAND_TYPES = (0, 1, 4)
+
+# Por debajo de este tamaño la cabecera del códec no compensa
+MIN_COMPRESS = 256
+# Muestra con la que se estima si los datos son compresibles
+PROBE_SIZE = 4096
+PROBE_RATIO = 0.9
+# Se envía sin comprimir si el resultado no baja de esta fracción del original
+MAX_RATIO = 0.95
+
+ZLIB_LEVEL = 6
+LZMA_PRESET = 1  # ~60 MB/s y bastante mejor ratio que zlib en texto
+
+# Tope de bytes descomprimidos por trama (protección frente a bombas)
+MAX_DECOMPRESSED = 512 * 1024 * 1024
+
+
+class CodecNotNegotiated(ValueError):
+    """La trama viene marcada con un códec que este extremo no negoció."""
+
+    def __init__(self, type_byte: int) -> None:
+        super().__init__(f"Trama tipo {type_byte & TYPE_MASK} comprimida con un códec "
+                         f"no negociado ({type_byte & FLAGS_MASK:#x})")
+        self.type_byte = type_byte
+
+
+def check_codec(type_byte: int, codecs: Sequence[str]) -> int:
+    """Marca de compresión de la trama; CodecNotNegotiated si su códec no está en `codecs`."""
+    flag = type_byte & FLAGS_MASK
+    if flag and FLAG_CODECS.get(flag) not in codecs:
+        raise CodecNotNegotiated(type_byte)
+    return flag
+
+
+def pick_codec(codecs: Sequence[str], msg_type: int) -> Optional[str]:
+    """Códec para una trama: lzma para archivos si se negoció, zlib para el resto."""
+    if msg_type in ROUTED_TYPES and "lzma" in codecs:
+        return "lzma"
+    if "zlib" in codecs:
+        return "zlib"
+    return "lzma" if "lzma" in codecs else None
+
+
+def routed_offset(msg_type: int, head) -> int:
+    """Bytes iniciales que no se comprimen (prefijo de enrutado)."""
+    if msg_type == 2:
+        return 1 + head[0]          # DST_LEN + DST
+    if msg_type == 3:
+        return 1 + head[0] + 5      # DST_LEN + DST + TRANSFER_ID + KIND
+    return 0
+
+
+def _compressor(codec: str):
+    if codec == "zlib":
+        return zlib.compressobj(ZLIB_LEVEL)
+    return lzma.LZMACompressor(preset=LZMA_PRESET, check=lzma.CHECK_NONE)
+
+
+def _looks_compressible(region: Sequence[memoryview]) -> bool:
+    sample = bytearray()
+    for part in region:
+        sample += part[:PROBE_SIZE - len(sample)]
+        if len(sample) >= PROBE_SIZE:
+            break
+    return len(zlib.compress(sample, 1)) < len(sample) * PROBE_RATIO
+
+
+def decompress(flag: int, data, limit: int = MAX_DECOMPRESSED) -> bytes:
+    """Descomprime un cuerpo marcado con `flag`. ValueError si está dañado o excede `limit`."""
+    if flag == FLAG_ZLIB:
+        decoder = zlib.decompressobj()
+        out = decoder.decompress(data, limit)
+        if decoder.unconsumed_tail or not decoder.eof:
+            raise ValueError("Trama zlib truncada o demasiado grande")
+        return out
+    if flag == FLAG_LZMA:
+        decoder = lzma.LZMADecompressor()
+        out = decoder.decompress(bytes(data), max_length=limit)
+        if not decoder.eof:
+            raise ValueError("Trama lzma truncada o demasiado grande")
+        return out
+    raise ValueError(f"Marca de compresión desconocida: {flag:#x}")
+
+
+def decompress_region(flag: int, region, limit: int = MAX_DECOMPRESSED) -> FileRegion:
+    """
+    Descomprime un cuerpo a un archivo temporal, por bloques acotados.
+
+    `region` es un FileRegion (cuerpo en disco) o un buffer en memoria.
+    """
+    if flag == FLAG_ZLIB:
+        decoder = zlib.decompressobj()
+        more = lambda: decoder.decompress(decoder.unconsumed_tail, BLOCK) if decoder.unconsumed_tail else None
+    elif flag == FLAG_LZMA:
+        decoder = lzma.LZMADecompressor()
+        more = lambda: None if decoder.needs_input or decoder.eof else decoder.decompress(b"", BLOCK)
+    else:
+        raise ValueError(f"Marca de compresión desconocida: {flag:#x}")
+    out = tempfile.TemporaryFile(prefix="frame_")
+    written = 0
+    try:
+        if isinstance(region, FileRegion):
+            blocks = region.blocks(BLOCK)
+        else:
+            view = memoryview(region)
+            blocks = (view[start:start + BLOCK] for start in range(0, len(view), BLOCK))
+        for block in blocks:
+            # Como mucho BLOCK bytes por paso: una bomba no se expande en memoria
+            data = decoder.decompress(block, BLOCK)
+            while data is not None:
+                written += len(data)
+                if written > limit:
+                    raise ValueError("Trama comprimida demasiado grande")
+                out.write(data)
+                data = more()
+        if not decoder.eof:
+            raise ValueError("Trama comprimida truncada")
+        out.flush()
+    except Exception:
+        out.close()
+        raise
+    return FileRegion(out, 0, written)
+
+
+class FrameCodec:
+    """
+    Comprime y descomprime tramas y acumula sus métricas. Seguro entre hilos.
+
+    Las métricas cuentan tramas comprimidas, omitidas, bytes antes y después
+    y tiempo de CPU (time.thread_time) por trama en cada sentido.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._skipped = 0
+        self._raw_bytes = 0
+        self._wire_bytes = 0
+        self._compress_cpu = 0.0
+        self._decompressed = 0
+        self._decompress_cpu = 0.0
+
+    def encode(self, msg_type: int, data, codecs: Sequence[str]) -> Tuple[int, object]:
+        """
+        Comprime el payload si compensa.
+
+        Returns:
+            (byte de tipo con la marca del códec, partes) o los argumentos
+            sin cambios si la trama viaja sin comprimir.
+        """
+        codec = pick_codec(codecs, msg_type)
+        if codec is None:
+            return msg_type, data
+        parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else tuple(data)
+        head = memoryview(parts[0])
+        offset = routed_offset(msg_type, head)
+        region = [head[offset:]] + [memoryview(part) for part in parts[1:]]
+        size = sum(len(part) for part in region)
+        if size < MIN_COMPRESS:
+            return msg_type, data
+
+        start = time.thread_time()
+        if not _looks_compressible(region):
+            self._record(size, size, time.thread_time() - start, skipped=True)
+            return msg_type, data
+        compressor = _compressor(codec)
+        out = b"".join([compressor.compress(part) for part in region] + [compressor.flush()])
+        cpu = time.thread_time() - start
+        if len(out) >= size * MAX_RATIO:
+            self._record(size, size, cpu, skipped=True)
+            return msg_type, data
+        self._record(size, len(out), cpu, skipped=False)
+        return msg_type | CODEC_FLAGS[codec], (head[:offset], out)
+
+    def decode(self, type_byte: int, payload, codecs: Sequence[str],
+               limits: Optional[FrameLimits] = None) -> Tuple[int, object]:
+        """
+        (tipo real, payload descomprimido) de una trama recibida.
+
+        CodecNotNegotiated si la marca no es de uno de `codecs`; ValueError
+        si lo descomprimido excede el límite de su tipo.
+        """
+        flag = check_codec(type_byte, codecs)
+        msg_type = type_byte & TYPE_MASK
+        if not flag:
+            return msg_type, payload
+        offset = routed_offset(msg_type, payload)
+        limit = (limits or FrameLimits()).limit(msg_type)
+        body = self.decompress(flag, memoryview(payload)[offset:], limit)
+        return msg_type, (bytes(payload[:offset]) + body if offset else body)
+
+    def decompress(self, flag: int, data, limit: int = MAX_DECOMPRESSED) -> bytes:
+        """decompress() con registro de métricas."""
+        start = time.thread_time()
+        out = decompress(flag, data, limit)
+        cpu = time.thread_time() - start
+        with self._lock:
+            self._decompressed += 1
+            self._decompress_cpu += cpu
+        return out
+
+    def decompress_region(self, flag: int, region, limit: int = MAX_DECOMPRESSED) -> FileRegion:
+        """decompress_region() con registro de métricas."""
+        start = time.thread_time()
+        out = decompress_region(flag, region, limit)
+        cpu = time.thread_time() - start
+        with self._lock:
+            self._decompressed += 1
+            self._decompress_cpu += cpu
+        return out
+
+    def _record(self, raw: int, wire: int, cpu: float, skipped: bool) -> None:
+        with self._lock:
+            if skipped:
+                self._skipped += 1
+            else:
+                self._frames += 1
+            self._raw_bytes += raw
+            self._wire_bytes += wire
+            self._compress_cpu += cpu
+
+    def stats(self) -> Dict[str, float]:
+        """Métricas acumuladas: ratio = bytes originales / bytes enviados."""
+        with self._lock:
+            attempts = self._frames + self._skipped
+            return {
+                "frames":             self._frames,
+                "skipped":            self._skipped,
+                "raw_bytes":          self._raw_bytes,
+                "wire_bytes":         self._wire_bytes,
+                "ratio":              self._raw_bytes / self._wire_bytes if self._wire_bytes else 1.0,
+                "compress_us":        self._compress_cpu / attempts * 1e6 if attempts else 0.0,
+                "decompressed":       self._decompressed,
+                "decompress_us":      (self._decompress_cpu / self._decompressed * 1e6
+                                       if self._decompressed else 0.0),
+            }
+
+
+def parse_codecs(value: str, allowed: Iterable[str] = CODECS) -> Tuple[str, ...]:
+    """Lista "zlib,lzma" filtrada por los códecs permitidos, en orden."""
+    allowed = tuple(allowed)
+    return tuple(codec for codec in value.split(",") if codec in allowed)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+framing.py
+----------
+Lectura y escritura de tramas TLV compartida por cliente y servidor.
+
+FrameReader lee la cabecera de 5 bytes (!BI) y el payload con recv_into
+directamente sobre buffers preasignados, sin concatenar bytes en cada recv.
+Los subcampos del payload (DST_LEN + DST, FILENAME_LEN + FILENAME, ...) se
+extraen como slices de memoryview, sin copias.
+
+En escritura, frame_parts() devuelve la cabecera y las partes del payload por
+separado y send_buffers() las envía con una única llamada scatter-gather
+(sendmsg), sin construir `header + data`.
+
+Tamaños: con FrameLimits el lector comprueba la longitud de la cabecera
+contra el máximo de su tipo antes de reservar nada (FrameTooLarge), y los
+payloads Tipo 2 mayores que `spool` se reciben en un archivo temporal en vez
+de en memoria. Se devuelven como FileRegion, una parte de trama respaldada
+por archivo que send_buffers() envía con sendfile.
+"""
+
+import os
+import socket
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+HEADER = struct.Struct("!BI")
+
+# Payload de una trama: un buffer o varias partes que se envían seguidas
+Payload = Union[bytes, bytearray, memoryview, Sequence[bytes]]
+
+# Límite de buffers por llamada a sendmsg (IOV_MAX en Linux)
+IOV_MAX = 1024
+
+# Sin sendmsg (Windows) se agrupan las partes pequeñas en un único sendall
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+JOIN_LIMIT = 64 * 1024
+
+# Tamaño máximo del buffer compartido que se conserva entre tramas; las tramas
+# mayores usan un buffer propio que se libera al terminar de procesarlas.
+MAX_RETAINED = 1024 * 1024
+
+# Bloque de lectura al recibir un payload en archivo temporal o copiarlo
+SPOOL_BLOCK = 256 * 1024
+# Lecturas posicionales (sin pread, p. ej. Windows: seek + read)
+HAS_PREAD = hasattr(os, "pread")
+
+# Máscara del tipo TLV real (los bits altos marcan el códec, ver compression.py)
+_TYPE_MASK = 0x3F
+
+
+@dataclass(frozen=True)
+class FrameLimits:
+    """
+    Tamaño máximo de payload por tipo de trama y umbral de volcado a disco.
+
+    El máximo vale para los bytes en el cable y también para el payload ya
+    descomprimido (ver compression.py).
+    """
+    command: int = 64 * 1024            # tipos 0, 1, 4 y desconocidos
+    file: int = 1024 * 1024 * 1024      # tipo 2 (archivo completo)
+    chunk: int = 1024 * 1024            # tipo 3 (fragmento de 64 KiB + prefijo)
+    spool: int = 8 * 1024 * 1024        # tipo 2 mayor que esto: a archivo temporal
+
+    def limit(self, msg_type: int) -> int:
+        msg_type &= _TYPE_MASK
+        if msg_type == 2:
+            return self.file
+        if msg_type == 3:
+            return self.chunk
+        return self.command
+
+
+class FrameTooLarge(ValueError):
+    """La cabecera anuncia un payload mayor que el límite de su tipo."""
+
+    def __init__(self, msg_type: int, length: int, limit: int) -> None:
+        super().__init__(f"Trama tipo {msg_type & _TYPE_MASK} de {length} bytes (máximo {limit})")
+        self.msg_type = msg_type
+        self.length = length
+        self.limit = limit
+
+
+class FileRegion:
+    """
+    Parte de una trama respaldada por archivo: `length` bytes desde `offset`.
+
+    Se encola como cualquier otra parte (len() da su tamaño en el cable) y
+    send_buffers() la envía con socket.sendfile, sin pasar por memoria. Las
+    lecturas son posicionales, así que varias regiones pueden compartir archivo.
+    El archivo temporal se borra al cerrarse (al soltarse la última referencia).
+    """
+
+    __slots__ = ("file", "offset", "length")
+
+    def __init__(self, file: BinaryIO, offset: int, length: int) -> None:
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, start: int, size: int) -> bytes:
+        """Hasta `size` bytes desde `start` (relativo a la región)."""
+        size = max(0, min(size, self.length - start))
+        if not size:
+            return b""
+        if HAS_PREAD:
+            return os.pread(self.file.fileno(), size, self.offset + start)
+        self.file.seek(self.offset + start)
+        return self.file.read(size)
+
+    def region(self, start: int, length: Optional[int] = None) -> "FileRegion":
+        """Subregión desde `start` (relativo), sin copiar."""
+        length = self.length - start if length is None else length
+        return FileRegion(self.file, self.offset + start, length)
+
+    def blocks(self, size: int = SPOOL_BLOCK) -> Iterator[bytes]:
+        """Contenido en bloques de `size` bytes."""
+        for start in range(0, self.length, size):
+            yield self.read(start, size)
+
+    def sendfile(self, sock: socket.socket) -> None:
+        sock.sendfile(self.file, self.offset, self.length)
+
+
+class FrameReader:
+    """
+    Lector de tramas TLV con buffers reutilizables.
+
+    read_frame(reuse=True) devuelve un memoryview sobre el buffer compartido:
+    solo es válido hasta la siguiente lectura, pensado para consumidores que
+    procesan la trama en el acto (p. ej. MessageReceiver). Con reuse=False
+    cada trama recibe su propio buffer, apto para encolarla.
+    """
+
+    def __init__(self, sock: socket.socket, initial_size: int = 64 * 1024,
+                 limits: Optional[FrameLimits] = None) -> None:
+        self._sock = sock
+        self._header = bytearray(HEADER.size)
+        self._header_view = memoryview(self._header)
+        self._buffer = bytearray(initial_size)
+        self._limits = limits  # sin límites (p. ej. en el cliente) se confía en la cabecera
+
+    def recv_exactly(self, view: memoryview) -> bool:
+        """Llena `view` por completo desde el socket. False si la conexión se cierra."""
+        n = len(view)
+        if not n:
+            return True
+        got = self._sock.recv_into(view)  # caso habitual: llega completo en un recv
+        if not got:
+            return False
+        while got < n:
+            received = self._sock.recv_into(view[got:])
+            if not received:
+                return False
+            got += received
+        return True
+
+    def read_header(self) -> Optional[Tuple[int, int]]:
+        """Lee la cabecera (tipo, longitud) de la siguiente trama."""
+        if not self.recv_exactly(self._header_view):
+            return None
+        return HEADER.unpack(self._header)
+
+    def read_payload(self, length: int, reuse: bool = True) -> Optional[memoryview]:
+        """Lee `length` bytes de payload en un buffer preasignado."""
+        if reuse and length <= MAX_RETAINED:
+            if length > len(self._buffer):
+                self._buffer = bytearray(max(length, 2 * len(self._buffer)))
+            view = memoryview(self._buffer)[:length]
+        else:
+            view = memoryview(bytearray(length))
+        if not self.recv_exactly(view):
+            return None
+        return view
+
+    def read_spooled(self, length: int) -> Optional[FileRegion]:
+        """Lee `length` bytes de payload a un archivo temporal, por bloques."""
+        spool = tempfile.TemporaryFile(prefix="frame_")
+        block = memoryview(bytearray(min(length, SPOOL_BLOCK)))
+        remaining = length
+        while remaining:
+            view = block[:min(remaining, len(block))]
+            if not self.recv_exactly(view):
+                spool.close()
+                return None
+            spool.write(view)
+            remaining -= len(view)
+        spool.flush()
+        return FileRegion(spool, 0, length)
+
+    def read_frame(self, reuse: bool = True) -> Optional[Tuple[int, Union[memoryview, FileRegion]]]:
+        """
+        Recibe una trama TLV completa como (tipo, memoryview del payload).
+
+        Con límites, FrameTooLarge si la cabecera excede el de su tipo, y los
+        Tipo 2 mayores que `spool` llegan como FileRegion.
+        """
+        header = self.read_header()
+        if header is None:
+            return None
+        msg_type, length = header
+        limits = self._limits
+        if limits is not None:
+            if length > limits.limit(msg_type):
+                raise FrameTooLarge(msg_type, length, limits.limit(msg_type))
+            if length > limits.spool and msg_type & _TYPE_MASK == 2:
+                spooled = self.read_spooled(length)
+                return None if spooled is None else (msg_type, spooled)
+        payload = self.read_payload(length, reuse)
+        if payload is None:
+            return None
+        return msg_type, payload
+
+
+def split_field(view: Union[memoryview, FileRegion], offset: int = 0) -> Tuple[memoryview, int]:
+    """
+    Extrae un campo prefijado por su longitud en 1 byte (LEN + VALOR).
+
+    En un payload en disco (FileRegion) se leen solo los bytes del campo.
+
+    Returns:
+        (slice del valor sin copiar, offset del siguiente campo)
+    """
+    if isinstance(view, FileRegion):
+        field = memoryview(view.read(offset, 256))
+        return field[1:1 + field[0]], offset + 1 + field[0]
+    length = view[offset]
+    start = offset + 1
+    return view[start:start + length], start + length
+
+
+def frame_parts(msg_type: int, data: Payload) -> Tuple[bytes, ...]:
+    """Cabecera y partes del payload de una trama, sin concatenarlas."""
+    parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else tuple(data)
+    return (HEADER.pack(msg_type, sum(len(part) for part in parts)),) + parts
+
+
+def send_buffers(sock: socket.socket, buffers: Iterable[bytes]) -> None:
+    """
+    Envía varios buffers seguidos como una sola escritura (sendmsg).
+
+    Reintenta con el resto tras un envío parcial. Sin sendmsg, las partes
+    pequeñas se unen en un único sendall y las grandes se envían aparte.
+    """
+    views: List[memoryview] = []
+    for buffer in buffers:
+        if isinstance(buffer, FileRegion):
+            # Lo anterior sale primero; la región va directa del archivo al socket
+            _send_views(sock, views)
+            views = []
+            buffer.sendfile(sock)
+        elif len(buffer):
+            views.append(memoryview(buffer).cast("B"))
+    _send_views(sock, views)
+
+
+def _send_views(sock: socket.socket, views: List[memoryview]) -> None:
+    if not views:
+        return
+    if not HAS_SENDMSG:
+        _send_joined(sock, views)
+        return
+    first = 0
+    while first < len(views):
+        sent = sock.sendmsg(views[first:first + IOV_MAX])
+        while sent:
+            size = len(views[first])
+            if sent >= size:
+                sent -= size
+                first += 1
+            else:
+                views[first] = views[first][sent:]
+                sent = 0
+
+
+def _send_joined(sock: socket.socket, views: List[memoryview]) -> None:
+    pending: List[memoryview] = []
+    pending_bytes = 0
+    for view in views:
+        if len(view) >= JOIN_LIMIT:
+            if pending:
+                sock.sendall(b"".join(pending))
+                pending, pending_bytes = [], 0
+            sock.sendall(view)
+            continue
+        pending.append(view)
+        pending_bytes += len(view)
+        if pending_bytes >= JOIN_LIMIT:
+            sock.sendall(b"".join(pending))
+            pending, pending_bytes = [], 0
+    if pending:
+        sock.sendall(b"".join(pending))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+protocol.py
+-----------
+Codificación de comandos de control en sus dos formatos de cable.
+
+v1 (texto, tramas Tipo 0/1):  "COMANDO:arg1:arg2" en UTF-8.
+v2 (binario, tramas Tipo 4):  OPCODE (1 byte) + campos [LEN (!H) + UTF-8]*
+
+El cliente propone v2 con el comando de texto "HELLO:2"; el servidor responde
+"HELLO_OK:2" en texto y a partir de ahí ambos extremos usan tramas Tipo 4 con
+esa sesión. Los clientes que no envían HELLO siguen usando v1 sin cambios.
+Como los campos v2 van prefijados por su longitud, pueden contener ':' o ','.
+"""
+
+import struct
+from typing import Dict, List, Optional, Tuple
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+
+# Tipo TLV de los comandos binarios v2
+BINARY_COMMAND = 4
+
+OPCODES: Dict[str, int] = {
+    # Cliente -> servidor
+    "SET_NAME":                1,
+    "GET_USERS":               2,
+    "REQ_CHAT":                3,
+    "ACCEPT_CHAT":             4,
+    "DENY_CHAT":               5,
+    "STOP_CHAT":               6,
+    "CHAT":                    7,
+    "REQ_SEND_FILES":          8,
+    "ACCEPT_SEND_FILES":       9,
+    "DENY_SEND_FILES":        10,
+    "FILES_RECEIVED":         11,
+    "ROOM_CREATE":            12,
+    "ROOM_JOIN":              13,
+    "ROOM_LEAVE":             14,
+    "ROOM_POST":              15,
+    "SUB_PRESENCE":           16,
+    "WINDOW":                 17,
+    # Servidor -> cliente
+    "NAME_OK":                64,
+    "NAME_TAKEN":             65,
+    "LIST_USERS":             66,
+    "REQ_CHAT_FROM":          67,
+    "CHAT_ACCEPTED":          68,
+    "CHAT_DENIED":            69,
+    "CHAT_STOPPED":           70,
+    "FROM":                   71,
+    "ERROR":                  72,
+    "REQ_SEND_FILES_FROM":    73,
+    "ACCEPT_SEND_FILES_FROM": 74,
+    "DENY_SEND_FILES_FROM":   75,
+    "FILES_RECEIVED_FROM":    76,
+    "ROOM_CREATED":           77,
+    "ROOM_JOINED":            78,
+    "ROOM_LEFT":              79,
+    "ROOM_FROM":              80,
+    "PRESENCE_SNAPSHOT":      81,
+    "PRESENCE_DELTA":         82,
+    "CREDIT":                 83,
+}
+COMMAND_NAMES: Dict[int, str] = {code: name for name, code in OPCODES.items()}
+
+# Comandos v1 que se envían sin ':' cuando no llevan argumentos
+_BARE_TEXT = {"NAME_OK", "NAME_TAKEN", "GET_USERS", "WINDOW"}
+# Comandos v1 cuyos argumentos van separados por ',' en vez de ':'
+CSV_COMMANDS = {"LIST_USERS", "PRESENCE_SNAPSHOT", "PRESENCE_DELTA"}
+# Comandos v1 que viajan como mensaje de texto (Tipo 0) en vez de comando (Tipo 1)
+_TEXT_MESSAGES = {"CHAT", "FROM", "ROOM_POST", "ROOM_FROM"}
+
+_FIELD_LEN = struct.Struct("!H")
+
+
+# ---------------------------------------------------------------------------
+# v2 binario
+# ---------------------------------------------------------------------------
+
+def encode_binary(opcode: int, *fields: str) -> bytes:
+    """Codifica un comando v2: OPCODE + campos prefijados por longitud."""
+    parts = [bytes((opcode,))]
+    for field in fields:
+        data = field.encode("utf-8")
+        parts.append(_FIELD_LEN.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_binary(payload) -> Tuple[int, List[str]]:
+    """
+    Decodifica un comando v2 en (opcode, campos).
+
+    ValueError si falta el opcode, una longitud o parte de un campo, o si un
+    campo no es UTF-8 válido.
+    """
+    # Los comandos son cortos: una copia a bytes y cortes directos salen más
+    # baratos que struct.unpack_from y str() sobre vistas por cada campo.
+    data = bytes(payload)
+    if not data:
+        raise ValueError("Comando binario vacío")
+    fields = []
+    offset, end = 1, len(data)
+    while offset < end:
+        if offset + 2 > end:
+            raise ValueError("Longitud de campo incompleta")
+        length = (data[offset] << 8) | data[offset + 1]
+        offset += 2
+        if offset + length > end:
+            raise ValueError("Campo truncado")
+        fields.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return data[0], fields
+
+
+def opcode_table(commands: Dict[str, tuple]) -> Dict[int, str]:
+    """Deriva opcode -> manejador de una tabla nombre -> (manejador, ...)."""
+    return {OPCODES[name]: entry[0] for name, entry in commands.items() if name in OPCODES}
+
+
+# ---------------------------------------------------------------------------
+# v1 texto
+# ---------------------------------------------------------------------------
+
+def encode_text(name: str, *fields: str) -> bytes:
+    """Codifica un comando v1 ("NOMBRE:arg1:arg2")."""
+    if not fields and name in _BARE_TEXT:
+        return name.encode("utf-8")
+    separator = "," if name in CSV_COMMANDS else ":"
+    return f"{name}:{separator.join(fields)}".encode("utf-8")
+
+
+def split_args(rest: str, maxsplit: Optional[int], separator: str = ":") -> List[str]:
+    """
+    Separa los argumentos v1 que siguen a "NOMBRE:".
+
+    maxsplit None: sin argumentos; 0: todo el resto es un único argumento;
+    n > 0 o -1: equivalente a rest.split(separator, n).
+    """
+    if maxsplit is None:
+        return []
+    if maxsplit == 0:
+        return [rest]
+    return rest.split(separator, maxsplit)
+
+
+# ---------------------------------------------------------------------------
+# Selección de formato por versión negociada
+# ---------------------------------------------------------------------------
+
+def frame_command(protocol: int, name: str, *fields: str) -> Tuple[int, bytes]:
+    """(tipo TLV, payload) de un comando en la versión de protocolo indicada."""
+    if protocol == PROTOCOL_V2:
+        return BINARY_COMMAND, encode_binary(OPCODES[name], *fields)
+    return (0 if name in _TEXT_MESSAGES else 1), encode_text(name, *fields)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sockopts.py
+-----------
+Perfiles de opciones de socket compartidos por cliente y servidor.
+
+Un SocketProfile agrupa las opciones TCP que se aplican a cada conexión y los
+parámetros de agrupación de escrituras del escritor de la sesión:
+
+    nodelay          TCP_NODELAY: desactiva Nagle. La agrupación se hace en
+                     espacio de usuario (coalesce_*), sin esperar ACKs.
+    sndbuf / rcvbuf  SO_SNDBUF / SO_RCVBUF en bytes (0: valor del sistema).
+    keepalive        SO_KEEPALIVE, con TCP_KEEPIDLE/INTVL/CNT donde existan.
+    coalesce_bytes   tope de bytes por escritura al agrupar tramas (0: una
+                     trama por escritura).
+    coalesce_window  segundos que el escritor espera a más tramas antes de
+                     escribir un lote pequeño (0: solo las ya encoladas).
+
+Perfiles predefinidos (SOCKET_PROFILES), seleccionables con SOCKET_PROFILE:
+
+    "default"     Sin Nagle, keepalive y agrupación de lo ya encolado.
+    "latency"     Sin Nagle y sin agrupación: cada trama sale en el acto.
+    "throughput"  Buffers de 4 MiB y ventana de agrupación de 1 ms.
+    "system"      Opciones del sistema operativo sin tocar (Nagle activo).
+"""
+
+import socket
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class SocketProfile:
+    """Opciones de socket y de agrupación de escrituras de una conexión."""
+    nodelay: bool = True
+    sndbuf: int = 0
+    rcvbuf: int = 0
+    keepalive: bool = True
+    keepidle: int = 60
+    keepintvl: int = 10
+    keepcnt: int = 5
+    coalesce_bytes: int = 256 * 1024
+    coalesce_window: float = 0.0
+
+    def apply(self, sock: socket.socket) -> None:
+        """Aplica las opciones al socket (las no soportadas se ignoran)."""
+        if self.nodelay:
+            _setopt(sock, socket.IPPROTO_TCP, "TCP_NODELAY", 1)
+        if self.sndbuf:
+            _setopt(sock, socket.SOL_SOCKET, "SO_SNDBUF", self.sndbuf)
+        if self.rcvbuf:
+            _setopt(sock, socket.SOL_SOCKET, "SO_RCVBUF", self.rcvbuf)
+        if self.keepalive:
+            _setopt(sock, socket.SOL_SOCKET, "SO_KEEPALIVE", 1)
+            _setopt(sock, socket.IPPROTO_TCP, "TCP_KEEPIDLE", self.keepidle)
+            _setopt(sock, socket.IPPROTO_TCP, "TCP_KEEPINTVL", self.keepintvl)
+            _setopt(sock, socket.IPPROTO_TCP, "TCP_KEEPCNT", self.keepcnt)
+
+
+def _setopt(sock, level: int, name: str, value: int) -> None:
+    option = getattr(socket, name, None)
+    if option is None:  # p. ej. TCP_KEEPIDLE no existe en todas las plataformas
+        return
+    try:
+        sock.setsockopt(level, option, value)
+    except OSError:
+        pass
+
+
+SOCKET_PROFILES: Dict[str, SocketProfile] = {
+    "default":    SocketProfile(),
+    "latency":    SocketProfile(coalesce_bytes=0),
+    "throughput": SocketProfile(sndbuf=4 * 1024 * 1024, rcvbuf=4 * 1024 * 1024,
+                                coalesce_bytes=1024 * 1024, coalesce_window=0.001),
+    "system":     SocketProfile(nodelay=False, keepalive=False, coalesce_bytes=0),
+}
+
+
+def get_profile(name: Optional[str]) -> SocketProfile:
+    """Perfil predefinido por nombre (None: "default")."""
+    try:
+        return SOCKET_PROFILES[name or "default"]
+    except KeyError:
+        raise ValueError(
+            f"Perfil de socket desconocido: {name!r} (usa {', '.join(SOCKET_PROFILES)})"
+        ) from None
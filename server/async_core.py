@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+async_core.py
+-------------
+Motor de conexiones basado en asyncio para ChatServer.
+
+En lugar de un hilo por socket, un único bucle de eventos atiende todas las
+conexiones con sockets no bloqueantes. Las tramas leídas se entregan al mismo
+RequestBuffer y se despachan con ProtocolHandlers.dispatch, por lo que la
+semántica del protocolo y los eventos emitidos son idénticos al modo con hilos.
+
+Nada que pueda esperar corre en el bucle ni en el executor por defecto:
+
+- El reenvío de fragmentos (que espera sitio en la cola de un receptor
+  lento) va a un pool propio de FlowConfig.relay_threads hilos.
+- Con una partición del RequestBuffer llena, el lector espera un
+  asyncio.Event de esa partición (RequestBuffer.on_space), sin ocupar hilos.
+- La escritura de los archivos volcados a disco va a un pool de
+  SPOOL_THREADS hilos.
+- La baja de una sesión (_disconnect, que con un router de clúster o de
+  federación avisa a otros nodos) corre en el pool de reenvío.
+- Tras rechazar una trama, reject() espera a que la corrutina escritora
+  vacíe la cola (un asyncio.Event), no a OutboundQueue.wait_empty.
+"""
+
+import asyncio
+import functools
+import random
+import tempfile
+import time
+import traceback
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from common.framing import (
+    HEADER, SPOOL_BLOCK, FileRegion, FrameLimits, FrameTooLarge, Payload, frame_parts,
+)
+from common.compression import COMMAND_TYPES, TYPE_MASK, CodecNotNegotiated, FrameCodec, check_codec
+from common.protocol import PROTOCOL_V1, frame_command
+from common.sockopts import SocketProfile
+from .core import ChatServer, FILE_CHUNK
+from .outbox import OutboundQueue, OutboxConfig
+from .session import REJECT_LINGER
+from .flow import FlowConfig, InboundQuota
+from .events import (
+    ServerStarted, ServerStopped, FatalError,
+    ClientHandshakeStarted, ClientError,
+)
+
+# Hilos que crean y escriben los temporales de los archivos grandes
+SPOOL_THREADS = 4
+
+
+class AsyncClientSession:
+    """
+    Sesión de cliente sobre los streams de asyncio.
+
+    Expone la misma interfaz que ClientSession (send, send_command, send_frame, close,
+    queue_stats, name, address, protocol, codecs, closed). send() puede llamarse
+    desde cualquier hilo: encola la trama en la cola de salida acotada y una
+    corrutina escritora la vacía respetando la contrapresión del transporte
+    (drain).
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 loop: asyncio.AbstractEventLoop, address: Tuple[str, int], name: str,
+                 outbox: Optional[OutboxConfig] = None,
+                 profile: Optional[SocketProfile] = None,
+                 frame_codec: Optional[FrameCodec] = None,
+                 metrics: Optional[Any] = None,
+                 flow: Optional[FlowConfig] = None,
+                 limits: Optional[FrameLimits] = None,
+                 spool_executor: Optional[Executor] = None) -> None:
+        self._reader = reader
+        self._limits = limits or FrameLimits()
+        self._spool_executor = spool_executor  # E/S de disco fuera del bucle (None: el por defecto)
+        self._writer = writer
+        self._profile = profile or SocketProfile()
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            self._profile.apply(sock)
+        self._loop = loop
+        self.address = address
+        self.name = name
+        self.closed = False
+        self.protocol = PROTOCOL_V1  # versión negociada con HELLO
+        self.codecs: Tuple[str, ...] = ()  # códecs de compresión negociados con HELLO
+        self._frame_codec = frame_codec or FrameCodec()
+        self._metrics = metrics  # server.metrics.Metrics: tramas y bytes por tipo
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()  # el escritor vació la cola en memoria (ver reject)
+        self._outbox = OutboundQueue(outbox or OutboxConfig(),
+                                     on_ready=self._notify_writer, on_overflow=self._abort)
+        # Cupo de entrada; quien despacha (otro hilo) despierta al lector en espera
+        self._quota_ready = asyncio.Event()
+        self.inbound = InboundQuota(flow or FlowConfig(), metrics, on_credit=self._grant_credit,
+                                    on_release=self._notify_quota)
+
+    def send(self, msg_type: int, data: Payload, block: bool = False,
+             control: bool = False) -> bool:
+        """Encola un mensaje en formato TLV (!BI). Nunca llamar con block=True desde el bucle."""
+        if self.codecs and msg_type in COMMAND_TYPES:
+            msg_type, data = self._frame_codec.encode(msg_type, data, self.codecs)
+        frame = frame_parts(msg_type, data)
+        if self._metrics is not None:
+            self._metrics.frame_out(frame)
+        return self._outbox.put(frame, block, control)
+
+    def send_command(self, name: str, *fields: str, control: bool = False) -> bool:
+        """Envía un comando de control en el formato negociado por la sesión (v1 o v2)."""
+        return self.send(*frame_command(self.protocol, name, *fields), control=control)
+
+    def send_frame(self, frame: Sequence[bytes], block: bool = False,
+                   control: bool = False) -> bool:
+        """Encola una trama ya codificada (cabecera + partes), p. ej. la misma para todos los miembros de una sala."""
+        if self._metrics is not None:
+            self._metrics.frame_out(frame)
+        return self._outbox.put(frame, block, control)
+
+    def _grant_credit(self, credits: int) -> None:
+        self.send_command("CREDIT", str(credits), control=True)
+
+    def _notify_quota(self) -> None:
+        self._loop.call_soon_threadsafe(self._quota_ready.set)
+
+    async def acquire_inbound(self, size: int) -> None:
+        """Reserva cupo para una trama; mientras no haya, no se lee del socket."""
+        if self.inbound.acquire(size, block=False):
+            return
+        start = time.perf_counter()
+        while True:
+            self._quota_ready.clear()
+            if self.inbound.acquire(size, block=False):
+                break
+            await self._quota_ready.wait()
+        self.inbound.stalled(time.perf_counter() - start)
+
+    def _notify_writer(self) -> None:
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def _abort(self) -> None:
+        self._loop.call_soon_threadsafe(self._writer.transport.abort)
+
+    async def write_loop(self) -> None:
+        """Corrutina escritora: vacía la cola de salida sobre el transporte."""
+        # Sin ventana de agrupación: esperar en take_batch bloquearía el bucle.
+        # Se agrupa lo ya encolado y writelines lo entrega al transporte sin concatenar.
+        max_bytes = self._profile.coalesce_bytes
+        try:
+            while not self._outbox.closed:
+                await self._ready.wait()
+                self._ready.clear()
+                while (batch := self._outbox.take_batch(0, max_bytes)) is not None:
+                    await self._write_batch(batch)
+                self._drained.set()
+        except (ConnectionError, OSError):
+            self._abort()
+        finally:
+            self._drained.set()
+
+    async def _write_batch(self, batch) -> None:
+        """Escribe un lote; las regiones de archivo van con sendfile tras vaciar lo anterior."""
+        start = 0
+        for i, part in enumerate(batch):
+            if isinstance(part, FileRegion):
+                self._writer.writelines(batch[start:i])
+                await self._writer.drain()
+                await self._loop.sendfile(self._writer.transport, part.file, part.offset, part.length)
+                start = i + 1
+        self._writer.writelines(batch[start:])
+        await self._writer.drain()
+
+    def queue_stats(self) -> Dict[str, int]:
+        """Métricas de la cola de salida y del cupo de entrada de esta sesión."""
+        stats = self._outbox.stats()
+        inbound = self.inbound.stats()
+        stats["inbound_frames"] = inbound["frames"]
+        stats["inbound_stalls"] = inbound["stalls"]
+        return stats
+
+    async def recv_tlv(self) -> Optional[Tuple[int, Union[bytes, FileRegion]]]:
+        """
+        Recibe un mensaje TLV completo.
+
+        Igual que ClientSession: FrameTooLarge si la cabecera excede el límite
+        de su tipo y los archivos mayores que FrameLimits.spool, a disco.
+        """
+        try:
+            header = await self._reader.readexactly(HEADER.size)
+            msg_type, length = HEADER.unpack(header)
+            limit = self._limits.limit(msg_type)
+            if length > limit:
+                raise FrameTooLarge(msg_type, length, limit)
+            if length > self._limits.spool and msg_type & TYPE_MASK == 2:
+                payload = await self._read_spooled(length)
+            else:
+                payload = await self._reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return None
+        if self._metrics is not None:
+            self._metrics.frame_in(msg_type, length)
+        return msg_type, payload
+
+    async def _read_spooled(self, length: int) -> FileRegion:
+        run = functools.partial(self._loop.run_in_executor, self._spool_executor)
+        spool = await run(functools.partial(tempfile.TemporaryFile, prefix="frame_"))
+        try:
+            remaining = length
+            while remaining:
+                data = await self._reader.readexactly(min(remaining, SPOOL_BLOCK))
+                await run(spool.write, data)
+                remaining -= len(data)
+            await run(spool.flush)
+        except BaseException:
+            spool.close()
+            raise
+        return FileRegion(spool, 0, length)
+
+    async def reject(self, message: str) -> None:
+        """Envía ERROR y cierra con gracia tras una trama rechazada (ver ClientSession.reject)."""
+        # Se espera al escritor en el bucle, sin ocupar hilos del executor
+        self._drained.clear()
+        self.send_command("ERROR", message)
+        try:
+            await asyncio.wait_for(self._drained.wait(), REJECT_LINGER)
+        except asyncio.TimeoutError:
+            pass
+        deadline = self._loop.time() + REJECT_LINGER
+        try:
+            if self._writer.can_write_eof():
+                self._writer.write_eof()
+            while (remaining := deadline - self._loop.time()) > 0:
+                if not await asyncio.wait_for(self._reader.read(SPOOL_BLOCK), remaining):
+                    break
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+
+    def close(self) -> None:
+        """Cierra la conexión con el cliente."""
+        self.closed = True
+        self._outbox.close()
+        self._loop.call_soon_threadsafe(self._ready.set)
+        self._loop.call_soon_threadsafe(self._writer.close)
+
+
+class AsyncChatServer(ChatServer):
+    """ChatServer que atiende todas las conexiones desde un único bucle asyncio."""
+
+    # Bucle y tarea de _serve mientras el servidor está en marcha (stop() la cancela)
+    _serving: Optional[Tuple[asyncio.AbstractEventLoop, "asyncio.Task[None]"]] = None
+
+    def start(self) -> None:
+        """Inicia el servidor"""
+        # Un receptor lento ocupa un hilo de reenvío; el resto del servidor no los usa
+        self._relay_executor = ThreadPoolExecutor(self._flow.relay_threads, "chunk-relay")
+        self._spool_executor = ThreadPoolExecutor(SPOOL_THREADS, "spool-io")
+        self._buffer_space: List[asyncio.Event] = []
+        try:
+            asyncio.run(self._serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass  # Cierre normal por Ctrl+C o stop(), sin emitir error
+        except Exception as e:
+            self.emit(FatalError(f"{e}\n{traceback.format_exc()}"))
+        finally:
+            self.emit(ServerStopped(self.network_ip, self.port))
+            self._buffer.on_space = None
+            self._buffer.stop()
+            self._fanout.stop()
+            self._router.stop()
+            self._relay_executor.shutdown(wait=False, cancel_futures=True)
+            self._spool_executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self) -> None:
+        """Detiene el servidor desde cualquier hilo: cancela _serve y start() termina."""
+        self._stopped = True
+        if self._serving is not None:
+            loop, task = self._serving
+            loop.call_soon_threadsafe(task.cancel)
+
+    async def _serve(self) -> None:
+        """Abre el socket de escucha y atiende conexiones hasta ser cancelado."""
+        loop = asyncio.get_running_loop()
+        self._serving = (loop, asyncio.current_task())
+        if self._stopped:
+            return
+        # Un evento por partición del RequestBuffer: su worker lo activa al liberar sitio
+        self._buffer_space = [asyncio.Event() for _ in range(self._buffer.partitions)]
+        self._buffer.on_space = lambda index: loop.call_soon_threadsafe(self._buffer_space[index].set)
+        self._router.start()
+        server = await asyncio.start_server(
+            self._handle_connection, self.bind_host, self.port, reuse_address=True,
+            reuse_port=self._reuse_port or None,
+        )
+        for sock in server.sockets:
+            self._profile.apply(sock)
+        real_host, real_port = server.sockets[0].getsockname()[:2]
+        self.port = real_port
+        self.emit(ServerStarted(real_host, real_port, self.network_ip))
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Maneja la sesión de un cliente dentro del bucle de eventos."""
+        addr = writer.get_extra_info("peername")
+        temp_id = f"Temp_{random.randint(1000, 9999)}"
+        loop = asyncio.get_running_loop()
+        session = AsyncClientSession(reader, writer, loop, addr, temp_id,
+                                     self._outbox_config, self._profile, self.frame_codec,
+                                     self._metrics, self._flow, self.frame_limits,
+                                     self._spool_executor)
+        writer_task = loop.create_task(session.write_loop())
+        self.emit(ClientHandshakeStarted(session.address, session.name))
+        try:
+            while True:
+                tlv = await session.recv_tlv()
+                if not tlv: break
+                msg_type, payload = tlv
+                check_codec(msg_type, session.codecs)
+                # Con el cupo del cliente lleno no se lee más de su socket
+                await session.acquire_inbound(len(payload))
+                if msg_type & TYPE_MASK == FILE_CHUNK:
+                    # Igual que en el modo con hilos, no se lee el siguiente fragmento
+                    # hasta entregar el actual; el reenvío (que puede esperar espacio
+                    # en la cola del receptor) corre en los hilos de reenvío.
+                    try:
+                        await loop.run_in_executor(self._relay_executor, self._dispatch_internal,
+                                                   session, msg_type, payload)
+                    finally:
+                        session.inbound.release(len(payload))
+                else:
+                    await self._add_request(session, msg_type, payload)
+        except (FrameTooLarge, CodecNotNegotiated) as exc:
+            await session.reject(str(exc))
+            self.emit(ClientError(session.name, str(exc)))
+        except Exception as exc:
+            self.emit(ClientError(session.name, str(exc)))
+        finally:
+            try:
+                # Con ClusterRouter/FederationRouter la baja espera a otros nodos (IPC)
+                await loop.run_in_executor(self._relay_executor, self._disconnect, session)
+            finally:
+                writer_task.cancel()
+
+    async def _add_request(self, session: AsyncClientSession, msg_type: int, payload) -> None:
+        """Entrega una trama al RequestBuffer; con su partición llena este lector espera sin ocupar hilos."""
+        buffer = self._buffer
+        if buffer.add_request(session, msg_type, payload, block=False):
+            return
+        index = buffer.shard_for(session)
+        space = self._buffer_space[index]
+        start = time.perf_counter()
+        while True:
+            space.clear()
+            if buffer.add_request(session, msg_type, payload, block=False):
+                break
+            await space.wait()
+        buffer.stalled(index, time.perf_counter() - start)
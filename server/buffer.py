@@ -3,48 +3,152 @@
 
 import queue
 import threading
+import time
 import traceback
-from typing import Callable, Any
+from typing import Callable, Any, Dict, List, Optional
 from .events import BufferError
+from .flow import record_stall
 
 
 class RequestBuffer:
-    """Buffer de peticiones para procesar mensajes en orden de llegada."""
+    """
+    Buffer de peticiones particionado por sesión.
 
-    def __init__(self, processor: Callable[[Any, str], None], emit: Callable[[Any], None]):
+    Cada sesión se asigna siempre a la misma partición (shard), atendida por
+    un único worker: las peticiones de un cliente se procesan en orden de
+    llegada, mientras que clientes no relacionados avanzan en paralelo y un
+    manejador lento solo retrasa a las sesiones de su propia partición.
+
+    Las particiones están acotadas (max_pending peticiones en total): con una
+    llena, add_request() espera y cuenta la parada, así la memoria no crece
+    aunque los clientes envíen más rápido de lo que se despacha. Los lectores
+    asyncio usan block=False y esperan a que `on_space` avise de que la
+    partición volvió a tener sitio.
+    """
+
+    def __init__(self, processor: Callable[[Any, str], None], emit: Callable[[Any], None],
+                 workers: int = 4, metrics: Optional[Any] = None, max_pending: int = 8192,
+                 on_done: Optional[Callable[[Any, Any], None]] = None):
         """
         Args:
             processor: Función que procesa cada solicitud (session, msg_type, payload).
             emit:      Callable del servidor para emitir eventos de error sin acoplarse al logger.
+            workers:   Número de particiones, cada una con su propio hilo worker.
+            metrics:   Registro de métricas (server.metrics.Metrics) para la espera en
+                       cola y la profundidad por partición; opcional.
+            max_pending: Peticiones encoladas como máximo entre todas las particiones
+                       (0: sin límite).
+            on_done:   Se llama con (session, payload) tras procesar cada solicitud,
+                       p. ej. para liberar el cupo de entrada del cliente.
         """
-        self._queue = queue.Queue()
+        if workers < 1:
+            raise ValueError("RequestBuffer necesita al menos un worker")
+        per_shard = -(-max_pending // workers) if max_pending > 0 else 0
+        self._shards = [queue.Queue(per_shard) for _ in range(workers)]
+        self._processed = [0] * workers
+        self._on_done = on_done
+        # Partición llena con algún add_request(block=False) rechazado desde el último aviso
+        self._full = [False] * workers
+        # Se llama (desde el worker) con el índice de la partición al liberarse sitio
+        self.on_space: Optional[Callable[[int], None]] = None
+        # Paradas por partición; se actualizan bajo el cerrojo de la propia cola
+        self._stalls = [0] * workers
+        self._stall_seconds = [0.0] * workers
         self._processor = processor
         self._emit = emit
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.gauge("chat_buffer_depth",
+                          lambda: {(str(i),): shard.qsize() for i, shard in enumerate(self._shards)})
         self._stop_event = threading.Event()
-        self._worker = threading.Thread(target=self._process_loop, daemon=True)
-        self._worker.start()
+        self._workers = [
+            threading.Thread(target=self._process_loop, args=(i,), daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def shard_for(self, session: Any) -> int:
+        """Partición fija de una sesión (por identidad: el nombre cambia tras SET_NAME)."""
+        return hash(session) % len(self._shards)
 
-    def add_request(self, session: Any, msg_type: int, payload: bytes):
-        """Agrega una solicitud al buffer."""
-        self._queue.put((session, msg_type, payload))
+    @property
+    def partitions(self) -> int:
+        return len(self._shards)
 
-    def _process_loop(self):
-        """Bucle de procesamiento de solicitudes con control de errores."""
+    def add_request(self, session: Any, msg_type: int, payload: bytes, block: bool = True) -> bool:
+        """
+        Agrega una solicitud al buffer.
+
+        Con la partición llena espera a que haya sitio; con block=False
+        devuelve False en su lugar (lectores asyncio, que no pueden bloquear
+        el bucle) y on_space avisará cuando se libere sitio.
+        """
+        index = self.shard_for(session)
+        shard = self._shards[index]
+        try:
+            shard.put_nowait((session, msg_type, payload, time.perf_counter()))
+            return True
+        except queue.Full:
+            if not block:
+                self._full[index] = True
+                return False
+        start = time.perf_counter()
+        shard.put((session, msg_type, payload, time.perf_counter()))
+        self.stalled(index, time.perf_counter() - start)
+        return True
+
+    def stalled(self, index: int, seconds: float) -> None:
+        """Cuenta una espera por la partición `index` llena (desde cualquier productor)."""
+        with self._shards[index].mutex:
+            self._stalls[index] += 1
+            self._stall_seconds[index] += seconds
+        record_stall(self._metrics, "buffer", seconds)
+
+    @property
+    def stalls(self) -> int:
+        return sum(self._stalls)
+
+    @property
+    def stall_seconds(self) -> float:
+        return sum(self._stall_seconds)
+
+    def _process_loop(self, index: int):
+        """Bucle de procesamiento de una partición con control de errores."""
+        shard = self._shards[index]
+        metrics = self._metrics
         while not self._stop_event.is_set():
             try:
-                session, msg_type, payload = self._queue.get(timeout=1.0)
+                session, msg_type, payload, enqueued = shard.get(timeout=1.0)
+                if self._full[index] and self.on_space is not None:
+                    self._full[index] = False
+                    self.on_space(index)
+                if metrics is not None:
+                    metrics.observe("chat_buffer_wait_seconds", time.perf_counter() - enqueued)
                 try:
                     self._processor(session, msg_type, payload)
                 except Exception as e:
                     self._emit(BufferError(session.name, f"{e}\n{traceback.format_exc()}"))
                 finally:
-                    self._queue.task_done()
+                    self._processed[index] += 1
+                    shard.task_done()
+                    if self._on_done is not None:
+                        self._on_done(session, payload)
             except queue.Empty:
                 continue
             except Exception:
                 pass
 
+    def stats(self) -> List[Dict[str, int]]:
+        """Profundidad de cola, capacidad, peticiones procesadas y paradas por partición."""
+        return [
+            {"shard": i, "depth": shard.qsize(), "capacity": shard.maxsize,
+             "processed": self._processed[i], "stalls": self._stalls[i]}
+            for i, shard in enumerate(self._shards)
+        ]
+
     def stop(self):
         """Detiene el buffer."""
         self._stop_event.set()
-        self._worker.join()
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+cluster.py
+----------
+Varios procesos ChatServer atendiendo el mismo puerto.
+
+Un proceso ChatServer aprovecha un solo núcleo (GIL). run_cluster() lanza N
+procesos worker que abren el socket de escucha con SO_REUSEPORT, de modo que
+el kernel reparte las conexiones entrantes entre ellos. Para que los usuarios
+de workers distintos puedan chatear y enviarse archivos:
+
+- Registro compartido: un dict de multiprocessing.Manager con
+  nombre -> (worker, códecs). Reclamar un nombre es un setdefault atómico en
+  el proceso del Manager, así que un nombre solo puede tener un dueño.
+- Enrutado entre workers: cada worker escucha en un socket Unix
+  (<run_dir>/worker-<n>.sock) y los usuarios de otro worker se alcanzan con
+  una RemoteSession que reenvía por ese socket (ver peers.py).
+- Presencia: cada worker anuncia sus altas (OP_PRESENT) y bajas (OP_GONE)
+  a los demás, y al abrir un enlace envía primero sus usuarios actuales. Si
+  la conexión entrante de un worker se cierra, sus usuarios se dan de baja.
+
+Requiere SO_REUSEPORT y sockets Unix (Linux, BSD, macOS).
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+from multiprocessing.managers import SyncManager
+from typing import Any, Callable, Dict, List, Optional
+
+from .peers import OP_GONE, Owner, PeerLink, PeerRouter, encode_op
+
+OP_PRESENT = 16  # (nombre): un usuario se registró en el worker emisor
+
+
+def worker_path(run_dir: str, worker: int) -> str:
+    """Ruta del socket Unix del worker."""
+    return os.path.join(run_dir, f"worker-{worker}.sock")
+
+
+class ClusterRouter(PeerRouter):
+    """Router de un worker del cluster: registro compartido y reenvío por sockets Unix."""
+
+    def __init__(self, worker: int, workers: int, run_dir: str, owners: Any) -> None:
+        super().__init__()
+        self.worker = worker
+        self._run_dir = run_dir
+        self._owners = owners  # nombre -> Owner (dict del Manager)
+        self._peers = {n: PeerLink(worker_path(run_dir, n), self._greeting)
+                       for n in range(workers) if n != worker}
+
+    def _greeting(self) -> List[bytes]:
+        frames: List[bytes] = []
+        for name in self.registry.names():
+            frames += encode_op(OP_PRESENT, name)
+        return frames
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        path = worker_path(self._run_dir, self.worker)
+        if os.path.exists(path):
+            os.unlink(path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen()
+        self._listen(listener)
+
+    def claim(self, name: str, session: Any) -> bool:
+        owner = (self.worker, tuple(session.codecs))
+        if self._owners.setdefault(name, owner) != owner:
+            return False
+        if not self.registry.register(name, session):
+            # Otra sesión local con el mismo nombre ganó la carrera o la sesión se cerró
+            if self.registry.get(name) is None:
+                self._owners.pop(name, None)
+            return False
+        self.broadcast(OP_PRESENT, name)
+        self._presence_changed(name, True)
+        return True
+
+    def release(self, name: str, session: Any) -> bool:
+        if not self.registry.unregister(name, session):
+            return False
+        # Mientras la entrada sea nuestra nadie más puede reclamar el nombre
+        if self._owners.get(name, (None,))[0] == self.worker:
+            self._owners.pop(name, None)
+        self.broadcast(OP_GONE, name)
+        self._presence_changed(name, False)
+        return True
+
+    def _resolve(self, name: str) -> Optional[Owner]:
+        owner = self._owners.get(name)
+        if owner is None or owner[0] == self.worker:
+            return None
+        return owner
+
+    def names(self) -> List[str]:
+        return list(self._owners.keys())
+
+    def count(self) -> int:
+        return len(self._owners)
+
+    def _apply(self, op: int, fields: List[str], origin: Dict[str, Any]) -> None:
+        if op == OP_PRESENT:
+            origin.setdefault("names", set()).add(fields[0])
+            self._presence_changed(fields[0], True)
+            return
+        if op == OP_GONE:
+            origin.get("names", set()).discard(fields[0])
+        super()._apply(op, fields, origin)
+
+    def _peer_closed(self, origin: Dict[str, Any]) -> None:
+        # El worker terminó: sus usuarios dejan de estar presentes
+        for name in origin.get("names", ()):
+            self._remotes.pop(name, None)
+            self._presence_changed(name, False)
+
+
+def _ignore_sigint() -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _worker_main(worker: int, workers: int, run_dir: str, owners: Any,
+                 host: Optional[str], port: int, log_filename: Optional[str],
+                 options: Dict[str, Any]) -> None:
+    from .facade import ServerFacade
+    router = ClusterRouter(worker, workers, run_dir, owners)
+    if log_filename:
+        root, ext = os.path.splitext(log_filename)
+        log_filename = f"{root}-{worker}{ext}"
+    if options.get("journal"):
+        root, ext = os.path.splitext(options["journal"])
+        options = dict(options, journal=f"{root}-{worker}{ext}")
+    for key in ("metrics_port", "admin_port"):
+        if options.get(key):
+            options = dict(options, **{key: options[key] + worker})  # un puerto por worker
+    ServerFacade(host, port, log_filename, router=router, reuse_port=True, **options).run()
+
+
+def run_cluster(processes: int, host: Optional[str] = None, port: int = 0,
+                log_filename: Optional[str] = "server.log",
+                announce: Optional[Callable[[int], None]] = None, **options: Any) -> None:
+    """
+    Lanza `processes` workers sobre el mismo puerto y espera a que terminen.
+
+    Args:
+        log_filename: cada worker escribe en "<nombre>-<n><ext>"; None no
+                      registra eventos.
+        announce:     se llama con el puerto real antes de lanzar los workers.
+        options:      mode, workers, outbox, profile, compression, metrics_port,
+                      admin_port, profile_dir, log_file, journal, log_rules,
+                      flow y frame_limits de ServerFacade; el worker n escucha en
+                      metrics_port + n y admin_port + n.
+
+    Si un worker termina, sus nombres se liberan en el registro compartido.
+    """
+    if not hasattr(socket, "SO_REUSEPORT") or not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("El modo multiproceso requiere SO_REUSEPORT y sockets Unix")
+
+    # El puerto se reserva en el proceso padre (enlazado, sin escuchar) para que
+    # todos los workers usen el mismo aunque se pida uno efímero.
+    reserve = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    reserve.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    reserve.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    reserve.bind((host or "0.0.0.0", port))
+    port = reserve.getsockname()[1]
+    if announce is not None:
+        announce(port)
+
+    manager = SyncManager()
+    manager.start(_ignore_sigint)
+    run_dir = tempfile.mkdtemp(prefix="chat-cluster-")
+    owners = manager.dict()
+    procs = {
+        n: multiprocessing.Process(
+            target=_worker_main, name=f"chat-worker-{n}",
+            args=(n, processes, run_dir, owners, host, port, log_filename, options),
+        )
+        for n in range(processes)
+    }
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        for proc in procs.values():
+            proc.start()
+        # Después de lanzar los workers: no deben heredar este manejador
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        alive = dict(procs)
+        while alive:
+            ready = multiprocessing.connection.wait([p.sentinel for p in alive.values()])
+            for n, proc in list(alive.items()):
+                if proc.sentinel in ready:
+                    proc.join()
+                    del alive[n]
+                    for name, owner in owners.items():
+                        if owner[0] == n:
+                            owners.pop(name, None)
+    except KeyboardInterrupt:
+        # Los workers reciben el mismo Ctrl+C y se cierran solos
+        for proc in procs.values():
+            if proc.pid is not None:
+                proc.join(timeout=2)
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        for proc in procs.values():
+            if proc.pid is None:
+                continue
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+        manager.shutdown()
+        shutil.rmtree(run_dir, ignore_errors=True)
+        reserve.close()
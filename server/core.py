@@ -4,9 +4,22 @@
 import random
 import socket
 import threading
-from typing import Dict, Optional, Set, Tuple
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set
+from common.compression import (
+    CODECS, FLAG_CODECS, TYPE_MASK, CodecNotNegotiated, FrameCodec, check_codec, parse_codecs,
+)
+from common.framing import FileRegion, FrameLimits, FrameTooLarge, frame_parts, split_field
+from common.protocol import PROTOCOL_V1, PROTOCOL_V2
+from common.sockopts import SocketProfile
 from .session import ClientSession
 from .buffer import RequestBuffer
+from .outbox import OutboxConfig
+from .flow import FlowConfig
+from .router import LocalRouter
+from .rooms import EncodedMessage, FanOut, RoomRegistry
+from .presence import Presence
+from .metrics import Metrics
 from .handlers import ProtocolHandlers
 from .observable import Observable
 from .events import (
@@ -15,9 +28,21 @@ from .events import (
     ActiveConnectionsChanged, ChatEstablished, ChatEnded,
     FileTransferRequested, FileTransferAccepted, FileTransferDenied,
     FileTransferRouted, FileTransferCompleted,
+    RoomCreated, RoomJoined, RoomLeft, RoomMessagePosted,
     BufferError, ClientError,
 )
 
+# Tramas Tipo 3: fragmentos de archivo (DST_LEN|DST|TRANSFER_ID !I|KIND|CUERPO)
+FILE_CHUNK = 3
+CHUNK_END  = 2
+CHUNK_NEED = 5  # respuestas del receptor reanudable: control, nunca se descartan
+CHUNK_DONE = 6
+STREAM_MODE = "STREAM"
+RESUME_MODE = "RESUME"  # reanudable: requiere STREAM (ver client/transfer.py)
+FILE_MODES = (STREAM_MODE, RESUME_MODE)
+# Los clientes usan el nombre del emisor en rutas (archivos parciales reanudables)
+NAME_FORBIDDEN = ("/", "\\", "..")
+
 def get_local_ip() -> str:
     """Obtiene la dirección IP local"""
     probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -31,23 +56,62 @@ def get_local_ip() -> str:
 class ChatServer(Observable):
     """Clase principal del servidor que maneja la lógica del chat"""
 
-    def __init__(self, host: Optional[str] = None, port: int = 0) -> None:
+    def __init__(self, host: Optional[str] = None, port: int = 0, *, workers: int = 4,
+                 outbox: Optional[OutboxConfig] = None,
+                 profile: Optional[SocketProfile] = None,
+                 compression: Sequence[str] = CODECS,
+                 router: Optional[LocalRouter] = None, reuse_port: bool = False,
+                 metrics: Optional[Metrics] = None,
+                 flow: Optional[FlowConfig] = None,
+                 limits: Optional[FrameLimits] = None) -> None:
         super().__init__()
         self.bind_host: str = host or "0.0.0.0"
         self.network_ip: str = get_local_ip()
         self.port: int = port
-        self._clients: Dict[str, ClientSession] = {}
-        self._active_sessions: Set[Tuple[str, str]] = set()
+        # Dueño de cada nombre y sesiones de chat activas; el registro local
+        # tiene sus propios cerrojos, el camino de enrutado no toma self._lock.
+        self._router = router or LocalRouter()
+        self._registry = self._router.registry  # solo clientes de este proceso
+        self._reuse_port = reuse_port  # SO_REUSEPORT: varios procesos en el mismo puerto
+        self._listener: Optional[socket.socket] = None  # socket de escucha (stop() lo cierra)
+        self._stopped = False
         self._pending_receive: Set[str] = set()
-        self._lock = threading.Lock()
-        self._buffer = RequestBuffer(self._dispatch_internal, self.emit)
+        self._rooms = RoomRegistry()  # salas de los clientes de este proceso
+        self._fanout = FanOut()
+        self._outbox_config = outbox or OutboxConfig()
+        self._profile = profile or SocketProfile()
+        self._compression = tuple(compression)  # códecs que se aceptan en HELLO
+        self.frame_codec = FrameCodec()
+        # Presencia versionada: lista de usuarios cacheada y deltas a los suscriptores
+        self._presence = Presence(self.frame_codec, self._fanout)
+        self._router.on_presence = self._presence.update
+        self._lock = threading.Lock()  # protege solo _pending_receive
+        # Métricas opcionales: sin registro, el camino de los mensajes no mide nada
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.gauge("chat_sessions", lambda: {(): self._registry.count()})
+        self._dispatch_hook: Optional[Any] = None  # despacho alternativo (perfilado bajo demanda)
+        # Cupos de entrada por cliente y global (flow.py): memoria acotada de socket a manejador
+        self._flow = flow or FlowConfig()
+        # Tamaño máximo por tipo de trama y umbral de volcado a disco de los archivos
+        self.frame_limits = limits or FrameLimits()
+        self._router.frame_limits = self.frame_limits
+        self._buffer = RequestBuffer(self._dispatch_internal, self.emit, workers, metrics,
+                                     self._flow.buffer_frames, self._request_done)
 
     def start(self) -> None:
         """Inicia el servidor"""
         server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self._reuse_port:
+            server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Los sockets aceptados heredan los buffers del de escucha; fijarlos antes
+        # de listen() permite negociar la escala de ventana TCP acorde a ellos.
+        self._profile.apply(server_sock)
+        self._listener = server_sock
 
         try:
+            self._router.start()
             server_sock.bind((self.bind_host, self.port))
             server_sock.listen()
 
@@ -65,13 +129,32 @@ class ChatServer(Observable):
             server_sock.close()
             self.emit(ServerStopped(self.network_ip, self.port))
             self._buffer.stop()
+            self._fanout.stop()
+            self._router.stop()
+
+    def stop(self) -> None:
+        """Detiene el servidor: start() deja de aceptar clientes y termina."""
+        self._stopped = True
+        if self._listener is not None:
+            try:
+                # Despierta al accept() bloqueado (close() solo no lo hace en Linux)
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
     def _accept_loop(self, server_sock: socket.socket) -> None:
         """Loop de aceptación de clientes"""
-        while True:
-            conn, addr = server_sock.accept()
+        while not self._stopped:
+            try:
+                conn, addr = server_sock.accept()
+            except OSError:
+                if self._stopped:
+                    return
+                raise
             temp_id = f"Temp_{random.randint(1000, 9999)}"
-            session = ClientSession(conn, addr, temp_id)
+            session = ClientSession(conn, addr, temp_id, self._outbox_config,
+                                    self._profile, self.frame_codec, self._metrics, self._flow,
+                                    self.frame_limits)
             threading.Thread(target=self._handle_client, args=(session,), daemon=True).start()
 
     def _handle_client(self, session: ClientSession) -> None:
@@ -82,165 +165,343 @@ class ChatServer(Observable):
                 tlv = session.recv_tlv()
                 if not tlv: break
                 msg_type, payload = tlv
-                self._buffer.add_request(session, msg_type, payload)
+                check_codec(msg_type, session.codecs)
+                # Con el cupo del cliente lleno no se lee más de su socket hasta
+                # que se despachen sus tramas (contrapresión TCP hacia él)
+                session.inbound.acquire(len(payload))
+                if msg_type & TYPE_MASK == FILE_CHUNK:
+                    # Los fragmentos se reenvían desde el hilo lector: no se vuelve a leer
+                    # del emisor hasta entregar el fragmento actual (un solo fragmento en
+                    # memoria por transferencia y contrapresión TCP hacia el emisor).
+                    try:
+                        self._dispatch_internal(session, msg_type, payload)
+                    finally:
+                        session.inbound.release(len(payload))
+                else:
+                    self._buffer.add_request(session, msg_type, payload)
+        except (FrameTooLarge, CodecNotNegotiated) as exc:
+            # Se avisa al cliente y se cierra la conexión sin procesar la trama
+            session.reject(str(exc))
+            self.emit(ClientError(session.name, str(exc)))
         except Exception as exc:
             self.emit(ClientError(session.name, str(exc)))
         finally:
             self._disconnect(session)
 
+    def buffer_stats(self) -> List[Dict[str, Any]]:
+        """Profundidad de cola por partición del buffer de peticiones."""
+        return self._buffer.stats()
+
+    def flow_stats(self) -> Dict[str, float]:
+        """Paradas de lectura por partición llena y por cupo de los clientes conectados."""
+        sessions = [session.inbound.stats() for _, session in self._registry.items()]
+        return {
+            "buffer_stalls":        self._buffer.stalls,
+            "buffer_stall_seconds": self._buffer.stall_seconds,
+            "client_stalls":        sum(stats["stalls"] for stats in sessions),
+            "client_stall_seconds": sum(stats["stall_seconds"] for stats in sessions),
+            "inflight_frames":      sum(stats["frames"] for stats in sessions),
+        }
+
+    def compression_stats(self) -> Dict[str, float]:
+        """Ratio y tiempo de CPU por trama de la compresión del servidor."""
+        return self.frame_codec.stats()
+
+    def outbound_stats(self) -> Dict[str, Dict[str, int]]:
+        """Métricas de la cola de salida de cada cliente registrado."""
+        return {name: session.queue_stats() for name, session in self._registry.items()}
+
+    def _request_done(self, session: ClientSession, payload: bytes) -> None:
+        """Libera el cupo de entrada de una trama ya despachada (y devuelve créditos)."""
+        session.inbound.release(len(payload))
+
     def _dispatch_internal(self, session: ClientSession, msg_type: int, payload: bytes):
         """Distribuye la solicitud al manejador interno."""
-        ProtocolHandlers.dispatch(self, session, msg_type, payload)
+        # El perfilador (profiling.py) sustituye el despacho durante su ventana
+        dispatch = self._dispatch_hook or ProtocolHandlers.dispatch
+        if self._metrics is None:
+            dispatch(self, session, msg_type, payload)
+            return
+        start = time.perf_counter()
+        command = dispatch(self, session, msg_type, payload)
+        self._metrics.observe("chat_dispatch_seconds", time.perf_counter() - start,
+                              (command or "UNKNOWN",))
+
+    def _relay(self, target: ClientSession, msg_type: int, flags: int,
+               prefix: bytes, body: memoryview, keep: int = 0, control: bool = False) -> None:
+        """
+        Reenvía un cuerpo enrutado tal como llegó (comprimido o no).
+
+        Si el receptor no negoció el códec del emisor, los bytes a partir de
+        `keep` se descomprimen una vez para él, sin superar el límite del tipo:
+        los archivos (Tipo 2) a un archivo temporal, aunque el cuerpo
+        comprimido cupiera en memoria; los fragmentos, en memoria.
+        """
+        if flags and FLAG_CODECS.get(flags) not in target.codecs:
+            if msg_type == 2:
+                body = self.frame_codec.decompress_region(flags, body, self.frame_limits.file)
+            else:
+                body = bytes(body[:keep]) + self.frame_codec.decompress(
+                    flags, body[keep:], self.frame_limits.limit(msg_type))
+            flags = 0
+        target.send(msg_type | flags, (prefix, body), block=True, control=control)
 
-    def handle_file_transfer(self, session: ClientSession, payload: bytes):
-        """Reenvía un archivo binario (Tipo 2) al destinatario."""
+    def handle_file_transfer(self, session: ClientSession, payload: bytes, flags: int = 0):
+        """Reenvía un archivo binario (Tipo 2) al destinatario (desde disco si se volcó)."""
         try:
-            dst_len = payload[0]
-            target_name = payload[1:1+dst_len].decode("utf-8")
+            dst, offset = split_field(payload)
+            target_name = str(dst, "utf-8")
 
-            with self._lock:
-                if (session.name, target_name) not in self._active_sessions:
-                    session.send(1, f"ERROR:No tienes un chat activo con {target_name} para enviar archivos.".encode("utf-8"))
-                    return
-                if target_name not in self._clients:
-                    session.send(1, f"ERROR:Usuario {target_name} desconectado".encode("utf-8"))
-                    return
+            if not self._router.are_connected(session.name, target_name):
+                session.send_command("ERROR", f"No tienes un chat activo con {target_name} para enviar archivos.")
+                return
+            target = self._router.lookup(target_name)
+            if target is None:
+                session.send_command("ERROR", f"Usuario {target_name} desconectado")
+                return
 
-                sender_name = session.name.encode("utf-8")
-                client_payload = bytes([len(sender_name)]) + sender_name + payload[1+dst_len:]
-                self._clients[target_name].send(2, client_payload)
-                self.emit(FileTransferRouted(session.name, target_name))
+            # Los archivos esperan espacio en la cola del receptor en vez de aplicar
+            # la política de desbordamiento; solo se frena la partición del emisor.
+            # El prefijo y el cuerpo se encolan por separado (sin copiar el archivo);
+            # un cuerpo en disco se encola como región y sale con sendfile.
+            sender_name = session.name.encode("utf-8")
+            prefix = bytes([len(sender_name)]) + sender_name
+            body = payload.region(offset) if isinstance(payload, FileRegion) else memoryview(payload)[offset:]
+            self._relay(target, 2, flags, prefix, body)
+            self.emit(FileTransferRouted(session.name, target_name))
         except Exception as e:
             self.emit(ClientError(session.name, f"Fallo al procesar envío de archivo: {e}"))
-            session.send(1, f"ERROR:Fallo al procesar envío de archivo: {e}".encode("utf-8"))
+            session.send_command("ERROR", f"Fallo al procesar envío de archivo: {e}")
 
-    def handle_set_name(self, session: ClientSession, new_name: str):
-        """Establece el nombre del usuario"""
-        with self._lock:
-            if session.closed:
+    def handle_file_chunk(self, session: ClientSession, payload: bytes, flags: int = 0):
+        """Reenvía un fragmento de archivo (Tipo 3) al destinatario sin acumularlo."""
+        try:
+            dst, offset = split_field(memoryview(payload))
+            target_name = str(dst, "utf-8")
+
+            if not self._router.are_connected(session.name, target_name):
+                session.send_command("ERROR", f"No tienes un chat activo con {target_name} para enviar archivos.")
                 return
-            if new_name in self._clients or "Temp_" in new_name:
-                session.send(1, b"NAME_TAKEN")
+            target = self._router.lookup(target_name)
+            if target is None:
+                session.send_command("ERROR", f"Usuario {target_name} desconectado")
                 return
-            session.name = new_name
-            self._clients[new_name] = session
-            session.send(1, b"NAME_OK")
-            count = len(self._clients)
+
+            # Se espera espacio en la cola del receptor: un receptor lento solo frena a este emisor
+            sender_name = session.name.encode("utf-8")
+            body = memoryview(payload)[offset:]
+            # TRANSFER_ID + KIND (5 bytes) nunca van comprimidos
+            # NEED/DONE no se descartan ni se vuelcan: sin ellos el emisor no avanza
+            self._relay(target, FILE_CHUNK, flags, bytes([len(sender_name)]) + sender_name, body,
+                        keep=5, control=body[4] in (CHUNK_NEED, CHUNK_DONE))
+            if body[4] == CHUNK_END:
+                self.emit(FileTransferRouted(session.name, target_name))
+        except Exception as e:
+            self.emit(ClientError(session.name, f"Fallo al procesar fragmento de archivo: {e}"))
+            session.send_command("ERROR", f"Fallo al procesar fragmento de archivo: {e}")
+
+    def handle_hello(self, session: ClientSession, version: str, codecs: str = "", *_: str):
+        """Negocia la versión de comandos y la compresión (HELLO:<versión>[:<códecs>])."""
+        protocol = PROTOCOL_V2 if version == str(PROTOCOL_V2) else PROTOCOL_V1
+        accepted = parse_codecs(codecs, self._compression)
+        reply = f"HELLO_OK:{protocol}"
+        if accepted:
+            reply += ":" + ",".join(accepted)
+        # Lo negociado se activa antes de responder: el cliente puede comprimir en
+        # cuanto recibe HELLO_OK y el lector ya debe aceptar esos códecs. La
+        # respuesta va siempre en texto y sin comprimir (el cliente aún no sabe
+        # qué se aceptó), por eso se encola ya codificada.
+        session.protocol = protocol
+        session.codecs = accepted
+        session.send_frame(frame_parts(1, reply.encode("utf-8")))
+
+    def handle_set_name(self, session: ClientSession, new_name: str):
+        """Establece el nombre del usuario"""
+        if session.closed:
+            return
+        if ("Temp_" in new_name or any(part in new_name for part in NAME_FORBIDDEN)
+                or not self._router.claim(new_name, session)):
+            if not session.closed:
+                session.send_command("NAME_TAKEN")
+            return
+        session.send_command("NAME_OK")
+        count = self._router.count()
         self.emit(ClientJoined(new_name, session.address))
         self.emit(ActiveConnectionsChanged(count))
 
+    def handle_window(self, session: ClientSession, *_: str):
+        """Activa el control de flujo por créditos y concede la ventana inicial (CREDIT:<n>)."""
+        session.send_command("CREDIT", str(session.inbound.enable_credit()), control=True)
+
     def send_user_list(self, session: ClientSession):
         """Envía la lista de usuarios al cliente"""
-        with self._lock:
-            user_list = ",".join(self._clients.keys())
-        session.send(1, f"LIST_USERS:{user_list}".encode("utf-8"))
+        session.send_frame(self._presence.user_list().frame_for(session))
+
+    def handle_sub_presence(self, session: ClientSession, epoch: str = "", version: str = "", *_: str):
+        """Suscribe a los cambios de presencia; envía el delta desde `version` o la lista completa"""
+        self._presence.subscribe(session, epoch, version)
 
     def handle_req_chat(self, session: ClientSession, target_name: str):
         """Maneja la solicitud de chat"""
-        with self._lock:
-            if target_name not in self._clients:
-                session.send(1, f"ERROR:Usuario {target_name} no encontrado".encode("utf-8"))
-            else:
-                self._clients[target_name].send(1, f"REQ_CHAT_FROM:{session.name}".encode("utf-8"))
+        target = self._router.lookup(target_name)
+        if target is None:
+            session.send_command("ERROR", f"Usuario {target_name} no encontrado")
+        else:
+            target.send_command("REQ_CHAT_FROM", session.name)
 
     def handle_accept_chat(self, session: ClientSession, requester_name: str):
         """Maneja la aceptación de chat"""
         with self._lock:
             self._pending_receive.discard(session.name)
-            if requester_name not in self._clients:
-                session.send(1, f"ERROR:Usuario {requester_name} ya no está conectado".encode("utf-8"))
-                return
-            self._active_sessions.add((session.name, requester_name))
-            self._active_sessions.add((requester_name, session.name))
-            self._clients[requester_name].send(1, f"CHAT_ACCEPTED:{session.name}".encode("utf-8"))
-            session.send(1, f"CHAT_ACCEPTED:{requester_name}".encode("utf-8"))
+        requester = self._router.lookup(requester_name)
+        if requester is None:
+            session.send_command("ERROR", f"Usuario {requester_name} ya no está conectado")
+            return
+        if not self._router.connect(session.name, requester_name):
+            # Uno de los dos se desconectó mientras tanto: no queda sesión de chat
+            session.send_command("ERROR", f"Usuario {requester_name} ya no está conectado")
+            return
+        requester.send_command("CHAT_ACCEPTED", session.name)
+        session.send_command("CHAT_ACCEPTED", requester_name)
         self.emit(ChatEstablished(session.name, requester_name))
 
     def handle_deny_chat(self, session: ClientSession, requester_name: str):
         """Maneja la denegación de chat"""
         with self._lock:
             self._pending_receive.discard(session.name)
-            if requester_name in self._clients:
-                self._clients[requester_name].send(1, f"CHAT_DENIED:{session.name}".encode("utf-8"))
+        requester = self._router.lookup(requester_name)
+        if requester is not None:
+            requester.send_command("CHAT_DENIED", session.name)
 
     def handle_stop_chat(self, session: ClientSession, target_name: str):
         """Maneja la finalización de chat"""
-        with self._lock:
-            self._active_sessions.discard((session.name, target_name))
-            self._active_sessions.discard((target_name, session.name))
-            if target_name in self._clients:
-                self._clients[target_name].send(1, f"CHAT_STOPPED:{session.name}".encode("utf-8"))
+        self._router.disconnect(session.name, target_name)
+        target = self._router.lookup(target_name)
+        if target is not None:
+            target.send_command("CHAT_STOPPED", session.name)
         self.emit(ChatEnded(session.name, target_name))
 
-    def handle_req_send_files(self, session: ClientSession, payload: str):
+    def handle_req_send_files(self, session: ClientSession, *args: str):
         """Maneja la solicitud de envío de archivos"""
         try:
-            target_name, count = payload.split(":")
-            with self._lock:
-                if target_name in self._clients:
-                    self._clients[target_name].send(1, f"REQ_SEND_FILES_FROM:{session.name}:{count}".encode("utf-8"))
-                else:
-                    session.send(1, f"ERROR:Usuario {target_name} no encontrado".encode("utf-8"))
-                    return
+            # REQ_SEND_FILES:<destino>:<cantidad>[:STREAM[:RESUME]]
+            target_name, count, *mode = args
+            if any(m not in FILE_MODES for m in mode) or (mode and mode[0] != STREAM_MODE):
+                raise ValueError(args)
+            target = self._router.lookup(target_name)
+            if target is None:
+                session.send_command("ERROR", f"Usuario {target_name} no encontrado")
+                return
+            self._router.set_offer(session.name, target_name, tuple(mode))
+            target.send_command("REQ_SEND_FILES_FROM", session.name, count)
             self.emit(FileTransferRequested(session.name, target_name, count))
         except ValueError:
-            session.send(1, "ERROR:Formato REQ_SEND_FILES inválido".encode("utf-8"))
+            session.send_command("ERROR", "Formato REQ_SEND_FILES inválido")
 
-    def handle_accept_send_files(self, session: ClientSession, sender_name: str):
+    def handle_accept_send_files(self, session: ClientSession, sender_name: str, *mode: str):
         """Maneja la aceptación de envío de archivos"""
-        with self._lock:
-            if sender_name in self._clients:
-                self._clients[sender_name].send(1, f"ACCEPT_SEND_FILES_FROM:{session.name}".encode("utf-8"))
-            else:
-                session.send(1, f"ERROR:Usuario {sender_name} desconectado".encode("utf-8"))
-                return
+        # ACCEPT_SEND_FILES:<emisor>[:STREAM[:RESUME]]; cada modo solo se
+        # confirma si ambos extremos lo ofrecieron (clientes antiguos no lo entienden).
+        offered = self._router.take_offer(sender_name, session.name)
+        sender = self._router.lookup(sender_name)
+        if sender is None:
+            session.send_command("ERROR", f"Usuario {sender_name} desconectado")
+            return
+        modes = [m for m in FILE_MODES if m in offered and m in mode]
+        if STREAM_MODE not in modes:
+            modes = []
+        sender.send_command("ACCEPT_SEND_FILES_FROM", session.name, *modes)
         self.emit(FileTransferAccepted(session.name, sender_name))
 
     def handle_deny_send_files(self, session: ClientSession, sender_name: str):
         """Maneja la denegación de envío de archivos"""
-        with self._lock:
-            if sender_name in self._clients:
-                self._clients[sender_name].send(1, f"DENY_SEND_FILES_FROM:{session.name}".encode("utf-8"))
-            else:
-                return
+        self._router.set_offer(sender_name, session.name, ())
+        sender = self._router.lookup(sender_name)
+        if sender is None:
+            return
+        sender.send_command("DENY_SEND_FILES_FROM", session.name)
         self.emit(FileTransferDenied(session.name, sender_name))
 
     def handle_files_received(self, session: ClientSession, sender_name: str):
         """Maneja la recepción de archivos"""
-        with self._lock:
-            if sender_name in self._clients:
-                self._clients[sender_name].send(1, f"FILES_RECEIVED_FROM:{session.name}".encode("utf-8"))
-            else:
-                return
+        sender = self._router.lookup(sender_name)
+        if sender is None:
+            return
+        sender.send_command("FILES_RECEIVED_FROM", session.name)
         self.emit(FileTransferCompleted(session.name, sender_name))
 
-    def handle_chat_message(self, session: ClientSession, raw: str):
+    def handle_chat_message(self, session: ClientSession, *args: str):
         """Maneja el envío de mensajes"""
         try:
-            _, target_name, text = raw.split(":", 2)
+            target_name, text = args
         except ValueError:
-            session.send(1, "ERROR:Formato de mensaje inválido".encode("utf-8"))
+            session.send_command("ERROR", "Formato de mensaje inválido")
             return
-        with self._lock:
-            if (session.name, target_name) not in self._active_sessions:
-                session.send(1, f"ERROR:No tienes un chat activo con {target_name}.".encode("utf-8"))
-                return
-            if target_name not in self._clients:
-                session.send(1, f"ERROR:Usuario {target_name} desconectado".encode("utf-8"))
-                self._active_sessions.discard((session.name, target_name))
-                self._active_sessions.discard((target_name, session.name))
-                return
-            self._clients[target_name].send(0, f"FROM:{session.name}:{text}".encode("utf-8"))
+        if not self._router.are_connected(session.name, target_name):
+            session.send_command("ERROR", f"No tienes un chat activo con {target_name}.")
+            return
+        target = self._router.lookup(target_name)
+        if target is None:
+            session.send_command("ERROR", f"Usuario {target_name} desconectado")
+            self._router.disconnect(session.name, target_name)
+            return
+        target.send_command("FROM", session.name, text)
+
+    def handle_room_create(self, session: ClientSession, room: str):
+        """Crea una sala con el solicitante como primer miembro"""
+        if "Temp_" in session.name or not room:
+            session.send_command("ERROR", "Nombre de sala inválido")
+            return
+        if not self._rooms.create(room, session):
+            session.send_command("ERROR", f"La sala {room} ya existe")
+            return
+        session.send_command("ROOM_CREATED", room)
+        self.emit(RoomCreated(room, session.name))
+
+    def handle_room_join(self, session: ClientSession, room: str):
+        """Añade al solicitante a una sala existente"""
+        if "Temp_" in session.name:
+            session.send_command("ERROR", "Debes registrar un nombre antes de entrar en una sala")
+            return
+        joined = self._rooms.join(room, session)
+        if joined is None:
+            session.send_command("ERROR", f"La sala {room} no existe")
+            return
+        if joined:
+            self.emit(RoomJoined(room, session.name))
+        session.send_command("ROOM_JOINED", room)
+
+    def handle_room_leave(self, session: ClientSession, room: str):
+        """Saca al solicitante de una sala"""
+        if not self._rooms.leave(room, session.name):
+            session.send_command("ERROR", f"No estás en la sala {room}")
+            return
+        session.send_command("ROOM_LEFT", room)
+        self.emit(RoomLeft(room, session.name))
+
+    def handle_room_post(self, session: ClientSession, *args: str):
+        """Publica un mensaje en una sala: se codifica una vez y se encola en cada miembro"""
+        try:
+            room, text = args
+        except ValueError:
+            session.send_command("ERROR", "Formato de mensaje inválido")
+            return
+        if not self._rooms.is_member(room, session.name):
+            session.send_command("ERROR", f"No estás en la sala {room}")
+            return
+        message = EncodedMessage(self.frame_codec, "ROOM_FROM", room, session.name, text)
+        delivered = self._fanout.deliver(self._rooms.members(room), message, skip=session)
+        self.emit(RoomMessagePosted(room, session.name, delivered))
 
     def _disconnect(self, session: ClientSession):
         """Maneja la desconexión de un cliente"""
         session.closed = True
+        self._presence.unsubscribe(session)
+        self._router.release(session.name, session)
         with self._lock:
-            if session.name in self._clients and self._clients[session.name] is session:
-                self._clients.pop(session.name)
             self._pending_receive.discard(session.name)
-            stale = [s for s in self._active_sessions if session.name in s]
-            for s in stale:
-                self._active_sessions.discard(s)
+        self._router.drop_user(session.name)
+        for room in self._rooms.drop_user(session.name):
+            self.emit(RoomLeft(room, session.name))
         self.emit(ClientDisconnected(session.name, session.address))
         session.close()
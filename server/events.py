@@ -126,6 +126,39 @@ class FileTransferCompleted:
     sender: str
 
 
+# ---------------------------------------------------------------------------
+# Eventos de salas
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class RoomCreated:
+    """Un usuario creó una sala."""
+    room: str
+    owner: str
+
+
+@dataclass(frozen=True)
+class RoomJoined:
+    """Un usuario entró en una sala."""
+    room: str
+    name: str
+
+
+@dataclass(frozen=True)
+class RoomLeft:
+    """Un usuario salió de una sala (o se desconectó estando en ella)."""
+    room: str
+    name: str
+
+
+@dataclass(frozen=True)
+class RoomMessagePosted:
+    """Mensaje publicado en una sala y entregado a `delivered` miembros."""
+    room: str
+    sender: str
+    delivered: int
+
+
 # ---------------------------------------------------------------------------
 # Eventos de errores internos
 # ---------------------------------------------------------------------------
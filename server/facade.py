@@ -9,20 +9,95 @@ Es el ÚNICO lugar donde se decide qué observer escucha al servidor.
 """
 
 from .core import ChatServer
-from .logger import ServerObserver
+from .async_core import AsyncChatServer
+from .logger import LogFileConfig, ServerObserver
+from .logcontrol import LogControl
+from .metrics import Metrics, MetricsExporter, MetricsObserver
+from .profiling import AdminServer, Profiler
+from .journal import JournalObserver
+from .outbox import OutboxConfig
+from .flow import FlowConfig
+from .router import LocalRouter
+from common.compression import CODECS
+from common.framing import FrameLimits
+from common.sockopts import SocketProfile
+
+
+# Motores de conexión disponibles: un hilo por socket o un bucle asyncio.
+SERVER_MODES = {
+    "threaded": ChatServer,
+    "async":    AsyncChatServer,
+}
 
 
 class ServerFacade:
     """Fachada que conecta el ChatServer con su observer de salida."""
 
-    def __init__(self, host: str = None, port: int = 0, log_filename: str = "server.log"):
-        self._server   = ChatServer(host, port)
-        self._observer = ServerObserver(log_filename)
-        self._server.subscribe(self._observer)
+    def __init__(self, host: str = None, port: int = 0, log_filename: str = "server.log",
+                 mode: str = "threaded", workers: int = 4, outbox: OutboxConfig = None,
+                 profile: SocketProfile = None, compression=CODECS,
+                 router: LocalRouter = None, reuse_port: bool = False,
+                 metrics_port: int = None, admin_port: int = None,
+                 profile_dir: str = "profiles", log_file: LogFileConfig = None,
+                 journal: str = None, log_rules: str = None, flow: FlowConfig = None,
+                 frame_limits: FrameLimits = None):
+        if mode not in SERVER_MODES:
+            raise ValueError(f"Modo de servidor desconocido: {mode!r} (usa {', '.join(SERVER_MODES)})")
+        # Con metrics_port se instrumenta el servidor y se exporta /metrics en 127.0.0.1
+        self._metrics  = Metrics() if metrics_port else None
+        self._server   = SERVER_MODES[mode](host, port, workers=workers, outbox=outbox,
+                                            profile=profile, compression=compression,
+                                            router=router, reuse_port=reuse_port,
+                                            metrics=self._metrics, flow=flow, limits=frame_limits)
+        self._exporter = None
+        if self._metrics is not None:
+            observer = MetricsObserver(self._metrics)
+            self._server.subscribe(observer, observer.event_types)
+            self._exporter = MetricsExporter(self._metrics, metrics_port)
+        # Sin log_filename (p. ej. workers de benchmark) no se suscribe ningún observer
+        self._observer = None
+        commands = {}
+        if log_filename:
+            # Nivel, límite de tasa y muestreo por tipo de evento, también por admin_port ("log")
+            control = LogControl()
+            if log_rules:
+                control.apply(log_rules)
+            self._observer = ServerObserver(log_filename, log_file, control)
+            self._server.subscribe(self._observer, self._observer.event_types)
+            commands.update(control.admin_commands())
+            if self._metrics is not None:
+                self._metrics.gauge("chat_log_dropped_total",
+                                    lambda: {(sink,): count for sink, count in self._observer.dropped.items()})
+        # Paradas por cupo de entrada y entradas de log descartadas ("flow")
+        commands["flow"] = self._flow_report
+        # Perfilado bajo demanda: señales siempre, órdenes por admin_port si se indica
+        self._profiler = Profiler(self._server, profile_dir)
+        commands.update(self._profiler.admin_commands())
+        self._admin = AdminServer(commands, admin_port) if admin_port else None
+        # Diario binario de eventos (journal.py) para análisis y reproducción
+        self._journal = JournalObserver(journal) if journal else None
+        if self._journal is not None:
+            self._server.subscribe(self._journal, self._journal.event_types)
+
+    def _flow_report(self, _args) -> str:
+        stats = self._server.flow_stats()
+        if self._observer is not None:
+            stats.update({f"log_dropped_{sink}": count for sink, count in self._observer.dropped.items()})
+        return " ".join(f"{name}={value:g}" for name, value in stats.items())
 
     def run(self):
         """Inicia el servidor. Bloquea hasta que se detenga."""
+        self._profiler.install_signals()
+        for service in (self._exporter, self._admin):
+            if service is not None:
+                service.start()
         try:
             self._server.start()
         finally:
-            self._observer.stop()
+            for service in (self._exporter, self._admin):
+                if service is not None:
+                    service.stop()
+            if self._observer is not None:
+                self._observer.stop()
+            if self._journal is not None:
+                self._journal.stop()
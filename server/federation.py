@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+federation.py
+-------------
+Federación de nodos ChatServer sobre TCP.
+
+Cada nodo atiende a sus propios clientes y mantiene una conexión TCP con cada
+uno de los demás (FEDERATION_PEERS). Entre nodos viajan las mismas
+operaciones que entre los workers de un cluster (peers.py) y además:
+
+    OP_HELLO    (nodo): primera trama de cada conexión
+    OP_JOIN     (nombre, códecs): un usuario se registró en el nodo emisor
+    OP_CLAIM    (id, nombre, nodo): pide al árbitro reservar un nombre
+    OP_CLAIMED  (id, "1" | ""): respuesta del árbitro
+
+Presencia: cada nodo mantiene nombre -> (nodo, códecs) de toda la
+federación. Al conectar se envían los usuarios locales y después cada alta
+(OP_JOIN) y baja (OP_GONE), así que LIST_USERS y el enrutado de CHAT,
+REQ_CHAT y archivos se resuelven sin consultar a otro nodo.
+
+Propiedad de los nombres: un anillo de hash consistente (HashRing) sobre los
+nodos vivos asigna a cada nombre un nodo árbitro. SET_NAME en cualquier nodo
+se lo pide al árbitro, que lo concede si el nombre no está en su presencia,
+de modo que dos nodos no registran el mismo nombre a la vez. Al entrar o
+salir un nodo solo cambia el árbitro de ~1/N de los nombres, y como la
+presencia está replicada el nuevo árbitro ya conoce los que están en uso.
+
+Un nodo identificado por "host:puerto" de federación puede arrancar con solo
+algunos de los demás en FEDERATION_PEERS: los que reciben su OP_HELLO se
+conectan de vuelta. Si un nodo cae, el resto retira sus usuarios al cerrarse
+su conexión.
+"""
+
+import bisect
+import hashlib
+import itertools
+import socket
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .peers import OP_GONE, Owner, PeerLink, PeerRouter, encode_op
+
+OP_HELLO   = 16
+OP_JOIN    = 17
+OP_CLAIM   = 18
+OP_CLAIMED = 19
+
+VNODES = 64               # puntos del anillo por nodo
+CLAIM_TIMEOUT = 5.0       # segundos de espera a la respuesta del árbitro
+RECONNECT_INTERVAL = 1.0  # segundos entre intentos de conexión con nodos caídos
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """"host:puerto" -> (host, puerto)."""
+    host, _, port = value.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anillo de hash consistente con `vnodes` puntos por nodo."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = VNODES) -> None:
+        points = sorted((_hash(f"{node}#{i}"), node) for node in set(nodes) for i in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Nodo responsable de `key`: el primer punto del anillo a partir de su hash."""
+        if not self._keys:
+            return None
+        return self._nodes[bisect.bisect(self._keys, _hash(key)) % len(self._keys)]
+
+
+class FederationRouter(PeerRouter):
+    """Router de un nodo federado: presencia replicada y árbitro de nombres por hash consistente."""
+
+    # Los enlaces caídos los reabre _connect_loop; un envío no espera a reconectar
+    connect_on_demand = False
+
+    def __init__(self, node: str, peers: Sequence[str] = (), vnodes: int = VNODES) -> None:
+        super().__init__()
+        self.node = node  # "host:puerto" de federación; identifica al nodo en el anillo
+        self._vnodes = vnodes
+        self._presence: Dict[str, Owner] = {}
+        self._presence_lock = threading.Lock()
+        self._live: Set[str] = set()
+        self._ring = HashRing([node], vnodes)
+        self._claims: Dict[str, list] = {}  # id -> [Event, concedido]
+        self._claim_ids = itertools.count(1)
+        self._stopped = threading.Event()
+        for peer in peers:
+            if peer and peer != node:
+                self._add_peer(peer)
+
+    def _add_peer(self, node: str) -> PeerLink:
+        link = self._peers.get(node)
+        if link is None:
+            link = self._peers[node] = PeerLink(parse_address(node), self._greeting)
+        return link
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        self._listen(socket.create_server(parse_address(self.node)))
+        threading.Thread(target=self._connect_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        super().stop()
+
+    def _greeting(self) -> List[bytes]:
+        frames = list(encode_op(OP_HELLO, self.node))
+        for name, session in self.registry.items():
+            frames += encode_op(OP_JOIN, name, ",".join(session.codecs))
+        return frames
+
+    def _connect_loop(self) -> None:
+        while True:
+            for link in list(self._peers.values()):
+                if not link.connected:
+                    link.open()
+            if self._stopped.wait(RECONNECT_INTERVAL):
+                return
+
+    # ------------------------------------------------------------------
+    # Nombres
+    # ------------------------------------------------------------------
+
+    def claim(self, name: str, session: Any) -> bool:
+        if name in self._presence:
+            return False
+        codecs = tuple(session.codecs)
+        arbiter = self._ring.owner(name)
+        if arbiter == self.node:
+            granted = self._arbitrate(name, self.node, codecs)
+        else:
+            granted = self._request_claim(arbiter, name)
+        if not granted:
+            return False
+        with self._presence_lock:
+            self._presence[name] = (self.node, codecs)
+        if not self.registry.register(name, session):  # la sesión se cerró mientras tanto
+            self._forget(name, self.node)
+            self.broadcast(OP_GONE, name)
+            return False
+        self.broadcast(OP_JOIN, name, ",".join(codecs))
+        self._presence_changed(name, True)
+        return True
+
+    def _arbitrate(self, name: str, node: str, codecs: Tuple[str, ...] = ()) -> bool:
+        with self._presence_lock:
+            if name in self._presence:
+                return False
+            self._presence[name] = (node, codecs)  # reserva hasta que llegue OP_JOIN
+            return True
+
+    def _request_claim(self, arbiter: str, name: str) -> bool:
+        claim_id = str(next(self._claim_ids))
+        waiter = self._claims[claim_id] = [threading.Event(), False]
+        try:
+            if not self.forward(arbiter, OP_CLAIM, claim_id, name, self.node):
+                return False
+            if not waiter[0].wait(CLAIM_TIMEOUT):
+                # El árbitro pudo concederlo sin que llegara la respuesta: se libera
+                self.forward(arbiter, OP_GONE, name)
+                return False
+            return waiter[1]
+        finally:
+            self._claims.pop(claim_id, None)
+
+    def release(self, name: str, session: Any) -> bool:
+        if not self.registry.unregister(name, session):
+            return False
+        self._forget(name, self.node)
+        self.broadcast(OP_GONE, name)
+        self._presence_changed(name, False)
+        return True
+
+    def _forget(self, name: str, node: Optional[str]) -> bool:
+        """Retira el nombre de la presencia si pertenece a `node`."""
+        with self._presence_lock:
+            if self._presence.get(name, (None,))[0] != node:
+                return False
+            del self._presence[name]
+        self._remotes.pop(name, None)
+        return True
+
+    def _resolve(self, name: str) -> Optional[Owner]:
+        owner = self._presence.get(name)
+        if owner is None or owner[0] == self.node:
+            return None
+        return owner
+
+    def names(self) -> List[str]:
+        with self._presence_lock:
+            return list(self._presence)
+
+    def count(self) -> int:
+        return len(self._presence)
+
+    # ------------------------------------------------------------------
+    # Operaciones entrantes
+    # ------------------------------------------------------------------
+
+    def _apply(self, op: int, fields: List[str], origin: Dict[str, Any]) -> None:
+        node = origin.get("node")
+        if op == OP_HELLO:
+            node = origin["node"] = fields[0]
+            self._add_peer(node)  # un nodo nuevo que solo nos conocía a nosotros
+            with self._presence_lock:
+                self._live.add(node)
+                self._ring = HashRing([self.node, *self._live], self._vnodes)
+        elif op == OP_JOIN:
+            name, codecs = fields
+            with self._presence_lock:
+                self._presence[name] = (node, tuple(c for c in codecs.split(",") if c))
+            self._remotes.pop(name, None)
+            self._presence_changed(name, True)
+        elif op == OP_GONE:
+            # Solo la baja del dueño actual (el nombre pudo reclamarse ya en otro nodo)
+            if self._forget(fields[0], node):
+                self.drop_user(fields[0])
+                self._presence_changed(fields[0], False)
+        elif op == OP_CLAIM:
+            claim_id, name, requester = fields
+            granted = self._arbitrate(name, requester)
+            self.forward(requester, OP_CLAIMED, claim_id, "1" if granted else "")
+        elif op == OP_CLAIMED:
+            waiter = self._claims.get(fields[0])
+            if waiter is not None:
+                waiter[1] = bool(fields[1])
+                waiter[0].set()
+        else:
+            super()._apply(op, fields, origin)
+
+    def _peer_closed(self, origin: Dict[str, Any]) -> None:
+        node = origin.get("node")
+        if node is None:
+            return
+        with self._presence_lock:
+            self._live.discard(node)
+            self._ring = HashRing([self.node, *self._live], self._vnodes)
+            gone = [name for name, owner in self._presence.items() if owner[0] == node]
+            for name in gone:
+                del self._presence[name]
+        for name in gone:
+            self._remotes.pop(name, None)
+            self.drop_user(name)
+            self._presence_changed(name, False)
+        # El enlace saliente también está muerto: _connect_loop lo reabrirá con saludo
+        self._peers[node].close()
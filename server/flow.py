@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+flow.py
+-------
+Control de flujo de entrada, del socket al manejador.
+
+Cada trama leída de un cliente ocupa cupo hasta que termina su despacho:
+
+- Cupo por cliente (InboundQuota): como mucho `client_frames` tramas y
+  `client_bytes` bytes en vuelo por sesión. Con el cupo lleno el lector deja
+  de leer el socket de ese cliente, el buffer TCP se llena y el propio
+  cliente queda frenado; los demás siguen avanzando.
+- Límite global: las particiones del RequestBuffer están acotadas
+  (`buffer_frames` en total); con todas llenas los lectores esperan.
+- Motor asyncio: los fragmentos se reenvían en `relay_threads` hilos propios
+  (un receptor lento ocupa uno mientras espera sitio en su cola) y la espera
+  por una partición llena es un evento del bucle, sin ocupar ningún hilo.
+
+Créditos (opt-in): un cliente que envía WINDOW recibe CREDIT:<n> con la
+ventana inicial y, a medida que se despachan sus tramas, nuevos CREDIT:<k>
+por lotes de `credit_batch`. El cliente que no envía más tramas de las que
+le quedan en crédito nunca llega a agotar su cupo y no sufre paradas de
+lectura; a los que no lo respetan se les aplica el cupo.
+
+Las paradas (veces y segundos) se cuentan por sesión y por RequestBuffer y
+se publican en /metrics como chat_flow_stalls_total y
+chat_flow_stall_seconds_total.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class FlowConfig:
+    """Cupos de entrada por cliente y global, y ventana de créditos."""
+    client_frames: int = 64
+    client_bytes: int = 4 * 1024 * 1024
+    buffer_frames: int = 8192
+    credit_batch: int = 0  # 0: un cuarto de client_frames
+    relay_threads: int = 64  # hilos de reenvío de fragmentos del motor asyncio
+
+    def __post_init__(self):
+        if self.client_frames < 1 or self.client_bytes < 1 or self.buffer_frames < 0:
+            raise ValueError("client_frames >= 1, client_bytes >= 1 y buffer_frames >= 0")
+        if self.relay_threads < 1:
+            raise ValueError("relay_threads >= 1")
+
+    @property
+    def batch(self) -> int:
+        return self.credit_batch or max(1, self.client_frames // 4)
+
+
+class InboundQuota:
+    """
+    Tramas y bytes de un cliente leídos y aún no despachados. Seguro entre hilos.
+
+    El lector llama a acquire() antes de entregar cada trama y quien la
+    despacha llama a release() al terminar. Una trama mayor que client_bytes
+    se admite cuando no hay nada más en vuelo, para no bloquear al cliente
+    para siempre.
+    """
+
+    def __init__(self, config: FlowConfig, metrics: Optional[Any] = None,
+                 on_credit: Optional[Callable[[int], None]] = None,
+                 on_release: Optional[Callable[[], None]] = None) -> None:
+        self._config = config
+        self._metrics = metrics        # server.metrics.Metrics: paradas por cupo
+        self._on_credit = on_credit    # envía CREDIT:<n> a la sesión
+        self._on_release = on_release  # despierta a un lector asíncrono en espera
+        self._cond = threading.Condition(threading.Lock())
+        self._frames = 0
+        self._bytes = 0
+        self._waiting = False
+        self._credit = False  # el cliente pidió ventana (WINDOW)
+        self._returned = 0    # créditos devueltos aún no comunicados
+        self.stalls = 0
+        self.stall_seconds = 0.0
+
+    def _fits(self, size: int) -> bool:
+        return self._frames == 0 or (self._frames < self._config.client_frames
+                                     and self._bytes + size <= self._config.client_bytes)
+
+    def acquire(self, size: int, block: bool = True) -> bool:
+        """Reserva cupo para una trama; sin block devuelve False si no cabe."""
+        with self._cond:
+            if not self._fits(size):
+                if not block:
+                    self._waiting = True
+                    return False
+                start = time.perf_counter()
+                while not self._fits(size):
+                    self._waiting = True
+                    self._cond.wait()
+                self._stalled(time.perf_counter() - start)
+            self._frames += 1
+            self._bytes += size
+            return True
+
+    def stalled(self, seconds: float) -> None:
+        """Registra una parada de un lector que espera fuera de acquire() (asyncio)."""
+        with self._cond:
+            self._stalled(seconds)
+
+    def _stalled(self, seconds: float) -> None:
+        self.stalls += 1
+        self.stall_seconds += seconds
+        record_stall(self._metrics, "client", seconds)
+
+    def release(self, size: int) -> None:
+        """Libera el cupo de una trama despachada y devuelve créditos si toca."""
+        grant = 0
+        with self._cond:
+            self._frames -= 1
+            self._bytes -= size
+            waiting, self._waiting = self._waiting, False
+            if waiting:
+                self._cond.notify_all()
+            if self._credit:
+                self._returned += 1
+                if self._returned >= self._config.batch:
+                    grant, self._returned = self._returned, 0
+        if waiting and self._on_release is not None:
+            self._on_release()
+        if grant and self._on_credit is not None:
+            self._on_credit(grant)
+
+    def enable_credit(self) -> int:
+        """Activa los créditos (WINDOW) y devuelve la ventana inicial."""
+        with self._cond:
+            self._credit = True
+            self._returned = 0
+        return self._config.client_frames
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "frames":        self._frames,
+                "bytes":         self._bytes,
+                "stalls":        self.stalls,
+                "stall_seconds": self.stall_seconds,
+            }
+
+
+def record_stall(metrics: Optional[Any], reason: str, seconds: float) -> None:
+    """Cuenta una parada de lectura ("client": cupo del cliente; "buffer": RequestBuffer lleno)."""
+    if metrics is not None:
+        metrics.inc("chat_flow_stalls_total", (reason,))
+        metrics.inc("chat_flow_stall_seconds_total", (reason,), seconds)
@@ -1,34 +1,76 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from common.compression import FLAGS_MASK, ROUTED_TYPES, TYPE_MASK
+from common.protocol import BINARY_COMMAND, COMMAND_NAMES, decode_binary, opcode_table, split_args
+
 class ProtocolHandlers:
     """Manejadores de la lógica del protocolo de comunicación."""
 
+    # Comando -> (método de ChatServer, separación de argumentos en v1 (ver
+    # split_args), campos v2 admitidos (mínimo, máximo o None sin límite)).
+    # Los manejadores con *args validan ellos mismos sus campos.
+    COMMANDS = {
+        "HELLO":             ("handle_hello",             -1,   (1, None)),
+        "SET_NAME":          ("handle_set_name",          0,    (1, 1)),
+        "GET_USERS":         ("send_user_list",           None, (0, 0)),
+        "REQ_CHAT":          ("handle_req_chat",          0,    (1, 1)),
+        "ACCEPT_CHAT":       ("handle_accept_chat",       0,    (1, 1)),
+        "DENY_CHAT":         ("handle_deny_chat",         0,    (1, 1)),
+        "STOP_CHAT":         ("handle_stop_chat",         0,    (1, 1)),
+        "CHAT":              ("handle_chat_message",      1,    (0, None)),
+        "REQ_SEND_FILES":    ("handle_req_send_files",    -1,   (0, None)),
+        "ACCEPT_SEND_FILES": ("handle_accept_send_files", -1,   (1, None)),
+        "DENY_SEND_FILES":   ("handle_deny_send_files",   0,    (1, 1)),
+        "FILES_RECEIVED":    ("handle_files_received",    0,    (1, 1)),
+        "ROOM_CREATE":       ("handle_room_create",       0,    (1, 1)),
+        "ROOM_JOIN":         ("handle_room_join",         0,    (1, 1)),
+        "ROOM_LEAVE":        ("handle_room_leave",        0,    (1, 1)),
+        "ROOM_POST":         ("handle_room_post",         1,    (0, None)),
+        "SUB_PRESENCE":      ("handle_sub_presence",      -1,   (0, None)),
+        "WINDOW":            ("handle_window",            -1,   (0, None)),
+    }
+
+    # Opcode v2 -> método de ChatServer (los campos ya llegan separados)
+    BINARY_COMMANDS = opcode_table(COMMANDS)
+
     @staticmethod
     def dispatch(server, session, msg_type: int, payload: bytes):
+        """Despacha una trama y devuelve el nombre del comando atendido (None si no se reconoce)."""
+        # Los bits altos del tipo indican el códec; el lector de la sesión ya
+        # rechazó los no negociados (check_codec). Los archivos se reenvían comprimidos
+        flags = msg_type & FLAGS_MASK
+        msg_type &= TYPE_MASK
+        if flags and msg_type not in ROUTED_TYPES:
+            # Descomprimido tampoco supera el límite de su tipo (64 KiB en comandos)
+            payload = server.frame_codec.decompress(flags, payload, server.frame_limits.limit(msg_type))
         if msg_type in (0, 1):
-            raw = payload.decode("utf-8")
-            if raw.startswith("SET_NAME:"):
-                server.handle_set_name(session, raw.split(":", 1)[1])
-            elif raw.startswith("GET_USERS"):
-                server.send_user_list(session)
-            elif raw.startswith("REQ_CHAT:"):
-                server.handle_req_chat(session, raw.split(":", 1)[1])
-            elif raw.startswith("ACCEPT_CHAT:"):
-                server.handle_accept_chat(session, raw.split(":", 1)[1])
-            elif raw.startswith("DENY_CHAT:"):
-                server.handle_deny_chat(session, raw.split(":", 1)[1])
-            elif raw.startswith("STOP_CHAT:"):
-                server.handle_stop_chat(session, raw.split(":", 1)[1])
-            elif raw.startswith("CHAT:"):
-                server.handle_chat_message(session, raw)
-            elif raw.startswith("REQ_SEND_FILES:"):
-                server.handle_req_send_files(session, raw.split(":", 1)[1])
-            elif raw.startswith("ACCEPT_SEND_FILES:"):
-                server.handle_accept_send_files(session, raw.split(":", 1)[1])
-            elif raw.startswith("DENY_SEND_FILES:"):
-                server.handle_deny_send_files(session, raw.split(":", 1)[1])
-            elif raw.startswith("FILES_RECEIVED:"):
-                server.handle_files_received(session, raw.split(":", 1)[1])
+            name, _, rest = str(payload, "utf-8").partition(":")
+            entry = ProtocolHandlers.COMMANDS.get(name)
+            if entry:
+                method, maxsplit, _ = entry
+                getattr(server, method)(session, *split_args(rest, maxsplit))
+                return name
+        elif msg_type == BINARY_COMMAND:
+            try:
+                opcode, fields = decode_binary(payload)
+            except ValueError:
+                session.send_command("ERROR", "Comando binario mal formado")
+                return None
+            method = ProtocolHandlers.BINARY_COMMANDS.get(opcode)
+            if method:
+                name = COMMAND_NAMES[opcode]
+                least, most = ProtocolHandlers.COMMANDS[name][2]
+                # En v1 split_args ya da la forma; en v2 los campos llegan tal cual
+                if len(fields) < least or (most is not None and len(fields) > most):
+                    session.send_command("ERROR", f"Formato {name} inválido")
+                else:
+                    getattr(server, method)(session, *fields)
+                return name
         elif msg_type == 2:
-            server.handle_file_transfer(session, payload)
+            server.handle_file_transfer(session, payload, flags)
+            return "FILE"
+        elif msg_type == 3:
+            server.handle_file_chunk(session, payload, flags)
+            return "FILE_CHUNK"
+        return None
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+journal.py
+----------
+Diario binario de eventos: cada dataclass de events.py se añade a un archivo
+compacto con registros prefijados por su longitud, junto a un índice disperso
+de tiempo -> posición que permite saltar a un intervalo sin recorrer el
+archivo. La lectura usa mmap.
+
+Formato del diario (events.journal):
+
+    MAGIC "EVJ1"
+    registro*:  !I longitud del cuerpo | !d instante (epoch) | !B tipo | cuerpo
+
+El tipo es la posición del evento en EVENT_TYPES (los nuevos se añaden al
+final). El cuerpo son los campos del dataclass en orden, cada uno con una
+etiqueta: "s" texto (!I + UTF-8), "i" entero (!q), "f" real (!d),
+"t" tupla (!B + elementos), "n" None. Los instantes se toman al emitir y no
+decrecen dentro del archivo.
+
+Índice (events.journal.idx): pares !dQ (instante, posición) del primer
+registro de cada tramo de INDEX_EVERY bytes. Un intervalo se localiza con
+una búsqueda binaria sobre el índice y una lectura desde esa posición.
+
+Escritura (JournalObserver, un observer más del servidor):
+    server.subscribe(JournalObserver("events.journal"))
+
+Lectura:
+    with Journal("events.journal") as journal:
+        for ts, event in journal.replay(start, end, (ChatEstablished,)):
+            ...
+
+Desde la línea de comandos, con server/replay.py:
+    python -m server.replay events.journal --summary
+"""
+
+import dataclasses
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .events import (
+    ServerStarted, ServerStopped, FatalError,
+    ClientHandshakeStarted, ClientJoined, ClientDisconnected,
+    ActiveConnectionsChanged, ChatEstablished, ChatEnded,
+    FileTransferRequested, FileTransferAccepted, FileTransferDenied,
+    FileTransferRouted, FileTransferCompleted,
+    RoomCreated, RoomJoined, RoomLeft, RoomMessagePosted,
+    BufferError, ClientError,
+)
+
+MAGIC = b"EVJ1"
+RECORD = struct.Struct("!IdB")   # longitud del cuerpo, instante, tipo
+INDEX = struct.Struct("!dQ")     # instante, posición del registro
+INDEX_EVERY = 64 * 1024          # bytes de diario entre entradas del índice
+
+# Código de tipo = posición + 1. Solo se añaden tipos al final.
+EVENT_TYPES: Tuple[type, ...] = (
+    ServerStarted, ServerStopped, FatalError,
+    ClientHandshakeStarted, ClientJoined, ClientDisconnected,
+    ActiveConnectionsChanged, ChatEstablished, ChatEnded,
+    FileTransferRequested, FileTransferAccepted, FileTransferDenied,
+    FileTransferRouted, FileTransferCompleted,
+    RoomCreated, RoomJoined, RoomLeft, RoomMessagePosted,
+    BufferError, ClientError,
+)
+CODES: Dict[type, int] = {event_type: code for code, event_type in enumerate(EVENT_TYPES, 1)}
+FIELDS: Dict[type, Tuple[str, ...]] = {
+    event_type: tuple(f.name for f in dataclasses.fields(event_type)) for event_type in EVENT_TYPES
+}
+
+_U32 = struct.Struct("!I")
+_I64 = struct.Struct("!q")
+_F64 = struct.Struct("!d")
+_STR, _INT, _FLOAT, _TUPLE, _NONE = b"siftn"
+
+
+# ---------------------------------------------------------------------------
+# Codificación de campos
+# ---------------------------------------------------------------------------
+
+def _encode(value: Any, out: bytearray) -> None:
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(_STR)
+        out += _U32.pack(len(data))
+        out += data
+    elif isinstance(value, int):
+        out.append(_INT)
+        out += _I64.pack(value)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _F64.pack(value)
+    elif isinstance(value, (tuple, list)):
+        out.append(_TUPLE)
+        out.append(len(value))
+        for item in value:
+            _encode(item, out)
+    elif value is None:
+        out.append(_NONE)
+    else:
+        _encode(str(value), out)
+
+
+def _decode(buf: Any, offset: int) -> Tuple[Any, int]:
+    tag = buf[offset]
+    offset += 1
+    if tag == _STR:
+        size = _U32.unpack_from(buf, offset)[0]
+        offset += 4
+        return str(buf[offset:offset + size], "utf-8"), offset + size
+    if tag == _INT:
+        return _I64.unpack_from(buf, offset)[0], offset + 8
+    if tag == _FLOAT:
+        return _F64.unpack_from(buf, offset)[0], offset + 8
+    if tag == _TUPLE:
+        count = buf[offset]
+        offset += 1
+        items = []
+        for _ in range(count):
+            item, offset = _decode(buf, offset)
+            items.append(item)
+        return tuple(items), offset
+    if tag == _NONE:
+        return None, offset
+    raise ValueError(f"Etiqueta de campo desconocida: {tag!r}")
+
+
+def encode_event(event: Any, timestamp: float) -> bytes:
+    """Registro completo (cabecera + cuerpo) de un evento."""
+    body = bytearray()
+    for name in FIELDS[type(event)]:
+        _encode(getattr(event, name), body)
+    return RECORD.pack(len(body), timestamp, CODES[type(event)]) + body
+
+
+# ---------------------------------------------------------------------------
+# Escritura
+# ---------------------------------------------------------------------------
+
+class JournalObserver:
+    """
+    Observer que añade cada evento al diario desde un hilo propio.
+
+    __call__ solo toma el instante y encola; el hilo escritor saca los eventos
+    por lotes, los codifica y los escribe en una sola llamada, vuelca cada
+    `flush_interval` segundos y mantiene el índice disperso.
+    """
+
+    event_types = EVENT_TYPES
+
+    def __init__(self, path: str = "events.journal", index_every: int = INDEX_EVERY,
+                 flush_interval: float = 1.0) -> None:
+        self.path = path
+        self._index_every = index_every
+        self._flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple[float, Any]]]" = queue.Queue()
+        self._file = open(path, "ab", buffering=256 * 1024)
+        self._index = open(path + ".idx", "ab")
+        self._offset = self._file.tell()
+        if self._offset == 0:
+            self._file.write(MAGIC)
+            self._offset = len(MAGIC)
+        self._last_ts = _last_indexed(path + ".idx")
+        self._next_index = self._offset  # el primer registro siempre se indexa
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def __call__(self, event: Any) -> None:
+        if type(event) in CODES:
+            self._queue.put((time.time(), event))
+
+    def stop(self) -> None:
+        """Escribe lo pendiente y cierra el diario."""
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self._flush_interval)
+                except queue.Empty:
+                    self._flush()
+                    last_flush = time.monotonic()
+                    continue
+                batch = [item]
+                while item is not None and len(batch) < 4096:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                stop = batch[-1] is None
+                self._write([entry for entry in batch if entry is not None])
+                if stop:
+                    break
+                if time.monotonic() - last_flush >= self._flush_interval:
+                    self._flush()
+                    last_flush = time.monotonic()
+        finally:
+            self._flush()
+            self._file.close()
+            self._index.close()
+
+    def _write(self, batch: List[Tuple[float, Any]]) -> None:
+        chunks = []
+        index = []
+        offset = self._offset
+        for timestamp, event in batch:
+            timestamp = max(timestamp, self._last_ts)  # instantes no decrecientes
+            self._last_ts = timestamp
+            record = encode_event(event, timestamp)
+            if offset >= self._next_index:
+                index.append(INDEX.pack(timestamp, offset))
+                self._next_index = offset + self._index_every
+            chunks.append(record)
+            offset += len(record)
+        self._file.write(b"".join(chunks))
+        self._offset = offset
+        self.written += len(batch)
+        if index:
+            self._file.flush()  # el índice nunca apunta más allá de lo escrito
+            self._index.write(b"".join(index))
+
+    def _flush(self) -> None:
+        self._file.flush()
+        self._index.flush()
+
+
+def _last_indexed(index_path: str) -> float:
+    """Último instante indexado de un diario que se reabre para añadir."""
+    try:
+        with open(index_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell() - f.tell() % INDEX.size
+            if size == 0:
+                return 0.0
+            f.seek(size - INDEX.size)
+            return INDEX.unpack(f.read(INDEX.size))[0]
+    except OSError:
+        return 0.0
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+class Journal:
+    """Lectura de un diario con mmap: intervalos por índice y eventos tipados."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._data = _map(path)
+        if self._data is not None and self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un diario de eventos")
+        self._index = _map(path + ".idx")
+        self._entries = len(self._index) // INDEX.size if self._index is not None else 0
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for name in ("_data", "_index"):
+            mapped = getattr(self, name, None)
+            if mapped is not None:
+                mapped.close()
+                setattr(self, name, None)
+
+    def seek(self, start: Optional[float]) -> int:
+        """Posición desde la que leer para no perder registros con instante >= start."""
+        if start is None or not self._entries:
+            return len(MAGIC)
+        # Búsqueda binaria sobre el índice mapeado: primera entrada con instante >= start
+        low, high = 0, self._entries
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX.unpack_from(self._index, middle * INDEX.size)[0] < start:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return len(MAGIC)
+        return INDEX.unpack_from(self._index, (low - 1) * INDEX.size)[1]
+
+    def replay(self, start: Optional[float] = None, end: Optional[float] = None,
+               types: Optional[Iterable[type]] = None) -> Iterator[Tuple[float, Any]]:
+        """
+        Eventos (instante, dataclass) en [start, end], opcionalmente de ciertos tipos.
+
+        Los registros de tipos desconocidos (diarios más nuevos) se saltan, y
+        un registro final incompleto (corte al escribir) termina la lectura.
+        """
+        data = self._data
+        if data is None:
+            return
+        wanted = {CODES[t] for t in types} if types is not None else None
+        size = len(data)
+        offset = self.seek(start)
+        header = RECORD.size
+        while offset + header <= size:
+            length, timestamp, code = RECORD.unpack_from(data, offset)
+            body = offset + header
+            offset = body + length
+            if offset > size:
+                break
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                break
+            if (wanted is not None and code not in wanted) or not 0 < code <= len(EVENT_TYPES):
+                continue
+            event_type = EVENT_TYPES[code - 1]
+            values = []
+            position = body
+            for _ in FIELDS[event_type]:
+                value, position = _decode(data, position)
+                values.append(value)
+            yield timestamp, event_type(*values)
+
+    def __iter__(self) -> Iterator[Tuple[float, Any]]:
+        return self.replay()
+
+    def summary(self, start: Optional[float] = None, end: Optional[float] = None) -> Counter:
+        """Número de eventos por tipo en el intervalo, sin decodificar los cuerpos."""
+        counts: Counter = Counter()
+        data = self._data
+        if data is None:
+            return counts
+        size = len(data)
+        offset = self.seek(start)
+        while offset + RECORD.size <= size:
+            length, timestamp, code = RECORD.unpack_from(data, offset)
+            offset += RECORD.size + length
+            if offset > size:
+                break
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                break
+            counts[EVENT_TYPES[code - 1].__name__ if 0 < code <= len(EVENT_TYPES) else code] += 1
+        return counts
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
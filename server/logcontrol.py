@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+logcontrol.py
+-------------
+Control del volumen de eventos que llegan a la consola y al log, por tipo de
+evento y modificable en caliente:
+
+- Nivel: cada tipo tiene una severidad (DEBUG, INFO, WARNING, ERROR) y cada
+  salida un umbral (console_level, file_level); por debajo no se formatea.
+- Límite de tasa: cubeta de tokens por tipo (rate eventos/s, ráfaga burst).
+- Muestreo: solo 1 de cada `sample` eventos del tipo.
+
+Los eventos descartados por límite o muestreo se cuentan y ServerObserver
+publica cada SUMMARY_INTERVAL segundos un resumen "N eventos suprimidos" por
+tipo. Sin reglas, admit() no toma cerrojos. Por defecto ambas salidas
+admiten DEBUG (todo, como sin control); con console=INFO la consola deja de
+mostrar los eventos de alto volumen, que siguen yendo al archivo.
+
+Las reglas se escriben igual en LOG_RULES (separadas por ';') y en el
+puerto de administración (orden "log"):
+
+    console=WARNING file=INFO
+    FileTransferRouted rate=50 burst=100
+    ClientHandshakeStarted sample=10
+    RoomMessagePosted level=DEBUG
+"""
+
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+SEVERITIES = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Salidas a las que va un evento admitido (máscara)
+CONSOLE = 1
+FILE = 2
+
+SUMMARY_INTERVAL = 5.0
+
+# Severidad por defecto de los eventos de alto volumen y de los errores;
+# el resto son INFO.
+DEFAULT_SEVERITY = {
+    "ClientHandshakeStarted":   "DEBUG",
+    "ActiveConnectionsChanged": "DEBUG",
+    "FileTransferRouted":       "DEBUG",
+    "RoomMessagePosted":        "DEBUG",
+    "BufferError":              "ERROR",
+    "ClientError":              "ERROR",
+    "FatalError":               "ERROR",
+}
+
+
+@dataclass(frozen=True)
+class EventRule:
+    """Regla de un tipo de evento: severidad, límite de tasa y muestreo."""
+    level: str = "INFO"
+    rate: float = 0.0   # eventos/s admitidos (0: sin límite)
+    burst: float = 0.0  # tamaño de la cubeta (0: igual a rate)
+    sample: int = 1     # admite 1 de cada `sample`
+
+
+class TokenBucket:
+    """Cubeta de tokens: `rate` por segundo hasta `burst` acumulados."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+class _TypeState:
+    """Estado de un tipo de evento: salidas, cubeta, contadores."""
+
+    __slots__ = ("rule", "sinks", "bucket", "seen", "suppressed", "lock")
+
+    def __init__(self, rule: EventRule, console_level: int, file_level: int) -> None:
+        self.rule = rule
+        severity = SEVERITIES[rule.level]
+        self.sinks = (CONSOLE if severity >= console_level else 0) | (FILE if severity >= file_level else 0)
+        self.bucket = TokenBucket(rule.rate, rule.burst) if rule.rate > 0 else None
+        self.seen = 0
+        self.suppressed = 0
+        # Solo los tipos con límite o muestreo necesitan cerrojo
+        self.lock = threading.Lock() if self.bucket or rule.sample > 1 else None
+
+
+class LogControl:
+    """Reglas por tipo de evento y umbrales de consola y archivo, configurables en caliente."""
+
+    def __init__(self, console_level: str = "DEBUG", file_level: str = "DEBUG",
+                 rules: Optional[Dict[str, EventRule]] = None) -> None:
+        self._console_level = SEVERITIES[console_level]
+        self._file_level = SEVERITIES[file_level]
+        self._rules: Dict[str, EventRule] = dict(rules or {})
+        self._states: Dict[type, _TypeState] = {}
+        self._carry: Dict[str, int] = {}  # suprimidos de estados ya sustituidos
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Camino de cada evento
+    # ------------------------------------------------------------------
+
+    def admit(self, event_type: type) -> int:
+        """Salidas (CONSOLE | FILE) a las que debe ir un evento; 0 si se descarta."""
+        state = self._states.get(event_type)
+        if state is None:
+            state = self._state_for(event_type)
+        if not state.sinks or state.lock is None:
+            return state.sinks
+        with state.lock:
+            state.seen += 1
+            if (state.rule.sample > 1 and state.seen % state.rule.sample) or \
+                    (state.bucket is not None and not state.bucket.take()):
+                state.suppressed += 1
+                return 0
+        return state.sinks
+
+    def take_suppressed(self) -> Dict[str, int]:
+        """Eventos suprimidos por tipo desde la última llamada (y los pone a cero)."""
+        with self._lock:
+            counts = self._carry
+            self._carry = {}
+            states = list(self._states.items())
+        for event_type, state in states:
+            if state.lock is None:
+                continue
+            with state.lock:
+                if state.suppressed:
+                    name = event_type.__name__
+                    counts[name] = counts.get(name, 0) + state.suppressed
+                    state.suppressed = 0
+        return counts
+
+    def _state_for(self, event_type: type) -> _TypeState:
+        with self._lock:
+            state = self._states.get(event_type)
+            if state is None:
+                state = _TypeState(self.rule(event_type.__name__), self._console_level, self._file_level)
+                self._states = {**self._states, event_type: state}
+            return state
+
+    # ------------------------------------------------------------------
+    # Configuración
+    # ------------------------------------------------------------------
+
+    def rule(self, name: str) -> EventRule:
+        return self._rules.get(name) or EventRule(DEFAULT_SEVERITY.get(name, "INFO"))
+
+    def configure(self, name: str, **changes) -> EventRule:
+        """Cambia campos de la regla de un tipo (level, rate, burst, sample)."""
+        rule = replace(self.rule(name), **changes)
+        if rule.level not in SEVERITIES:
+            raise ValueError(f"Nivel desconocido: {rule.level!r} (usa {', '.join(SEVERITIES)})")
+        if rule.sample < 1 or rule.rate < 0 or rule.burst < 0:
+            raise ValueError("sample >= 1, rate >= 0 y burst >= 0")
+        with self._lock:
+            self._rules[name] = rule
+            self._reset()
+        return rule
+
+    def set_levels(self, console: Optional[str] = None, file: Optional[str] = None) -> None:
+        """Cambia los umbrales de severidad de la consola y del archivo."""
+        for level in (console, file):
+            if level is not None and level not in SEVERITIES:
+                raise ValueError(f"Nivel desconocido: {level!r} (usa {', '.join(SEVERITIES)})")
+        with self._lock:
+            if console is not None:
+                self._console_level = SEVERITIES[console]
+            if file is not None:
+                self._file_level = SEVERITIES[file]
+            self._reset()
+
+    def _reset(self) -> None:
+        """Sustituye los estados (se recalculan al siguiente evento) guardando lo suprimido."""
+        for event_type, state in self._states.items():
+            if state.suppressed:
+                name = event_type.__name__
+                self._carry[name] = self._carry.get(name, 0) + state.suppressed
+        self._states = {}
+
+    def apply(self, spec: str) -> str:
+        """Aplica reglas en texto: 'console=NIVEL file=NIVEL' o '<Tipo> clave=valor...', separadas por ';'."""
+        for part in spec.split(";"):
+            words = part.split()
+            if not words:
+                continue
+            if "=" in words[0]:
+                levels = dict(word.split("=", 1) for word in words)
+                unknown = set(levels) - {"console", "file"}
+                if unknown:
+                    raise ValueError(f"Opciones desconocidas: {', '.join(sorted(unknown))}")
+                self.set_levels(levels.get("console", "").upper() or None,
+                                levels.get("file", "").upper() or None)
+                continue
+            changes = {}
+            for word in words[1:]:
+                key, _, value = word.partition("=")
+                if key == "level":
+                    changes[key] = value.upper()
+                elif key in ("rate", "burst"):
+                    changes[key] = float(value)
+                elif key == "sample":
+                    changes[key] = int(value)
+                else:
+                    raise ValueError(f"Opción desconocida: {key!r} (usa level, rate, burst, sample)")
+            self.configure(words[0], **changes)
+        return self.describe()
+
+    def describe(self) -> str:
+        names = {v: k for k, v in SEVERITIES.items()}
+        parts = [f"console={names[self._console_level]} file={names[self._file_level]}"]
+        for name, rule in sorted(self._rules.items()):
+            parts.append(f"{name} level={rule.level} rate={rule.rate:g} burst={rule.burst:g} sample={rule.sample}")
+        return "; ".join(parts)
+
+    def admin_commands(self) -> Dict[str, Callable[[List[str]], str]]:
+        """Orden 'log' del puerto de administración: sin argumentos muestra las reglas."""
+        def log(args: List[str]) -> str:
+            return self.apply(" ".join(args)) if args else self.describe()
+        return {"log": log}
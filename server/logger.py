@@ -13,9 +13,13 @@ Para conectarlo al servidor, usa ServerFacade o subscribe() directamente:
     server.start()
 """
 
-import re
+import glob
+import gzip
+import os
 import queue
+import shutil
 import threading
+import time
 from datetime import datetime
 from typing import Optional, Any, Dict
 from dataclasses import dataclass
@@ -24,12 +28,14 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.markup import escape
 
+from .logcontrol import CONSOLE, FILE, SUMMARY_INTERVAL, LogControl
 from .events import (
     ServerStarted, ServerStopped, FatalError,
     ClientHandshakeStarted, ClientJoined, ClientDisconnected,
     ActiveConnectionsChanged, ChatEstablished, ChatEnded,
     FileTransferRequested, FileTransferAccepted, FileTransferDenied,
     FileTransferRouted, FileTransferCompleted,
+    RoomCreated, RoomJoined, RoomLeft, RoomMessagePosted,
     BufferError, ClientError,
 )
 
@@ -72,14 +78,35 @@ class BaseLogWorker(threading.Thread):
         raise NotImplementedError
 
 
+# Líneas pendientes de consola a partir de las que se omiten las siguientes
+CONSOLE_BACKLOG = 1000
+
+# Entradas como máximo en cada cola de ServerObserver
+LOG_QUEUE_SIZE = 65536
+
+
 class ConsoleWorker(BaseLogWorker):
-    """Worker de salida a consola usando Rich."""
+    """
+    Worker de salida a consola usando Rich.
 
-    def __init__(self, log_queue: queue.Queue):
+    Si la consola no da abasto y se acumulan más de `max_backlog` líneas, las
+    siguientes se omiten (sin renderizar) hasta ponerse al día, y se imprime
+    cuántas se omitieron: la consola nunca frena al servidor.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_backlog: int = CONSOLE_BACKLOG):
         super().__init__(log_queue)
         self.console = Console()
+        self.max_backlog = max_backlog
+        self.skipped = 0
 
     def process(self, entry: LogEntry):
+        if self.log_queue.qsize() > self.max_backlog:
+            self.skipped += 1
+            return
+        if self.skipped:
+            self.console.print(f"[bold yellow]… {self.skipped} líneas omitidas en consola (saturada)[/]")
+            self.skipped = 0
         ts = entry.timestamp
         lvl = entry.level
         msg = entry.message
@@ -123,45 +150,185 @@ class ConsoleWorker(BaseLogWorker):
                 self.console.print(f"[dim]{ts}[/] [{style}]{lvl}[/] {escape(msg)}")
 
         except Exception:
-            print(f"[{ts}] [{lvl}] {msg}", flush=True)
+            print(plain_line(entry), end="", flush=True)
+
+
+def plain_line(entry: LogEntry) -> str:
+    """Línea de texto plano de una entrada (los mensajes no llevan marcado Rich)."""
+    lvl = entry.level
+    msg = entry.message
+    if lvl == "BANNER" and entry.extra:
+        msg = f"Servidor iniciado. IP: {entry.extra.get('network_ip')}, Puerto: {entry.extra.get('port')}"
+        lvl = "SYSTEM"
+    elif lvl == "CONNECTION" and entry.extra:
+        addr = entry.extra.get("addr", "")
+        msg  = f"Conexión de {addr}: {msg}"
+        lvl  = "INFO"
+    elif lvl == "FILE" and entry.extra:
+        sender   = entry.extra.get("sender",   "")
+        receiver = entry.extra.get("receiver", "")
+        msg = f"Archivo: {sender} -> {receiver}: {msg}"
+    return f"[{entry.timestamp}] [{lvl}] {msg}\n"
+
+
+@dataclass
+class LogFileConfig:
+    """
+    Escritura y rotación del archivo de log.
+
+    Attributes:
+        flush_bytes:     Bytes escritos tras los que se vuelca el buffer al disco.
+        flush_interval:  Segundos máximos que una línea espera en el buffer.
+        batch:           Entradas que se sacan de la cola por escritura.
+        max_bytes:       Rota al superar este tamaño (0: sin límite).
+        rotate_interval: Rota cada tantos segundos (0: nunca por tiempo).
+        backups:         Archivos rotados que se conservan.
+        compress:        Comprime con gzip los archivos rotados.
+    """
+    flush_bytes: int = 64 * 1024
+    flush_interval: float = 1.0
+    batch: int = 1024
+    max_bytes: int = 0
+    rotate_interval: float = 0.0
+    backups: int = 5
+    compress: bool = False
 
 
 class FileWorker(BaseLogWorker):
-    """Worker de persistencia en archivo de texto plano."""
+    """
+    Worker de persistencia en archivo de texto plano.
 
-    def __init__(self, log_queue: queue.Queue, log_filename: str = "server.log"):
+    Mantiene el archivo abierto, saca las entradas de la cola por lotes y las
+    escribe en una sola llamada; el buffer se vuelca al disco al acumular
+    `flush_bytes` o tras `flush_interval` segundos. Rota por tamaño o por
+    tiempo renombrando el archivo con la fecha (server.log.20250101-120000),
+    opcionalmente comprimido con gzip en segundo plano, y conserva `backups`.
+    """
+
+    def __init__(self, log_queue: queue.Queue, log_filename: str = "server.log",
+                 config: Optional[LogFileConfig] = None):
         super().__init__(log_queue)
         self.log_filename = log_filename
+        self.config = config or LogFileConfig()
+        self._file = None
+        self._size = 0          # bytes del archivo actual
+        self._unflushed = 0     # bytes escritos desde el último volcado
+        self._last_flush = time.monotonic()
+        self._rotate_at = 0.0   # instante de la próxima rotación por tiempo
 
-    @staticmethod
-    def _strip_rich(text: str) -> str:
-        if not text:
-            return ""
-        return re.sub(r"\[[^\]]+\]", "", str(text))
+    def run(self):
+        config = self.config
+        try:
+            while self.running:
+                timeout = max(0.0, self._last_flush + config.flush_interval - time.monotonic())
+                try:
+                    entry = self.log_queue.get(timeout=timeout if self._unflushed else 1.0)
+                except queue.Empty:
+                    self._flush()
+                    continue
+                batch = [entry]
+                while entry is not None and len(batch) < config.batch:
+                    try:
+                        entry = self.log_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(entry)
+                stop = batch[-1] is None
+                if stop:
+                    batch.pop()
+                self._write(batch)
+                for _ in range(len(batch) + stop):
+                    self.log_queue.task_done()
+                if stop:
+                    break
+        finally:
+            self._close()
 
     def process(self, entry: LogEntry):
-        ts  = entry.timestamp
-        lvl = entry.level
-        msg = self._strip_rich(entry.message)
-
-        if lvl == "BANNER" and entry.extra:
-            msg = f"Servidor iniciado. IP: {entry.extra.get('network_ip')}, Puerto: {entry.extra.get('port')}"
-            lvl = "SYSTEM"
-        elif lvl == "CONNECTION" and entry.extra:
-            addr = entry.extra.get("addr", "")
-            msg  = f"Conexión de {addr}: {msg}"
-            lvl  = "INFO"
-        elif lvl == "FILE" and entry.extra:
-            sender   = entry.extra.get("sender",   "")
-            receiver = entry.extra.get("receiver", "")
-            msg = f"Archivo: {sender} -> {receiver}: {msg}"
-
-        log_line = f"[{ts}] [{lvl}] {msg}\n"
+        self._write([entry])
+        self._flush()
+
+    def _write(self, entries):
+        if not entries:
+            return
+        data = "".join([plain_line(entry) for entry in entries])
         try:
-            with open(self.log_filename, "a", encoding="utf-8") as f:
-                f.write(log_line)
+            if self._file is None:
+                self._open()
+            self._file.write(data)
         except Exception:
+            return
+        size = len(data.encode("utf-8")) if not data.isascii() else len(data)
+        self._size += size
+        self._unflushed += size
+        config = self.config
+        if (config.max_bytes and self._size >= config.max_bytes) or \
+                (config.rotate_interval and time.time() >= self._rotate_at):
+            self._rotate()
+        elif self._unflushed >= config.flush_bytes or \
+                time.monotonic() - self._last_flush >= config.flush_interval:
+            self._flush()
+
+    def _open(self):
+        self._file = open(self.log_filename, "a", encoding="utf-8", buffering=self.config.flush_bytes)
+        self._size = self._file.tell()
+        if self.config.rotate_interval:
+            self._rotate_at = time.time() + self.config.rotate_interval
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if self._file is None or not self._unflushed:
+            return
+        try:
+            self._file.flush()
+        except Exception:
+            pass
+        self._unflushed = 0
+
+    def _close(self):
+        self._flush()
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """Cierra el archivo actual, lo renombra con la fecha y abre uno nuevo."""
+        self._close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        target = f"{self.log_filename}.{stamp}"
+        suffix = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.log_filename}.{stamp}-{suffix}"
+            suffix += 1
+        try:
+            os.replace(self.log_filename, target)
+        except OSError:
+            return
+        if self.config.compress:
+            threading.Thread(target=self._compress, args=(target,), daemon=True).start()
+        else:
+            self._prune()
+
+    def _compress(self, path: str):
+        try:
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        except OSError:
             pass
+        self._prune()
+
+    def _prune(self):
+        """Borra los archivos rotados más antiguos por encima de `backups`."""
+        rotated = sorted(glob.glob(glob.escape(self.log_filename) + ".*"), key=os.path.getmtime)
+        for path in rotated[:max(0, len(rotated) - self.config.backups)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
 
 # ---------------------------------------------------------------------------
@@ -179,43 +346,41 @@ class ServerObserver:
         observer.stop()
     """
 
-    def __init__(self, log_filename: str = "server.log"):
-        self._console_queue = queue.Queue()
-        self._file_queue    = queue.Queue()
+    def __init__(self, log_filename: str = "server.log", log_file: Optional[LogFileConfig] = None,
+                 control: Optional[LogControl] = None, queue_size: int = LOG_QUEUE_SIZE):
+        # Colas acotadas: si un worker no da abasto se descartan entradas (y se
+        # cuentan) en vez de acumular memoria o frenar al servidor
+        self._console_queue = queue.Queue(queue_size)
+        self._file_queue    = queue.Queue(queue_size)
+        self.dropped = {"console": 0, "file": 0}
+        # Nivel, límite de tasa y muestreo por tipo de evento (logcontrol.py)
+        self.control = control or LogControl()
+        self._sinks = threading.local()  # salidas del evento en curso en cada hilo
 
         self._console_worker = ConsoleWorker(self._console_queue)
-        self._file_worker    = FileWorker(self._file_queue, log_filename)
+        self._file_worker    = FileWorker(self._file_queue, log_filename, log_file)
 
         self._console_worker.start()
         self._file_worker.start()
 
+        self._stopped = threading.Event()
+        self._reported_drops = 0
+        threading.Thread(target=self._summary_loop, daemon=True).start()
+
     # ------------------------------------------------------------------
     # Punto de entrada del observer
     # ------------------------------------------------------------------
 
     def __call__(self, event: Any) -> None:
         """Recibe un evento y lo despacha al método correspondiente."""
-        dispatch = {
-            ServerStarted:            self._on_server_started,
-            ServerStopped:            self._on_server_stopped,
-            FatalError:               self._on_fatal_error,
-            ClientHandshakeStarted:   self._on_handshake_started,
-            ClientJoined:             self._on_client_joined,
-            ClientDisconnected:       self._on_client_disconnected,
-            ActiveConnectionsChanged: self._on_connections_changed,
-            ChatEstablished:          self._on_chat_established,
-            ChatEnded:                self._on_chat_ended,
-            FileTransferRequested:    self._on_file_requested,
-            FileTransferAccepted:     self._on_file_accepted,
-            FileTransferDenied:       self._on_file_denied,
-            FileTransferRouted:       self._on_file_routed,
-            FileTransferCompleted:    self._on_file_completed,
-            BufferError:              self._on_buffer_error,
-            ClientError:              self._on_client_error,
-        }
-        handler = dispatch.get(type(event))
-        if handler:
-            handler(event)
+        handler = self._DISPATCH.get(type(event))
+        if handler is None:
+            return
+        # Descartado por nivel, muestreo o límite: ni se formatea
+        sinks = self.control.admit(type(event))
+        if sinks:
+            self._sinks.value = sinks
+            handler(self, event)
 
     # ------------------------------------------------------------------
     # Handlers por tipo de evento
@@ -269,12 +434,50 @@ class ServerObserver:
         self._broadcast("FILE", "Lote RECIBIDO y confirmado",
                         {"sender": e.sender, "receiver": e.receiver})
 
+    def _on_room_created(self, e: RoomCreated):
+        self._broadcast("INFO", f"Sala {e.room} creada por {e.owner}")
+
+    def _on_room_joined(self, e: RoomJoined):
+        self._broadcast("INFO", f"{e.name} ha entrado en la sala {e.room}")
+
+    def _on_room_left(self, e: RoomLeft):
+        self._broadcast("INFO", f"{e.name} ha salido de la sala {e.room}")
+
+    def _on_room_posted(self, e: RoomMessagePosted):
+        self._broadcast("INFO", f"Mensaje de {e.sender} en la sala {e.room} entregado a {e.delivered} miembros")
+
     def _on_buffer_error(self, e: BufferError):
         self._broadcast("ERROR", f"Error procesando solicitud de {e.session_name}: {e.error_msg}")
 
     def _on_client_error(self, e: ClientError):
         self._broadcast("ERROR", f"{e.session_name}: {e.error_msg}")
 
+    # Tipo de evento -> manejador, construido una sola vez con la clase
+    _DISPATCH = {
+        ServerStarted:            _on_server_started,
+        ServerStopped:            _on_server_stopped,
+        FatalError:               _on_fatal_error,
+        ClientHandshakeStarted:   _on_handshake_started,
+        ClientJoined:             _on_client_joined,
+        ClientDisconnected:       _on_client_disconnected,
+        ActiveConnectionsChanged: _on_connections_changed,
+        ChatEstablished:          _on_chat_established,
+        ChatEnded:                _on_chat_ended,
+        FileTransferRequested:    _on_file_requested,
+        FileTransferAccepted:     _on_file_accepted,
+        FileTransferDenied:       _on_file_denied,
+        FileTransferRouted:       _on_file_routed,
+        FileTransferCompleted:    _on_file_completed,
+        RoomCreated:              _on_room_created,
+        RoomJoined:               _on_room_joined,
+        RoomLeft:                 _on_room_left,
+        RoomMessagePosted:        _on_room_posted,
+        BufferError:              _on_buffer_error,
+        ClientError:              _on_client_error,
+    }
+    # Tipos que atiende: para suscribirse solo a ellos (Observable.subscribe)
+    event_types = tuple(_DISPATCH)
+
     # ------------------------------------------------------------------
     # Infraestructura interna
     # ------------------------------------------------------------------
@@ -282,11 +485,37 @@ class ServerObserver:
     def _broadcast(self, level: str, message: str, extra: Dict[str, Any] = None):
         ts    = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         entry = LogEntry(level, message, ts, extra)
-        self._console_queue.put(entry)
-        self._file_queue.put(entry)
+        sinks = getattr(self._sinks, "value", CONSOLE | FILE)
+        if sinks & CONSOLE:
+            try:
+                self._console_queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped["console"] += 1
+        if sinks & FILE:
+            try:
+                self._file_queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped["file"] += 1
+
+    def _summary_loop(self):
+        """Publica cada SUMMARY_INTERVAL los eventos suprimidos por tipo y las entradas descartadas."""
+        while not self._stopped.wait(SUMMARY_INTERVAL):
+            self._report_suppressed()
+
+    def _report_suppressed(self):
+        suppressed = self.control.take_suppressed()
+        dropped = sum(self.dropped.values())
+        self._sinks.value = CONSOLE | FILE
+        for name, count in sorted(suppressed.items()):
+            self._broadcast("SYSTEM", f"{count} eventos {name} suprimidos (límite o muestreo)")
+        if dropped > self._reported_drops:
+            self._broadcast("SYSTEM", f"{dropped - self._reported_drops} entradas de log descartadas (cola llena)")
+            self._reported_drops = dropped
 
     def stop(self):
         """Detiene los workers ordenadamente, vaciando las colas."""
+        self._stopped.set()
+        self._report_suppressed()
         self._console_queue.put(None)
         self._file_queue.put(None)
         self._console_worker.join(timeout=2.0)
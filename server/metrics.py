@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+metrics.py
+----------
+Métricas del servidor en formato de exposición de Prometheus.
+
+- Metrics: registro de contadores, histogramas y gauges. Cada hilo escribe en
+  su propio almacén (threading.local), así que inc() y observe() no toman
+  ningún cerrojo; solo la exportación recorre y suma los almacenes. Cuando un
+  hilo termina, su almacén se acumula en el total de los hilos retirados.
+  Los gauges se calculan al exportar con una función (profundidad de colas,
+  sesiones), sin coste en el camino de los mensajes.
+- MetricsObserver: observer (como ServerObserver) que cuenta conexiones,
+  chats, transferencias, mensajes de sala y errores a partir de los eventos.
+- MetricsExporter: servidor HTTP local que sirve /metrics.
+
+La instrumentación del camino caliente (tramas y bytes por tipo, latencia de
+despacho por comando, espera en RequestBuffer) la hacen ChatServer, las
+sesiones y RequestBuffer cuando reciben un Metrics; sin él no hacen nada.
+
+    curl http://127.0.0.1:9100/metrics
+"""
+
+import bisect
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from common.compression import TYPE_MASK
+from .events import (
+    ClientHandshakeStarted, ClientDisconnected, ChatEstablished, ChatEnded,
+    FileTransferRequested, FileTransferAccepted, FileTransferDenied,
+    FileTransferRouted, FileTransferCompleted, RoomMessagePosted,
+    BufferError, ClientError, FatalError,
+)
+
+Labels = Tuple[str, ...]
+
+# Límites superiores (segundos) de los histogramas de latencia
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+           0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Nombre de la etiqueta "type" de las tramas
+FRAME_TYPES = ("text", "command", "file", "chunk", "binary")
+
+# nombre -> (tipo, ayuda, etiquetas)
+DEFINITIONS: Dict[str, Tuple[str, str, Labels]] = {
+    "chat_frames_received_total":    ("counter",   "Tramas recibidas de los clientes.", ("type",)),
+    "chat_bytes_received_total":     ("counter",   "Bytes recibidos de los clientes (con cabecera).", ("type",)),
+    "chat_frames_sent_total":        ("counter",   "Tramas encoladas hacia los clientes.", ("type",)),
+    "chat_bytes_sent_total":         ("counter",   "Bytes encolados hacia los clientes (con cabecera).", ("type",)),
+    "chat_connections_total":        ("counter",   "Conexiones aceptadas.", ()),
+    "chat_disconnections_total":     ("counter",   "Conexiones cerradas.", ()),
+    "chat_chats_total":              ("counter",   "Chats establecidos y finalizados.", ("event",)),
+    "chat_file_transfers_total":     ("counter",   "Transferencias de archivos por etapa.", ("stage",)),
+    "chat_room_messages_total":      ("counter",   "Mensajes publicados en salas.", ()),
+    "chat_room_deliveries_total":    ("counter",   "Copias entregadas de mensajes de sala.", ()),
+    "chat_errors_total":             ("counter",   "Errores por origen.", ("kind",)),
+    "chat_dispatch_seconds":         ("histogram", "Tiempo de despacho por comando.", ("command",)),
+    "chat_buffer_wait_seconds":      ("histogram", "Espera en RequestBuffer hasta el despacho.", ()),
+    "chat_buffer_depth":             ("gauge",     "Peticiones pendientes por partición de RequestBuffer.", ("shard",)),
+    "chat_sessions":                 ("gauge",     "Sesiones registradas en este proceso.", ()),
+    "chat_flow_stalls_total":        ("counter",   "Paradas de lectura por cupo de entrada lleno.", ("reason",)),
+    "chat_flow_stall_seconds_total": ("counter",   "Segundos con la lectura de un cliente detenida.", ("reason",)),
+    "chat_log_dropped_total":        ("counter",   "Entradas de log descartadas por cola llena.", ("sink",)),
+}
+
+
+def _frame_keys(received: bool, msg_type: int) -> Tuple[Tuple[str, Labels], Tuple[str, Labels]]:
+    """Claves (tramas, bytes) de los contadores de un tipo de trama."""
+    label = (FRAME_TYPES[msg_type] if msg_type < len(FRAME_TYPES) else str(msg_type),)
+    if received:
+        return ("chat_frames_received_total", label), ("chat_bytes_received_total", label)
+    return ("chat_frames_sent_total", label), ("chat_bytes_sent_total", label)
+
+
+# Tipo de trama -> claves de contador, precalculadas para no construirlas por trama
+_FRAMES_IN: Dict[int, Tuple[Tuple[str, Labels], Tuple[str, Labels]]] = {}
+_FRAMES_OUT: Dict[int, Tuple[Tuple[str, Labels], Tuple[str, Labels]]] = {}
+
+
+class _Store:
+    """Contadores e histogramas escritos por un único hilo."""
+
+    __slots__ = ("counters", "histograms", "__weakref__")
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}  # cubetas..., +Inf, suma
+
+
+class _ThreadToken:
+    """Vive en el threading.local del hilo; al recogerse, su almacén se retira."""
+
+    __slots__ = ("__weakref__",)
+
+
+class Metrics:
+    """Registro de métricas sin cerrojos en escritura (un almacén por hilo)."""
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS) -> None:
+        self._buckets = tuple(buckets)
+        self._local = threading.local()
+        self._stores: List[_Store] = []
+        self._retired = _Store()  # suma de los hilos que ya terminaron
+        self._lock = threading.Lock()  # altas y bajas de almacenes y exportación
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+
+    # ------------------------------------------------------------------
+    # Escritura (camino caliente)
+    # ------------------------------------------------------------------
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        counters = self._store().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        histograms = self._store().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(self._buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self._buckets, value)] += 1
+        histogram[-1] += value
+
+    def frame_in(self, msg_type: int, size: int) -> None:
+        """Trama recibida de `size` bytes de payload."""
+        self._count_frame(_FRAMES_IN, msg_type & TYPE_MASK, size + 5)
+
+    def frame_out(self, frame: Sequence[bytes]) -> None:
+        """Trama encolada como partes (cabecera, payload...)."""
+        size = 0
+        for part in frame:
+            size += len(part)
+        self._count_frame(_FRAMES_OUT, frame[0][0] & TYPE_MASK, size)
+
+    def _count_frame(self, keys: Dict[int, Tuple[Tuple[str, Labels], Tuple[str, Labels]]],
+                     msg_type: int, size: int) -> None:
+        pair = keys.get(msg_type)
+        if pair is None:
+            pair = keys[msg_type] = _frame_keys(keys is _FRAMES_IN, msg_type)
+        frames, nbytes = pair
+        counters = self._store().counters
+        counters[frames] = counters.get(frames, 0) + 1
+        counters[nbytes] = counters.get(nbytes, 0) + size
+
+    def gauge(self, name: str, read: Callable[[], Dict[Labels, float]]) -> None:
+        """Registra un gauge que se calcula al exportar: read() -> {etiquetas: valor}."""
+        self._gauges[name] = read
+
+    def _store(self) -> _Store:
+        try:
+            return self._local.store
+        except AttributeError:
+            store = self._local.store = _Store()
+            token = self._local.token = _ThreadToken()
+            with self._lock:
+                self._stores.append(store)
+            weakref.finalize(token, self._retire, store)
+            return store
+
+    def _retire(self, store: _Store) -> None:
+        with self._lock:
+            self._merge(self._retired, store)
+            self._stores.remove(store)
+
+    @staticmethod
+    def _merge(total: _Store, store: _Store) -> None:
+        for key, value in store.counters.copy().items():
+            total.counters[key] = total.counters.get(key, 0) + value
+        for key, histogram in store.histograms.copy().items():
+            histogram = list(histogram)
+            current = total.histograms.get(key)
+            if current is None:
+                total.histograms[key] = histogram
+            else:
+                total.histograms[key] = [a + b for a, b in zip(current, histogram)]
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> _Store:
+        """Suma de todos los almacenes en este instante."""
+        total = _Store()
+        with self._lock:
+            self._merge(total, self._retired)
+            for store in self._stores:
+                self._merge(total, store)
+        return total
+
+    def render(self) -> str:
+        """Métricas en formato de texto de Prometheus (0.0.4)."""
+        total = self.snapshot()
+        samples: Dict[str, List[str]] = {name: [] for name in DEFINITIONS}
+        for (name, labels), value in sorted(total.counters.items()):
+            samples.setdefault(name, []).append(f"{name}{_labels(name, labels)} {_number(value)}")
+        for (name, labels), histogram in sorted(total.histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), histogram):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(name, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(name, labels)} {_number(histogram[-1])}")
+            lines.append(f"{name}_count{_labels(name, labels)} {cumulative}")
+        for name, read in self._gauges.items():
+            try:
+                values = read()
+            except Exception:
+                continue
+            samples.setdefault(name, []).extend(
+                f"{name}{_labels(name, labels)} {_number(value)}" for labels, value in sorted(values.items()))
+
+        out = []
+        for name, lines in samples.items():
+            kind, text, _ = DEFINITIONS.get(name, ("untyped", "", ()))
+            out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+def _labels(name: str, values: Labels, le: str = "") -> str:
+    names = DEFINITIONS.get(name, ("", "", ()))[2]
+    pairs = [f'{key}="{_escape(value)}"' for key, value in zip(names, values)]
+    if le:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ---------------------------------------------------------------------------
+# Observer de eventos
+# ---------------------------------------------------------------------------
+
+class MetricsObserver:
+    """Observer que traduce eventos del servidor a contadores."""
+
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+        inc = metrics.inc
+        self._dispatch: Dict[type, Callable[[Any], None]] = {
+            ClientHandshakeStarted: lambda e: inc("chat_connections_total"),
+            ClientDisconnected:     lambda e: inc("chat_disconnections_total"),
+            ChatEstablished:        lambda e: inc("chat_chats_total", ("established",)),
+            ChatEnded:              lambda e: inc("chat_chats_total", ("ended",)),
+            FileTransferRequested:  lambda e: inc("chat_file_transfers_total", ("requested",)),
+            FileTransferAccepted:   lambda e: inc("chat_file_transfers_total", ("accepted",)),
+            FileTransferDenied:     lambda e: inc("chat_file_transfers_total", ("denied",)),
+            FileTransferRouted:     lambda e: inc("chat_file_transfers_total", ("routed",)),
+            FileTransferCompleted:  lambda e: inc("chat_file_transfers_total", ("completed",)),
+            RoomMessagePosted:      self._on_room_posted,
+            BufferError:            lambda e: inc("chat_errors_total", ("buffer",)),
+            ClientError:            lambda e: inc("chat_errors_total", ("client",)),
+            FatalError:             lambda e: inc("chat_errors_total", ("fatal",)),
+        }
+        self.event_types = tuple(self._dispatch)  # para Observable.subscribe
+
+    def __call__(self, event: Any) -> None:
+        handler = self._dispatch.get(type(event))
+        if handler:
+            handler(event)
+
+    def _on_room_posted(self, e: RoomMessagePosted) -> None:
+        self.metrics.inc("chat_room_messages_total")
+        self.metrics.inc("chat_room_deliveries_total", (), e.delivered)
+
+
+# ---------------------------------------------------------------------------
+# Exportación HTTP
+# ---------------------------------------------------------------------------
+
+class MetricsExporter:
+    """Sirve GET /metrics en un puerto local desde un hilo daemon."""
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1") -> None:
+        render = metrics.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # sin trazas por petición en la consola del servidor
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
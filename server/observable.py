@@ -14,10 +14,77 @@ Uso:
 
     instancia = MiClase()
     instancia.subscribe(mi_observer)   # mi_observer(event) será llamado
+    instancia.subscribe(otro, (ChatEstablished, ChatEnded))   # solo esos tipos
+    instancia.subscribe(lento, delivery="async", policy="drop")  # en su propio hilo
+
+Cada suscripción puede filtrar por tipos de evento; emit() solo llama a los
+observers del tipo emitido. La tabla tipo -> observers se construye la
+primera vez que se emite cada tipo y se sustituye entera al suscribir o
+cancelar (copia en escritura), así que emit() no toma cerrojos ni copia
+listas. Con delivery="async" el observer recibe los eventos desde una cola
+acotada en su propio hilo y nunca añade latencia al hilo que emite: con la
+política "drop" los eventos que no caben se descartan (y se cuentan), con
+"block" el emisor espera a que haya sitio.
 """
 
+import queue
 import threading
-from typing import Callable, Any
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Capacidad por defecto de la cola de un observer asíncrono
+ASYNC_QUEUE = 10000
+POLICIES = ("drop", "block")
+
+_STOP = object()  # marca de fin para el hilo de un AsyncObserver
+
+
+class AsyncObserver:
+    """Entrega los eventos a un observer desde un hilo propio, con cola acotada."""
+
+    def __init__(self, observer: Callable[[Any], None], maxsize: int = ASYNC_QUEUE,
+                 policy: str = "drop") -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {policy!r} (usa {', '.join(POLICIES)})")
+        self.observer = observer
+        self.dropped = 0  # eventos descartados por cola llena (política "drop")
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize)
+        self._block = policy == "block"
+        self._thread = threading.Thread(target=self._run, name="observer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, event: Any) -> None:
+        if self._block:
+            self._queue.put(event)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                return
+            try:
+                self.observer(event)
+            except Exception:
+                pass
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Entrega lo encolado y termina el hilo (espera como mucho `timeout`)."""
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+# (observer original, tipos aceptados o None para todos, callable que recibe los eventos)
+Subscription = Tuple[Callable[[Any], None], Optional[Tuple[type, ...]], Callable[[Any], None]]
 
 
 class Observable:
@@ -25,51 +92,86 @@ class Observable:
     Mixin que dota a una clase de capacidad de emisión de eventos.
 
     Cualquier clase puede heredar de Observable para publicar eventos
-    a sus observers registrados. La emisión es thread-safe.
+    a sus observers registrados. La emisión es thread-safe y sin cerrojos.
     """
 
     def __init__(self):
-        self._observers: list[Callable[[Any], None]] = []
-        self._obs_lock = threading.Lock()
+        self._subscriptions: Tuple[Subscription, ...] = ()
+        self._routes: Dict[type, Tuple[Callable[[Any], None], ...]] = {}  # tipo -> observers
+        self._obs_lock = threading.Lock()  # solo para suscribir, cancelar y construir rutas
 
-    def subscribe(self, observer: Callable[[Any], None]) -> None:
+    def subscribe(self, observer: Callable[[Any], None],
+                  event_types: Optional[Iterable[type]] = None,
+                  delivery: str = "sync", queue_size: int = ASYNC_QUEUE,
+                  policy: str = "drop") -> Callable[[Any], None]:
         """
-        Registra un observer para recibir todos los eventos emitidos.
+        Registra un observer para recibir los eventos emitidos.
 
         Args:
-            observer: Callable que acepta un único argumento (el evento).
+            observer:    Callable que acepta un único argumento (el evento).
+            event_types: Tipos (o clases base) de evento que recibe; None, todos.
+            delivery:    "sync" (en el hilo que emite) o "async" (hilo y cola propios).
+            queue_size:  Capacidad de la cola en modo "async".
+            policy:      Cola llena en modo "async": "drop" descarta, "block" espera.
+
+        Returns:
+            El callable que recibe los eventos: el propio observer o su AsyncObserver
+            (con `dropped` y `pending()`).
         """
+        if delivery == "sync":
+            target = observer
+        elif delivery == "async":
+            target = AsyncObserver(observer, queue_size, policy)
+        else:
+            raise ValueError(f"Entrega desconocida: {delivery!r} (usa sync o async)")
+        types = tuple(event_types) if event_types is not None else None
         with self._obs_lock:
-            self._observers.append(observer)
+            self._subscriptions += ((observer, types, target),)
+            self._routes = {}
+        return target
 
     def unsubscribe(self, observer: Callable[[Any], None]) -> None:
         """
-        Elimina un observer previamente registrado.
+        Elimina un observer previamente registrado (y detiene su hilo si es asíncrono).
 
         Args:
             observer: El mismo callable que fue registrado.
         """
         with self._obs_lock:
-            try:
-                self._observers.remove(observer)
-            except ValueError:
-                pass
+            removed = [s for s in self._subscriptions if s[0] == observer]
+            if not removed:
+                return
+            self._subscriptions = tuple(s for s in self._subscriptions if s[0] != observer)
+            self._routes = {}
+        for _, _, target in removed:
+            if isinstance(target, AsyncObserver):
+                target.stop()
 
     def emit(self, event: Any) -> None:
         """
-        Emite un evento a todos los observers registrados.
+        Emite un evento a los observers suscritos a su tipo.
 
-        La entrega es síncrona y en el mismo hilo que llama a emit().
+        Los observers síncronos se llaman en el mismo hilo que llama a
+        emit(); los asíncronos solo reciben el evento en su cola.
         Si un observer lanza una excepción, se ignora para no bloquear
         al servidor (mismo principio de robustez que el logger).
 
         Args:
             event: El objeto de evento (dataclass de events.py).
         """
-        with self._obs_lock:
-            observers = list(self._observers)
+        observers = self._routes.get(type(event))
+        if observers is None:
+            observers = self._route(type(event))
         for observer in observers:
             try:
                 observer(event)
             except Exception:
                 pass
+
+    def _route(self, event_type: type) -> Tuple[Callable[[Any], None], ...]:
+        """Observers de un tipo de evento, calculados una vez por tipo y suscripciones."""
+        with self._obs_lock:
+            observers = tuple(target for _, types, target in self._subscriptions
+                              if types is None or issubclass(event_type, types))
+            self._routes[event_type] = observers
+        return observers
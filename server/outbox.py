@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+outbox.py
+---------
+Cola de salida acotada por sesión.
+
+Los manejadores del servidor ya no escriben en el socket: encolan la trama en
+el OutboundQueue de la sesión destino y un escritor propio de esa sesión
+(hilo en ClientSession, corrutina en AsyncClientSession) la vacía. Un receptor
+lento solo llena su propia cola; cuando se desborda se aplica la política
+configurada:
+
+    "disconnect": se cierra la conexión del receptor lento.
+    "drop":       se descarta la trama nueva.
+    "spill":      las tramas se vuelcan a un archivo temporal y se envían,
+                  en orden, cuando la cola en memoria se vacía.
+
+Cada trama se encola como una tupla de buffers (cabecera, payload, ...) sin
+concatenarlos; el escritor extrae con take_batch() todas las tramas listas
+(hasta un límite de bytes) y las envía en una sola escritura scatter-gather.
+Una parte puede ser una FileRegion (archivo recibido en disco): no cuenta
+para el límite de bytes en memoria y el escritor la envía con sendfile.
+
+Las tramas de control (put(control=True): CREDIT, NEED/DONE de las
+transferencias reanudables) no cuentan para los límites ni se descartan ni
+se vuelcan: van a una cola aparte que el escritor atiende antes que el resto,
+en cuanto el envío está en una frontera de trama (dentro del volcado, al
+terminar la trama en curso). Perder una dejaría al cliente sin créditos.
+
+El volcado a disco no retiene el cerrojo de la cola: bajo él solo se reserva
+el tramo del archivo de volcado y la copia (que con una FileRegion puede ser
+de gigabytes) se hace fuera, con escrituras posicionales. El escritor solo
+lee el prefijo contiguo de tramos ya copiados, así que el orden se conserva.
+"""
+
+import os
+import tempfile
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+from common.framing import FileRegion
+
+POLICY_DISCONNECT = "disconnect"
+POLICY_DROP       = "drop"
+POLICY_SPILL      = "spill"
+
+OVERFLOW_POLICIES = (POLICY_DISCONNECT, POLICY_DROP, POLICY_SPILL)
+
+# Tamaño de lectura al vaciar el archivo de volcado
+SPILL_READ_SIZE = 64 * 1024
+# Escrituras y lecturas posicionales en el volcado (sin ellas, p. ej. Windows: seek bajo cerrojo)
+HAS_PWRITE = hasattr(os, "pwrite") and hasattr(os, "pread")
+
+# Tramas máximas por lote: cada una aporta 2-3 buffers y sendmsg admite
+# como mucho IOV_MAX (1024 en Linux) por llamada.
+MAX_BATCH_FRAMES = 256
+
+Frame = Sequence[bytes]
+
+
+@dataclass(frozen=True)
+class OutboxConfig:
+    """Límites y política de desbordamiento de las colas de salida."""
+    max_frames: int = 1024
+    max_bytes: int = 8 * 1024 * 1024
+    policy: str = POLICY_DISCONNECT
+
+    def __post_init__(self):
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de desbordamiento desconocida: {self.policy!r}")
+
+
+class OutboundQueue:
+    """
+    Cola FIFO de tramas pendientes de enviar a un cliente. Segura entre hilos.
+
+    put() nunca bloquea salvo que se pida (block=True, usado por los relays de
+    archivos para propagar contrapresión al emisor). take_batch() entrega las
+    tramas listas como lista de buffers o, si hay tramas volcadas a disco, el
+    siguiente bloque del archivo de volcado.
+    """
+
+    def __init__(self, config: OutboxConfig,
+                 on_ready: Optional[Callable[[], None]] = None,
+                 on_overflow: Optional[Callable[[], None]] = None) -> None:
+        self._config = config
+        self._on_ready = on_ready
+        self._on_overflow = on_overflow
+        self._frames: Deque[Frame] = deque()
+        self._control: Deque[Frame] = deque()  # tramas de control, sin límite ni política
+        self._sizes: Deque[int] = deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._spill = None
+        self._spill_read = 0   # siguiente byte del volcado por enviar
+        self._spill_write = 0  # fin del prefijo ya copiado (legible)
+        self._spill_end = 0    # fin de lo reservado (copiado o en curso)
+        self._spill_pending: Deque[List] = deque()  # [inicio, fin, copiado] en orden de reserva
+        self._spill_bounds: Deque[int] = deque()  # fin de cada trama volcada aún no enviada del todo
+        self._spill_aligned = True  # lo enviado del volcado termina en una frontera de trama
+        self._spill_io = threading.Lock()  # posición del archivo sin escrituras posicionales
+        # Métricas
+        self._high_water = 0
+        self._sent_frames = 0
+        self._sent_bytes = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._batches = 0
+        self.overflowed = False
+
+    # ------------------------------------------------------------------
+    # Productores (manejadores del servidor)
+    # ------------------------------------------------------------------
+
+    def put(self, frame: Frame, block: bool = False, control: bool = False) -> bool:
+        """
+        Encola una trama completa como secuencia de buffers (cabecera, payload...).
+
+        Con control=True la trama nunca se descarta, vuelca ni espera: sale
+        antes que las tramas normales pendientes.
+
+        Returns:
+            True si la trama quedó encolada (en memoria o en disco).
+        """
+        # Bytes en memoria: las regiones de archivo no ocupan cola
+        size = sum(0 if isinstance(part, FileRegion) else len(part) for part in frame)
+        overflow = False
+        spill = None
+        with self._cond:
+            if self._closed:
+                raise ConnectionError("La sesión está cerrada")
+            if control:
+                self._control.append(frame)
+                self._cond.notify_all()
+            elif self._spill_end > self._spill_read:
+                # Ya hay tramas en disco: las nuevas van detrás para conservar el orden
+                spill = self._reserve_spill(frame)
+            elif self._fits(size):
+                self._append(frame, size)
+            elif block:
+                self._cond.wait_for(lambda: self._closed or self._fits(size))
+                if self._closed:
+                    raise ConnectionError("La sesión está cerrada")
+                self._append(frame, size)
+            elif self._config.policy == POLICY_DROP:
+                self._dropped += 1
+                return False
+            elif self._config.policy == POLICY_SPILL:
+                spill = self._reserve_spill(frame)
+            else:
+                self.overflowed = True
+                self._dropped += 1
+                overflow = True
+        if spill is not None and not self._write_spill(frame, *spill):
+            overflow = True
+        if overflow:
+            if self._on_overflow:
+                self._on_overflow()
+            return False
+        if self._on_ready:
+            self._on_ready()
+        return True
+
+    def _fits(self, size: int) -> bool:
+        # Una trama mayor que el límite se admite si la cola está vacía
+        if not self._frames:
+            return True
+        return (len(self._frames) < self._config.max_frames
+                and self._bytes + size <= self._config.max_bytes)
+
+    def _append(self, frame: Frame, size: int) -> None:
+        self._frames.append(frame)
+        self._sizes.append(size)
+        self._bytes += size
+        if len(self._frames) > self._high_water:
+            self._high_water = len(self._frames)
+        self._cond.notify_all()
+
+    def _reserve_spill(self, frame: Frame):
+        """Reserva (bajo el cerrojo) el tramo del volcado donde se copiará la trama."""
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix="outbox_", buffering=0)
+        start = self._spill_end
+        self._spill_end += sum(len(part) for part in frame)
+        entry = [start, self._spill_end, False]
+        self._spill_pending.append(entry)
+        self._spill_bounds.append(self._spill_end)
+        self._spilled += 1
+        return self._spill, entry
+
+    def _write_spill(self, frame: Frame, spill, entry: List) -> bool:
+        """Copia la trama en su tramo (sin el cerrojo) y la hace legible. False si falla."""
+        offset = entry[0]
+        ok = True
+        try:
+            for part in frame:
+                for block in part.blocks() if isinstance(part, FileRegion) else (part,):
+                    self._write_at(spill, block, offset)
+                    offset += len(block)
+        except (OSError, ValueError):
+            ok = False  # disco lleno o cola cerrada: la conexión se corta
+        with self._cond:
+            entry[2] = True
+            while self._spill_pending and self._spill_pending[0][2]:
+                self._spill_write = self._spill_pending.popleft()[1]
+            if self._closed and not self._spill_pending:
+                spill.close()  # close() lo dejó abierto mientras había copias en curso
+            self._cond.notify_all()
+        return ok
+
+    def _write_at(self, spill, data, offset: int) -> None:
+        view = memoryview(data).cast("B")
+        if HAS_PWRITE:
+            fd = spill.fileno()
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+            return
+        with self._spill_io:
+            spill.seek(offset)
+            spill.write(view)
+
+    def _read_at(self, size: int, offset: int) -> bytes:
+        if HAS_PWRITE:
+            return os.pread(self._spill.fileno(), size, offset)
+        with self._spill_io:
+            self._spill.seek(offset)
+            return self._spill.read(size)
+
+    # ------------------------------------------------------------------
+    # Consumidor (escritor de la sesión)
+    # ------------------------------------------------------------------
+
+    def take_batch(self, timeout: Optional[float] = 0, max_bytes: int = 0,
+                   window: float = 0.0) -> Optional[List[bytes]]:
+        """
+        Extrae el siguiente lote de buffers a enviar en una sola escritura.
+
+        Args:
+            timeout:   0 para no esperar, None para esperar indefinidamente.
+            max_bytes: tope orientativo del lote (la primera trama siempre
+                       entra); 0 desactiva la agrupación (una trama por lote).
+            window:    segundos que se espera a que lleguen más tramas cuando
+                       el lote aún no alcanza max_bytes (0: solo las ya listas).
+
+        Returns:
+            Lista de buffers (las partes de una o varias tramas, en orden) o
+            None si no hay nada (o la cola se cerró).
+        """
+        with self._cond:
+            if timeout != 0:
+                self._cond.wait_for(
+                    lambda: (self._closed or self._frames or self._control
+                             or self._spill_write > self._spill_read),
+                    timeout,
+                )
+            if self._closed:
+                return None
+            if self._control and self._spill_aligned:
+                # Control primero: nunca a mitad de una trama volcada
+                batch = [part for frame in self._control for part in frame]
+                self._sent_frames += len(self._control)
+                self._control.clear()
+                self._batches += 1
+                return batch
+            if self._frames:
+                if window and max_bytes and self._bytes < max_bytes:
+                    # Ventana de agrupación: Nagle en espacio de usuario, acotado
+                    self._cond.wait_for(lambda: self._closed or self._bytes >= max_bytes, window)
+                    if self._closed:
+                        return None
+                batch: List[bytes] = []
+                taken = 0
+                count = 0
+                while self._frames and count < MAX_BATCH_FRAMES:
+                    if count and (not max_bytes or taken + self._sizes[0] > max_bytes):
+                        break
+                    batch.extend(self._frames.popleft())
+                    taken += self._sizes.popleft()
+                    count += 1
+                self._bytes -= taken
+                self._cond.notify_all()
+                self._sent_frames += count
+                self._sent_bytes += taken
+                self._batches += 1
+                return batch
+            if self._spill_write > self._spill_read:
+                size = min(SPILL_READ_SIZE, self._spill_write - self._spill_read)
+                if self._control:
+                    # Hay control esperando: se corta al final de la trama en curso
+                    size = min(size, self._spill_bounds[0] - self._spill_read)
+                data = self._read_at(size, self._spill_read)
+                self._spill_read += len(data)
+                self._spill_aligned = False
+                while self._spill_bounds and self._spill_bounds[0] <= self._spill_read:
+                    self._spill_aligned = self._spill_bounds.popleft() == self._spill_read
+                if self._spill_read == self._spill_end:
+                    # Sin copias en curso: el volcado se vacía y vuelve a empezar
+                    self._spill.truncate(0)
+                    self._spill_read = self._spill_write = self._spill_end = 0
+                    self._spill_aligned = True
+                self._sent_bytes += len(data)
+                self._batches += 1
+                return [data]
+            return None
+
+    def close(self) -> None:
+        """Cierra la cola y libera el archivo de volcado."""
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._control.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            if self._spill is not None and not self._spill_pending:
+                self._spill.close()  # con copias en curso lo cierra la última (_write_spill)
+            self._spill = None
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def pending(self) -> bool:
+        """Indica si quedan datos por enviar (en memoria o en disco)."""
+        with self._cond:
+            return bool(self._frames or self._control) or self._spill_end > self._spill_read
+
+    def wait_empty(self, timeout: float) -> bool:
+        """Espera hasta `timeout` segundos a que el escritor saque todas las tramas en memoria."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed or not (self._frames or self._control),
+                                       timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Métricas de la cola: profundidad, bytes pendientes y contadores."""
+        with self._cond:
+            return {
+                "depth":         len(self._frames) + len(self._control),
+                "bytes":         self._bytes,
+                "spill_bytes":   self._spill_end - self._spill_read,
+                "high_water":    self._high_water,
+                "sent_frames":   self._sent_frames,
+                "sent_bytes":    self._sent_bytes,
+                "batches":       self._batches,
+                "dropped":       self._dropped,
+                "spilled":       self._spilled,
+            }
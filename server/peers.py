@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+peers.py
+--------
+Base de los routers cuyos usuarios pueden estar en otro proceso o nodo
+(ClusterRouter en cluster.py, FederationRouter en federation.py).
+
+Para un usuario ajeno, lookup() devuelve una RemoteSession con la misma
+interfaz de envío que ClientSession. Sus envíos viajan al dueño por un
+PeerLink (socket Unix o TCP) como tramas TLV cuyo tipo es la operación:
+
+    OP_COMMAND  campos v2 (destino, comando, *argumentos): el dueño lo
+                codifica con el protocolo y la compresión de la sesión
+    OP_FRAME    DST_LEN + DST + TIPO + DATOS: trama enrutada (tipos 2 y 3)
+                que se encola tal cual en la sesión destino; los NEED/DONE
+                de las transferencias reanudables, como control
+    OP_LINK     (a, b): abre el chat a <-> b en el registro del otro extremo
+    OP_UNLINK   (a, b): lo cierra
+    OP_GONE     (nombre): el usuario se desconectó
+    OP_OFFER    (emisor, receptor, "STREAM,RESUME" | ""): modos ofrecidos, se
+                guardan en el proceso del receptor, que es quien recibe la
+                aceptación ("1" de nodos anteriores equivale a STREAM)
+
+Cada router guarda en su SessionRegistry las sesiones de chat de sus usuarios
+locales, también con compañeros remotos, así que are_connected() no sale del
+proceso. Las operaciones hacia un mismo destino comparten conexión: llegan en
+orden, pero un receptor lento frena el resto del tráfico de ese enlace.
+
+Las conexiones entrantes se leen con los FrameLimits del servidor (más el
+margen de PEER_OVERHEAD): un OP_FRAME con un archivo mayor que `spool` se
+recibe en un archivo temporal y se encola como FileRegion, igual que desde
+un cliente.
+"""
+
+import dataclasses
+import socket
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple, Union
+
+from common.framing import (
+    FileRegion, FrameLimits, FrameReader, Payload, frame_parts, send_buffers, split_field,
+)
+from common.compression import TYPE_MASK
+from common.protocol import PROTOCOL_V1, decode_binary, encode_binary
+from .core import CHUNK_DONE, CHUNK_NEED, FILE_CHUNK
+from .router import LocalRouter
+
+OP_COMMAND = 1
+OP_FRAME   = 2
+OP_LINK    = 3
+OP_UNLINK  = 4
+OP_GONE    = 5
+OP_OFFER   = 6
+
+Owner = Tuple[Hashable, Tuple[str, ...]]  # (proceso o nodo dueño, códecs negociados)
+Address = Union[str, Tuple[str, int]]     # ruta de socket Unix o (host, puerto)
+
+# Bytes que una operación añade a la trama del cliente que transporta
+# (destino, emisor, tipo y cabeceras de campo; cada nombre ocupa como mucho 255)
+PEER_OVERHEAD = 1024
+
+
+def peer_limits(limits: FrameLimits) -> FrameLimits:
+    """
+    Límites de las tramas entre procesos o nodos a partir de los de los clientes.
+
+    El tipo de trama es la operación: OP_FRAME (2) usa el límite y el umbral de
+    volcado de los archivos y el resto, el de los comandos.
+    """
+    return dataclasses.replace(limits, command=limits.command + PEER_OVERHEAD,
+                               file=limits.file + PEER_OVERHEAD)
+
+
+def encode_op(op: int, *fields: str) -> Tuple[bytes, ...]:
+    """Trama de una operación con campos v2, lista para send_buffers."""
+    return frame_parts(op, encode_binary(0, *fields))
+
+
+def is_control(msg_type: int, body: Payload) -> bool:
+    """
+    Indica si una trama enrutada (EMISOR_LEN + EMISOR + ...) es un NEED/DONE.
+
+    El dueño del receptor la encola como control (ver ChatServer.handle_file_chunk):
+    el flag no viaja en OP_FRAME, se deduce del propio fragmento.
+    """
+    if msg_type & TYPE_MASK != FILE_CHUNK or isinstance(body, FileRegion):
+        return False
+    _, offset = split_field(body)
+    return len(body) > offset + 4 and body[offset + 4] in (CHUNK_NEED, CHUNK_DONE)
+
+
+class RemoteSession:
+    """Usuario conectado a otro proceso o nodo; misma interfaz de envío que ClientSession."""
+
+    closed = False
+    protocol = PROTOCOL_V1
+
+    def __init__(self, router: "PeerRouter", name: str, owner: Owner) -> None:
+        self._router = router
+        self.name = name
+        self.owner, self.codecs = owner
+
+    def send(self, msg_type: int, data: Payload, block: bool = False,
+             control: bool = False) -> bool:
+        # El enlace no descarta tramas; `control` lo vuelve a deducir el dueño (is_control)
+        return self._router.forward_frame(self.owner, self.name, msg_type, data)
+
+    def send_command(self, name: str, *fields: str, control: bool = False) -> bool:
+        return self._router.forward(self.owner, OP_COMMAND, self.name, name, *fields)
+
+
+class PeerLink:
+    """
+    Conexión saliente hacia otro proceso o nodo, abierta bajo demanda.
+
+    `greeting` devuelve las tramas que se envían nada más conectar, antes
+    que cualquier otra (presentación del nodo, usuarios locales...).
+    """
+
+    def __init__(self, address: Address,
+                 greeting: Optional[Callable[[], List[bytes]]] = None) -> None:
+        self.address = address
+        self._greeting = greeting
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def open(self) -> bool:
+        """Conecta si hace falta. False si el otro extremo no responde."""
+        return self.send(())
+
+    def send(self, buffers: Sequence[bytes], connect: bool = True) -> bool:
+        """Envía las tramas. Con connect=False falla si no hay conexión abierta."""
+        with self._lock:
+            try:
+                if self._sock is None:
+                    if not connect:
+                        return False
+                    self._sock = self._connect()
+                    if self._greeting is not None:
+                        send_buffers(self._sock, self._greeting())
+                if buffers:
+                    send_buffers(self._sock, buffers)
+                return True
+            except OSError:
+                self._close()
+                return False
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+            return sock
+        sock = socket.create_connection(self.address, timeout=5)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+class PeerRouter(LocalRouter):
+    """
+    Router con usuarios en otros procesos o nodos.
+
+    Las subclases rellenan self._peers (dueño -> PeerLink), implementan
+    _resolve() (dueño de un nombre que no está en este proceso) y deciden
+    cómo se reclaman los nombres. Con connect_on_demand = False los envíos a
+    un enlace caído fallan en el acto en vez de intentar reconectar.
+    """
+
+    connect_on_demand = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._peers: Dict[Hashable, PeerLink] = {}
+        self._remotes: Dict[str, RemoteSession] = {}  # caché, se invalida con OP_GONE
+        self._listener: Optional[socket.socket] = None
+
+    def _resolve(self, name: str) -> Optional[Owner]:
+        raise NotImplementedError
+
+    def lookup(self, name: str) -> Optional[Any]:
+        session = self.registry.get(name)
+        if session is not None:
+            return session
+        remote = self._remotes.get(name)
+        if remote is not None:
+            return remote
+        owner = self._resolve(name)
+        if owner is None:
+            return None
+        remote = self._remotes[name] = RemoteSession(self, name, owner)
+        return remote
+
+    def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+        for peer in self._peers.values():
+            peer.close()
+
+    # ------------------------------------------------------------------
+    # Sesiones de chat: se replican en el dueño de cada extremo remoto
+    # ------------------------------------------------------------------
+
+    def connect(self, a: str, b: str) -> bool:
+        if not self._link(a, b):
+            return False
+        self._notify_owners(OP_LINK, a, b)
+        return True
+
+    def _link(self, a: str, b: str) -> bool:
+        """Arista a <-> b en el registro local si sus extremos locales siguen registrados."""
+        local = [name for name in (a, b) if not isinstance(self.lookup(name), RemoteSession)]
+        return self.registry.connect(a, b, local)
+
+    def disconnect(self, a: str, b: str) -> None:
+        self.registry.disconnect(a, b)
+        self._notify_owners(OP_UNLINK, a, b)
+
+    def _notify_owners(self, op: int, a: str, b: str) -> None:
+        owners: Set[Hashable] = set()
+        for name in (a, b):
+            remote = self.lookup(name)
+            if isinstance(remote, RemoteSession):
+                owners.add(remote.owner)
+        for owner in owners:
+            self.forward(owner, op, a, b)
+
+    # ------------------------------------------------------------------
+    # Ofertas de transferencia: se guardan donde está el receptor
+    # ------------------------------------------------------------------
+
+    def set_offer(self, sender: str, receiver: str, modes: Tuple[str, ...]) -> None:
+        remote = self.lookup(receiver)
+        if isinstance(remote, RemoteSession):
+            self.forward(remote.owner, OP_OFFER, sender, receiver, ",".join(modes))
+        else:
+            super().set_offer(sender, receiver, modes)
+
+    # ------------------------------------------------------------------
+    # Reenvío
+    # ------------------------------------------------------------------
+
+    def forward(self, owner: Hashable, op: int, *fields: str) -> bool:
+        """Envía una operación con campos v2 al dueño indicado."""
+        return self._send_peer(owner, encode_op(op, *fields))
+
+    def forward_frame(self, owner: Hashable, name: str, msg_type: int, data: Payload) -> bool:
+        """Reenvía una trama enrutada sin copiar sus partes."""
+        parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else tuple(data)
+        dst = name.encode("utf-8")
+        head = bytes([len(dst)]) + dst + bytes([msg_type])
+        return self._send_peer(owner, frame_parts(OP_FRAME, (head,) + parts))
+
+    def broadcast(self, op: int, *fields: str) -> None:
+        """Envía la operación a todos los enlaces."""
+        frame = encode_op(op, *fields)
+        for owner in list(self._peers):
+            self._send_peer(owner, frame)
+
+    def _send_peer(self, owner: Hashable, buffers: Sequence[bytes]) -> bool:
+        peer = self._peers.get(owner)
+        if peer is not None and peer.send(buffers, self.connect_on_demand):
+            return True
+        # Dueño caído: sus usuarios dejan de resolverse desde la caché
+        for name, remote in list(self._remotes.items()):
+            if remote.owner == owner:
+                self._remotes.pop(name, None)
+        return False
+
+    def _listen(self, listener: socket.socket) -> None:
+        """Atiende las conexiones entrantes de otros procesos o nodos."""
+        self._listener = listener
+        threading.Thread(target=self._accept_loop, args=(listener,), daemon=True).start()
+
+    def _accept_loop(self, listener: socket.socket) -> None:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._peer_loop, args=(conn,), daemon=True).start()
+
+    def _peer_loop(self, conn: socket.socket) -> None:
+        """Aplica en orden las operaciones que llegan por una conexión entrante."""
+        reader = FrameReader(conn, limits=peer_limits(self.frame_limits))
+        origin: Dict[str, Any] = {}  # estado de la conexión para las subclases
+        try:
+            while True:
+                frame = reader.read_frame(reuse=False)
+                if frame is None:
+                    break
+                op, payload = frame
+                if op == OP_FRAME:
+                    dst, offset = split_field(payload)
+                    session = self.registry.get(str(dst, "utf-8"))
+                    if session is None:
+                        continue
+                    if isinstance(payload, FileRegion):
+                        # Volcado a disco: se encola como región y sale con sendfile
+                        msg_type, body = payload.read(offset, 1)[0], payload.region(offset + 1)
+                    else:
+                        msg_type, body = payload[offset], payload[offset + 1:]
+                    try:
+                        session.send(msg_type, body, block=True, control=is_control(msg_type, body))
+                    except ConnectionError:
+                        pass  # el destinatario se desconectó: el enlace sigue sirviendo a los demás
+                    continue
+                _, fields = decode_binary(payload)
+                self._apply(op, fields, origin)
+        except (OSError, ValueError):
+            # ValueError: trama que excede peer_limits() o mal formada
+            pass
+        finally:
+            conn.close()
+            self._peer_closed(origin)
+
+    def _apply(self, op: int, fields: List[str], origin: Dict[str, Any]) -> None:
+        """Aplica una operación con campos llegada de otro proceso o nodo."""
+        if op == OP_COMMAND:
+            session = self.registry.get(fields[0])
+            if session is not None:
+                try:
+                    session.send_command(*fields[1:])
+                except ConnectionError:
+                    pass  # el destinatario se desconectó durante la entrega
+        elif op == OP_LINK:
+            self._link(*fields)
+        elif op == OP_UNLINK:
+            self.registry.disconnect(*fields)
+        elif op == OP_GONE:
+            self._remotes.pop(fields[0], None)
+            self.drop_user(fields[0])
+            self._presence_changed(fields[0], False)
+        elif op == OP_OFFER:
+            modes = ("STREAM",) if fields[2] == "1" else tuple(m for m in fields[2].split(",") if m)
+            super().set_offer(fields[0], fields[1], modes)
+
+    def _peer_closed(self, origin: Dict[str, Any]) -> None:
+        """Se llama al cerrarse una conexión entrante."""
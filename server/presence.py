@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+presence.py
+-----------
+Presencia versionada: quién está conectado, con suscripción a los cambios.
+
+Cada alta o baja de un nombre incrementa la versión y se envía a los
+suscriptores como un delta de una entrada, en vez de que cada cliente pida
+la lista completa:
+
+    SUB_PRESENCE:<época>:<versión>                 cliente -> servidor
+    PRESENCE_SNAPSHOT:<época>,<versión>,a,b,c...   lista completa
+    PRESENCE_DELTA:<época>,<versión>,+a,-b...      cambios desde la anterior
+
+Un cliente que se reconecta envía la época y la versión que tenía y recibe
+solo los cambios posteriores si siguen en el historial (HISTORY entradas) y
+ocupan menos que la lista completa; si no, o si el servidor se reinició
+(otra época), recibe la lista completa. Sin versión recibe la lista completa.
+
+La lista completa (y la respuesta a GET_USERS) se codifica una vez por
+versión y variante de sesión y se reutiliza hasta el siguiente cambio. Los
+deltas se codifican una vez y se reparten con FanOut, bajo el mismo cerrojo
+que las suscripciones: cada suscriptor recibe las versiones en orden y sin
+huecos.
+"""
+
+import secrets
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from common.compression import FrameCodec
+from .rooms import EncodedMessage, FanOut
+
+# Cambios que se recuerdan para responder a una reconexión con un delta
+HISTORY = 4096
+
+
+class Presence:
+    """Nombres conectados, versión, historial de cambios y suscriptores."""
+
+    def __init__(self, frame_codec: FrameCodec, fanout: FanOut, history: int = HISTORY) -> None:
+        self._frame_codec = frame_codec
+        self._fanout = fanout
+        self.epoch = secrets.token_hex(4)  # distingue versiones de arranques distintos
+        self.version = 0
+        self._names: Dict[str, None] = {}  # conjunto con orden de llegada
+        self._log: Deque[Tuple[int, str]] = deque(maxlen=history)  # (versión, "+nombre" | "-nombre")
+        self._subscribers: Set[Any] = set()
+        self._targets: Tuple[Any, ...] = ()  # instantánea de _subscribers para el reparto
+        self._snapshot: Optional[EncodedMessage] = None
+        self._user_list: Optional[EncodedMessage] = None
+        self._lock = threading.Lock()
+
+    def update(self, name: str, joined: bool) -> None:
+        """Aplica un alta o baja y la envía a los suscriptores. Ignora las repetidas."""
+        with self._lock:
+            if joined == (name in self._names):
+                return
+            if joined:
+                self._names[name] = None
+            else:
+                del self._names[name]
+            self.version += 1
+            entry = ("+" if joined else "-") + name
+            self._log.append((self.version, entry))
+            self._snapshot = self._user_list = None
+            if self._targets:
+                delta = EncodedMessage(self._frame_codec, "PRESENCE_DELTA",
+                                       self.epoch, str(self.version), entry)
+                self._fanout.deliver(self._targets, delta)
+
+    def subscribe(self, session: Any, epoch: str = "", version: str = "") -> None:
+        """Suscribe la sesión y le envía el delta desde `version` o la lista completa."""
+        with self._lock:
+            message = self._since(epoch, version) or self._full()
+            try:
+                session.send_frame(message.frame_for(session))
+            except ConnectionError:
+                return
+            self._subscribers.add(session)
+            self._targets = tuple(self._subscribers)
+
+    def unsubscribe(self, session: Any) -> None:
+        with self._lock:
+            if session in self._subscribers:
+                self._subscribers.discard(session)
+                self._targets = tuple(self._subscribers)
+
+    def user_list(self) -> EncodedMessage:
+        """Respuesta a GET_USERS, codificada una vez por versión."""
+        with self._lock:
+            if self._user_list is None:
+                self._user_list = EncodedMessage(self._frame_codec, "LIST_USERS", *self._names)
+            return self._user_list
+
+    def _full(self) -> EncodedMessage:
+        if self._snapshot is None:
+            self._snapshot = EncodedMessage(self._frame_codec, "PRESENCE_SNAPSHOT",
+                                            self.epoch, str(self.version), *self._names)
+        return self._snapshot
+
+    def _since(self, epoch: str, version: str) -> Optional[EncodedMessage]:
+        """Delta desde `version`, o None si no se puede reconstruir o no compensa."""
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        since = int(version)
+        if since > self.version:
+            return None
+        oldest = self._log[0][0] if self._log else self.version + 1
+        if since < oldest - 1:
+            return None  # parte de los cambios ya salió del historial
+        changes: Dict[str, str] = {}  # nombre -> último cambio
+        for entry_version, entry in reversed(self._log):
+            if entry_version <= since:
+                break
+            changes.setdefault(entry[1:], entry)
+        if len(changes) >= len(self._names) and changes:
+            return None
+        return EncodedMessage(self._frame_codec, "PRESENCE_DELTA",
+                              self.epoch, str(self.version), *reversed(changes.values()))
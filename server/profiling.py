@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+profiling.py
+------------
+Perfilado bajo demanda de un servidor en marcha, durante una ventana acotada,
+sin reiniciarlo ni coste cuando no está activo.
+
+- cprofile: cada despacho de ProtocolHandlers se ejecuta bajo su propio
+  cProfile y las estadísticas se acumulan por comando (y por tanto por
+  método handle_* de ChatServer). Al terminar escribe un .prof por comando
+  (pstats, snakeviz...) y un resumen de texto.
+- sample: un hilo muestrea sys._current_frames() cada `interval` segundos.
+  Escribe las pilas en formato "collapsed" (flamegraph.pl, speedscope) y un
+  resumen con las muestras por método manejador y por función hoja.
+- memory: dos instantáneas de tracemalloc separadas por la ventana, más el
+  recuento de objetos de los tipos que crecen con la carga (sesiones,
+  LogEntry, mensajes codificados) y de lo encolado (RequestBuffer, colas de
+  salida). Escribe las dos instantáneas (.snap) y el crecimiento por línea y
+  por archivo del servidor.
+
+Se dispara desde el puerto de administración local (AdminServer, ADMIN_PORT)
+o con señales: SIGUSR1 perfila con cProfile y SIGUSR2 mide la memoria.
+
+    echo "cprofile 10" | nc 127.0.0.1 9200
+    echo "sample 10 5" | nc 127.0.0.1 9200      # 10 s, una muestra cada 5 ms
+    echo "memory 30"   | nc 127.0.0.1 9200
+    echo "status"      | nc 127.0.0.1 9200
+    kill -USR1 <pid>
+"""
+
+import cProfile
+import gc
+import io
+import os
+import pstats
+import signal
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from .handlers import ProtocolHandlers
+
+# Ventana por defecto (segundos) de cada modo, también la de las señales
+WINDOWS = {"cprofile": 10.0, "sample": 10.0, "memory": 30.0}
+SAMPLE_INTERVAL = 0.005
+# Ventana máxima que se acepta desde el puerto de administración
+MAX_WINDOW = 600.0
+
+# Tipos cuyo número de instancias se cuenta en el modo memory
+TRACKED_TYPES = ("ClientSession", "AsyncClientSession", "RemoteSession", "LogEntry", "EncodedMessage")
+
+# Métodos de ChatServer que atienden cada trama (para atribuir muestras)
+HANDLER_METHODS = frozenset(
+    [method for method, *_ in ProtocolHandlers.COMMANDS.values()]
+    + ["handle_file_transfer", "handle_file_chunk"]
+)
+
+
+def handler_for(command: str) -> str:
+    """Método de ChatServer que atiende un comando (o una trama de archivo)."""
+    if command == "FILE":
+        return "handle_file_transfer"
+    if command == "FILE_CHUNK":
+        return "handle_file_chunk"
+    return ProtocolHandlers.COMMANDS.get(command, ("?",))[0]
+
+
+class Profiler:
+    """Ejecuta una sesión de perfilado a la vez sobre un ChatServer."""
+
+    def __init__(self, server: Any, directory: str = "profiles") -> None:
+        self._server = server
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._running: Optional[str] = None  # modo en curso
+        self._last: List[str] = []  # archivos de la última sesión
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._skipped = 0
+
+    # ------------------------------------------------------------------
+    # Control
+    # ------------------------------------------------------------------
+
+    def start(self, mode: str, seconds: Optional[float] = None, interval: float = SAMPLE_INTERVAL) -> str:
+        """
+        Lanza una sesión en segundo plano.
+
+        ValueError si el modo no existe o la ventana o el intervalo no son
+        positivos; RuntimeError si ya hay otra sesión en curso.
+        """
+        if mode not in WINDOWS:
+            raise ValueError(f"Modo de perfilado desconocido: {mode!r} (usa {', '.join(WINDOWS)})")
+        # "not x > 0" rechaza también NaN
+        if seconds is not None and not seconds > 0:
+            raise ValueError(f"la ventana debe ser positiva: {seconds:g} s")
+        if not interval > 0:
+            raise ValueError(f"el intervalo de muestreo debe ser positivo: {interval * 1000:g} ms")
+        seconds = min(seconds or WINDOWS[mode], MAX_WINDOW)
+        with self._lock:
+            if self._running:
+                raise RuntimeError(f"ya hay una sesión {self._running} en curso")
+            self._running = mode
+        run = getattr(self, f"_run_{mode}")
+        threading.Thread(target=self._guarded, args=(run, seconds, interval),
+                         name=f"profiler-{mode}", daemon=True).start()
+        return f"{mode} durante {seconds:g} s -> {os.path.abspath(self._directory)}"
+
+    def status(self) -> str:
+        with self._lock:
+            if self._running:
+                return f"en curso: {self._running}"
+        return "inactivo; últimos archivos: " + (", ".join(self._last) or "ninguno")
+
+    def admin_commands(self) -> Dict[str, Callable[[List[str]], str]]:
+        """Órdenes del puerto de administración: <modo> [segundos] [ms entre muestras] y status."""
+        def run(mode: str) -> Callable[[List[str]], str]:
+            def command(args: List[str]) -> str:
+                seconds = float(args[0]) if args else None
+                interval = float(args[1]) / 1000 if len(args) > 1 else SAMPLE_INTERVAL
+                return "iniciado: " + self.start(mode, seconds, interval)
+            return command
+        commands = {mode: run(mode) for mode in WINDOWS}
+        commands["status"] = lambda args: self.status()
+        return commands
+
+    def install_signals(self) -> None:
+        """SIGUSR1 -> cprofile, SIGUSR2 -> memory (solo desde el hilo principal, POSIX)."""
+        if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self._from_signal("cprofile"))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self._from_signal("memory"))
+
+    def _from_signal(self, mode: str) -> None:
+        try:
+            self.start(mode)
+        except RuntimeError:
+            pass  # ya hay una sesión en curso
+
+    def _guarded(self, run, seconds: float, interval: float) -> None:
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            prefix = os.path.join(self._directory, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+            self._last = run(prefix, seconds, interval)
+        finally:
+            with self._lock:
+                self._running = None
+
+    # ------------------------------------------------------------------
+    # cProfile por comando
+    # ------------------------------------------------------------------
+
+    def _run_cprofile(self, prefix: str, seconds: float, _interval: float) -> List[str]:
+        self._stats = {}
+        self._skipped = 0
+        self._server._dispatch_hook = self._profiled_dispatch
+        try:
+            time.sleep(seconds)
+        finally:
+            self._server._dispatch_hook = None
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            skipped = self._skipped
+
+        files = []
+        summary = io.StringIO()
+        summary.write(f"cProfile por comando, {seconds:g} s")
+        if skipped:
+            summary.write(f" ({skipped} despachos sin perfilar: otro perfilador activo)")
+        summary.write("\n")
+        for command, command_stats in sorted(stats.items(), key=lambda item: -item[1].total_tt):
+            path = f"{prefix}-cprofile-{command}.prof"
+            command_stats.dump_stats(path)
+            files.append(path)
+            summary.write(f"\n=== {command} ({handler_for(command)}) "
+                          f"{command_stats.total_calls} llamadas, {command_stats.total_tt:.4f} s ===\n")
+            command_stats.stream = summary
+            command_stats.sort_stats("cumulative").print_stats(15)
+        path = f"{prefix}-cprofile.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        return [path] + files
+
+    def _profiled_dispatch(self, server: Any, session: Any, msg_type: int, payload: bytes) -> Optional[str]:
+        """Despacho de ProtocolHandlers bajo un cProfile propio, acumulado por comando."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Otro perfilador ya está activo (en 3.12+ cProfile es uno por intérprete)
+            with self._lock:
+                self._skipped += 1
+            return ProtocolHandlers.dispatch(server, session, msg_type, payload)
+        command = None
+        try:
+            command = ProtocolHandlers.dispatch(server, session, msg_type, payload)
+            return command
+        finally:
+            profile.disable()
+            key = command or "UNKNOWN"
+            with self._lock:
+                current = self._stats.get(key)
+                if current is None:
+                    self._stats[key] = pstats.Stats(profile)
+                else:
+                    current.add(profile)
+
+    # ------------------------------------------------------------------
+    # Muestreo de pilas
+    # ------------------------------------------------------------------
+
+    def _run_sample(self, prefix: str, seconds: float, interval: float) -> List[str]:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        handlers: Counter = Counter()
+        leaves: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                handler = None
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    if handler is None and code.co_name in HANDLER_METHODS:
+                        handler = code.co_name
+                    frame = frame.f_back
+                leaves[stack[0]] += 1
+                stack.append(_thread_group(names.get(ident, "?")))
+                stacks[";".join(reversed(stack))] += 1
+                if handler:
+                    handlers[handler] += 1
+            samples += 1
+            time.sleep(interval)
+
+        folded = f"{prefix}-sample.folded"
+        with open(folded, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        path = f"{prefix}-sample.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"{samples} muestras en {seconds:g} s (cada {interval * 1000:g} ms)\n\n")
+            f.write("Muestras por manejador de ChatServer:\n")
+            for name, count in handlers.most_common():
+                f.write(f"  {count:>8}  {name}\n")
+            f.write("\nFunciones hoja (incluye hilos en espera):\n")
+            for name, count in leaves.most_common(30):
+                f.write(f"  {count:>8}  {name}\n")
+        return [path, folded]
+
+    # ------------------------------------------------------------------
+    # Memoria
+    # ------------------------------------------------------------------
+
+    def _run_memory(self, prefix: str, seconds: float, _interval: float) -> List[str]:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(10)
+        try:
+            before, counts_before, queued_before = tracemalloc.take_snapshot(), _type_counts(), self._queued()
+            time.sleep(seconds)
+            after, counts_after, queued_after = tracemalloc.take_snapshot(), _type_counts(), self._queued()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        files = [f"{prefix}-memory-before.snap", f"{prefix}-memory-after.snap"]
+        before.dump(files[0])
+        after.dump(files[1])
+        path = f"{prefix}-memory.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Crecimiento de memoria en {seconds:g} s\n\nInstancias por tipo (antes -> después):\n")
+            for name in TRACKED_TYPES:
+                f.write(f"  {name:<20}{counts_before[name]:>10} -> {counts_after[name]:<10}\n")
+            f.write("\nEncolado (antes -> después):\n")
+            for name in queued_after:
+                f.write(f"  {name:<20}{queued_before[name]:>10} -> {queued_after[name]:<10}\n")
+            f.write("\nCrecimiento por archivo del servidor:\n")
+            for stat in after.compare_to(before, "filename"):
+                filename = stat.traceback[0].filename
+                if os.sep + "server" + os.sep in filename or os.sep + "common" + os.sep in filename:
+                    f.write(f"  {stat.size_diff / 1024:>+10.1f} KiB {stat.count_diff:>+8}  {filename}\n")
+            f.write("\nCrecimiento por línea (30 mayores):\n")
+            for stat in after.compare_to(before, "lineno")[:30]:
+                f.write(f"  {stat}\n")
+        return [path] + files
+
+    def _queued(self) -> Dict[str, int]:
+        """Peticiones en RequestBuffer y tramas y bytes en las colas de salida."""
+        outbound = self._server.outbound_stats().values()
+        return {
+            "buffer_requests": sum(shard["depth"] for shard in self._server.buffer_stats()),
+            "outbox_frames": sum(stats["depth"] for stats in outbound),
+            "outbox_bytes": sum(stats["bytes"] for stats in outbound),
+        }
+
+
+def _type_counts() -> Counter:
+    counts: Counter = Counter()
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in TRACKED_TYPES:
+            counts[name] += 1
+    return counts
+
+
+def _thread_group(name: str) -> str:
+    """Agrupa los hilos numerados (Thread-12, profiler-...) por su prefijo."""
+    return name.split("-", 1)[0].split(" ", 1)[0] or name
+
+
+# ---------------------------------------------------------------------------
+# Puerto de administración
+# ---------------------------------------------------------------------------
+
+class AdminServer:
+    """
+    Órdenes de una línea en un puerto local.
+
+    `commands` asocia cada orden a una función que recibe el resto de palabras
+    y devuelve la respuesta; Profiler.admin_commands() aporta cprofile,
+    sample, memory y status, y otros componentes pueden añadir las suyas.
+    """
+
+    def __init__(self, commands: Dict[str, Callable[[List[str]], str]], port: int,
+                 host: str = "127.0.0.1") -> None:
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = _command(commands, line.decode("utf-8", "replace"))
+                    self.wfile.write((reply + "\n").encode("utf-8"))
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self.port = self._server.server_address[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _command(commands: Dict[str, Callable[[List[str]], str]], line: str) -> str:
+    words = line.split()
+    if not words:
+        return ""
+    command = commands.get(words[0])
+    if command is None:
+        return f"error: orden desconocida {words[0]!r} (usa {', '.join(sorted(commands))})"
+    try:
+        return command(words[1:])
+    except (ValueError, RuntimeError) as e:
+        return f"error: {e}"
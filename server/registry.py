@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+registry.py
+-----------
+Registro de clientes conectados y de las sesiones de chat activas.
+
+- Los clientes se guardan en un dict protegido por un cerrojo
+  lectores-escritor: las búsquedas del camino caliente (enrutar CHAT o un
+  archivo) se ejecutan en paralelo y solo los registros/bajas son exclusivos.
+- Las sesiones de chat se guardan como lista de adyacencia por usuario
+  (nombre -> compañeros), con cerrojos particionados por nombre (lock
+  striping). Conectar, cortar y consultar un par cuesta O(1) y desconectar
+  a un usuario cuesta O(grado), sin recorrer todas las sesiones del servidor.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class RWLock:
+    """Cerrojo lectores-escritor con preferencia de escritura."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class SessionRegistry:
+    """Clientes registrados por nombre y grafo de sesiones de chat activas."""
+
+    def __init__(self, stripes: int = 16) -> None:
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = RWLock()
+        self._adjacency: Dict[str, Set[str]] = {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    # ------------------------------------------------------------------
+    # Clientes
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Any]:
+        """Sesión registrada con ese nombre, o None."""
+        with self._clients_lock.read():
+            return self._clients.get(name)
+
+    def names(self) -> List[str]:
+        """Nombres registrados, en orden de registro."""
+        with self._clients_lock.read():
+            return list(self._clients)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._clients_lock.read():
+            return list(self._clients.items())
+
+    def count(self) -> int:
+        with self._clients_lock.read():
+            return len(self._clients)
+
+    def register(self, name: str, session: Any) -> bool:
+        """
+        Registra la sesión con `name` y actualiza session.name.
+
+        Returns:
+            False si el nombre ya está en uso o la sesión ya se cerró.
+        """
+        with self._clients_lock.write():
+            if session.closed or name in self._clients:
+                return False
+            session.name = name
+            self._clients[name] = session
+            return True
+
+    def unregister(self, name: str, session: Any) -> bool:
+        """Da de baja el nombre solo si sigue perteneciendo a esa sesión."""
+        with self._clients_lock.write():
+            if self._clients.get(name) is session:
+                del self._clients[name]
+                return True
+            return False
+
+    # ------------------------------------------------------------------
+    # Sesiones de chat (lista de adyacencia)
+    # ------------------------------------------------------------------
+
+    def _stripe(self, name: str) -> threading.Lock:
+        # Cada cerrojo protege los conjuntos de compañeros de los nombres que le
+        # corresponden; el dict externo se apoya en la atomicidad de sus
+        # operaciones individuales (get/setdefault/pop) bajo el GIL.
+        return self._stripes[hash(name) % len(self._stripes)]
+
+    @contextmanager
+    def _pair_locks(self, a: str, b: str) -> Iterator[None]:
+        # Se toman en orden fijo para evitar interbloqueos entre pares cruzados
+        locks = sorted({self._stripe(a), self._stripe(b)}, key=id)
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def connect(self, a: str, b: str, registered: Optional[Iterable[str]] = None) -> bool:
+        """
+        Abre la sesión de chat a <-> b si los nombres de `registered` (por
+        defecto ambos) siguen registrados.
+
+        La comprobación y el alta se hacen bajo el cerrojo de escritura de los
+        clientes: una baja (unregister) queda antes, y la conexión falla, o
+        después, y su drop_user() se lleva la arista. Sin ello una aceptación
+        concurrente con la desconexión dejaría una arista huérfana que heredaría
+        la siguiente sesión con el mismo nombre.
+
+        Returns:
+            False si alguno de esos nombres ya no está registrado.
+        """
+        required = (a, b) if registered is None else tuple(registered)
+        with self._clients_lock.write():
+            if any(name not in self._clients for name in required):
+                return False
+            with self._pair_locks(a, b):
+                self._adjacency.setdefault(a, set()).add(b)
+                self._adjacency.setdefault(b, set()).add(a)
+            return True
+
+    def disconnect(self, a: str, b: str) -> None:
+        """Cierra la sesión de chat a <-> b."""
+        with self._pair_locks(a, b):
+            self._discard_edge(a, b)
+            self._discard_edge(b, a)
+
+    def _discard_edge(self, a: str, b: str) -> None:
+        partners = self._adjacency.get(a)
+        if partners is not None:
+            partners.discard(b)
+            if not partners:
+                del self._adjacency[a]
+
+    def are_connected(self, a: str, b: str) -> bool:
+        """Indica si hay una sesión de chat activa entre a y b."""
+        with self._stripe(a):
+            partners = self._adjacency.get(a)
+            return partners is not None and b in partners
+
+    def partners(self, name: str) -> Set[str]:
+        """Copia de los compañeros de chat de un usuario."""
+        with self._stripe(name):
+            return set(self._adjacency.get(name, ()))
+
+    def drop_user(self, name: str) -> Set[str]:
+        """Cierra todas las sesiones de un usuario en O(grado). Devuelve sus compañeros."""
+        with self._stripe(name):
+            partners = self._adjacency.pop(name, set())
+        for partner in partners:
+            with self._stripe(partner):
+                self._discard_edge(partner, name)
+        return partners
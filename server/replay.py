@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+replay.py
+---------
+Lectura del diario binario de eventos (journal.py) desde la línea de comandos.
+
+    python -m server.replay events.journal --summary
+    python -m server.replay events.journal --since "2025-01-01 10:00" --until "2025-01-01 10:05"
+    python -m server.replay events.journal --type ChatEstablished --type ChatEnded
+"""
+
+import argparse
+from datetime import datetime
+from typing import Optional
+
+from .journal import EVENT_TYPES, Journal
+
+
+def _parse_time(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lectura de un diario de eventos del servidor")
+    parser.add_argument("path", help="archivo .journal")
+    parser.add_argument("--since", help="inicio (ISO 8601 o epoch)")
+    parser.add_argument("--until", help="fin (ISO 8601 o epoch)")
+    parser.add_argument("--type", action="append", default=[], help="solo este tipo de evento (repetible)")
+    parser.add_argument("--summary", action="store_true", help="solo el número de eventos por tipo")
+    args = parser.parse_args()
+
+    by_name = {event_type.__name__: event_type for event_type in EVENT_TYPES}
+    types = [by_name[name] for name in args.type] or None
+    start, end = _parse_time(args.since), _parse_time(args.until)
+    with Journal(args.path) as journal:
+        if args.summary:
+            for name, count in journal.summary(start, end).most_common():
+                print(f"{count:>10}  {name}")
+            return
+        for timestamp, event in journal.replay(start, end, types):
+            print(datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="milliseconds"), event)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+rooms.py
+--------
+Salas de chat (ROOM_CREATE / ROOM_JOIN / ROOM_LEAVE / ROOM_POST).
+
+Un mensaje publicado en una sala se codifica una sola vez por variante de
+sesión (versión de protocolo y códecs negociados; en la práctica una o dos
+variantes por sala) y la misma trama —cabecera y payload, sin copiar— se
+encola en la cola de salida de cada miembro. No se vuelve a partir,
+codificar ni comprimir por destinatario.
+
+Las salas grandes se reparten en tramos de FANOUT_SLICE miembros entre los
+hilos de FanOut. La publicación espera a que terminen todos los tramos, así
+que los mensajes sucesivos de una sala llegan en orden a cada miembro.
+
+Las salas son locales al proceso: en los modos cluster y federado solo
+incluyen a los usuarios conectados a ese worker o nodo.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from common.compression import FrameCodec
+from common.framing import frame_parts
+from common.protocol import frame_command
+
+# A partir de estos miembros la entrega se reparte entre los hilos de FanOut
+FANOUT_PARALLEL = 1024
+FANOUT_SLICE    = 512
+FANOUT_WORKERS  = 4
+
+
+class EncodedMessage:
+    """Comando codificado una vez por variante (protocolo, códecs) de sesión."""
+
+    def __init__(self, frame_codec: FrameCodec, name: str, *fields: str) -> None:
+        self._frame_codec = frame_codec
+        self._name = name
+        self._fields = fields
+        self._frames: Dict[Tuple[int, Tuple[str, ...]], Tuple[bytes, ...]] = {}
+
+    def frame_for(self, session: Any) -> Tuple[bytes, ...]:
+        """Trama (cabecera + payload) en el formato que espera la sesión."""
+        key = (session.protocol, session.codecs)
+        frame = self._frames.get(key)
+        if frame is None:
+            msg_type, payload = frame_command(session.protocol, self._name, *self._fields)
+            if session.codecs:
+                msg_type, payload = self._frame_codec.encode(msg_type, payload, session.codecs)
+            # Entre hilos de FanOut puede codificarse dos veces; se queda la primera
+            frame = self._frames.setdefault(key, frame_parts(msg_type, payload))
+        return frame
+
+    @property
+    def variants(self) -> int:
+        """Codificaciones distintas que se han necesitado."""
+        return len(self._frames)
+
+
+class Room:
+    """Sala con sus miembros por nombre."""
+
+    def __init__(self, name: str, owner: str) -> None:
+        self.name = name
+        self.owner = owner
+        self._members: Dict[str, Any] = {}
+        self._snapshot: Optional[Tuple[Any, ...]] = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._members
+
+
+class RoomRegistry:
+    """
+    Salas por nombre y salas de cada usuario.
+
+    Las altas y bajas toman un único cerrojo; las publicaciones recorren una
+    instantánea inmutable de los miembros que solo se reconstruye tras un
+    cambio, así que no compiten con ellas.
+    """
+
+    def __init__(self) -> None:
+        self._rooms: Dict[str, Room] = {}
+        self._user_rooms: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, name: str, session: Any) -> bool:
+        """Crea la sala con `session` como primer miembro. False si ya existe."""
+        with self._lock:
+            if name in self._rooms:
+                return False
+            room = self._rooms[name] = Room(name, session.name)
+            self._add(room, session)
+            return True
+
+    def join(self, name: str, session: Any) -> Optional[bool]:
+        """Añade la sesión a la sala. None si no existe, False si ya era miembro."""
+        with self._lock:
+            room = self._rooms.get(name)
+            if room is None:
+                return None
+            if session.name in room._members:
+                return False
+            self._add(room, session)
+            return True
+
+    def leave(self, name: str, user: str) -> bool:
+        """Saca al usuario de la sala (que se borra al quedar vacía). False si no era miembro."""
+        with self._lock:
+            room = self._rooms.get(name)
+            if room is None or user not in room._members:
+                return False
+            self._remove(room, user)
+            return True
+
+    def drop_user(self, user: str) -> List[str]:
+        """Saca al usuario de todas sus salas. Devuelve sus nombres."""
+        with self._lock:
+            names = list(self._user_rooms.get(user, ()))
+            for name in names:
+                self._remove(self._rooms[name], user)
+            return names
+
+    def is_member(self, name: str, user: str) -> bool:
+        room = self._rooms.get(name)
+        return room is not None and user in room
+
+    def members(self, name: str) -> Tuple[Any, ...]:
+        """Instantánea de las sesiones de la sala (vacía si no existe)."""
+        room = self._rooms.get(name)
+        if room is None:
+            return ()
+        snapshot = room._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = room._snapshot
+                if snapshot is None:
+                    snapshot = room._snapshot = tuple(room._members.values())
+        return snapshot
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._rooms)
+
+    def _add(self, room: Room, session: Any) -> None:
+        room._members[session.name] = session
+        room._snapshot = None
+        self._user_rooms.setdefault(session.name, set()).add(room.name)
+
+    def _remove(self, room: Room, user: str) -> None:
+        del room._members[user]
+        room._snapshot = None
+        rooms = self._user_rooms.get(user)
+        if rooms is not None:
+            rooms.discard(room.name)
+            if not rooms:
+                del self._user_rooms[user]
+        if not room._members:
+            del self._rooms[room.name]
+
+
+def deliver(members: Sequence[Any], message: EncodedMessage, skip: Any = None) -> int:
+    """Encola la trama del mensaje en cada miembro salvo `skip`. Devuelve las entregas."""
+    frame_for = message.frame_for
+    delivered = 0
+    for session in members:
+        if session is skip:
+            continue
+        try:
+            if session.send_frame(frame_for(session)):
+                delivered += 1
+        except ConnectionError:
+            pass  # el miembro se desconectó durante la entrega
+    return delivered
+
+
+class FanOut:
+    """Entrega de un mensaje a muchas sesiones, en paralelo para las salas grandes."""
+
+    def __init__(self, workers: int = FANOUT_WORKERS, parallel: int = FANOUT_PARALLEL,
+                 slice_size: int = FANOUT_SLICE) -> None:
+        self._workers = workers
+        self._parallel = parallel
+        self._slice = slice_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def deliver(self, members: Sequence[Any], message: EncodedMessage, skip: Any = None) -> int:
+        """Entrega el mensaje y espera a que termine. Devuelve las entregas."""
+        if len(members) < self._parallel or self._workers < 2:
+            return deliver(members, message, skip)
+        pool = self._get_pool()
+        futures = [pool.submit(deliver, members[i:i + self._slice], message, skip)
+                   for i in range(0, len(members), self._slice)]
+        return sum(future.result() for future in futures)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self._workers, thread_name_prefix="fanout")
+            return self._pool
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
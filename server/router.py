@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+router.py
+---------
+Enrutado de usuarios para ChatServer.
+
+El servidor no busca destinatarios directamente en su SessionRegistry sino a
+través de un router, que decide a quién pertenece cada nombre:
+
+- LocalRouter (por defecto): todos los usuarios están en este proceso; es una
+  capa fina sobre SessionRegistry.
+- ClusterRouter (cluster.py): los usuarios se reparten entre varios procesos
+  y los que viven en otro se devuelven como RemoteSession, con la misma
+  interfaz de envío que ClientSession.
+
+Cada alta y baja de un nombre, local o de otro proceso o nodo, se notifica a
+`on_presence` (presencia versionada, ver presence.py).
+
+Las ofertas de transferencia por fragmentos (REQ_SEND_FILES:...:STREAM) se
+guardan aquí porque, en un cluster, la oferta y la aceptación pueden llegar
+a procesos distintos.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from common.framing import FrameLimits
+from .registry import SessionRegistry
+
+
+class LocalRouter:
+    """Router de un único proceso: delega en SessionRegistry."""
+
+    def __init__(self, registry: Optional[SessionRegistry] = None) -> None:
+        self.registry = registry or SessionRegistry()
+        # (emisor, receptor) -> modos ofrecidos en REQ_SEND_FILES (STREAM, RESUME)
+        self._offers: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._offers_lock = threading.Lock()
+        # (nombre, True alta / False baja); lo fija ChatServer
+        self.on_presence: Optional[Callable[[str, bool], None]] = None
+        # Límites de las tramas de los clientes; los de otros procesos o nodos se
+        # derivan de ellos (ver peers.py). Los fija ChatServer
+        self.frame_limits = FrameLimits()
+
+    def start(self) -> None:
+        """Se llama al arrancar el servidor."""
+
+    def stop(self) -> None:
+        """Se llama al detener el servidor."""
+
+    # ------------------------------------------------------------------
+    # Nombres
+    # ------------------------------------------------------------------
+
+    def claim(self, name: str, session: Any) -> bool:
+        """Registra el nombre para la sesión. False si ya está en uso."""
+        if not self.registry.register(name, session):
+            return False
+        self._presence_changed(name, True)
+        return True
+
+    def release(self, name: str, session: Any) -> bool:
+        """Libera el nombre si sigue perteneciendo a la sesión."""
+        if not self.registry.unregister(name, session):
+            return False
+        self._presence_changed(name, False)
+        return True
+
+    def lookup(self, name: str) -> Optional[Any]:
+        """Sesión a la que enviar para llegar a `name`, o None."""
+        return self.registry.get(name)
+
+    def names(self) -> List[str]:
+        return self.registry.names()
+
+    def _presence_changed(self, name: str, joined: bool) -> None:
+        if self.on_presence is not None:
+            self.on_presence(name, joined)
+
+    def count(self) -> int:
+        return self.registry.count()
+
+    # ------------------------------------------------------------------
+    # Sesiones de chat
+    # ------------------------------------------------------------------
+
+    def connect(self, a: str, b: str) -> bool:
+        """Abre el chat a <-> b. False si alguno de los dos ya se desconectó."""
+        return self.registry.connect(a, b)
+
+    def disconnect(self, a: str, b: str) -> None:
+        self.registry.disconnect(a, b)
+
+    def are_connected(self, a: str, b: str) -> bool:
+        return self.registry.are_connected(a, b)
+
+    def drop_user(self, name: str) -> Set[str]:
+        """Cierra los chats del usuario y retira las ofertas que hizo o recibió."""
+        # Sin esto, quien reconecta con el mismo nombre heredaría ofertas viejas
+        with self._offers_lock:
+            for key in [key for key in self._offers if name in key]:
+                del self._offers[key]
+        return self.registry.drop_user(name)
+
+    # ------------------------------------------------------------------
+    # Ofertas de transferencia por fragmentos
+    # ------------------------------------------------------------------
+
+    def set_offer(self, sender: str, receiver: str, modes: Tuple[str, ...]) -> None:
+        """Anota (o retira, sin modos) los modos de transferencia ofrecidos por sender."""
+        with self._offers_lock:
+            if modes:
+                self._offers[(sender, receiver)] = tuple(modes)
+            else:
+                self._offers.pop((sender, receiver), None)
+
+    def take_offer(self, sender: str, receiver: str) -> Tuple[str, ...]:
+        """Consume la oferta y devuelve sus modos (vacío si no había)."""
+        with self._offers_lock:
+            return self._offers.pop((sender, receiver), ())
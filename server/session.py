@@ -2,45 +2,180 @@
 # -*- coding: utf-8 -*-
 
 import socket
-import struct
-from typing import Tuple, Optional
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+from common.framing import (
+    SPOOL_BLOCK, FileRegion, FrameLimits, FrameReader, Payload, frame_parts, send_buffers,
+)
+from common.compression import COMMAND_TYPES, FrameCodec
+from common.protocol import PROTOCOL_V1, frame_command
+from common.sockopts import SocketProfile
+from .outbox import OutboundQueue, OutboxConfig
+from .flow import FlowConfig, InboundQuota
+
+# Segundos sin tramas pendientes tras los que el hilo escritor termina
+WRITER_IDLE = 5.0
+# Segundos que se espera a vaciar la salida y se descarta la entrada al rechazar una trama
+REJECT_LINGER = 1.0
 
 class ClientSession:
     """Representa la conexión de un cliente individual al servidor."""
 
-    def __init__(self, sock: socket.socket, address: Tuple[str, int], name: str) -> None:
+    def __init__(self, sock: socket.socket, address: Tuple[str, int], name: str,
+                 outbox: Optional[OutboxConfig] = None,
+                 profile: Optional[SocketProfile] = None,
+                 frame_codec: Optional[FrameCodec] = None,
+                 metrics: Optional[Any] = None,
+                 flow: Optional[FlowConfig] = None,
+                 limits: Optional[FrameLimits] = None) -> None:
         self._sock = sock
+        self._profile = profile or SocketProfile()
+        self._profile.apply(sock)
         self.address = address
         self.name = name
         self.closed = False
+        self.protocol = PROTOCOL_V1  # versión negociada con HELLO
+        self.codecs: Tuple[str, ...] = ()  # códecs de compresión negociados con HELLO
+        self._frame_codec = frame_codec or FrameCodec()
+        self._metrics = metrics  # server.metrics.Metrics: tramas y bytes por tipo
+        # Tamaño máximo por tipo antes de reservar; Tipo 2 grandes a disco
+        self._reader = FrameReader(sock, limits=limits or FrameLimits())
+        self._outbox = OutboundQueue(outbox or OutboxConfig(),
+                                     on_ready=self._wake_writer, on_overflow=self._abort)
+        # Cupo de entrada: tramas leídas y aún no despachadas (flow.py)
+        self.inbound = InboundQuota(flow or FlowConfig(), metrics, on_credit=self._grant_credit)
+        # El hilo escritor se crea bajo demanda y termina tras WRITER_IDLE sin
+        # tráfico, así los clientes ociosos no mantienen un segundo hilo vivo.
+        self._writer_lock = threading.Lock()
+        self._writer_running = False
+        # Escrituras en el socket: las del hilo escritor y la de reject()
+        self._send_lock = threading.Lock()
+
+    def send(self, msg_type: int, data: Payload, block: bool = False,
+             control: bool = False) -> bool:
+        """
+        Encola un mensaje en formato TLV (!BI) para el escritor de la sesión.
+
+        `data` puede ser un buffer o una secuencia de partes (p. ej. prefijo +
+        cuerpo reenviado): se encolan por separado y se envían con sendmsg.
+        Los comandos se comprimen si la sesión negoció un códec; los archivos
+        reenviados viajan tal como los envió el emisor.
+        No bloquea salvo con block=True, que espera a que haya espacio en la
+        cola (usado por los relays de archivos para frenar al emisor).
+        Con control=True (CREDIT, NEED/DONE) la trama no se descarta ni se
+        vuelca y sale antes que las normales pendientes.
+
+        Returns:
+            False si la trama se descartó por la política de desbordamiento.
+        """
+        if self.codecs and msg_type in COMMAND_TYPES:
+            msg_type, data = self._frame_codec.encode(msg_type, data, self.codecs)
+        frame = frame_parts(msg_type, data)
+        if self._metrics is not None:
+            self._metrics.frame_out(frame)
+        return self._outbox.put(frame, block, control)
+
+    def send_command(self, name: str, *fields: str, control: bool = False) -> bool:
+        """Envía un comando de control en el formato negociado por la sesión (v1 o v2)."""
+        return self.send(*frame_command(self.protocol, name, *fields), control=control)
+
+    def send_frame(self, frame: Sequence[bytes], block: bool = False,
+                   control: bool = False) -> bool:
+        """Encola una trama ya codificada (cabecera + partes), p. ej. la misma para todos los miembros de una sala."""
+        if self._metrics is not None:
+            self._metrics.frame_out(frame)
+        return self._outbox.put(frame, block, control)
+
+    def _grant_credit(self, credits: int) -> None:
+        # Un CREDIT perdido dejaría al cliente esperando: nunca se descarta
+        self.send_command("CREDIT", str(credits), control=True)
+
+    def _wake_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer_running:
+                return
+            self._writer_running = True
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def _write_loop(self) -> None:
+        """Vacía la cola de salida sobre el socket, un lote de tramas por escritura."""
+        profile = self._profile
+        while True:
+            batch = self._outbox.take_batch(WRITER_IDLE, profile.coalesce_bytes,
+                                            profile.coalesce_window)
+            if batch is None:
+                with self._writer_lock:
+                    if self._outbox.closed or not self._outbox.pending():
+                        self._writer_running = False
+                        return
+                continue
+            try:
+                with self._send_lock:
+                    send_buffers(self._sock, batch)
+            except OSError:
+                self._abort()
+                with self._writer_lock:
+                    self._writer_running = False
+                return
+
+    def _abort(self) -> None:
+        """Corta la conexión; el hilo lector detecta el cierre y desconecta la sesión."""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def queue_stats(self) -> Dict[str, int]:
+        """Métricas de la cola de salida y del cupo de entrada de esta sesión."""
+        stats = self._outbox.stats()
+        inbound = self.inbound.stats()
+        stats["inbound_frames"] = inbound["frames"]
+        stats["inbound_stalls"] = inbound["stalls"]
+        return stats
+
+    def recv_tlv(self) -> Optional[Tuple[int, Union[memoryview, FileRegion]]]:
+        """
+        Recibe un mensaje TLV completo.
+
+        Cada trama se lee con recv_into sobre su propio buffer (se encola en el
+        RequestBuffer, así que no puede reutilizarse) y se devuelve como
+        memoryview para que los manejadores extraigan subcampos sin copiar.
+        Los archivos mayores que FrameLimits.spool llegan como FileRegion y
+        una cabecera que excede el límite de su tipo lanza FrameTooLarge.
+        """
+        tlv = self._reader.read_frame(reuse=False)
+        if tlv and self._metrics is not None:
+            self._metrics.frame_in(tlv[0], len(tlv[1]))
+        return tlv
+
+    def reject(self, message: str) -> None:
+        """
+        Envía ERROR y cierra con gracia tras una trama rechazada sin leer.
 
-    def send(self, msg_type: int, data: bytes) -> None:
-        """Envía un mensaje usando el formato TLV (!BI)."""
-        header = struct.pack("!BI", msg_type, len(data))
-        self._sock.sendall(header + data)
-
-    def recv_all(self, n: int) -> Optional[bytes]:
-        """Auxiliar para recibir exactamente n bytes."""
-        data = b""
-        while len(data) < n:
-            packet = self._sock.recv(n - len(data))
-            if not packet:
-                return None
-            data += packet
-        return data
-
-    def recv_tlv(self) -> Optional[Tuple[int, bytes]]:
-        """Recibe un mensaje TLV completo."""
-        header = self.recv_all(5)
-        if not header:
-            return None
-        msg_type, length = struct.unpack("!BI", header)
-        payload = self.recv_all(length)
-        if payload is None:
-            return None
-        return msg_type, payload
+        Cerrar con el payload aún en el buffer de recepción provoca un RST que
+        descarta el ERROR en el cliente: se envía directamente, se cierra la
+        escritura y se descarta lo que llegue durante REJECT_LINGER segundos.
+        """
+        msg_type, data = frame_command(self.protocol, "ERROR", message)
+        if self.codecs:
+            msg_type, data = self._frame_codec.encode(msg_type, data, self.codecs)
+        deadline = time.monotonic() + REJECT_LINGER
+        try:
+            # Directo al socket: un lote ya sacado de la cola no puede quedar detrás del cierre
+            with self._send_lock:
+                send_buffers(self._sock, frame_parts(msg_type, data))
+                self._sock.shutdown(socket.SHUT_WR)
+            while (remaining := deadline - time.monotonic()) > 0:
+                self._sock.settimeout(remaining)
+                if not self._sock.recv(SPOOL_BLOCK):
+                    break
+        except OSError:
+            pass
 
     def close(self) -> None:
         """Cierra la conexión con el cliente."""
+        self._outbox.close()
+        self._abort()  # desbloquea al escritor si está detenido en sendall
         self._sock.close()
         self.closed = True
@@ -10,11 +10,76 @@ Inicia el socket server.
 
 import os
 from server.facade import ServerFacade
+from server.cluster import run_cluster
+from server.federation import FederationRouter
+from server.outbox import OutboxConfig
+from server.flow import FlowConfig
+from server.logger import LogFileConfig
+from common.compression import parse_codecs
+from common.framing import FrameLimits
+from common.sockopts import get_profile
 
 def main():
     # Buscamos el puerto en la variable de entorno, si no existe usamos 5000
     port = int(os.environ.get("PORT", 5000))
-    ServerFacade(port=port).run()
+    # Motor de conexiones: "threaded" (un hilo por cliente) o "async" (asyncio)
+    mode = os.environ.get("SERVER_MODE", "threaded")
+    # Workers del buffer de peticiones (cada uno atiende una partición de sesiones)
+    workers = int(os.environ.get("WORKERS", 4))
+    # Qué hacer cuando la cola de salida de un cliente lento se llena:
+    # "disconnect", "drop" o "spill" (volcado a disco)
+    outbox = OutboxConfig(policy=os.environ.get("OUTBOX_POLICY", "disconnect"))
+    # Cupos de entrada: tramas y bytes en vuelo por cliente y peticiones encoladas en total
+    flow = FlowConfig(client_frames=int(os.environ.get("CLIENT_QUOTA_FRAMES", 64)),
+                      client_bytes=int(os.environ.get("CLIENT_QUOTA_BYTES", 4 * 1024 * 1024)),
+                      buffer_frames=int(os.environ.get("BUFFER_FRAMES", 8192)),
+                      relay_threads=int(os.environ.get("RELAY_THREADS", 64)))
+    # Tamaño máximo de trama por tipo (órdenes/texto, archivo, fragmento) y a partir
+    # de qué tamaño un archivo se recibe en disco en vez de en memoria
+    frame_limits = FrameLimits(command=int(os.environ.get("MAX_COMMAND_BYTES", 64 * 1024)),
+                               file=int(os.environ.get("MAX_FILE_BYTES", 1024 ** 3)),
+                               chunk=int(os.environ.get("MAX_CHUNK_BYTES", 1024 * 1024)),
+                               spool=int(os.environ.get("FILE_SPOOL_BYTES", 8 * 1024 * 1024)))
+    # Opciones TCP y agrupación de escrituras: "default", "latency", "throughput" o "system"
+    profile = get_profile(os.environ.get("SOCKET_PROFILE"))
+    # Códecs de compresión que se aceptan en el saludo ("" la desactiva)
+    compression = parse_codecs(os.environ.get("COMPRESSION", "zlib,lzma"))
+    # Procesos que comparten el puerto (SO_REUSEPORT); con más de uno cada
+    # worker escribe su propio log (server-<n>.log)
+    processes = int(os.environ.get("PROCESSES", 1))
+    # Federación: "host:puerto" de este nodo para los demás y nodos a los que conectarse
+    node = os.environ.get("FEDERATION_NODE")
+    peers = [p for p in os.environ.get("FEDERATION_PEERS", "").split(",") if p]
+    # Puerto local de /metrics (Prometheus); sin él no se recogen métricas
+    metrics_port = int(os.environ.get("METRICS_PORT", 0)) or None
+    # Puerto local de órdenes de perfilado y carpeta de resultados (también SIGUSR1/SIGUSR2)
+    admin_port = int(os.environ.get("ADMIN_PORT", 0)) or None
+    profile_dir = os.environ.get("PROFILE_DIR", "profiles")
+    # Rotación de server.log por tamaño (bytes) o tiempo (segundos), copias y gzip
+    log_file = LogFileConfig(max_bytes=int(os.environ.get("LOG_MAX_BYTES", 0)),
+                             rotate_interval=float(os.environ.get("LOG_ROTATE_SECONDS", 0)),
+                             backups=int(os.environ.get("LOG_BACKUPS", 5)),
+                             compress=os.environ.get("LOG_COMPRESS", "") == "1")
+    # Reglas de nivel, límite de tasa y muestreo por tipo de evento (ver server/logcontrol.py),
+    # p. ej. "console=INFO; FileTransferRouted rate=50; ClientHandshakeStarted sample=10"
+    log_rules = os.environ.get("LOG_RULES") or None
+    # Diario binario de eventos (p. ej. events.journal); con PROCESSES, uno por worker
+    journal = os.environ.get("JOURNAL") or None
+    if processes > 1:
+        if node:
+            raise ValueError("PROCESSES y FEDERATION_NODE no se pueden combinar")
+        run_cluster(processes, port=port, mode=mode, workers=workers, outbox=outbox,
+                    profile=profile, compression=compression, metrics_port=metrics_port,
+                    admin_port=admin_port, profile_dir=profile_dir, log_file=log_file,
+                    journal=journal, log_rules=log_rules, flow=flow,
+                    frame_limits=frame_limits)
+        return
+    router = FederationRouter(node, peers) if node else None
+    ServerFacade(port=port, mode=mode, workers=workers, outbox=outbox, profile=profile,
+                 compression=compression, router=router, metrics_port=metrics_port,
+                 admin_port=admin_port, profile_dir=profile_dir, log_file=log_file,
+                 journal=journal, log_rules=log_rules, flow=flow,
+                 frame_limits=frame_limits).run()
 
 if __name__ == "__main__":
     main()
@@ -73,7 +73,7 @@ time.sleep(2)
 # ── Paso 5: Desconectar ────────────────────────────────────────────────────
 print("\n[5] Desconectando...")
 try:
-    client.disconnect()
+    client.close()
     print("    OK")
 except Exception as e:
     print(f"    FAIL: {e}")
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Fixtures compartidas por las pruebas."""
+
+import threading
+
+import pytest
+
+from server.core import ChatServer
+from server.events import ServerStarted
+
+
+@pytest.fixture(scope="module")
+def start_server():
+    """
+    Arranca servidores en 127.0.0.1 con puerto libre, cada uno en su hilo.
+
+    start_server(cls=ChatServer, **opciones) devuelve el servidor ya
+    escuchando; todos se detienen al terminar el módulo.
+    """
+    servers = []
+
+    def start(cls=ChatServer, **options):
+        server = cls("127.0.0.1", 0, **options)
+        ready = threading.Event()
+        server.subscribe(lambda e: isinstance(e, ServerStarted) and ready.set())
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        assert ready.wait(5), "El servidor no arrancó"
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.stop()
+        thread.join(5)
+        assert not thread.is_alive(), "El servidor no se detuvo"
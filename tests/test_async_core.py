@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""AsyncChatServer: la baja de una sesión no bloquea el bucle de eventos."""
+
+import threading
+
+from benchmarks.common import connect, login, recv_tlv, send_tlv
+from server.async_core import AsyncChatServer
+from server.router import LocalRouter
+
+
+class SlowRouter(LocalRouter):
+    """Como un router de clúster cuyo aviso de baja espera a otro nodo."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def drop_user(self, name):
+        if name == "ana":
+            self.gate.wait(5)
+        return super().drop_user(name)
+
+
+def test_a_slow_disconnect_does_not_stall_other_clients(start_server):
+    router = SlowRouter()
+    server = start_server(AsyncChatServer, router=router)
+    try:
+        ana = connect(server.port)
+        login(ana, "ana")
+        ana.close()  # su baja queda esperando en drop_user
+        bob = connect(server.port)
+        bob.settimeout(2)
+        login(bob, "bob")
+        send_tlv(bob, 1, b"GET_USERS")
+        assert recv_tlv(bob)[1].startswith(b"LIST_USERS:")
+        bob.close()
+    finally:
+        router.gate.set()
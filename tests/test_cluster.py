@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""ClusterRouter: registro compartido, presencia y reenvío entre workers por sockets Unix."""
+
+import time
+
+import pytest
+
+from server.cluster import ClusterRouter
+from server.peers import RemoteSession
+
+
+class Session:
+    """Sesión local que anota los comandos y tramas que se le encolan."""
+
+    closed = False
+    codecs = ("zlib",)
+
+    def __init__(self):
+        self.name = ""
+        self.commands = []
+        self.frames = []
+
+    def send_command(self, name, *fields, control=False):
+        self.commands.append((name, *fields))
+        return True
+
+    def send(self, msg_type, data, block=False, control=False):
+        parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        self.frames.append((msg_type, b"".join(bytes(part) for part in parts)))
+        return True
+
+
+def eventually(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "la condición no llegó a cumplirse"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    owners = {}  # en run_cluster es un dict del Manager; aquí basta uno compartido
+    routers = [ClusterRouter(n, 2, str(tmp_path), owners) for n in range(2)]
+    presence = [[] for _ in routers]
+    for router, changes in zip(routers, presence):
+        router.on_presence = lambda name, joined, changes=changes: changes.append((name, joined))
+        router.start()
+    yield routers, presence
+    for router in routers:
+        router.stop()
+
+
+def test_a_name_has_a_single_owner(workers):
+    (w0, w1), _ = workers
+    assert w0.claim("ana", Session())
+    assert not w1.claim("ana", Session())
+    assert w1.names() == ["ana"] and w1.count() == 1
+
+
+def test_presence_is_announced_to_the_other_worker(workers):
+    (w0, w1), (_, seen) = workers
+    ana = Session()
+    assert w0.claim("ana", ana)
+    eventually(lambda: ("ana", True) in seen)
+    assert w0.release("ana", ana)
+    eventually(lambda: ("ana", False) in seen)  # la tabla la purga el supervisor
+    assert w1.claim("ana", Session())  # el nombre quedó libre
+
+
+def test_commands_and_chats_reach_users_of_another_worker(workers):
+    (w0, w1), _ = workers
+    ana, bob = Session(), Session()
+    assert w0.claim("ana", ana) and w1.claim("bob", bob)
+    remote = w0.lookup("bob")
+    assert isinstance(remote, RemoteSession) and remote.codecs == ("zlib",)
+    assert w0.connect("ana", "bob")
+    eventually(lambda: w1.are_connected("bob", "ana"))  # OP_LINK replicado en el dueño
+    remote.send_command("FROM", "ana", "hola:mundo")
+    eventually(lambda: bob.commands == [("FROM", "ana", "hola:mundo")])
+    remote.send(2, (b"\x03ana", b"archivo"), block=True)
+    eventually(lambda: bob.frames == [(2, b"\x03anaarchivo")])
+    w0.disconnect("ana", "bob")
+    eventually(lambda: not w1.are_connected("bob", "ana"))
+
+
+def test_offers_are_kept_where_the_receiver_lives(workers):
+    (w0, w1), _ = workers
+    assert w0.claim("ana", Session()) and w1.claim("bob", Session())
+    w0.set_offer("ana", "bob", ("STREAM", "RESUME"))
+    eventually(lambda: w1.take_offer("ana", "bob") == ("STREAM", "RESUME"))
+
+
+def test_offers_of_a_departed_sender_are_withdrawn(workers):
+    (w0, w1), (_, seen) = workers
+    ana = Session()
+    assert w0.claim("ana", ana) and w1.claim("bob", Session())
+    w0.set_offer("ana", "bob", ("STREAM",))  # OP_OFFER y OP_GONE viajan en orden por el mismo enlace
+    assert w0.release("ana", ana)
+    w0.drop_user("ana")
+    eventually(lambda: ("ana", False) in seen)  # OP_GONE aplicado en el dueño de bob
+    assert w1.take_offer("ana", "bob") == ()
+
+
+def test_users_of_a_stopped_worker_leave_the_presence(workers):
+    (w0, w1), (_, seen) = workers
+    assert w0.claim("ana", Session())
+    eventually(lambda: ("ana", True) in seen)
+    w0.stop()
+    eventually(lambda: ("ana", False) in seen)  # la tabla la purga el supervisor
+
+
+class Closing(Session):
+    """Sesión cuya cola de salida ya se cerró: cada entrega lanza ConnectionError."""
+
+    def send(self, msg_type, data, block=False, control=False):
+        raise ConnectionError("La sesión está cerrada")
+
+
+def test_a_closing_session_does_not_drop_the_link(workers):
+    (w0, w1), (seen, _) = workers
+    bob, carla = Closing(), Session()
+    assert w1.claim("bob", bob) and w1.claim("carla", carla)
+    eventually(lambda: ("carla", True) in seen)
+    w0.lookup("bob").send(2, (b"\x03bob", b"archivo"), block=True)
+    w0.lookup("carla").send(2, (b"\x05carla", b"archivo"), block=True)
+    eventually(lambda: carla.frames == [(2, b"\x05carlaarchivo")])
+    # La presencia no parpadea (el saludo del enlace puede repetir las altas)
+    assert not [change for change in seen if not change[1]]
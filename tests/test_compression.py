@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Compresión negociada: rechazo de códecs no negociados y tope de descompresión (user-009)."""
+
+import lzma
+import os
+import socket
+import zlib
+
+import pytest
+
+from benchmarks.common import connect, recv_tlv, send_tlv
+from common.compression import (
+    FLAG_LZMA, FLAG_ZLIB, CodecNotNegotiated, FrameCodec, check_codec, decompress,
+    decompress_region, parse_codecs,
+)
+from common.framing import FrameLimits
+from server.facade import SERVER_MODES
+from server.handlers import ProtocolHandlers
+
+TEXT = ("hola, " * 2000).encode("utf-8")
+
+
+def test_parse_codecs_keeps_only_known_ones():
+    assert parse_codecs("lzma,gzip,zlib") == ("lzma", "zlib")
+    assert parse_codecs("zlib", allowed=("lzma",)) == ()
+
+
+@pytest.mark.parametrize("codecs", [("zlib",), ("lzma",), ("zlib", "lzma")])
+def test_command_round_trip(codecs):
+    codec = FrameCodec()
+    type_byte, parts = codec.encode(4, TEXT, codecs)
+    assert type_byte & (FLAG_ZLIB | FLAG_LZMA)
+    assert codec.decode(type_byte, b"".join(parts), codecs) == (4, TEXT)
+
+
+def test_routed_prefix_is_not_compressed():
+    head = b"\x03bob" + b"\x00\x00\x00\x07\x01"  # DST + TRANSFER_ID + KIND
+    codec = FrameCodec()
+    type_byte, parts = codec.encode(3, head + TEXT, ("lzma",))
+    assert type_byte == 3 | FLAG_LZMA
+    assert bytes(parts[0]) == head
+    assert codec.decode(type_byte, b"".join(bytes(p) for p in parts), ("lzma",)) == (3, head + TEXT)
+
+
+def test_incompressible_or_small_payloads_travel_as_is():
+    codec = FrameCodec()
+    assert codec.encode(1, b"SET_NAME:ana", ("zlib",)) == (1, b"SET_NAME:ana")
+    noise = os.urandom(64 * 1024)
+    assert codec.encode(4, noise, ("zlib",)) == (4, noise)
+
+
+@pytest.mark.parametrize("type_byte, codecs", [(0x81, ()), (0x41, ("zlib",)), (0xC1, ("zlib", "lzma"))])
+def test_codec_not_negotiated_is_rejected(type_byte, codecs):
+    with pytest.raises(CodecNotNegotiated):
+        check_codec(type_byte, codecs)
+    with pytest.raises(CodecNotNegotiated):
+        FrameCodec().decode(type_byte, zlib.compress(TEXT), codecs)
+
+
+def test_uncompressed_frames_need_no_codec():
+    assert check_codec(4, ()) == 0
+    assert FrameCodec().decode(1, b"LIST", ()) == (1, b"LIST")
+
+
+def test_decompression_is_capped_by_the_frame_type_limit():
+    bomb = zlib.compress(b"\x00" * 200_000)
+    with pytest.raises(ValueError):
+        FrameCodec().decode(4 | FLAG_ZLIB, bomb, ("zlib",), FrameLimits(command=100_000))
+    assert len(FrameCodec().decode(2 | FLAG_ZLIB, b"\x01x" + bomb, ("zlib",),
+                                   FrameLimits(command=100_000))[1]) == 2 + 200_000
+
+
+@pytest.mark.parametrize("flag, compress", [(FLAG_ZLIB, zlib.compress), (FLAG_LZMA, lzma.compress)])
+def test_decompress_limit(flag, compress):
+    data = compress(b"A" * 50_000)
+    assert decompress(flag, data, 50_000) == b"A" * 50_000
+    with pytest.raises(ValueError):
+        decompress(flag, data, 49_999)
+    region = decompress_region(flag, data, 50_000)
+    assert len(region) == 50_000
+    with pytest.raises(ValueError):
+        decompress_region(flag, data, 49_999)
+
+
+class Handlers:
+    """Servidor mínimo para ProtocolHandlers.dispatch (como los de los benchmarks)."""
+
+    frame_codec = FrameCodec()
+    frame_limits = FrameLimits()
+
+    def __init__(self):
+        self.calls = []
+
+    def handle_set_name(self, session, name):
+        self.calls.append((session, name))
+
+
+def test_dispatch_decompresses_without_touching_the_session():
+    # Los lectores ya comprobaron el códec; el despacho no necesita la sesión
+    server = Handlers()
+    assert ProtocolHandlers.dispatch(server, None, 1 | FLAG_ZLIB, zlib.compress(b"SET_NAME:" + TEXT)) == "SET_NAME"
+    assert server.calls == [(None, TEXT.decode("utf-8"))]
+
+
+# ----------------------------------------------------------------------
+# Servidor: una trama con un códec no negociado cierra la sesión
+# ----------------------------------------------------------------------
+
+@pytest.fixture(scope="module", params=sorted(SERVER_MODES))
+def port(request, start_server):
+    return start_server(SERVER_MODES[request.param]).port
+
+
+def client(port: int) -> socket.socket:
+    sock = connect(port)
+    sock.settimeout(5)
+    return sock
+
+
+def test_server_rejects_compressed_frame_without_hello(port):
+    sock = client(port)
+    send_tlv(sock, 1 | FLAG_LZMA, lzma.compress(b"A" * 1_000_000))
+    msg_type, payload = recv_tlv(sock)
+    assert payload.startswith(b"ERROR")
+    assert recv_tlv(sock) is None
+    sock.close()
+
+
+def test_server_rejects_codec_it_did_not_confirm(port):
+    sock = client(port)
+    send_tlv(sock, 1, b"HELLO:1:zlib")
+    assert recv_tlv(sock)[1].startswith(b"HELLO_OK")
+    send_tlv(sock, 1 | FLAG_LZMA, lzma.compress(b"SET_NAME:" + b"x" * 300))
+    assert recv_tlv(sock)[1].startswith(b"ERROR")
+    assert recv_tlv(sock) is None
+    sock.close()
+
+
+def test_server_accepts_negotiated_codec(port):
+    sock = client(port)
+    send_tlv(sock, 1, b"HELLO:1:zlib")
+    assert recv_tlv(sock)[1] == b"HELLO_OK:1:zlib"
+    send_tlv(sock, 1 | FLAG_ZLIB, zlib.compress(b"SET_NAME:zlib_" + b"z" * 300))
+    assert recv_tlv(sock)[1] == b"NAME_OK"
+    sock.close()
+
+
+def test_server_rejects_oversized_header(port):
+    sock = client(port)
+    sock.sendall(bytes([1]) + (FrameLimits().command + 1).to_bytes(4, "big"))
+    assert recv_tlv(sock)[1].startswith(b"ERROR")
+    assert recv_tlv(sock) is None
+    sock.close()
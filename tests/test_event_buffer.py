@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""EventBuffer del cliente: orden, fusión del progreso y espera sin descartes."""
+
+import threading
+import time
+
+import pytest
+
+from client.buffer import EVENT_CHAT, EVENT_CONTROL, EVENT_PROGRESS, EventBuffer
+from client.receiver import MessageReceiver
+from client.state import ChatState
+from common.compression import FrameCodec
+
+
+def wait_for(seen, count):
+    deadline = time.monotonic() + 5
+    while len(seen) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("kind", [EVENT_CHAT, EVENT_CONTROL])
+def test_full_lane_waits_instead_of_dropping(kind):
+    release = threading.Event()
+    seen = []
+
+    def callback(message):
+        release.wait(5)
+        seen.append(message)
+
+    buffer = EventBuffer(callback, max_events=2, max_control=2)
+    try:
+        producer = threading.Thread(
+            target=lambda: [buffer.add_event(f"evento {i}", kind) for i in range(6)])
+        producer.start()
+        time.sleep(0.2)
+        assert producer.is_alive()  # GUI detenida: quien añade espera
+        assert buffer.stalls >= 1
+        release.set()
+        producer.join(5)
+        wait_for(seen, 6)
+        assert seen == [f"evento {i}" for i in range(6)]
+    finally:
+        release.set()
+        buffer.stop()
+
+
+def test_lanes_are_bounded_separately():
+    release = threading.Event()
+    seen = []
+
+    def callback(message):
+        release.wait(5)
+        seen.append(message)
+
+    buffer = EventBuffer(callback, max_events=2, max_control=2)
+    try:
+        buffer.add_event("primero")  # el hilo del buffer se queda en este
+        time.sleep(0.05)
+        buffer.add_event("[ERROR] x] dice: y")  # control, aunque parezca chat
+        buffer.add_event("[ERROR] z")
+        # El carril de control está lleno; el de chat sigue admitiendo sin esperar
+        buffer.add_event("[a] dice: hola", EVENT_CHAT)
+        assert buffer.stalls == 0
+        release.set()
+        wait_for(seen, 4)
+        assert seen == ["primero", "[ERROR] x] dice: y", "[ERROR] z", "[a] dice: hola"]
+    finally:
+        release.set()
+        buffer.stop()
+
+
+def test_callbacks_never_wait_on_a_full_lane():
+    seen = []
+
+    def callback(message):
+        seen.append(message)
+        if message == "abrir":  # p. ej. Bridge encadena eventos desde el callback
+            for i in range(3):
+                buffer.add_event(f"aviso {i}")
+
+    buffer = EventBuffer(callback, max_control=1)
+    try:
+        buffer.add_event("abrir")
+        wait_for(seen, 4)
+        assert seen == ["abrir", "aviso 0", "aviso 1", "aviso 2"]
+    finally:
+        buffer.stop()
+
+
+def test_progress_is_coalesced_in_order():
+    release = threading.Event()
+    seen = []
+
+    def callback(message):
+        release.wait(5)
+        seen.append(message)
+
+    buffer = EventBuffer(callback)
+    try:
+        buffer.add_event("START")  # el hilo del buffer se queda en este
+        time.sleep(0.05)
+        for i in range(5):
+            buffer.add_event(f"UPLOAD_PROGRESS:{i}:4:a.bin", EVENT_PROGRESS)
+        buffer.add_event("[a] dice: hola", EVENT_CHAT)
+        buffer.add_event("UPLOAD_PROGRESS:4:4:a.bin", EVENT_PROGRESS)
+        release.set()
+        wait_for(seen, 4)
+        assert seen == ["START", "UPLOAD_PROGRESS:4:4:a.bin", "[a] dice: hola",
+                        "UPLOAD_PROGRESS:4:4:a.bin"]
+        assert buffer.coalesced == 4
+    finally:
+        release.set()
+        buffer.stop()
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, message, kind=EVENT_CONTROL):
+        self.events.append((kind, message))
+
+
+def test_receiver_classifies_by_command():
+    events = Recorder()
+    receiver = MessageReceiver(None, ChatState(), events, lambda *args: None, FrameCodec())
+    receiver._dispatch(1, b"FROM:ana:hola")
+    receiver._dispatch(1, b"ROOM_FROM:sala:ana:hola")
+    receiver._dispatch(1, b"ERROR:[x] dice: falso")
+    assert [kind for kind, _ in events.events] == [EVENT_CHAT, EVENT_CHAT, EVENT_CONTROL]
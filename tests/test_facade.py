@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""ServerFacade: cada opción llega a su parámetro en ambos motores."""
+
+import pytest
+
+from common.framing import FrameLimits
+from common.sockopts import get_profile
+from server.facade import SERVER_MODES, ServerFacade
+from server.flow import FlowConfig
+from server.outbox import OutboxConfig
+from server.router import LocalRouter
+
+
+@pytest.mark.parametrize("mode", sorted(SERVER_MODES))
+def test_options_reach_the_server(mode, tmp_path):
+    outbox = OutboxConfig(max_frames=7)
+    profile = get_profile("latency")
+    router = LocalRouter()
+    flow = FlowConfig(client_frames=5)
+    limits = FrameLimits(command=4096)
+    facade = ServerFacade("127.0.0.1", 0, log_filename=None, mode=mode, workers=3,
+                          outbox=outbox, profile=profile, compression=("zlib",), router=router,
+                          flow=flow, frame_limits=limits, profile_dir=str(tmp_path))
+    server = facade._server
+    assert isinstance(server, SERVER_MODES[mode])
+    assert server._buffer.partitions == 3
+    assert server._outbox_config is outbox
+    assert server._profile is profile
+    assert server._compression == ("zlib",)
+    assert server._router is router
+    assert server._flow is flow
+    assert server.frame_limits is limits
+    server._buffer.stop()
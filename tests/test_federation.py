@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""FederationRouter: anillo de hash, arbitraje de nombres y presencia replicada entre nodos TCP."""
+
+import socket
+import time
+
+import pytest
+
+from server.federation import HashRing, FederationRouter
+from server.peers import RemoteSession
+
+
+class Session:
+    """Sesión local que anota los comandos que se le encolan."""
+
+    closed = False
+    codecs = ("zlib",)
+
+    def __init__(self):
+        self.name = ""
+        self.commands = []
+
+    def send_command(self, name, *fields, control=False):
+        self.commands.append((name, *fields))
+        return True
+
+
+def eventually(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "la condición no llegó a cumplirse"
+        time.sleep(0.01)
+
+
+def free_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+def arbitrated_by(node, nodes):
+    """Un nombre cuyo árbitro en el anillo de `nodes` es `node`."""
+    ring = HashRing(nodes)
+    return next(f"user{i}" for i in range(1000) if ring.owner(f"user{i}") == node)
+
+
+@pytest.fixture
+def nodes():
+    a, b = free_address(), free_address()
+    routers = [FederationRouter(a, [b]), FederationRouter(b)]  # b solo conoce a a por su OP_HELLO
+    presence = [[] for _ in routers]
+    for router, changes in zip(routers, presence):
+        router.on_presence = lambda name, joined, changes=changes: changes.append((name, joined))
+        router.start()
+    eventually(lambda: routers[0]._live == {b} and routers[1]._live == {a})
+    yield routers, presence
+    for router in routers:
+        router.stop()
+
+
+def test_ring_is_deterministic_and_moves_few_keys():
+    keys = [f"user{i}" for i in range(2000)]
+    three = HashRing(["a:1", "b:2", "c:3"])
+    assert [three.owner(k) for k in keys] == [HashRing(["c:3", "a:1", "b:2"]).owner(k) for k in keys]
+    four = HashRing(["a:1", "b:2", "c:3", "d:4"])
+    moved = [k for k in keys if three.owner(k) != four.owner(k)]
+    assert all(four.owner(k) == "d:4" for k in moved)  # solo cambian los que pasan al nodo nuevo
+    assert len(moved) < len(keys) / 2
+    assert HashRing([]).owner("ana") is None
+
+
+@pytest.mark.parametrize("arbiter", [0, 1])
+def test_a_name_is_granted_to_a_single_node(nodes, arbiter):
+    (na, nb), _ = nodes
+    name = arbitrated_by((na, nb)[arbiter].node, [na.node, nb.node])
+    assert na.claim(name, Session())
+    eventually(lambda: name in nb.names())
+    assert not nb.claim(name, Session())
+    assert nb.count() == 1
+
+
+def test_presence_is_replicated_and_released(nodes):
+    (na, nb), (_, seen) = nodes
+    ana = Session()
+    assert na.claim("ana", ana)
+    eventually(lambda: ("ana", True) in seen)
+    remote = nb.lookup("ana")
+    assert isinstance(remote, RemoteSession) and remote.codecs == ("zlib",)
+    assert na.release("ana", ana)
+    eventually(lambda: ("ana", False) in seen)
+    assert nb.lookup("ana") is None and nb.names() == []
+
+
+def test_commands_reach_users_of_another_node(nodes):
+    (na, nb), _ = nodes
+    bob = Session()
+    assert nb.claim("bob", bob)
+    eventually(lambda: "bob" in na.names())
+    na.lookup("bob").send_command("FROM", "ana", "hola:mundo")
+    eventually(lambda: bob.commands == [("FROM", "ana", "hola:mundo")])
+
+
+def test_users_of_a_stopped_node_leave_the_presence(nodes):
+    (na, nb), (seen, _) = nodes
+    assert nb.claim("bob", Session())
+    eventually(lambda: "bob" in na.names())
+    nb.stop()
+    eventually(lambda: "bob" not in na.names())
+    assert seen == [("bob", True), ("bob", False)]
+    assert na.lookup("bob") is None
+
+
+class Closing(Session):
+    """Sesión cuya cola de salida ya se cerró: cada entrega lanza ConnectionError."""
+
+    def send_command(self, name, *fields, control=False):
+        raise ConnectionError("La sesión está cerrada")
+
+
+def test_a_closing_session_does_not_drop_the_link(nodes):
+    (na, nb), (seen, _) = nodes
+    bob, carla = Closing(), Session()
+    assert nb.claim("bob", bob) and nb.claim("carla", carla)
+    eventually(lambda: ("carla", True) in seen)
+    na.lookup("bob").send_command("FROM", "ana", "hola")
+    na.lookup("carla").send_command("FROM", "ana", "sigue")
+    eventually(lambda: carla.commands == [("FROM", "ana", "sigue")])
+    assert seen == [("bob", True), ("carla", True)]  # la presencia no parpadea
+    assert sorted(na.names()) == ["bob", "carla"]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Control de flujo de entrada: cupo por cliente, paradas y créditos WINDOW/CREDIT."""
+
+import threading
+
+import pytest
+
+from benchmarks.common import connect, recv_tlv, send_tlv
+from server.facade import SERVER_MODES
+from server.flow import FlowConfig, InboundQuota
+
+
+def test_config_rejects_empty_quotas():
+    assert FlowConfig(client_frames=10).batch == 2
+    assert FlowConfig(credit_batch=5).batch == 5
+    for bad in ({"client_frames": 0}, {"client_bytes": 0}, {"buffer_frames": -1}, {"relay_threads": 0}):
+        with pytest.raises(ValueError):
+            FlowConfig(**bad)
+
+
+def test_full_quota_refuses_or_blocks_until_a_release():
+    quota = InboundQuota(FlowConfig(client_frames=2, client_bytes=100))
+    assert quota.acquire(10) and quota.acquire(10)
+    assert not quota.acquire(10, block=False)
+    acquired = threading.Event()
+    reader = threading.Thread(target=lambda: quota.acquire(10) and acquired.set())
+    reader.start()
+    assert not acquired.wait(0.1)
+    quota.release(10)
+    assert acquired.wait(5)
+    reader.join()
+    assert quota.stats()["frames"] == 2 and quota.stalls == 1 and quota.stall_seconds > 0
+
+
+def test_byte_quota_admits_a_large_frame_only_alone():
+    quota = InboundQuota(FlowConfig(client_frames=8, client_bytes=100))
+    assert quota.acquire(500)  # nada en vuelo: se admite aunque exceda client_bytes
+    assert not quota.acquire(1, block=False)
+    quota.release(500)
+    assert quota.acquire(60) and not quota.acquire(50, block=False)
+
+
+def test_release_wakes_a_waiting_async_reader():
+    woken = []
+    quota = InboundQuota(FlowConfig(client_frames=1), on_release=lambda: woken.append(True))
+    quota.acquire(1)
+    quota.release(1)
+    assert woken == []  # nadie esperaba
+    quota.acquire(1)
+    assert not quota.acquire(1, block=False)
+    quota.release(1)
+    assert woken == [True]
+
+
+def test_credits_are_returned_in_batches():
+    grants = []
+    quota = InboundQuota(FlowConfig(client_frames=8, credit_batch=3), on_credit=grants.append)
+    quota.acquire(1)
+    quota.release(1)
+    assert grants == []  # sin WINDOW no hay créditos
+    assert quota.enable_credit() == 8
+    for _ in range(7):
+        quota.acquire(1)
+        quota.release(1)
+    assert grants == [3, 3]
+
+
+# ----------------------------------------------------------------------
+# Servidor: WINDOW concede la ventana y cada lote despachado un CREDIT
+# ----------------------------------------------------------------------
+
+@pytest.fixture(scope="module", params=sorted(SERVER_MODES))
+def port(request, start_server):
+    flow = FlowConfig(client_frames=8, credit_batch=2)
+    return start_server(SERVER_MODES[request.param], flow=flow).port
+
+
+def test_window_and_credit_exchange(port):
+    sock = connect(port)
+    sock.settimeout(5)
+    send_tlv(sock, 1, b"WINDOW")
+    assert recv_tlv(sock) == (1, b"CREDIT:8")
+    for _ in range(5):
+        send_tlv(sock, 1, b"GET_USERS")
+    replies = [recv_tlv(sock)[1] for _ in range(5 + 3)]
+    # WINDOW y los cinco GET_USERS despachados: tres lotes de dos
+    assert replies.count(b"LIST_USERS:") == 5
+    assert replies.count(b"CREDIT:2") == 3
+    sock.close()
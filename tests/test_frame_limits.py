@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Límites de trama por tipo, volcado a disco de los archivos grandes y envío de FileRegion (user-023)."""
+
+import socket
+import threading
+
+import pytest
+
+from common.framing import (
+    HEADER, FileRegion, FrameLimits, FrameReader, FrameTooLarge, frame_parts, send_buffers,
+    split_field,
+)
+from server.peers import OP_FRAME, PEER_OVERHEAD, peer_limits
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def send_async(sock, buffers):
+    """Envía en otro hilo (las tramas grandes no caben en el buffer del socket)."""
+    thread = threading.Thread(target=send_buffers, args=(sock, buffers))
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize("msg_type, limit_field", [(1, "command"), (4, "command"),
+                                                    (2, "file"), (3, "chunk"), (9, "command")])
+def test_header_over_limit_is_rejected_before_reading(pair, msg_type, limit_field):
+    a, b = pair
+    limits = FrameLimits(command=100, file=300, chunk=200)
+    limit = getattr(limits, limit_field)
+    a.sendall(HEADER.pack(msg_type, limit + 1))  # sin payload: no debe esperarlo
+    with pytest.raises(FrameTooLarge) as info:
+        FrameReader(b, limits=limits).read_frame()
+    assert info.value.limit == limit
+
+
+def test_compression_flags_use_the_real_type_limit(pair):
+    a, b = pair
+    a.sendall(HEADER.pack(0x83, 150))
+    with pytest.raises(FrameTooLarge):
+        FrameReader(b, limits=FrameLimits(command=1000, chunk=100)).read_frame()
+
+
+def test_large_file_frame_is_spooled_to_disk(pair):
+    a, b = pair
+    dst = b"bob"
+    body = bytes(range(256)) * 400
+    sender = send_async(a, frame_parts(2, (bytes([len(dst)]) + dst, body)))
+    msg_type, payload = FrameReader(b, limits=FrameLimits(spool=4096)).read_frame()
+    sender.join()
+    assert msg_type == 2
+    assert isinstance(payload, FileRegion)
+    assert len(payload) == 1 + len(dst) + len(body)
+    field, offset = split_field(payload)
+    assert (bytes(field), offset) == (dst, 1 + len(dst))
+    assert b"".join(payload.region(offset).blocks(1000)) == body
+
+
+def test_small_file_frame_stays_in_memory(pair):
+    a, b = pair
+    send_buffers(a, frame_parts(2, b"\x01xdatos"))
+    _, payload = FrameReader(b, limits=FrameLimits(spool=4096)).read_frame()
+    assert isinstance(payload, memoryview)
+
+
+def test_split_field_in_memory():
+    payload = memoryview(b"\x03bob\x04file" + b"resto")
+    name, offset = split_field(payload)
+    filename, offset = split_field(payload, offset)
+    assert (bytes(name), bytes(filename), bytes(payload[offset:])) == (b"bob", b"file", b"resto")
+
+
+def test_file_region_is_sent_with_the_other_parts(pair, tmp_path):
+    a, b = pair
+    path = tmp_path / "datos.bin"
+    path.write_bytes(b"0123456789" * 1000)
+    with open(path, "rb") as f:
+        region = FileRegion(f, 5, 20)
+        send_buffers(a, frame_parts(2, (b"\x01x", region)) + frame_parts(1, b"fin"))
+    reader = FrameReader(b)
+    assert bytes(reader.read_frame(reuse=False)[1]) == b"\x01x" + (b"0123456789" * 3)[5:25]
+    assert reader.read_frame() == (1, b"fin")
+
+
+def test_peer_limits_leave_room_for_routing_overhead():
+    limits = peer_limits(FrameLimits(command=100, file=1000, chunk=50, spool=10))
+    assert limits.limit(OP_FRAME) == 1000 + PEER_OVERHEAD
+    assert limits.limit(1) == 100 + PEER_OVERHEAD
+    assert limits.spool == 10
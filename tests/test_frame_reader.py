@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""FrameReader: tramas TLV completas sobre un buffer preasignado y reutilizable."""
+
+import socket
+
+import pytest
+
+from common.framing import HEADER, FrameReader, frame_parts, send_buffers
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_round_trip_in_parts(pair):
+    a, b = pair
+    send_buffers(a, frame_parts(1, (b"HELLO", b":", b"2")))
+    assert FrameReader(b).read_frame() == (1, b"HELLO:2")
+
+
+def test_reuse_false_gives_independent_buffers(pair):
+    a, b = pair
+    send_buffers(a, frame_parts(0, b"uno") + frame_parts(0, b"dos"))
+    reader = FrameReader(b)
+    first = reader.read_frame(reuse=False)[1]
+    second = reader.read_frame(reuse=False)[1]
+    assert (bytes(first), bytes(second)) == (b"uno", b"dos")
+
+
+def test_closed_connection_returns_none(pair):
+    a, b = pair
+    a.sendall(HEADER.pack(1, 10) + b"corto")
+    a.close()
+    assert FrameReader(b).read_frame() is None
+
+
+def test_frames_split_across_reads(pair):
+    a, b = pair
+    frame = b"".join(frame_parts(1, b"x" * 5000))
+    reader = FrameReader(b)
+    a.sendall(frame[:3])      # cabecera incompleta
+    a.sendall(frame[3:2000])  # payload a medias
+    a.sendall(frame[2000:] + b"".join(frame_parts(0, b"siguiente")))
+    assert reader.read_frame(reuse=False) == (1, b"x" * 5000)
+    assert reader.read_frame() == (0, b"siguiente")
+
+
+def test_reuse_true_overwrites_the_previous_payload(pair):
+    a, b = pair
+    send_buffers(a, frame_parts(0, b"uno") + frame_parts(0, b"dos"))
+    reader = FrameReader(b)
+    first = reader.read_frame(reuse=True)[1]
+    assert bytes(first) == b"uno"
+    reader.read_frame(reuse=True)
+    assert bytes(first) == b"dos"  # misma memoria: se consume antes de leer la siguiente
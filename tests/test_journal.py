@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Diario binario de eventos: ida y vuelta tipada, intervalos por índice y lectura tolerante."""
+
+import sys
+
+import pytest
+
+from server import replay
+from server.events import ChatEnded, ChatEstablished, ClientJoined, RoomMessagePosted
+from server.journal import MAGIC, Journal, JournalObserver
+
+EVENTS = [ClientJoined("ana", ("127.0.0.1", 5000)), ChatEstablished("ana", "bob"),
+          RoomMessagePosted("sala", "ana", 3), ChatEnded("ana", "bob")]
+
+
+def write(path, timed_events, **options):
+    observer = JournalObserver(str(path), **options)
+    for timestamp, event in timed_events:
+        observer._queue.put((timestamp, event))  # instantes fijos en vez de time.time()
+    observer.stop()
+    return observer
+
+
+def test_events_round_trip_with_their_types(tmp_path):
+    path = tmp_path / "events.journal"
+    observer = JournalObserver(str(path))
+    for event in EVENTS + ["no es un evento"]:
+        observer(event)
+    observer.stop()
+    assert observer.written == len(EVENTS)
+    with Journal(str(path)) as journal:
+        assert [event for _, event in journal] == EVENTS
+
+
+def test_replay_by_interval_and_type(tmp_path):
+    path = tmp_path / "events.journal"
+    write(path, [(1000.0 + n, ChatEstablished(f"u{n}", "bob")) for n in range(500)], index_every=256)
+    with Journal(str(path)) as journal:
+        assert journal.seek(1300.0) > len(MAGIC)  # el índice evita leer desde el principio
+        events = list(journal.replay(1300.0, 1302.0))
+        assert [ts for ts, _ in events] == [1300.0, 1301.0, 1302.0]
+        assert events[0][1] == ChatEstablished("u300", "bob")
+        assert list(journal.replay(types=(ChatEnded,))) == []
+        assert journal.summary(1400.0) == {"ChatEstablished": 100}
+
+
+def test_timestamps_never_decrease_across_reopens(tmp_path):
+    path = tmp_path / "events.journal"
+    write(path, [(2000.0, EVENTS[0]), (1990.0, EVENTS[1])])
+    write(path, [(1500.0, EVENTS[2])])
+    with Journal(str(path)) as journal:
+        assert [ts for ts, _ in journal] == [2000.0, 2000.0, 2000.0]
+    assert path.read_bytes().count(MAGIC) == 1
+
+
+def test_truncated_tail_ends_the_replay(tmp_path):
+    path = tmp_path / "events.journal"
+    write(path, [(1.0, event) for event in EVENTS])
+    path.write_bytes(path.read_bytes()[:-3])
+    with Journal(str(path)) as journal:
+        assert [event for _, event in journal] == EVENTS[:-1]
+
+
+def test_other_files_and_empty_journals(tmp_path):
+    other = tmp_path / "other"
+    other.write_bytes(b"not a journal")
+    with pytest.raises(ValueError):
+        Journal(str(other))
+    empty = tmp_path / "empty.journal"
+    empty.touch()
+    with Journal(str(empty)) as journal:
+        assert list(journal) == [] and journal.summary() == {}
+
+
+def test_replay_command_line(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "events.journal"
+    write(path, [(1.0, event) for event in EVENTS])
+    monkeypatch.setattr(sys, "argv", ["replay", str(path), "--type", "ChatEnded"])
+    replay.main()
+    assert capsys.readouterr().out.strip().endswith(repr(EVENTS[-1]))
+    monkeypatch.setattr(sys, "argv", ["replay", str(path), "--summary"])
+    replay.main()
+    assert "ClientJoined" in capsys.readouterr().out
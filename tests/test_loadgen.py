@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Generador de carga: cada escenario corre contra ambos motores sin errores."""
+
+import argparse
+import asyncio
+
+import pytest
+
+from benchmarks.loadgen import RUNNERS, SCENARIOS, Stats, start_server
+
+
+@pytest.fixture(scope="module", params=["threaded", "async"])
+def port(request):
+    return start_server(request.param)
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_scenario_runs_cleanly(port, scenario):
+    args = argparse.Namespace(clients=4, duration=0.2, concurrency=4, size=64, file_sizes="1024,70000")
+    stats = Stats()
+    asyncio.run(asyncio.wait_for(RUNNERS[scenario]("127.0.0.1", port, args, stats), 30))
+    report = stats.report()
+    assert report["errors"] == 0
+    assert report["messages"] > 0 and stats.latencies
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Control de log: umbrales por salida, muestreo, límite de tasa y reglas en texto."""
+
+import pytest
+
+from server.events import ChatEstablished, ClientHandshakeStarted, FatalError, FileTransferRouted
+from server.logcontrol import CONSOLE, FILE, LogControl, TokenBucket
+
+
+def test_levels_choose_the_sinks():
+    control = LogControl(console_level="INFO")
+    assert control.admit(ChatEstablished) == CONSOLE | FILE
+    assert control.admit(ClientHandshakeStarted) == FILE  # DEBUG por defecto: solo archivo
+    control.set_levels(file="ERROR")
+    assert control.admit(ClientHandshakeStarted) == 0
+    assert control.admit(FatalError) == CONSOLE | FILE
+
+
+def test_sampling_keeps_one_in_n_and_counts_the_rest():
+    control = LogControl()
+    control.configure("FileTransferRouted", sample=4)
+    admitted = [control.admit(FileTransferRouted) for _ in range(12)]
+    assert sum(1 for sinks in admitted if sinks) == 3
+    assert control.take_suppressed() == {"FileTransferRouted": 9}
+    assert control.take_suppressed() == {}
+
+
+def test_rate_limit_admits_a_burst():
+    control = LogControl()
+    control.configure("ChatEstablished", rate=0.001, burst=5)
+    assert sum(1 for _ in range(20) if control.admit(ChatEstablished)) == 5
+
+
+def test_suppressed_counts_survive_a_rule_change():
+    control = LogControl()
+    control.configure("FileTransferRouted", sample=2)
+    for _ in range(4):
+        control.admit(FileTransferRouted)
+    control.configure("FileTransferRouted", sample=1)
+    assert control.take_suppressed() == {"FileTransferRouted": 2}
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("server.logcontrol.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.take() and bucket.take() and not bucket.take()
+    now[0] += 0.5
+    assert bucket.take() and not bucket.take()
+
+
+def test_text_rules():
+    control = LogControl()
+    described = control.apply("console=warning file=info; FileTransferRouted rate=50 burst=100;"
+                              " ClientHandshakeStarted sample=10 level=info")
+    assert described.startswith("console=WARNING file=INFO")
+    assert "FileTransferRouted level=DEBUG rate=50 burst=100 sample=1" in described
+    assert [control.admit(ClientHandshakeStarted) for _ in range(10)] == [0] * 9 + [FILE]
+    assert control.admin_commands()["log"]([]) == described
+    for bad in ("ChatEstablished color=red", "verbose=1", "ChatEstablished level=LOUD", "ChatEstablished sample=0"):
+        with pytest.raises(ValueError):
+            control.apply(bad)
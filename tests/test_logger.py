@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""FileWorker: escritura por lotes, volcado por tiempo y rotación por tamaño con copias acotadas."""
+
+import gzip
+import queue
+import time
+
+from server.logger import FileWorker, LogEntry, LogFileConfig, plain_line
+
+
+def entry(n):
+    return LogEntry("INFO", f"mensaje {n}", "2025-01-01 12:00:00")
+
+
+def run_worker(path, entries, config=None):
+    log_queue = queue.Queue()
+    worker = FileWorker(log_queue, str(path), config)
+    writes = []
+    write = worker._write
+    worker._write = lambda batch: (writes.append(len(batch)), write(batch))
+    for item in entries:
+        log_queue.put(item)
+    log_queue.put(None)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive()
+    return writes
+
+
+def test_plain_line_formats_special_levels():
+    assert plain_line(entry(1)) == "[2025-01-01 12:00:00] [INFO] mensaje 1\n"
+    file_entry = LogEntry("FILE", "a.txt", "t", {"sender": "ana", "receiver": "bob"})
+    assert plain_line(file_entry) == "[t] [FILE] Archivo: ana -> bob: a.txt\n"
+
+
+def test_queued_entries_are_written_in_batches(tmp_path):
+    path = tmp_path / "server.log"
+    writes = run_worker(path, [entry(n) for n in range(250)], LogFileConfig(batch=100))
+    assert writes == [100, 100, 50]
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 250 and lines[-1].endswith("mensaje 249")
+
+
+def test_idle_worker_flushes_after_the_interval(tmp_path):
+    path = tmp_path / "server.log"
+    log_queue = queue.Queue()
+    worker = FileWorker(log_queue, str(path), LogFileConfig(flush_interval=0.05))
+    worker.start()
+    try:
+        log_queue.put(entry(1))
+        deadline = time.monotonic() + 5
+        while not path.exists() or not path.read_text(encoding="utf-8"):
+            assert time.monotonic() < deadline, "la línea no llegó al disco"
+            time.sleep(0.02)
+    finally:
+        log_queue.put(None)
+        worker.join(5)
+
+
+def test_size_rotation_keeps_the_configured_backups(tmp_path):
+    path = tmp_path / "server.log"
+    config = LogFileConfig(batch=10, max_bytes=400, backups=2)
+    run_worker(path, [entry(n) for n in range(200)], config)
+    rotated = sorted(p.name for p in tmp_path.iterdir() if p.name != "server.log")
+    assert len(rotated) == 2 and all(name.startswith("server.log.") for name in rotated)
+    assert all((tmp_path / name).stat().st_size >= 400 for name in rotated)
+
+
+def test_rotated_files_can_be_compressed(tmp_path):
+    path = tmp_path / "server.log"
+    run_worker(path, [entry(n) for n in range(20)], LogFileConfig(batch=20, max_bytes=100, compress=True))
+    deadline = time.monotonic() + 5
+    while not list(tmp_path.glob("*.gz")):
+        assert time.monotonic() < deadline, "el archivo rotado no se comprimió"
+        time.sleep(0.02)
+    gz = next(tmp_path.glob("*.gz"))
+    deadline = time.monotonic() + 5
+    while gz.with_suffix("").exists():  # se borra el original al terminar la compresión
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    with gzip.open(gz, "rt", encoding="utf-8") as f:
+        assert f.read().count("\n") == 20
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Métricas: suma de almacenes por hilo, histogramas, gauges, observer y exportador HTTP."""
+
+import threading
+import urllib.request
+
+from common.framing import frame_parts
+from server.events import ChatEstablished, RoomMessagePosted
+from server.metrics import Metrics, MetricsExporter, MetricsObserver
+
+
+def test_counters_from_several_threads_add_up():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(1000):
+            metrics.inc("chat_connections_total")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.inc("chat_connections_total")
+    # Los almacenes de los hilos terminados se acumulan en el total retirado
+    assert metrics.snapshot().counters[("chat_connections_total", ())] == 4001
+    assert "chat_connections_total 4001\n" in metrics.render()
+
+
+def test_frames_are_counted_by_type_with_header():
+    metrics = Metrics()
+    metrics.frame_in(1, 10)
+    metrics.frame_out(frame_parts(0, b"hola"))
+    counters = metrics.snapshot().counters
+    assert counters[("chat_frames_received_total", ("command",))] == 1
+    assert counters[("chat_bytes_received_total", ("command",))] == 15
+    assert counters[("chat_bytes_sent_total", ("text",))] == 9
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        metrics.observe("chat_dispatch_seconds", value, ("CHAT",))
+    text = metrics.render()
+    assert 'chat_dispatch_seconds_bucket{command="CHAT",le="0.1"} 1' in text
+    assert 'chat_dispatch_seconds_bucket{command="CHAT",le="1.0"} 2' in text
+    assert 'chat_dispatch_seconds_bucket{command="CHAT",le="+Inf"} 3' in text
+    assert 'chat_dispatch_seconds_count{command="CHAT"} 3' in text
+    assert 'chat_dispatch_seconds_sum{command="CHAT"} 5.55' in text
+
+
+def test_gauges_are_read_on_export_and_failures_skipped():
+    metrics = Metrics()
+    metrics.gauge("chat_buffer_depth", lambda: {("0",): 3, ("1",): 0})
+    metrics.gauge("chat_sessions", lambda: 1 / 0)
+    text = metrics.render()
+    assert 'chat_buffer_depth{shard="0"} 3' in text and 'chat_buffer_depth{shard="1"} 0' in text
+    assert "# TYPE chat_sessions gauge\n" in text
+
+
+def test_observer_translates_events():
+    metrics = Metrics()
+    observer = MetricsObserver(metrics)
+    observer(ChatEstablished("ana", "bob"))
+    observer(RoomMessagePosted("sala", "ana", 7))
+    observer(object())
+    counters = metrics.snapshot().counters
+    assert counters[("chat_chats_total", ("established",))] == 1
+    assert counters[("chat_room_deliveries_total", ())] == 7
+
+
+def test_exporter_serves_metrics():
+    metrics = Metrics()
+    metrics.inc("chat_errors_total", ("client",))
+    exporter = MetricsExporter(metrics, 0)
+    exporter.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'chat_errors_total{kind="client"} 1' in response.read().decode("utf-8")
+    finally:
+        exporter.stop()
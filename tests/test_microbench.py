@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Microbenchmarks: cada grupo mide sus casos y la comparación con la línea base detecta regresiones."""
+
+import json
+import sys
+
+import pytest
+
+from benchmarks import microbench
+
+
+@pytest.mark.parametrize("name, suite", microbench.SUITES, ids=[name for name, _ in microbench.SUITES])
+def test_every_suite_reports_its_cases(name, suite):
+    results = suite(20, 1)
+    assert results and all(case.startswith(name + ".") for case in results)
+    assert all(metrics["us_per_op"] > 0 for metrics in results.values())
+
+
+def test_compare_flags_regressions_over_the_threshold(capsys):
+    baseline = {"a": {"us_per_op": 1.0}, "b": {"us_per_op": 1.0}, "c": {"us_per_op": 1.0}}
+    results = {"a": {"us_per_op": 1.05}, "b": {"us_per_op": 1.5}, "c": {"us_per_op": 0.5},
+               "d": {"us_per_op": 1.0}}
+    assert microbench.compare(results, baseline, 0.10) == ["b"]
+    out = capsys.readouterr().out
+    assert "REGRESIÓN" in out and "mejora" in out and "nuevo" in out
+
+
+def test_baseline_round_trip(tmp_path, monkeypatch):
+    path = tmp_path / "baseline.json"
+    argv = ["microbench", "--filter", "tlv", "--iterations", "20", "--repeats", "1"]
+    monkeypatch.setattr(sys, "argv", argv + ["--save-baseline", str(path)])
+    microbench.main()
+    document = json.loads(path.read_text(encoding="utf-8"))
+    assert document["meta"]["iterations"] == 20 and "tlv.header_pack" in document["results"]
+    # Una línea base mucho más rápida marca regresión y sale con código 1
+    for metrics in document["results"].values():
+        metrics["us_per_op"] /= 1000
+    path.write_text(json.dumps(document), encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", argv + ["--baseline", str(path)])
+    with pytest.raises(SystemExit) as exit_info:
+        microbench.main()
+    assert exit_info.value.code == 1
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Observable: filtrado por tipo de evento, observers que fallan y entrega asíncrona."""
+
+import threading
+
+import pytest
+
+from server.events import ChatEnded, ChatEstablished
+from server.observable import AsyncObserver, Observable
+
+
+def test_observers_only_receive_their_event_types():
+    source = Observable()
+    everything, chats = [], []
+    source.subscribe(everything.append)
+    source.subscribe(chats.append, (ChatEstablished,))
+    source.emit(ChatEstablished("ana", "bob"))
+    source.emit(ChatEnded("ana", "bob"))
+    source.emit("otro")
+    assert len(everything) == 3 and chats == [ChatEstablished("ana", "bob")]
+
+
+def test_subscription_changes_rebuild_the_routes():
+    source = Observable()
+    seen = []
+    source.emit(ChatEnded("ana", "bob"))  # ruta vacía ya calculada para el tipo
+    source.subscribe(seen.append, (ChatEnded,))
+    source.emit(ChatEnded("ana", "bob"))
+    source.unsubscribe(seen.append)
+    source.emit(ChatEnded("ana", "bob"))
+    assert seen == [ChatEnded("ana", "bob")]
+
+
+def test_failing_observer_does_not_stop_the_others():
+    source = Observable()
+    seen = []
+    source.subscribe(lambda event: 1 / 0)
+    source.subscribe(seen.append)
+    source.emit("evento")
+    assert seen == ["evento"]
+
+
+def test_async_observer_runs_in_its_own_thread():
+    source = Observable()
+    threads = []
+    done = threading.Event()
+
+    def observer(event):
+        threads.append(threading.current_thread())
+        if event == 2:
+            done.set()
+
+    source.subscribe(observer, delivery="async")
+    for event in range(3):
+        source.emit(event)
+    assert done.wait(5)
+    source.unsubscribe(observer)  # entrega lo pendiente antes de terminar
+    assert len(threads) == 3 and threading.current_thread() not in threads
+
+
+def test_drop_policy_counts_what_does_not_fit():
+    release = threading.Event()
+    target = AsyncObserver(lambda event: release.wait(5), maxsize=2)
+    for event in range(10):
+        target(event)
+    # Uno en el observer (o aún en la cola) y dos encolados: el resto se descarta
+    assert target.dropped >= 7 and target.pending() <= 2
+    release.set()
+    target.stop()
+
+
+def test_unknown_delivery_or_policy_is_rejected():
+    source = Observable()
+    with pytest.raises(ValueError):
+        source.subscribe(print, delivery="later")
+    with pytest.raises(ValueError):
+        source.subscribe(print, delivery="async", policy="retry")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Cola de salida por sesión: políticas de desbordamiento y tramas de control."""
+
+from queue import Queue
+
+from common.framing import FileRegion
+from server.cluster import ClusterRouter
+from server.core import CHUNK_DONE, CHUNK_END, CHUNK_NEED, FILE_CHUNK
+from server.peers import RemoteSession
+from server.outbox import (
+    POLICY_DISCONNECT, POLICY_DROP, POLICY_SPILL, SPILL_READ_SIZE, OutboundQueue, OutboxConfig,
+)
+
+
+def drain(queue):
+    """Concatena todo lo que el escritor sacaría de la cola."""
+    out = b""
+    while (batch := queue.take_batch()) is not None:
+        out += b"".join(bytes(part) for part in batch)
+    return out
+
+
+def test_disconnect_policy_reports_the_overflow():
+    overflows, ready = [], []
+    queue = OutboundQueue(OutboxConfig(max_frames=2, policy=POLICY_DISCONNECT),
+                          on_ready=lambda: ready.append(1), on_overflow=lambda: overflows.append(1))
+    assert queue.put((b"a",)) and queue.put((b"b",))
+    assert not queue.overflowed
+    assert not queue.put((b"c",))
+    assert queue.overflowed and overflows == [1] and len(ready) == 2
+    assert queue.stats()["dropped"] == 1
+    assert drain(queue) == b"ab"  # lo ya encolado no se toca
+
+
+def test_drop_policy_discards_only_the_new_frame():
+    overflows = []
+    queue = OutboundQueue(OutboxConfig(max_bytes=10, policy=POLICY_DROP),
+                          on_overflow=lambda: overflows.append(1))
+    assert queue.put((b"12345", b"678"))
+    assert not queue.put((b"abc",))  # 8 + 3 > 10 bytes
+    assert queue.put((b"",))         # cabe
+    assert queue.stats()["dropped"] == 1 and not overflows and not queue.overflowed
+    assert drain(queue) == b"12345678"
+    # Con la cola vacía se admite una trama mayor que el límite
+    assert queue.put((b"x" * 50,))
+    assert drain(queue) == b"x" * 50
+
+
+def test_spill_round_trip_keeps_fifo_order(tmp_path):
+    region_path = tmp_path / "region.bin"
+    region_path.write_bytes(b"R" * (SPILL_READ_SIZE + 7))
+    queue = OutboundQueue(OutboxConfig(max_frames=2, policy=POLICY_SPILL))
+    with open(region_path, "rb") as f:
+        frames = [(b"m0",), (b"m1",),  # en memoria
+                  (b"d2-", FileRegion(f, 0, SPILL_READ_SIZE + 7)),  # al volcado, desde el archivo
+                  (b"d3",)]
+        for frame in frames:
+            assert queue.put(frame)
+        stats = queue.stats()
+        assert stats["depth"] == 2 and stats["spilled"] == 2
+        assert stats["spill_bytes"] == 3 + SPILL_READ_SIZE + 7 + 2
+        # La memoria se vacía pero el volcado sigue pendiente: lo nuevo va detrás
+        assert queue.take_batch() == [b"m0"]
+        assert queue.put((b"d4",))
+        assert queue.stats()["spilled"] == 3
+        expected = b"m1d2-" + b"R" * (SPILL_READ_SIZE + 7) + b"d3d4"
+        assert drain(queue) == expected
+    assert not queue.pending() and queue.stats()["spill_bytes"] == 0
+    # Vaciado el volcado, las tramas vuelven a la memoria
+    assert queue.put((b"m5",)) and queue.stats()["spilled"] == 3
+    assert drain(queue) == b"m5"
+
+
+def test_control_frames_are_never_dropped():
+    queue = OutboundQueue(OutboxConfig(max_frames=1, policy=POLICY_DROP))
+    assert queue.put((b"chat-1",))
+    assert not queue.put((b"chat-2",))
+    assert queue.put((b"CREDIT",), control=True)
+    assert queue.stats()["dropped"] == 1
+    # El control sale antes que lo que ya estaba encolado
+    assert drain(queue) == b"CREDITchat-1"
+
+
+def test_control_frames_wait_for_a_spilled_frame_boundary():
+    queue = OutboundQueue(OutboxConfig(max_frames=1, policy=POLICY_SPILL))
+    big = b"x" * (SPILL_READ_SIZE * 2 + 10)
+    queue.put((b"first",))
+    queue.put((b"[", big, b"]"))  # volcada a disco
+    queue.put((b"next",))         # también al volcado, detrás
+    assert queue.take_batch() == [b"first"]
+    head = queue.take_batch()[0]
+    assert len(head) == SPILL_READ_SIZE
+    queue.put((b"CREDIT",), control=True)
+    # Termina la trama volcada en curso, luego el control y después el resto
+    while (batch := queue.take_batch()) != [b"CREDIT"]:
+        head += batch[0]
+    assert head == b"[" + big + b"]"
+    assert drain(queue) == b"next"
+    assert not queue.pending()
+
+
+class Recorder:
+    """Sesión local que anota lo que se le encola."""
+
+    closed = False
+    codecs = ()
+
+    def __init__(self):
+        self.frames = Queue()
+
+    def send(self, msg_type, data, block=False, control=False):
+        parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        self.frames.put((msg_type, b"".join(bytes(part) for part in parts), control))
+        return True
+
+
+def test_need_and_done_stay_control_across_the_peer_link(tmp_path):
+    owners = {}
+    routers = [ClusterRouter(n, 2, str(tmp_path), owners) for n in range(2)]
+    for router in routers:
+        router.start()
+    try:
+        bob = Recorder()
+        assert routers[1].claim("bob", bob)
+        remote = routers[0].lookup("bob")
+        assert isinstance(remote, RemoteSession)
+        prefix = b"\x03ana"
+        for kind, control in ((CHUNK_NEED, True), (CHUNK_DONE, True), (CHUNK_END, False)):
+            body = b"\x00\x00\x00\x07" + bytes([kind]) + b"cuerpo"
+            remote.send(FILE_CHUNK, (prefix, body), block=True, control=control)
+            assert bob.frames.get(timeout=5) == (FILE_CHUNK, prefix + body, control)
+    finally:
+        for router in routers:
+            router.stop()
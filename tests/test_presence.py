@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Presencia versionada: lista completa, deltas desde una versión y reparto en orden."""
+
+import pytest
+
+from common.compression import FrameCodec
+from common.protocol import PROTOCOL_V1
+from server.presence import Presence
+from server.rooms import FanOut
+
+
+class Session:
+    """Suscriptor v1 que guarda los comandos recibidos como texto."""
+
+    protocol = PROTOCOL_V1
+    codecs = ()
+
+    def __init__(self):
+        self.received = []
+
+    def send_frame(self, frame):
+        self.received.append(b"".join(frame)[5:].decode("utf-8"))
+        return True
+
+
+@pytest.fixture
+def presence():
+    return Presence(FrameCodec(), FanOut())
+
+
+def test_updates_bump_the_version_and_repeats_are_ignored(presence):
+    presence.update("ana", True)
+    presence.update("ana", True)
+    presence.update("bob", False)
+    assert presence.version == 1
+    presence.update("bob", True)
+    presence.update("ana", False)
+    assert presence.version == 3
+
+
+def test_subscribe_without_version_gets_a_snapshot(presence):
+    presence.update("ana", True)
+    presence.update("bob", True)
+    session = Session()
+    presence.subscribe(session)
+    assert session.received == [f"PRESENCE_SNAPSHOT:{presence.epoch},2,ana,bob"]
+
+
+def test_known_version_gets_only_the_changes(presence):
+    for name in ("ana", "bob", "carla", "dani"):
+        presence.update(name, True)
+    presence.update("bob", False)
+    presence.update("eva", True)
+    session = Session()
+    presence.subscribe(session, presence.epoch, "4")
+    assert session.received == [f"PRESENCE_DELTA:{presence.epoch},6,-bob,+eva"]
+
+
+@pytest.mark.parametrize("epoch, version", [("otra", "1"), (None, "9"), (None, "x")])
+def test_unknown_epoch_or_version_gets_a_snapshot(presence, epoch, version):
+    presence.update("ana", True)
+    presence.update("bob", True)
+    session = Session()
+    presence.subscribe(session, epoch or presence.epoch, version)
+    assert session.received[0].startswith("PRESENCE_SNAPSHOT:")
+
+
+def test_forgotten_changes_send_a_snapshot():
+    presence = Presence(FrameCodec(), FanOut(), history=2)
+    for name in ("ana", "bob", "carla"):
+        presence.update(name, True)
+    session = Session()
+    presence.subscribe(session, presence.epoch, "0")  # el cambio 1 salió del historial
+    assert session.received == [f"PRESENCE_SNAPSHOT:{presence.epoch},3,ana,bob,carla"]
+    late = Session()
+    presence.subscribe(late, presence.epoch, "1")
+    assert late.received == [f"PRESENCE_DELTA:{presence.epoch},3,+bob,+carla"]
+
+
+def test_delta_as_long_as_the_list_sends_a_snapshot(presence):
+    presence.update("ana", True)
+    session = Session()
+    presence.subscribe(session, presence.epoch, "0")
+    assert session.received == [f"PRESENCE_SNAPSHOT:{presence.epoch},1,ana"]
+
+
+def test_subscribers_receive_every_change_in_order(presence):
+    sessions = [Session() for _ in range(3)]
+    for session in sessions:
+        presence.subscribe(session)
+    presence.update("ana", True)
+    presence.update("bob", True)
+    presence.update("ana", False)
+    presence.unsubscribe(sessions[2])
+    presence.update("carla", True)
+    epoch = presence.epoch
+    expected = [f"PRESENCE_SNAPSHOT:{epoch},0", f"PRESENCE_DELTA:{epoch},1,+ana",
+                f"PRESENCE_DELTA:{epoch},2,+bob", f"PRESENCE_DELTA:{epoch},3,-ana"]
+    assert sessions[2].received == expected
+    assert sessions[0].received == sessions[1].received == expected + [f"PRESENCE_DELTA:{epoch},4,+carla"]
+
+
+def test_user_list_is_cached_per_version(presence):
+    presence.update("ana", True)
+    listing = presence.user_list()
+    assert presence.user_list() is listing
+    presence.update("bob", True)
+    assert presence.user_list() is not listing
+    session = Session()
+    session.send_frame(presence.user_list().frame_for(session))
+    assert session.received == ["LIST_USERS:ana,bob"]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Perfilado bajo demanda: una sesión a la vez, archivos de cada modo y puerto de administración."""
+
+import socket
+import time
+
+import pytest
+
+from server.profiling import AdminServer, Profiler, handler_for
+
+
+class Server:
+    """Lo que Profiler usa de ChatServer: el gancho de despacho y las colas."""
+
+    _dispatch_hook = None
+
+    def outbound_stats(self):
+        return {"ana": {"depth": 2, "bytes": 10}}
+
+    def buffer_stats(self):
+        return [{"depth": 1}, {"depth": 3}]
+
+
+def wait_idle(profiler):
+    deadline = time.monotonic() + 10
+    while profiler.status().startswith("en curso"):
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_handler_for_maps_commands_to_methods():
+    assert handler_for("CHAT") == "handle_chat_message"
+    assert handler_for("FILE_CHUNK") == "handle_file_chunk"
+    assert handler_for("NOPE") == "?"
+
+
+def test_one_session_at_a_time(tmp_path):
+    profiler = Profiler(Server(), str(tmp_path))
+    with pytest.raises(ValueError):
+        profiler.start("heap")
+    profiler.start("sample", 0.2)
+    with pytest.raises(RuntimeError):
+        profiler.start("memory", 0.1)
+    wait_idle(profiler)
+    assert profiler.status().startswith("inactivo; últimos archivos: ")
+    assert sorted(p.name.rsplit("-", 1)[1] for p in tmp_path.iterdir()) == ["sample.folded", "sample.txt"]
+
+
+@pytest.mark.parametrize("seconds, interval", [(0, 0.005), (-1, 0.005), (float("nan"), 0.005),
+                                               (1, 0), (1, -0.001)])
+def test_non_positive_windows_are_rejected(tmp_path, seconds, interval):
+    profiler = Profiler(Server(), str(tmp_path))
+    with pytest.raises(ValueError, match="positiv"):
+        profiler.start("sample", seconds, interval)
+    assert profiler.status().startswith("inactivo")  # no queda una sesión a medias
+
+
+def test_cprofile_installs_and_removes_the_dispatch_hook(tmp_path):
+    server = Server()
+    profiler = Profiler(server, str(tmp_path))
+    profiler.start("cprofile", 0.3)
+    deadline = time.monotonic() + 5
+    while server._dispatch_hook is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    wait_idle(profiler)
+    assert server._dispatch_hook is None
+    with open(profiler._last[0], encoding="utf-8") as f:
+        assert f.read().startswith("cProfile por comando")
+
+
+def test_memory_reports_queued_work(tmp_path):
+    profiler = Profiler(Server(), str(tmp_path))
+    profiler.start("memory", 0.1)
+    wait_idle(profiler)
+    with open(profiler._last[0], encoding="utf-8") as f:
+        report = f.read()
+    assert "buffer_requests" in report and "outbox_bytes" in report
+    assert len(list(tmp_path.glob("*.snap"))) == 2
+
+
+def test_admin_port_runs_commands(tmp_path):
+    admin = AdminServer(Profiler(Server(), str(tmp_path)).admin_commands(), 0)
+    admin.start()
+    try:
+        with socket.create_connection(("127.0.0.1", admin.port), timeout=5) as sock:
+            replies = sock.makefile("rb")
+            sock.sendall(b"status\nfoo\nsample x\nsample 0\nsample 1 -5\n")
+            assert replies.readline().startswith("inactivo".encode("utf-8"))
+            assert replies.readline().startswith(b"error: orden desconocida 'foo'")
+            assert replies.readline().startswith(b"error: could not convert")
+            assert replies.readline() == b"error: la ventana debe ser positiva: 0 s\n"
+            assert replies.readline() == b"error: el intervalo de muestreo debe ser positivo: -5 ms\n"
+    finally:
+        admin.stop()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Protocolo v1/v2: codificación, despacho por tabla y comandos mal formados."""
+
+import pytest
+
+from benchmarks.common import connect, recv_tlv, send_tlv
+from common.protocol import (
+    BINARY_COMMAND, OPCODES, PROTOCOL_V1, PROTOCOL_V2, decode_binary, encode_binary,
+    frame_command, split_args,
+)
+from server.facade import SERVER_MODES
+from server.handlers import ProtocolHandlers
+
+
+def test_binary_fields_may_contain_separators():
+    payload = encode_binary(OPCODES["CHAT"], "bob", "a:b,c", "")
+    assert decode_binary(payload) == (OPCODES["CHAT"], ["bob", "a:b,c", ""])
+
+
+@pytest.mark.parametrize("payload", [b"", b"\x07\x00", b"\x07\x00\x05bob", b"\x07\x00\x02\xff\xfe"])
+def test_malformed_binary_commands_are_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_binary(payload)
+
+
+def test_handler_type_errors_are_not_taken_for_a_bad_field_count():
+    class Server:
+        def handle_req_chat(self, session, target):
+            return len(None)  # error propio del manejador, una llamada más abajo
+
+    with pytest.raises(TypeError):
+        ProtocolHandlers.dispatch(Server(), None, BINARY_COMMAND, encode_binary(OPCODES["REQ_CHAT"], "bob"))
+
+
+def test_frame_command_by_version():
+    assert frame_command(PROTOCOL_V1, "CHAT", "bob", "hola") == (0, b"CHAT:bob:hola")
+    assert frame_command(PROTOCOL_V1, "NAME_OK") == (1, b"NAME_OK")
+    assert frame_command(PROTOCOL_V2, "NAME_OK") == (BINARY_COMMAND, bytes([OPCODES["NAME_OK"]]))
+
+
+def test_split_args():
+    assert split_args("bob:a:b", 1) == ["bob", "a:b"]
+    assert split_args("a:b", 0) == ["a:b"]
+    assert split_args("a:b", None) == []
+
+
+# ----------------------------------------------------------------------
+# Servidor: un comando v2 con campos de más o de menos recibe ERROR
+# ----------------------------------------------------------------------
+
+@pytest.fixture(scope="module", params=sorted(SERVER_MODES))
+def port(request, start_server):
+    return start_server(SERVER_MODES[request.param]).port
+
+
+def v2_client(port):
+    sock = connect(port)
+    sock.settimeout(5)
+    send_tlv(sock, 1, b"HELLO:2")
+    assert recv_tlv(sock)[1] == b"HELLO_OK:2"
+    return sock
+
+
+@pytest.mark.parametrize("command, fields", [
+    ("REQ_CHAT", ()), ("REQ_CHAT", ("bob", "extra")), ("SET_NAME", ()), ("DENY_CHAT", ("a", "b")),
+    ("GET_USERS", ("extra",)), ("ACCEPT_SEND_FILES", ()),
+])
+def test_wrong_field_count_gets_an_error(port, command, fields):
+    sock = v2_client(port)
+    send_tlv(sock, BINARY_COMMAND, encode_binary(OPCODES[command], *fields))
+    msg_type, payload = recv_tlv(sock)
+    assert msg_type == BINARY_COMMAND
+    opcode, (description,) = decode_binary(payload)
+    assert opcode == OPCODES["ERROR"] and command in description
+    # La sesión sigue atendiendo comandos
+    send_tlv(sock, BINARY_COMMAND, encode_binary(OPCODES["SET_NAME"], f"v2_{command}_{len(fields)}"))
+    assert decode_binary(recv_tlv(sock)[1]) == (OPCODES["NAME_OK"], [])
+    sock.close()
+
+
+@pytest.mark.parametrize("payload", [b"", b"\x03\x00", b"\x03\x00\x05bob"])
+def test_malformed_binary_command_gets_an_error(port, payload):
+    sock = v2_client(port)
+    send_tlv(sock, BINARY_COMMAND, payload)
+    assert decode_binary(recv_tlv(sock)[1]) == (OPCODES["ERROR"], ["Comando binario mal formado"])
+    send_tlv(sock, BINARY_COMMAND, encode_binary(OPCODES["SET_NAME"], f"v2_bad_{len(payload)}"))
+    assert decode_binary(recv_tlv(sock)[1]) == (OPCODES["NAME_OK"], [])
+    sock.close()
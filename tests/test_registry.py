@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""SessionRegistry: clientes por nombre y lista de adyacencia de los chats activos; ofertas de LocalRouter."""
+
+import threading
+
+from server.registry import SessionRegistry
+from server.router import LocalRouter
+
+
+class Session:
+    closed = False
+    name = ""
+
+
+def registered(registry, *names):
+    sessions = {}
+    for name in names:
+        sessions[name] = Session()
+        assert registry.register(name, sessions[name])
+    return sessions
+
+
+def test_connect_and_drop_user():
+    registry = SessionRegistry()
+    registered(registry, "ana", "bob", "eva")
+    assert registry.connect("ana", "bob")
+    assert registry.connect("ana", "eva")
+    assert registry.are_connected("bob", "ana")
+    assert registry.partners("ana") == {"bob", "eva"}
+    assert registry.drop_user("ana") == {"bob", "eva"}
+    assert not registry.are_connected("bob", "ana")
+    assert registry.partners("eva") == set()
+
+
+def test_connect_fails_once_a_name_is_released():
+    registry = SessionRegistry()
+    sessions = registered(registry, "ana", "bob")
+    assert registry.unregister("bob", sessions["bob"])
+    assert not registry.connect("ana", "bob")
+    # Solo se exigen los nombres indicados (p. ej. el extremo local de un chat remoto)
+    assert registry.connect("ana", "bob", registered=("ana",))
+
+
+def test_accept_racing_a_disconnect_leaves_no_stale_edge():
+    # Mismo orden que ChatServer: aceptar = connect(); desconectar = unregister() + drop_user()
+    for _ in range(200):
+        registry = SessionRegistry()
+        sessions = registered(registry, "ana", "bob")
+        start = threading.Barrier(2)
+
+        def accept():
+            start.wait()
+            registry.connect("ana", "bob")
+
+        def disconnect():
+            start.wait()
+            registry.unregister("bob", sessions["bob"])
+            registry.drop_user("bob")
+
+        threads = [threading.Thread(target=accept), threading.Thread(target=disconnect)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Un nuevo "bob" no hereda el chat que el anterior nunca llegó a cerrar
+        registered(registry, "bob")
+        assert not registry.are_connected("ana", "bob")
+        assert registry.partners("bob") == set()
+
+
+def test_drop_user_withdraws_its_offers():
+    router = LocalRouter()
+    router.set_offer("ana", "bob", ("STREAM",))
+    router.set_offer("carla", "ana", ("STREAM", "RESUME"))
+    router.set_offer("carla", "bob", ("STREAM",))
+    router.drop_user("ana")
+    # Al reconectar, ana no hereda ni las ofertas que hizo ni las que recibió
+    assert router.take_offer("ana", "bob") == ()
+    assert router.take_offer("carla", "ana") == ()
+    assert router.take_offer("carla", "bob") == ("STREAM",)
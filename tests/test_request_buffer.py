@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""RequestBuffer: orden por sesión, particiones acotadas y paradas contadas."""
+
+import threading
+import time
+
+from server.buffer import RequestBuffer
+
+
+class Session:
+    name = "ana"
+
+
+def test_requests_of_a_session_keep_their_order():
+    seen = []
+    done = threading.Event()
+
+    def process(session, msg_type, payload):
+        seen.append((session, payload))
+        if len(seen) == 400:
+            done.set()
+
+    buffer = RequestBuffer(process, lambda event: None, workers=4)
+    try:
+        sessions = [Session() for _ in range(4)]
+        for i in range(100):
+            for session in sessions:
+                buffer.add_request(session, 1, i)
+        assert done.wait(5)
+        for session in sessions:
+            assert [payload for s, payload in seen if s is session] == list(range(100))
+    finally:
+        buffer.stop()
+
+
+def test_stalls_from_concurrent_producers_are_all_counted():
+    release = threading.Event()
+    buffer = RequestBuffer(lambda *args: release.wait(5), lambda event: None,
+                           workers=1, max_pending=1)
+    try:
+        session = Session()
+        buffer.add_request(session, 1, b"")  # el worker se queda en esta
+        time.sleep(0.05)
+        buffer.add_request(session, 1, b"")  # llena la partición
+        producers = [threading.Thread(target=buffer.add_request, args=(session, 1, b""))
+                     for _ in range(16)]
+        for producer in producers:
+            producer.start()
+        time.sleep(0.1)
+        release.set()
+        for producer in producers:
+            producer.join(5)
+        assert buffer.stalls == 16
+        assert buffer.stall_seconds > 0
+        assert buffer.stats()[0]["stalls"] == 16
+    finally:
+        release.set()
+        buffer.stop()
+
+
+def test_non_blocking_add_reports_a_full_partition():
+    release = threading.Event()
+    freed = threading.Event()
+    buffer = RequestBuffer(lambda *args: release.wait(5), lambda event: None,
+                           workers=1, max_pending=1)
+    buffer.on_space = lambda index: freed.set()
+    try:
+        session = Session()
+        buffer.add_request(session, 1, b"")
+        time.sleep(0.05)
+        assert buffer.add_request(session, 1, b"", block=False)
+        assert not buffer.add_request(session, 1, b"", block=False)
+        release.set()
+        assert freed.wait(5)
+    finally:
+        release.set()
+        buffer.stop()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Transferencias reanudables: progreso en disco, NEED/DONE y límites de START_RESUME (user-024)."""
+
+import hashlib
+import os
+import struct
+import time
+
+import pytest
+
+from benchmarks.common import connect, recv_tlv, send_tlv
+from client.receiver import MessageReceiver
+from client.state import ChatState
+from client.transfer import (
+    CHUNK_DATA_AT, CHUNK_DONE, CHUNK_END, CHUNK_NEED, CHUNK_START_RESUME, DONE_CORRUPT, DONE_OK,
+    DONE_REJECTED, MAX_RESUME_CHUNK_SIZE, MAX_RESUME_CHUNKS, MAX_VERIFY_FAILURES, ResumableFile,
+    check_resume, decode_ranges, encode_chunk, encode_data_at, encode_start_resume,
+)
+from common.compression import FrameCodec
+
+CHUNK = 1024
+DATA = os.urandom(CHUNK * 10 + 100)  # 11 fragmentos, el último corto
+DIGEST = hashlib.sha256(DATA).digest()
+
+
+def piece(index: int) -> bytes:
+    return DATA[index * CHUNK:(index + 1) * CHUNK]
+
+
+# ----------------------------------------------------------------------
+# ResumableFile
+# ----------------------------------------------------------------------
+
+def new_file(directory, digest=DIGEST) -> ResumableFile:
+    return ResumableFile("ana", "datos.bin", len(DATA), digest, CHUNK, directory)
+
+
+def write(incoming: ResumableFile, *indexes: int) -> None:
+    for index in indexes:
+        assert incoming.write_chunk(index, encode_data_at(index, piece(index))[8:], piece(index))
+
+
+def test_missing_ranges_follow_received_chunks(tmp_path):
+    incoming = new_file(tmp_path)
+    assert incoming.chunks == 11
+    assert incoming.missing() == [(0, 11)]
+    write(incoming, 0, 1, 5, 10)
+    assert incoming.missing() == [(2, 5), (6, 10)]
+    assert incoming.missing(limit=1) == [(2, 5)]
+    incoming.discard()
+
+
+def test_bad_chunks_are_not_written(tmp_path):
+    incoming = new_file(tmp_path)
+    digest = encode_data_at(3, piece(3))[8:]
+    assert not incoming.write_chunk(3, digest, b"x" * CHUNK)         # resumen erróneo
+    assert not incoming.write_chunk(11, digest, piece(3))            # índice fuera de rango
+    assert not incoming.write_chunk(3, digest, piece(3) + b"extra")  # longitud distinta
+    last = piece(10)
+    assert not incoming.write_chunk(10, encode_data_at(10, last + b"!")[8:], last + b"!")
+    assert incoming.corrupt == 4
+    assert incoming.missing() == [(0, 11)]
+    incoming.discard()
+
+
+def test_progress_survives_close_and_resumes(tmp_path):
+    incoming = new_file(tmp_path)
+    write(incoming, 0, 1, 2, 7)
+    incoming.close()
+    resumed = new_file(tmp_path)
+    assert resumed.resumed
+    assert resumed.missing() == [(3, 7), (8, 11)]
+    write(resumed, 3, 4, 5, 6, 8, 9, 10)
+    assert resumed.verify()  # parte del resumen se lee de disco
+    resumed.finish(tmp_path / "datos.bin")
+    assert (tmp_path / "datos.bin").read_bytes() == DATA
+    assert not resumed.progress_path.exists()
+
+
+def test_progress_of_another_file_is_ignored(tmp_path):
+    incoming = new_file(tmp_path)
+    write(incoming, 0, 1)
+    incoming.close()
+    other = new_file(tmp_path, digest=b"\x00" * 32)
+    assert not other.resumed
+    assert other.missing() == [(0, 11)]
+    other.discard()
+
+
+@pytest.mark.parametrize("sender", ["x/../../../tmp/evil", "..", "a\\..\\b"])
+def test_sender_name_cannot_leave_the_directory(tmp_path, sender):
+    incoming = ResumableFile(sender, "datos.bin", len(DATA), DIGEST, CHUNK, tmp_path)
+    assert incoming.path.parent == tmp_path
+    assert incoming.progress_path.parent == tmp_path
+    assert ".." not in incoming.path.name.replace("datos.bin.", "", 1)
+    incoming.discard()
+
+
+def test_in_order_chunks_are_hashed_on_arrival(tmp_path):
+    incoming = new_file(tmp_path)
+    write(incoming, *range(11))
+    os.truncate(incoming.path, 0)  # verify() no necesita volver a leer nada
+    assert incoming.verify()
+    incoming.discard()
+
+
+def test_reset_after_failed_verification(tmp_path):
+    incoming = new_file(tmp_path, digest=b"\x00" * 32)
+    write(incoming, *range(11))
+    assert not incoming.verify()
+    incoming.reset()
+    assert incoming.failures == 1
+    assert incoming.missing() == [(0, 11)]
+    incoming.discard()
+
+
+@pytest.mark.parametrize("size, chunk_size", [
+    (10, 0), (10, MAX_RESUME_CHUNK_SIZE + 1), ((MAX_RESUME_CHUNKS + 1) * 1024, 1024), (1 << 60, 1),
+])
+def test_check_resume_rejects_out_of_bounds(size, chunk_size):
+    with pytest.raises(ValueError):
+        check_resume(size, chunk_size)
+
+
+def test_check_resume_accepts_sane_values():
+    check_resume(0, 64 * 1024)
+    check_resume(MAX_RESUME_CHUNKS * 1024, 1024)
+
+
+# ----------------------------------------------------------------------
+# MessageReceiver: máquina de estados START_RESUME -> NEED -> DATA_AT -> END -> DONE
+# ----------------------------------------------------------------------
+
+class Events:
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, message, kind=None):
+        self.events.append(message)
+
+
+class Peer:
+    """Receptor con el emisor "ana" simulado: recoge las respuestas NEED / DONE."""
+
+    def __init__(self, directory):
+        self.state = ChatState()
+        self.state.name = "bob"
+        self.state.save_path = str(directory)
+        self.buffer = Events()
+        self.replies = []
+        self.receiver = MessageReceiver(None, self.state, self.buffer, lambda *args: None,
+                                        FrameCodec(), None, self._reply)
+
+    def _reply(self, msg_type, payload):
+        payload = bytes(payload)
+        assert msg_type == 3 and payload[:4] == b"\x03ana"
+        tid, kind = struct.unpack_from("!IB", payload, 4)
+        self.replies.append((tid, kind, payload[9:]))
+
+    def chunk(self, kind, body=b"", tid=7):
+        self.receiver._on_file_chunk(memoryview(encode_chunk("ana", tid, kind, body)))
+
+    def start(self, tid=7, size=len(DATA), digest=DIGEST, chunk_size=CHUNK):
+        self.chunk(CHUNK_START_RESUME, encode_start_resume("datos.bin", size, digest, chunk_size), tid)
+
+    def send(self, *indexes, tid=7):
+        for index in indexes:
+            self.chunk(CHUNK_DATA_AT, encode_data_at(index, piece(index)) + piece(index), tid)
+
+    def reply(self, timeout=5.0):
+        """Siguiente respuesta (DONE puede llegar desde el hilo de verificación)."""
+        deadline = time.monotonic() + timeout
+        while not self.replies:
+            assert time.monotonic() < deadline, "sin respuesta del receptor"
+            time.sleep(0.01)
+        return self.replies.pop(0)
+
+
+def test_full_transfer(tmp_path):
+    peer = Peer(tmp_path)
+    peer.start()
+    assert peer.reply() == (7, CHUNK_NEED, b"\x00\x00\x00\x01" + struct.pack("!QQ", 0, 11))
+    peer.send(*range(11))
+    peer.chunk(CHUNK_END)
+    assert peer.reply() == (7, CHUNK_DONE, bytes([DONE_OK]))
+    assert (tmp_path / "datos.bin").read_bytes() == DATA
+    assert not peer.state.incoming_files
+
+
+def test_interrupted_transfer_asks_only_for_missing_chunks(tmp_path):
+    peer = Peer(tmp_path)
+    peer.start(tid=1)
+    peer.reply()
+    peer.send(0, 1, 2, 3, tid=1)
+    for incoming in peer.state.incoming_files.values():  # conexión perdida (ver run())
+        incoming.close()
+    peer.state.incoming_files.clear()
+
+    peer = Peer(tmp_path)
+    peer.start(tid=2)
+    tid, kind, body = peer.reply()
+    assert (tid, kind, decode_ranges(body)) == (2, CHUNK_NEED, [(4, 11)])
+    assert any("Reanudando" in event for event in peer.buffer.events)
+    peer.send(*range(4, 11), tid=2)
+    peer.chunk(CHUNK_END, tid=2)
+    assert peer.reply() == (2, CHUNK_DONE, bytes([DONE_OK]))
+    assert (tmp_path / "datos.bin").read_bytes() == DATA
+
+
+def test_end_with_missing_chunks_sends_need(tmp_path):
+    peer = Peer(tmp_path)
+    peer.start()
+    peer.reply()
+    peer.send(0, 2, 4, 6, 8, 10)
+    peer.chunk(CHUNK_DATA_AT, encode_data_at(1, piece(1)) + b"x" * CHUNK)  # resumen erróneo
+    peer.chunk(CHUNK_END)
+    tid, kind, body = peer.reply()
+    assert kind == CHUNK_NEED
+    assert decode_ranges(body) == [(1, 2), (3, 4), (5, 6), (7, 8), (9, 10)]
+
+
+def test_failed_verification_asks_again_then_gives_up(tmp_path):
+    peer = Peer(tmp_path)
+    peer.start(digest=b"\x00" * 32)
+    peer.reply()
+    for _ in range(MAX_VERIFY_FAILURES):
+        peer.send(*range(11))
+        peer.chunk(CHUNK_END)
+        tid, kind, body = peer.reply()
+        assert (kind, decode_ranges(body)) == (CHUNK_NEED, [(0, 11)])
+    peer.send(*range(11))
+    peer.chunk(CHUNK_END)
+    assert peer.reply() == (7, CHUNK_DONE, bytes([DONE_CORRUPT]))
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("size, chunk_size", [(100, 0), (1 << 60, 1)])
+def test_out_of_bounds_start_is_rejected(tmp_path, size, chunk_size):
+    peer = Peer(tmp_path)
+    peer.start(size=size, chunk_size=chunk_size)
+    assert peer.reply() == (7, CHUNK_DONE, bytes([DONE_REJECTED]))
+    assert not peer.state.incoming_files
+    assert any("rechazado" in event for event in peer.buffer.events)
+
+
+# ----------------------------------------------------------------------
+# Servidor: los nombres no pueden contener separadores de ruta
+# ----------------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def server_port(start_server):
+    return start_server().port
+
+
+@pytest.mark.parametrize("name", ["x/../../tmp/evil", "a\\b", "..", "ana..bob"])
+def test_server_rejects_path_like_names(server_port, name):
+    sock = connect(server_port)
+    sock.settimeout(5)
+    send_tlv(sock, 1, f"SET_NAME:{name}".encode("utf-8"))
+    assert recv_tlv(sock)[1] == b"NAME_TAKEN"
+    send_tlv(sock, 1, f"SET_NAME:ana_{len(name)}".encode("utf-8"))
+    assert recv_tlv(sock)[1] == b"NAME_OK"
+    sock.close()
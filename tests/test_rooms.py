@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Salas: altas y bajas, instantáneas de miembros y reparto de tramas codificadas una vez."""
+
+from unittest import mock
+
+import pytest
+
+from benchmarks.common import connect, recv_tlv, send_tlv
+from common.compression import FrameCodec
+from common import protocol
+from common.protocol import PROTOCOL_V1, PROTOCOL_V2
+from server.facade import SERVER_MODES
+from server.rooms import EncodedMessage, FanOut, RoomRegistry
+
+
+class Session:
+    """Miembro de una sala que guarda las tramas que se le encolan."""
+
+    def __init__(self, name, protocol=PROTOCOL_V1, codecs=()):
+        self.name = name
+        self.protocol = protocol
+        self.codecs = codecs
+        self.frames = []
+
+    def send_frame(self, frame):
+        self.frames.append(frame)
+        return True
+
+
+class Gone(Session):
+    def send_frame(self, frame):
+        raise ConnectionError
+
+
+def text(frame):
+    """Payload v1 de una trama (cabecera + payload)."""
+    return b"".join(frame)[5:].decode("utf-8")
+
+
+def test_rooms_lifecycle():
+    rooms = RoomRegistry()
+    ana, bob = Session("ana"), Session("bob")
+    assert rooms.create("general", ana)
+    assert not rooms.create("general", bob)
+    assert rooms.join("otra", bob) is None
+    assert rooms.join("general", bob) is True
+    assert rooms.join("general", bob) is False
+    assert rooms.members("general") == (ana, bob)
+    assert rooms.leave("general", "ana") and not rooms.leave("general", "ana")
+    assert rooms.members("general") == (bob,)
+    assert rooms.leave("general", "bob")
+    assert rooms.names() == [] and rooms.members("general") == ()  # vacía: se borra
+
+
+def test_members_snapshot_is_reused_until_a_change():
+    rooms = RoomRegistry()
+    rooms.create("general", Session("ana"))
+    snapshot = rooms.members("general")
+    assert rooms.members("general") is snapshot
+    rooms.join("general", Session("bob"))
+    assert rooms.members("general") is not snapshot
+    assert snapshot == (rooms.members("general")[0],)  # la anterior no cambia
+
+
+def test_drop_user_leaves_every_room():
+    rooms = RoomRegistry()
+    ana, bob = Session("ana"), Session("bob")
+    rooms.create("a", ana)
+    rooms.create("b", ana)
+    rooms.join("b", bob)
+    assert sorted(rooms.drop_user("ana")) == ["a", "b"]
+    assert rooms.names() == ["b"] and not rooms.is_member("b", "ana")
+    assert rooms.drop_user("ana") == []
+
+
+def test_message_is_encoded_once_per_variant():
+    message = EncodedMessage(FrameCodec(), "ROOM_FROM", "general", "ana", "hola " * 100)
+    members = [Session(f"v1-{i}") for i in range(3)] + [Session(f"v2-{i}", PROTOCOL_V2) for i in range(3)]
+    members += [Session(f"z-{i}", PROTOCOL_V2, ("zlib",)) for i in range(3)]
+    encoder = mock.patch("server.rooms.frame_command", wraps=protocol.frame_command)
+    with encoder as encode:
+        assert FanOut().deliver(members, message) == len(members)
+    assert encode.call_count == 3 and message.variants == 3
+    for group in (members[0:3], members[3:6], members[6:9]):
+        assert all(member.frames[0] is group[0].frames[0] for member in group)  # la misma trama
+    assert text(members[0].frames[0]) == "ROOM_FROM:general:ana:" + "hola " * 100
+    compressed = b"".join(members[6].frames[0])
+    assert len(compressed) < len(b"".join(members[3].frames[0]))
+
+
+@pytest.mark.parametrize("fanout", [FanOut(), FanOut(workers=3, parallel=4, slice_size=3)])
+def test_deliver_skips_the_sender_and_closed_members(fanout):
+    members = [Session(f"u{i}") for i in range(10)]
+    members[4] = Gone("u4")
+    message = EncodedMessage(FrameCodec(), "ROOM_FROM", "general", "u0", "hola")
+    assert fanout.deliver(members, message, skip=members[0]) == 8
+    assert members[0].frames == []
+    assert all(len(member.frames) == 1 for member in members[1:] if member is not members[4])
+    fanout.stop()
+
+
+# ----------------------------------------------------------------------
+# Servidor: ROOM_POST llega a los demás miembros y no vuelve al autor
+# ----------------------------------------------------------------------
+
+@pytest.fixture(scope="module", params=sorted(SERVER_MODES))
+def port(request, start_server):
+    return start_server(SERVER_MODES[request.param]).port
+
+
+def request(sock, msg_type, payload):
+    send_tlv(sock, msg_type, payload)
+    return recv_tlv(sock)
+
+
+def test_room_post_reaches_the_other_members(port):
+    ana, bob = connect(port), connect(port)
+    for sock, name in ((ana, b"ana"), (bob, b"bob")):
+        sock.settimeout(5)
+        assert request(sock, 1, b"SET_NAME:" + name) == (1, b"NAME_OK")
+    assert request(bob, 1, b"ROOM_JOIN:sala") == (1, b"ERROR:La sala sala no existe")
+    assert request(ana, 1, b"ROOM_CREATE:sala") == (1, b"ROOM_CREATED:sala")
+    assert request(bob, 1, b"ROOM_JOIN:sala") == (1, b"ROOM_JOINED:sala")
+    send_tlv(ana, 0, b"ROOM_POST:sala:hola:mundo")
+    assert recv_tlv(bob) == (0, b"ROOM_FROM:sala:ana:hola:mundo")
+    # La siguiente trama de ana es la respuesta a su ROOM_LEAVE: no recibió su propio mensaje
+    assert request(ana, 1, b"ROOM_LEAVE:sala") == (1, b"ROOM_LEFT:sala")
+    assert request(ana, 0, b"ROOM_POST:sala:otra") == (1, "ERROR:No estás en la sala sala".encode())
+    ana.close()
+    bob.close()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""SocketProfile: opciones leídas de vuelta de un socket real y ventana de agrupación."""
+
+import socket
+import time
+
+import pytest
+
+from benchmarks.common import recv_tlv
+from common.sockopts import SOCKET_PROFILES, SocketProfile, get_profile
+from server.session import ClientSession
+
+
+def getopt(sock, level, name):
+    return sock.getsockopt(level, getattr(socket, name))
+
+
+def test_profile_options_reach_the_socket():
+    profile = SocketProfile(sndbuf=64 * 1024, rcvbuf=96 * 1024, keepidle=30, keepintvl=7, keepcnt=3)
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        profile.apply(sock)
+        assert getopt(sock, socket.IPPROTO_TCP, "TCP_NODELAY")
+        assert getopt(sock, socket.SOL_SOCKET, "SO_KEEPALIVE")
+        # Linux duplica el valor pedido (reserva para su contabilidad)
+        assert getopt(sock, socket.SOL_SOCKET, "SO_SNDBUF") >= 64 * 1024
+        assert getopt(sock, socket.SOL_SOCKET, "SO_RCVBUF") >= 96 * 1024
+        for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 7), ("TCP_KEEPCNT", 3)):
+            if hasattr(socket, name):
+                assert getopt(sock, socket.IPPROTO_TCP, name) == value
+
+
+def test_system_profile_leaves_the_socket_untouched():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        before = {name: getopt(sock, socket.SOL_SOCKET, name) for name in ("SO_SNDBUF", "SO_RCVBUF")}
+        SOCKET_PROFILES["system"].apply(sock)
+        assert not getopt(sock, socket.IPPROTO_TCP, "TCP_NODELAY")
+        assert not getopt(sock, socket.SOL_SOCKET, "SO_KEEPALIVE")
+        assert getopt(sock, socket.SOL_SOCKET, "SO_SNDBUF") == before["SO_SNDBUF"]
+        assert getopt(sock, socket.SOL_SOCKET, "SO_RCVBUF") == before["SO_RCVBUF"]
+
+
+def test_unknown_profile_is_rejected():
+    assert get_profile(None) is SOCKET_PROFILES["default"]
+    with pytest.raises(ValueError, match="Perfil de socket desconocido"):
+        get_profile("rapido")
+
+
+@pytest.mark.parametrize("window, batches", [(0.5, 1), (0.0, 2)])
+def test_coalesce_window_joins_frames_queued_within_it(window, batches):
+    server_end, client_end = socket.socketpair()
+    session = ClientSession(server_end, ("local", 0), "bob",
+                            profile=SocketProfile(coalesce_bytes=64 * 1024, coalesce_window=window))
+    client_end.settimeout(5)
+    try:
+        session.send(1, b"uno")
+        time.sleep(0.1)  # llega dentro de la ventana, pero después de la primera trama
+        session.send(1, b"dos")
+        assert [recv_tlv(client_end) for _ in range(2)] == [(1, b"uno"), (1, b"dos")]
+        stats = session.queue_stats()
+        assert stats["sent_frames"] == 2 and stats["batches"] == batches
+    finally:
+        session.close()
+        client_end.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""FileUploader: Tipo 2 con sendfile por bloques, STREAM, rondas RESUME y recuperación de errores."""
+
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from client.core import ChatClient
+from client.state import ChatState
+from client.transfer import (
+    CHUNK_DATA, CHUNK_DATA_AT, CHUNK_DONE, CHUNK_END, CHUNK_NEED, CHUNK_SIZE, CHUNK_START,
+    CHUNK_START_RESUME, DONE_OK, DONE_REJECTED, encode_ranges, encode_start,
+)
+from client.upload import FileUploader, UploadRegion
+from common.compression import FLAGS_MASK, FrameCodec
+from common.framing import FileRegion, FrameReader, frame_parts, send_buffers
+
+DATA = os.urandom(CHUNK_SIZE * 2 + 1000)  # STREAM/RESUME: tres fragmentos, el último corto
+
+
+class Events:
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, message, kind=None):
+        self.events.append(message)
+
+    def wait_for(self, text, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not any(text in event for event in self.events):
+            assert time.monotonic() < deadline, f"sin evento {text!r}: {self.events}"
+            time.sleep(0.01)
+
+
+class Wire:
+    """
+    Extremo del servidor sobre un socketpair.
+
+    send() hace lo mismo que ChatClient._write sin créditos: comprime si hay
+    códecs y la trama no lleva regiones de archivo, y escribe con send_buffers.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.codec = FrameCodec()
+        self.tx, self.rx = socket.socketpair()
+        self.parts = []   # tipos de las partes de cada trama enviada
+        self.types = []   # byte de tipo de cada trama recibida (con la marca del códec)
+        self.frames = queue.Queue()  # (tipo en el cable, tipo real, payload descomprimido)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def send(self, msg_type, data):
+        parts = (data,) if isinstance(data, (bytes, bytearray, memoryview)) else tuple(data)
+        self.parts.append(tuple(type(part) for part in parts))
+        if self.state.codecs and not any(isinstance(part, FileRegion) for part in parts):
+            msg_type, data = self.codec.encode(msg_type, data, self.state.codecs)
+        send_buffers(self.tx, frame_parts(msg_type, data))
+
+    def _read(self):
+        reader = FrameReader(self.rx)
+        while True:
+            frame = reader.read_frame(reuse=False)
+            if frame is None:
+                return
+            self.types.append(frame[0])
+            msg_type, payload = self.codec.decode(frame[0], frame[1], self.state.codecs)
+            self.frames.put((frame[0], msg_type, bytes(payload)))
+
+    def next(self):
+        return self.frames.get(timeout=5)
+
+    def chunk(self):
+        """Siguiente Tipo 3 hacia "bob": (transfer_id, tipo de fragmento, cuerpo)."""
+        _, msg_type, payload = self.next()
+        assert msg_type == 3 and payload[:4] == b"\x03bob"
+        tid, kind = struct.unpack_from("!IB", payload, 4)
+        return tid, kind, payload[9:]
+
+    def close(self):
+        # El lector termina con el fin de flujo antes de cerrar su extremo
+        self.tx.close()
+        self._reader.join(5)
+        self.rx.close()
+
+
+@pytest.fixture
+def upload(tmp_path):
+    state, events = ChatState(), Events()
+    wire = Wire(state)
+    uploader = FileUploader(wire.send, events.add_event, state)
+    path = tmp_path / "datos.bin"
+    path.write_bytes(DATA)
+    yield state, events, wire, uploader, path
+    uploader.stop()
+    wire.close()
+
+
+def progress_events(events):
+    return [event for event in events.events if event.startswith("UPLOAD_PROGRESS:")]
+
+
+def test_whole_file_goes_out_with_sendfile_in_blocks(upload, monkeypatch):
+    state, events, wire, uploader, path = upload
+    monkeypatch.setattr("client.upload.UPLOAD_BLOCK", 50000)
+    monkeypatch.setattr("client.upload.PROGRESS_INTERVAL", 0)
+    uploader.submit([str(path)], "bob")
+    wire_type, msg_type, payload = wire.next()
+    assert wire_type == msg_type == 2
+    assert payload == b"\x03bob\x09datos.bin" + DATA
+    assert wire.parts == [(bytes, UploadRegion)]
+    events.wait_for("Envío de archivos completado")
+    sent = [int(event.split(":")[1]) for event in progress_events(events)]
+    assert sent == [50000, 100000, len(DATA), len(DATA)]  # un aviso por bloque y el final
+    assert uploader.progress() == {"file": "datos.bin", "sent": len(DATA), "total": len(DATA), "pending": 0}
+
+
+@pytest.mark.parametrize("codecs", [(), ("zlib",)])
+def test_stream_sends_bounded_chunks(upload, tmp_path, codecs):
+    state, events, wire, uploader, _ = upload
+    data = DATA if not codecs else b"texto repetido " * 10000  # comprimible
+    path = tmp_path / "flujo.txt"
+    path.write_bytes(data)
+    state.codecs = codecs
+    state.stream_files = True
+    uploader.submit([str(path)], "bob")
+    tid, kind, body = wire.chunk()
+    assert (kind, body) == (CHUNK_START, encode_start("flujo.txt", len(data)))
+    received = b""
+    while True:
+        chunk_tid, kind, body = wire.chunk()
+        assert chunk_tid == tid
+        if kind == CHUNK_END:
+            break
+        assert kind == CHUNK_DATA and len(body) <= CHUNK_SIZE
+        received += body
+    assert received == data
+    # Sin códec el cuerpo es una región (sendfile); con códec se lee para comprimirlo
+    bodies = {parts[-1] for parts in wire.parts[1:-1]}
+    assert bodies == ({bytes} if codecs else {FileRegion})
+    assert all(bool(wire_type & FLAGS_MASK) == bool(codecs) for wire_type in wire.types[1:-1])
+    events.wait_for("Envío de archivos completado")
+
+
+def resumable(upload):
+    state, events, wire, uploader, path = upload
+    state.resume_files = True
+    uploader.submit([str(path)], "bob")
+    tid, kind, _ = wire.chunk()
+    assert kind == CHUNK_START_RESUME
+    return tid, state.outgoing_files[("bob", tid)]
+
+
+def test_resume_sends_only_the_missing_chunks(upload):
+    state, events, wire, uploader, path = upload
+    tid, replies = resumable(upload)
+    replies.put((CHUNK_NEED, encode_ranges([(1, 3)])))  # el receptor ya tiene el fragmento 0
+    for index in (1, 2):
+        _, kind, body = wire.chunk()
+        assert kind == CHUNK_DATA_AT and struct.unpack_from("!Q", body)[0] == index
+        assert body[24:] == DATA[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+    assert wire.chunk()[1] == CHUNK_END
+    # El fragmento 0 ya estaba: cuenta como enviado con su tamaño real
+    assert uploader.progress()["sent"] == len(DATA)
+    replies.put((CHUNK_NEED, encode_ranges([(2, 3)])))  # otra ronda: un fragmento dañado
+    _, kind, body = wire.chunk()
+    assert kind == CHUNK_DATA_AT and struct.unpack_from("!Q", body)[0] == 2
+    assert wire.chunk()[1] == CHUNK_END
+    events.wait_for("Reanudando datos.bin: faltan 2 de 3 fragmentos")
+    replies.put((CHUNK_DONE, bytes([DONE_OK])))
+    events.wait_for("datos.bin enviado y verificado")
+    events.wait_for("Envío de archivos completado")
+    assert not state.outgoing_files
+
+
+@pytest.mark.parametrize("reply, message", [
+    ((CHUNK_DONE, bytes([DONE_REJECTED])), "rechazó el archivo"),
+    (None, "no responde"),
+])
+def test_resume_failures_are_reported(upload, monkeypatch, reply, message):
+    monkeypatch.setattr("client.upload.RESUME_TIMEOUT", 0.2)
+    state, events, wire, uploader, path = upload
+    tid, replies = resumable(upload)
+    if reply is not None:
+        replies.put(reply)
+    events.wait_for(f"[ERROR] Error al enviar datos.bin: bob {message}")
+    events.wait_for("Envío de archivos completado")
+    assert not state.outgoing_files and uploader.progress()["pending"] == 0
+
+
+def test_a_failed_file_does_not_stop_the_batch(upload, tmp_path):
+    state, events, wire, uploader, path = upload
+    send = wire.send
+    calls = []
+
+    def flaky(msg_type, data):
+        calls.append(msg_type)
+        if len(calls) == 1:
+            raise ConnectionError("conexión perdida")
+        send(msg_type, data)
+
+    uploader._send = flaky
+    other = tmp_path / "otro.bin"
+    other.write_bytes(b"hola")
+    uploader.submit([str(path), str(tmp_path / "no-existe.bin"), str(other)], "bob")
+    assert wire.next()[2] == b"\x03bob\x08otro.bin" + b"hola"
+    events.wait_for("Envío de archivos completado")
+    errors = [event for event in events.events if event.startswith("[ERROR]")]
+    assert len(errors) == 2 and "conexión perdida" in errors[0] and "no-existe.bin" in errors[1]
+    assert uploader.progress()["pending"] == 0
+
+
+def test_upload_after_disconnect_reports_no_connection(tmp_path):
+    client = ChatClient()
+    client._sock, peer = socket.socketpair()
+    client.disconnect()
+    peer.close()
+    assert client._sock is None
+    with pytest.raises(ConnectionError, match="No hay conexión"):
+        client._write(1, b"GET_USERS")
+    events = Events()
+    uploader = FileUploader(client._write, events.add_event, ChatState())
+    path = tmp_path / "datos.bin"
+    path.write_bytes(b"hola")
+    uploader.submit([str(path)], "bob")
+    events.wait_for("Error al enviar datos.bin: No hay conexión con el servidor")
+    uploader.stop()
+    client.close()